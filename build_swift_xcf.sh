@@ -85,7 +85,7 @@ SP_LIB_NAME=lbsolverlib
 SP_BRIDGE_NAME=bng_bridge
 SP_BRIDGE_DIR=${SP_DIR}/${SP_LIB_NAME}/Sources/${SP_BRIDGE_NAME}
 SP_BRIDGE_HEADER_DIR=${SP_BRIDGE_DIR}/include_internal
-SP_BRIDGE_SWIFT_DIR=${SP_DIR}/${SP_LIB_NAME}/lbsolverlib
+SP_BRIDGE_SWIFT_DIR=${SP_DIR}/${SP_LIB_NAME}/Sources/${SP_LIB_NAME}
 
 
 function find_dev_team_id() {
@@ -7,3 +7,457 @@
   #define BNG_API_EXPORT __attribute__((visibility("default")))
   #define BNG_API_IMPORT
 #endif
+
+#if defined(BNG_BINDING_STATS)
+#include <stdint.h>
+
+// counters of one binding entry point - a binding built with BNG_BINDING_STATS copies its
+// table out through {api}_get_binding_stats
+typedef struct BngCallStats {
+  const char* name;
+  uint64_t calls;
+  uint64_t total_ns;
+  uint64_t max_ns;
+  uint64_t arg_bytes;
+} BngCallStats;
+#endif // defined(BNG_BINDING_STATS)
+
+#if defined(__cplusplus)
+#include <algorithm>
+#include <atomic>
+#if defined(BNG_BINDING_STATS)
+#include <chrono>
+#endif
+#include <condition_variable>
+#include <cstddef>
+#include <cstdint>
+#include <deque>
+#include <functional>
+#include <iterator>
+#include <memory>
+#include <mutex>
+#include <string>
+#include <string_view>
+#include <thread>
+#include <utility>
+#include <vector>
+
+namespace bng::api {
+  // pull based result of an is_stream method - items are produced on demand instead of
+  // materializing the whole result up front
+  template <class T>
+  class Stream {
+  public:
+    virtual ~Stream() = default;
+
+    // false once the stream is exhausted, item is left untouched then
+    virtual bool next(T& item) = 0;
+  };
+
+  // binding side state of an open stream - the current item stays readable until next()
+  template <class T>
+  struct StreamCursor {
+    explicit StreamCursor(std::unique_ptr<Stream<T>> stream) : stream(std::move(stream)) {}
+
+    bool next() {
+      return stream && stream->next(item);
+    }
+
+    std::unique_ptr<Stream<T>> stream;
+    T item{};
+  };
+
+  // a packed string list - the UTF-8 of every string back to back, string i spanning
+  // offsets[i]..offsets[i + 1]. bindings pass the caller's two buffers through as they are and
+  // the strings are sliced out on access, without a copy or an allocation per string.
+  class StringViews {
+  public:
+    class Iterator {
+    public:
+      using iterator_category = std::input_iterator_tag;
+      using value_type = std::string_view;
+      using difference_type = std::ptrdiff_t;
+      using pointer = void;
+      using reference = std::string_view;
+
+      Iterator(const StringViews* views, uint32_t index) : views_(views), index_(index) {}
+
+      std::string_view operator*() const {
+        return (*views_)[index_];
+      }
+
+      Iterator& operator++() {
+        ++index_;
+        return *this;
+      }
+
+      Iterator operator++(int) {
+        auto it = *this;
+        ++index_;
+        return it;
+      }
+
+      bool operator==(const Iterator& other) const = default;
+
+    private:
+      const StringViews* views_;
+      uint32_t index_;
+    };
+
+    StringViews() = default;
+
+    // offsets holds count + 1 entries
+    StringViews(const char* chars, const uint32_t* offsets, uint32_t count)
+        : chars_(chars), offsets_(offsets), count_(count) {}
+
+    uint32_t size() const {
+      return count_;
+    }
+
+    bool empty() const {
+      return count_ == 0;
+    }
+
+    std::string_view operator[](uint32_t i) const {
+      return std::string_view(chars_ + offsets_[i], offsets_[i + 1] - offsets_[i]);
+    }
+
+    Iterator begin() const {
+      return Iterator(this, 0);
+    }
+
+    Iterator end() const {
+      return Iterator(this, count_);
+    }
+
+  private:
+    const char* chars_ = nullptr;
+    const uint32_t* offsets_ = nullptr;
+    uint32_t count_ = 0;
+  };
+
+  // packs separately held strings for a StringViews - for bindings whose callers can't hand
+  // over a packed list
+  class PackedStrings {
+  public:
+    template <class Strings>
+    explicit PackedStrings(const Strings& strings) {
+      offsets_.reserve(std::size(strings) + 1);
+      offsets_.push_back(0);
+      for (const auto& s : strings) {
+        chars_.append(s);
+        offsets_.push_back(uint32_t(chars_.size()));
+      }
+    }
+
+    StringViews views() const {
+      return StringViews(chars_.data(), offsets_.data(), uint32_t(offsets_.size() - 1));
+    }
+
+  private:
+    std::string chars_;
+    std::vector<uint32_t> offsets_;
+  };
+
+  // a fixed set of interchangeable instances for calls from any number of threads.
+  // checkout() pops a free instance off a lock-free stack and waits while all are busy, the
+  // lease pushes it back. the stack head carries a version tag next to the index, so a pop
+  // racing an instance that was checked out and returned in between fails its exchange (ABA).
+  template <class T>
+  class InstancePool {
+  public:
+    class Lease {
+    public:
+      Lease(InstancePool* pool, uint32_t index) : pool_(pool), index_(index) {}
+      Lease(const Lease&) = delete;
+      Lease& operator=(const Lease&) = delete;
+
+      ~Lease() {
+        pool_->release(index_);
+      }
+
+      T* operator->() const {
+        return pool_->instances_[index_].get();
+      }
+
+      T& operator*() const {
+        return *pool_->instances_[index_];
+      }
+
+    private:
+      InstancePool* pool_;
+      uint32_t index_;
+    };
+
+    // make() is called size times and the pool owns what it returns - a raw, unique or
+    // shared pointer. size 0 makes one instance per hardware thread.
+    template <class Make>
+    InstancePool(uint32_t size, Make make)
+        : next_(size ? size : std::max(1u, std::thread::hardware_concurrency())) {
+      instances_.reserve(next_.size());
+      for (uint32_t i = 0; i < next_.size(); ++i) {
+        instances_.emplace_back(make());
+        next_[i].store(i + 1 < next_.size() ? i + 1 : kNone, std::memory_order_relaxed);
+      }
+      head_.store(0, std::memory_order_release);
+    }
+
+    InstancePool(const InstancePool&) = delete;
+    InstancePool& operator=(const InstancePool&) = delete;
+
+    uint32_t size() const {
+      return uint32_t(instances_.size());
+    }
+
+    Lease checkout() {
+      uint64_t head = head_.load(std::memory_order_acquire);
+      for (;;) {
+        const auto index = uint32_t(head);
+        if (index == kNone) {
+          // all busy - sleeps until a release moves the head
+          head_.wait(head, std::memory_order_acquire);
+          head = head_.load(std::memory_order_acquire);
+          continue;
+        }
+        const uint64_t next = tagged(head, next_[index].load(std::memory_order_relaxed));
+        if (head_.compare_exchange_weak(
+                head, next, std::memory_order_acquire, std::memory_order_acquire)) {
+          return Lease(this, index);
+        }
+      }
+    }
+
+    // calls fn(instance, i) for every i in [0, count), split in contiguous slices over up to
+    // size() checked out instances running in parallel - the calling thread runs the first
+    // slice, the others get a thread each. a slice stops at the first i fn returns false for.
+    // returns the lowest such i, count when every call returned true.
+    template <class Fn>
+    size_t run_sliced(size_t count, Fn fn) {
+      const size_t slices = std::min(size_t(size()), count);
+      std::vector<size_t> stops(slices, count);
+      auto run_slice = [&](size_t slice) {
+        auto lease = checkout();
+        for (size_t i = count * slice / slices, end = count * (slice + 1) / slices; i < end; ++i) {
+          if (!fn(*lease, i)) {
+            stops[slice] = i;
+            return;
+          }
+        }
+      };
+      std::vector<std::thread> threads;
+      for (size_t slice = 1; slice < slices; ++slice) {
+        threads.emplace_back(run_slice, slice);
+      }
+      if (slices) {
+        run_slice(0);
+      }
+      for (auto& thread : threads) {
+        thread.join();
+      }
+      return slices ? *std::min_element(stops.begin(), stops.end()) : count;
+    }
+
+  private:
+    static constexpr uint32_t kNone = UINT32_MAX;
+
+    // the head with a new index and the next version
+    static uint64_t tagged(uint64_t head, uint32_t index) {
+      return (((head >> 32) + 1) << 32) | index;
+    }
+
+    void release(uint32_t index) {
+      uint64_t head = head_.load(std::memory_order_relaxed);
+      do {
+        next_[index].store(uint32_t(head), std::memory_order_relaxed);
+      } while (!head_.compare_exchange_weak(
+          head, tagged(head, index), std::memory_order_release, std::memory_order_relaxed));
+      head_.notify_one();
+    }
+
+    std::vector<std::shared_ptr<T>> instances_;
+    // free list links, kNone ends it
+    std::vector<std::atomic<uint32_t>> next_;
+    // version << 32 | index of the first free instance
+    std::atomic<uint64_t> head_{kNone};
+  };
+
+  // a fixed set of threads running posted tasks in order - the default *_async variants run
+  // on shared(), so any number of async calls share one thread per hardware thread instead
+  // of starting a thread each. tasks wait in the queue while all threads are busy.
+  class AsyncExecutor {
+  public:
+    // created on first use, drains the queue and joins its threads at exit
+    static AsyncExecutor& shared() {
+      static AsyncExecutor executor(std::max(1u, std::thread::hardware_concurrency()));
+      return executor;
+    }
+
+    explicit AsyncExecutor(uint32_t size) {
+      threads_.reserve(size);
+      for (uint32_t i = 0; i < size; ++i) {
+        threads_.emplace_back([this]() { run(); });
+      }
+    }
+
+    AsyncExecutor(const AsyncExecutor&) = delete;
+    AsyncExecutor& operator=(const AsyncExecutor&) = delete;
+
+    ~AsyncExecutor() {
+      {
+        std::lock_guard lock(mutex_);
+        stopping_ = true;
+      }
+      wake_.notify_all();
+      for (auto& thread : threads_) {
+        thread.join();
+      }
+    }
+
+    void post(std::function<void()> task) {
+      {
+        std::lock_guard lock(mutex_);
+        tasks_.push_back(std::move(task));
+      }
+      wake_.notify_one();
+    }
+
+  private:
+    void run() {
+      for (;;) {
+        std::function<void()> task;
+        {
+          std::unique_lock lock(mutex_);
+          wake_.wait(lock, [this]() { return stopping_ || !tasks_.empty(); });
+          if (tasks_.empty()) {
+            return;
+          }
+          task = std::move(tasks_.front());
+          tasks_.pop_front();
+        }
+        task();
+      }
+    }
+
+    std::mutex mutex_;
+    std::condition_variable wake_;
+    std::deque<std::function<void()>> tasks_;
+    bool stopping_ = false;
+    std::vector<std::thread> threads_;
+  };
+
+#if defined(BNG_BINDING_STATS)
+  // the counters behind a BngCallStats. bindings keep one per entry point in a static table
+  // and every call adds to it with relaxed atomics - concurrent calls never wait on each other,
+  // and a copy taken while calls run may be off by the calls in flight.
+  class CallStats {
+  public:
+    explicit constexpr CallStats(const char* name) : name_(name) {}
+
+    void record(uint64_t ns, uint64_t arg_bytes) {
+      calls_.fetch_add(1, std::memory_order_relaxed);
+      total_ns_.fetch_add(ns, std::memory_order_relaxed);
+      arg_bytes_.fetch_add(arg_bytes, std::memory_order_relaxed);
+      uint64_t max_ns = max_ns_.load(std::memory_order_relaxed);
+      while (ns > max_ns &&
+             !max_ns_.compare_exchange_weak(max_ns, ns, std::memory_order_relaxed)) {
+      }
+    }
+
+    void copy_to(BngCallStats& out) const {
+      out.name = name_;
+      out.calls = calls_.load(std::memory_order_relaxed);
+      out.total_ns = total_ns_.load(std::memory_order_relaxed);
+      out.max_ns = max_ns_.load(std::memory_order_relaxed);
+      out.arg_bytes = arg_bytes_.load(std::memory_order_relaxed);
+    }
+
+  private:
+    const char* name_;
+    std::atomic<uint64_t> calls_{0};
+    std::atomic<uint64_t> total_ns_{0};
+    std::atomic<uint64_t> max_ns_{0};
+    std::atomic<uint64_t> arg_bytes_{0};
+  };
+
+  // records the time from construction to the end of the enclosing scope - the whole call,
+  // argument conversion and result copy included
+  class CallTimer {
+  public:
+    CallTimer(CallStats& stats, uint64_t arg_bytes)
+        : stats_(stats), arg_bytes_(arg_bytes), start_(std::chrono::steady_clock::now()) {}
+    CallTimer(const CallTimer&) = delete;
+    CallTimer& operator=(const CallTimer&) = delete;
+
+    ~CallTimer() {
+      const auto elapsed = std::chrono::steady_clock::now() - start_;
+      stats_.record(
+          uint64_t(std::chrono::duration_cast<std::chrono::nanoseconds>(elapsed).count()),
+          arg_bytes_);
+    }
+
+  private:
+    CallStats& stats_;
+    uint64_t arg_bytes_;
+    std::chrono::steady_clock::time_point start_;
+  };
+#endif // defined(BNG_BINDING_STATS)
+
+  template <class E>
+  struct Unexpected {
+    E error;
+  };
+
+  template <class E>
+  Unexpected<E> unexpected(E error) {
+    return Unexpected<E>{error};
+  }
+
+  // result of an error_enum method - the value or the error, never a message string.
+  // the error enum's zero value means success. follows std::expected naming so it can be
+  // swapped for it once the builds move to C++23.
+  template <class T, class E>
+  class Expected {
+  public:
+    Expected(T value) : value_(std::move(value)) {}
+    Expected(Unexpected<E> unexpected) : error_(unexpected.error) {}
+
+    bool has_value() const {
+      return error_ == E{};
+    }
+
+    explicit operator bool() const {
+      return has_value();
+    }
+
+    E error() const {
+      return error_;
+    }
+
+    T& value() & {
+      return value_;
+    }
+
+    const T& value() const& {
+      return value_;
+    }
+
+    T&& value() && {
+      return std::move(value_);
+    }
+
+  private:
+    T value_{};
+    E error_{};
+  };
+}
+
+// first statement of a binding entry point - times the call into STATS, an entry of the
+// binding's CallStats table. expands to nothing without BNG_BINDING_STATS, ARG_BYTES isn't
+// evaluated then.
+#if defined(BNG_BINDING_STATS)
+#define BNG_BINDING_CALL(STATS, ARG_BYTES) \
+  bng::api::CallTimer bng_call_timer((STATS), uint64_t(ARG_BYTES))
+#else
+#define BNG_BINDING_CALL(STATS, ARG_BYTES)
+#endif
+#endif // defined(__cplusplus)
@@ -1,3 +1,59 @@
 set(TOOL_SCRIPT_DIR "${PROJECT_SOURCE_DIR}/tool_scripts")
 set(GenApiSources_SCRIPT "${TOOL_SCRIPT_DIR}/gen_api_sources.py")
 set(GEN_OUT_DIR "${PROJECT_BINARY_DIR}/generated")
+
+# adds the custom command for a generated binding source and sets OUT_VAR to its sources.
+# with BNG_SHARD_BINDINGS the source is split into a translation unit per api class - the
+# shard list follows the api def, so it's generated once at configure time to read the
+# manifest, and the api def re-triggers configuration. shards are byproducts so unchanged
+# ones (the generator doesn't rewrite them) don't recompile. they're compiled on their own,
+# so they're added to AIO_EXCLUDES - unsharded, the binding joins the target's unity AIO.
+# with BNG_PRECOMPILE_BINDINGS and PCH_H the binding's includes are written to PCH_H and
+# OUT_VAR_PCH is set to it, for target_precompile_headers.
+#   bng_gen_binding_sources(OUT_VAR <var> OUT_CPP <path> [PCH_H <path>] [OUTPUTS <path>...]
+#                           ARGS <generator args>...)
+function(bng_gen_binding_sources)
+  cmake_parse_arguments(GEN "" "OUT_VAR;OUT_CPP;PCH_H" "OUTPUTS;ARGS" ${ARGN})
+  # written only when changed, like the shards, so it's a byproduct either way
+  set(GEN_BYPRODUCTS)
+  if(BNG_PRECOMPILE_BINDINGS AND GEN_PCH_H)
+    list(APPEND GEN_ARGS --out-pch-h="${GEN_PCH_H}")
+    list(APPEND GEN_BYPRODUCTS "${GEN_PCH_H}")
+    set(${GEN_OUT_VAR}_PCH "${GEN_PCH_H}" PARENT_SCOPE)
+  endif()
+
+  if(NOT BNG_SHARD_BINDINGS)
+    add_custom_command(
+        OUTPUT "${GEN_OUT_CPP}" ${GEN_OUTPUTS}
+        BYPRODUCTS ${GEN_BYPRODUCTS}
+        COMMAND "${Python_EXECUTABLE}" "${GenApiSources_SCRIPT}" ${GEN_ARGS}
+        MAIN_DEPENDENCY "${API_DEF}"
+        DEPENDS "${GenApiSources_SCRIPT}"
+        WORKING_DIRECTORY "${PROJECT_BINARY_DIR}"
+    )
+    set(${GEN_OUT_VAR} "${GEN_OUT_CPP}" PARENT_SCOPE)
+    return()
+  endif()
+
+  get_filename_component(GEN_DIR "${GEN_OUT_CPP}" DIRECTORY)
+  get_filename_component(GEN_STEM "${GEN_OUT_CPP}" NAME_WE)
+  set(GEN_MANIFEST "${GEN_DIR}/${GEN_STEM}_shards.txt")
+  file(MAKE_DIRECTORY "${GEN_DIR}")
+  # --opt="value" args keep their quotes without a shell to strip them
+  list(TRANSFORM GEN_ARGS REPLACE "\"" "" OUTPUT_VARIABLE GEN_CONFIGURE_ARGS)
+  Python("${PROJECT_BINARY_DIR}" "${GenApiSources_SCRIPT}" ${GEN_CONFIGURE_ARGS} --shard)
+  file(STRINGS "${GEN_MANIFEST}" GEN_SHARDS)
+  set_property(DIRECTORY APPEND PROPERTY CMAKE_CONFIGURE_DEPENDS "${API_DEF}")
+
+  add_custom_command(
+      OUTPUT "${GEN_MANIFEST}"
+      BYPRODUCTS ${GEN_SHARDS} ${GEN_OUTPUTS} ${GEN_BYPRODUCTS}
+      COMMAND "${Python_EXECUTABLE}" "${GenApiSources_SCRIPT}" ${GEN_ARGS} --shard
+      MAIN_DEPENDENCY "${API_DEF}"
+      DEPENDS "${GenApiSources_SCRIPT}"
+      WORKING_DIRECTORY "${PROJECT_BINARY_DIR}"
+  )
+  # the manifest stays a source so every generator attaches the command to the target
+  set(${GEN_OUT_VAR} ${GEN_SHARDS} "${GEN_MANIFEST}" PARENT_SCOPE)
+  set(AIO_EXCLUDES ${AIO_EXCLUDES} ${GEN_SHARDS} "${GEN_MANIFEST}" PARENT_SCOPE)
+endfunction()
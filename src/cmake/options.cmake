@@ -4,3 +4,10 @@ set(BNG_USE_FOLDERS TRUE CACHE BOOL "use folders in IDE organization")
 
 set(BNG_OPTIMIZED_BUILD_TYPE BNG_RELEASE CACHE STRING "what it says on the tin")
 set_property(CACHE BNG_OPTIMIZED_BUILD_TYPE PROPERTY STRINGS BNG_DEBUG BNG_RELEASE)
+
+set(BNG_WASM_BINDING embind CACHE STRING "wasm binding backend. raw trades embind for smaller extern C exports + generated JS glue")
+set_property(CACHE BNG_WASM_BINDING PROPERTY STRINGS embind raw)
+
+set(BNG_SHARD_BINDINGS FALSE CACHE BOOL "split generated binding sources into a translation unit per api class for parallel compilation")
+set(BNG_PRECOMPILE_BINDINGS FALSE CACHE BOOL "precompile the headers included by generated binding sources")
+set(BNG_PYTHON_EXTENSION FALSE CACHE BOOL "build a CPython extension module over the api on desktop platforms")
@@ -52,7 +52,7 @@ elseif(BNG_IS_WASM)
     -sALLOW_MEMORY_GROWTH # required for libraries that allocate memory.
     -sFILESYSTEM=0 # minimal file system support - allows stdout to work.
     -sEXPORT_NAME=${BNG_WASM_MODULE_FACTORY_NAME} # name of exported factory function in the module
-    --bind # IMPORTANT: use embind for C++ type and function binding
+    # binding backend link options (embind vs raw) are added in platform/wasm/CMakeLists.txt
     )
 else()
   message(FATAL_ERROR "add case for ${BNG_PLATFORM}")
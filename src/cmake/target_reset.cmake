@@ -2,6 +2,7 @@
 # when including target_lib.cmake or target_exe.cmake
 unset(ADDITIONAL_HEADERS)
 unset(ADDITIONAL_SOURCES)
+unset(AIO_EXCLUDES)
 unset(AIO_SOURCE)
 unset(AUTO_AIO)
 unset(HEADERS)
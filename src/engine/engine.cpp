@@ -16,6 +16,12 @@ namespace bng::engine {
     return new Engine();
   }
 
+  Engine* Engine::share() const {
+    auto engine = new Engine();
+    engine->wordDB = wordDB;
+    return engine;
+  }
+
   namespace dtl {
     WordDB::SideSet init_sides(const EnginePuzzleData& puzzleData) {
       char* side_strs[] = {
@@ -58,48 +64,91 @@ namespace bng::engine {
 
       return sides;
     }
+
+    // formats one solution without a line break, returns the length
+    uint32_t format_solution(char (&line)[80], const WordDB& wordDB, const Solution& s) {
+      auto& a = *wordDB.word(s.a);
+      auto& b = *wordDB.word(s.b);
+      int length;
+      if (a.letter_count == 12 || b.letter_count == 12) {
+        auto& c = (a.letter_count == 12) ? a : b;
+        length = snprintf(line, sizeof(line), "%.*s",
+          uint32_t(c.length), wordDB.str(c));
+      }
+      else {
+        length = snprintf(line, sizeof(line), "%.*s -> %.*s",
+          uint32_t(a.length), wordDB.str(a), uint32_t(b.length), wordDB.str(b));
+      }
+      return std::min(uint32_t(length), uint32_t(sizeof(line) - 1));
+    }
+
+    // owns the culled word db so lines are formatted only as they are pulled
+    class SolutionStream : public bng::api::Stream<std::string> {
+      public:
+        SolutionStream(WordDB&& wordDB, SolutionSet&& solutions)
+          : wordDB(std::move(wordDB)), solutions(std::move(solutions)) {}
+
+        bool next(std::string& item) override {
+          if (index >= solutions.size()) {
+            return false;
+          }
+          char line[80];
+          item.assign(line, format_solution(line, wordDB, solutions[index++]));
+          return true;
+        }
+
+      private:
+        WordDB wordDB;
+        SolutionSet solutions;
+        size_t index = 0;
+    };
   }
 
-  std::string Engine::setup(const EngineSetupData &setupData) {
+  EngineError Engine::setup(const EngineSetupData &setupData) {
     auto timer = BNG_SCOPED_TIMER("loaded words_alpha.pre");
     auto wordsPath = std::filesystem::path(setupData.words_path);
     auto preprocessedPath = std::filesystem::path(setupData.cache_path) / "words_alpha.pre";
 
     BNG_VERIFY(!wordDB, "setup already called.");
 
+    auto loaded = std::make_shared<WordDB>();
     if (!setupData.words_data.empty()) {
       timer.setMessage("proccessed dictionary");
-      wordDB.read_words(setupData.words_data.c_str());
+      loaded->read_words(setupData.words_data.c_str());
     }
-    else if (!wordDB.load(preprocessedPath)) {
+    else if (!loaded->load(preprocessedPath)) {
       timer.setMessage("proccessed dictionary -> words_alpha.pre");
-      if (!wordDB.load(wordsPath)) {
-        return "failed loading word list.";
+      if (!loaded->load(wordsPath)) {
+        return EngineError::word_list_load_failed;
       }
-      wordDB.save(preprocessedPath);
+      loaded->save(preprocessedPath);
     }
 
-    return wordDB ? "" : "failed preloading words database";
+    if (!*loaded) {
+      return EngineError::word_db_load_failed;
+    }
+    wordDB = std::move(loaded);
+    return EngineError::ok;
   }
 
-  std::string Engine::solve(const EnginePuzzleData& puzzleData) {
+  bng::api::Expected<std::string, EngineError> Engine::solve(const EnginePuzzleData& puzzleData) {
     if (!wordDB) {
-      return "ERROR: setup not called.";
+      return bng::api::unexpected(EngineError::setup_not_called);
     }
     auto timer = BNG_SCOPED_TIMER("solve()");
 
     const WordDB::SideSet sides = dtl::init_sides(puzzleData);
     if (!sides[0]) {
       timer.cancel();
-      return "ERROR: invalid puzzle.";
+      return bng::api::unexpected(EngineError::invalid_puzzle);
     }
 
     // eliminate non-candidates and solve
-    auto puzzleWordDB = wordDB.culled(sides);
+    auto puzzleWordDB = wordDB->culled(sides);
     SolutionSet solutions = puzzleWordDB.solve(sides);
 
     if (solutions.empty()) {
-      return "";
+      return std::string();
     }
 
     solutions.sort(puzzleWordDB);
@@ -119,21 +168,32 @@ namespace bng::engine {
     {
       char line[80];
       for (auto ps : solutions) {
-        auto& a = *puzzleWordDB.word(ps.a);
-        auto& b = *puzzleWordDB.word(ps.b);
-        if (a.letter_count == 12 || b.letter_count == 12) {
-          auto& c = (a.letter_count == 12) ? a : b;
-          snprintf(line, sizeof(line), "%.*s\n",
-            uint32_t(c.length), puzzleWordDB.str(c));
-        }
-        else {
-          snprintf(line, sizeof(line), "%.*s -> %.*s\n",
-            uint32_t(a.length), puzzleWordDB.str(a), uint32_t(b.length), puzzleWordDB.str(b));
-        }
-        outBuf += line;
+        outBuf.append(line, dtl::format_solution(line, puzzleWordDB, ps));
+        outBuf += '\n';
       }
     }
 
     return outBuf;
   }
+
+  bng::api::Expected<std::unique_ptr<bng::api::Stream<std::string>>, EngineError> Engine::solve_stream(
+    const EnginePuzzleData& puzzleData) {
+    if (!wordDB) {
+      return bng::api::unexpected(EngineError::setup_not_called);
+    }
+    auto timer = BNG_SCOPED_TIMER("solve_stream()");
+
+    const WordDB::SideSet sides = dtl::init_sides(puzzleData);
+    if (!sides[0]) {
+      timer.cancel();
+      return bng::api::unexpected(EngineError::invalid_puzzle);
+    }
+
+    // solving needs the whole set to sort it, only formatting and transfer are incremental
+    auto puzzleWordDB = wordDB->culled(sides);
+    SolutionSet solutions = puzzleWordDB.solve(sides);
+    solutions.sort(puzzleWordDB);
+    return std::unique_ptr<bng::api::Stream<std::string>>(
+      std::make_unique<dtl::SolutionStream>(std::move(puzzleWordDB), std::move(solutions)));
+  }
 }
@@ -7,14 +7,20 @@
 #include "bng_api.h"
 
 namespace bng::engine {
-  class Engine : public EngineInterface {
+  class Engine final : public EngineInterfaceBase<Engine> {
     BNG_DECL_NO_COPY(Engine)
     public:
       Engine() = default;
-      std::string setup(const EngineSetupData& setupData) override;
-      std::string solve(const EnginePuzzleData& puzzleData) override;
+      static Engine* create();
+      // a new engine reading this one's word db - the db is never written once loaded (solves
+      // cull into a copy), so pool workers share it instead of each loading their own
+      Engine* share() const;
+      EngineError setup(const EngineSetupData& setupData);
+      bng::api::Expected<std::string, EngineError> solve(const EnginePuzzleData& puzzleData);
+      bng::api::Expected<std::unique_ptr<bng::api::Stream<std::string>>, EngineError> solve_stream(
+        const EnginePuzzleData& puzzleData);
 
     private:
-      word_db::WordDB wordDB;
+      std::shared_ptr<const word_db::WordDB> wordDB;
   };
 }
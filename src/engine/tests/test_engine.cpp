@@ -0,0 +1,167 @@
+#include "engine.h"
+#include "test_harness/test_harness.h"
+#include <atomic>
+#include <thread>
+
+using namespace bng::engine;
+
+// every letter needs a word
+static const char dict_text[] =
+	"ant\nantonym\n"
+	"bean\nbearskin\n"
+	"cat\n"
+	"debating\ndog\n"
+	"ear\n"
+	"fit\n"
+	"gab\n"
+	"hah\nheehaw\nhumdinger\n"
+	"ion\n"
+	"jot\n"
+	"kit\n"
+	"lag\n"
+	"manta\n"
+	"nematode\n"
+	"octopus\n"
+	"penguin\n"
+	"quiche\n"
+	"ramen\n"
+	"s\nsmoked\nsupercalifragilisticexpialidocious\n"
+	"tan\n"
+	"use\n"
+	"vim\n"
+	"wit\n"
+	"xray\n"
+	"yank\n"
+	"zebra\nzephyr\nzigzag\n";
+
+static const EnginePuzzleData puzzle_1 = {{"btn", "akd", "oes", "mir"}};
+static const EnginePuzzleData puzzle_2 = {{"btn", "akd", "oes", "mig"}};
+
+static const char solution_1[] = "bearskin -> nematode\n";
+static const char solution_2[] = "smoked -> debating\n";
+
+static constexpr uint32_t thread_count = 8;
+
+// runs solve(i) calls_per_thread times from each of thread_count threads at once, returns how
+// many calls failed
+template <class Solve>
+static uint32_t solve_concurrently(uint32_t calls_per_thread, Solve solve) {
+	std::atomic<uint32_t> failed_count = 0;
+	std::vector<std::thread> threads;
+	for (uint32_t ti = 0; ti < thread_count; ++ti) {
+		threads.emplace_back([&, ti]() {
+			for (uint32_t i = 0; i < calls_per_thread; ++i) {
+				failed_count += uint32_t(!solve(ti + i));
+			}
+		});
+	}
+	for (auto& t : threads) {
+		t.join();
+	}
+	return failed_count;
+}
+
+static bool is_solution(const bng::api::Expected<std::string, EngineError>& result, uint32_t i) {
+	return result && result.value() == ((i & 1) ? solution_2 : solution_1);
+}
+
+// the stream's lines joined like solve() returns them
+static bng::api::Expected<std::string, EngineError> solve_streamed(
+	Engine& engine, const EnginePuzzleData& puzzle) {
+	auto stream = engine.solve_stream(puzzle);
+	if (!stream) {
+		return bng::api::unexpected(stream.error());
+	}
+	std::string text;
+	for (std::string line; stream.value()->next(line);) {
+		text += line + '\n';
+	}
+	return text;
+}
+
+static std::unique_ptr<Engine> make_engine() {
+	auto engine = std::unique_ptr<Engine>(Engine::create());
+	EngineSetupData setup_data;
+	setup_data.words_data = dict_text;
+	return (engine->setup(setup_data) == EngineError::ok) ? std::move(engine) : nullptr;
+}
+
+BNG_BEGIN_TEST(solve) {
+	auto engine = make_engine();
+	BT_CHECK(engine);
+	BT_CHECK(is_solution(engine->solve(puzzle_1), 0));
+	BT_CHECK(is_solution(engine->solve(puzzle_2), 1));
+
+	// culling doesn't change the shared word db - solving again gives the same result
+	BT_CHECK(is_solution(engine->solve(puzzle_1), 0));
+
+	// a stream reports its error when it opens
+	EnginePuzzleData invalid = puzzle_1;
+	invalid.sides[0] = "";
+	BT_CHECK(engine->solve(invalid).error() == EngineError::invalid_puzzle);
+	BT_CHECK(engine->solve_stream(invalid).error() == EngineError::invalid_puzzle);
+	BT_CHECK(Engine().solve_stream(puzzle_1).error() == EngineError::setup_not_called);
+}
+BNG_END_TEST()
+
+// solve and solve_stream are declared thread safe - the bindings call them on one instance
+// concurrently, without a lock
+BNG_BEGIN_TEST(solve_concurrent) {
+	auto engine = make_engine();
+	BT_CHECK(engine);
+	const auto failed_count = solve_concurrently(200, [&](uint32_t i) {
+		return is_solution(engine->solve((i & 1) ? puzzle_2 : puzzle_1), i);
+	});
+	BT_CHECK(failed_count == 0);
+
+	const auto stream_failed_count = solve_concurrently(200, [&](uint32_t i) {
+		return is_solution(solve_streamed(*engine, (i & 1) ? puzzle_2 : puzzle_1), i);
+	});
+	BT_CHECK(stream_failed_count == 0);
+}
+BNG_END_TEST()
+
+// pool workers share the source's word db
+BNG_BEGIN_TEST(pool_solve_concurrent) {
+	auto engine = make_engine();
+	BT_CHECK(engine);
+	EngineInterfacePool pool(*engine, 4);
+	BT_CHECK(pool.size() == 4);
+	const auto failed_count = solve_concurrently(200, [&](uint32_t i) {
+		return is_solution(pool.solve((i & 1) ? puzzle_2 : puzzle_1), i);
+	});
+	BT_CHECK(failed_count == 0);
+}
+BNG_END_TEST()
+
+BNG_BEGIN_TEST(pool_solve_batch) {
+	auto engine = make_engine();
+	BT_CHECK(engine);
+	EngineInterfacePool pool(*engine, 4);
+
+	std::vector<EnginePuzzleData> puzzles;
+	for (uint32_t i = 0; i < 101; ++i) {
+		puzzles.push_back((i & 1) ? puzzle_2 : puzzle_1);
+	}
+	const auto failed_count = solve_concurrently(10, [&](uint32_t) {
+		auto results = pool.solve_batch(puzzles);
+		if (!results || results.value().size() != puzzles.size()) {
+			return false;
+		}
+		for (uint32_t i = 0; i < puzzles.size(); ++i) {
+			if (results.value()[i] != ((i & 1) ? solution_2 : solution_1)) {
+				return false;
+			}
+		}
+		return true;
+	});
+	BT_CHECK(failed_count == 0);
+
+	// fails with the first failing puzzle
+	puzzles[60].sides[0] = "xx";
+	puzzles[90].sides[0] = "";
+	auto results = pool.solve_batch(puzzles);
+	BT_CHECK(!results && results.error() == EngineError::invalid_puzzle);
+	BT_CHECK(pool.solve_batch({}).value().empty());
+}
+BNG_END_TEST()
@@ -122,28 +122,23 @@ namespace bng::word_db {
   }
 
   WordDB WordDB::culled(const SideSet& sides) const {
-    // internal implementation marks words as culled
-    // does packed clone_packed() then unmarks dead words and restores original stats.
-    return const_cast<WordDB*>(this)->culled_impl(sides);
-  }
-
-  WordDB WordDB::culled_impl(const SideSet& sides) {
+    // culled words are flagged in a local mask and left out of the packed clone - the words
+    // and stats of this db are never written, it may be shared by concurrent solves.
     uint32_t all_letters = 0;
     for (auto s : sides) {
       all_letters |= s.letters;
     }
 
-    const auto cached_stats = live_stats;
-    const auto cached_words_by_letter = words_by_letter;
+    auto stats = live_stats;
+    std::vector<bool> culled_words(words_count());
 
     for (uint32_t li = 0; li < 26; ++li) {
       const auto lb = uint32_t(1u << li);
 
       // letter not in puzzle
       if (!(lb & all_letters)) {
-        words_by_letter[li] = WordIdx::kInvalid;
-        live_stats.word_counts[li] = 0;
-        live_stats.size_bytes[li] = 0;
+        stats.word_counts[li] = 0;
+        stats.size_bytes[li] = 0;
         continue;
       }
 
@@ -152,11 +147,11 @@ namespace bng::word_db {
         continue;
       }
 
-      for (auto wp = first_word_rw(li); *wp; ++wp) {
+      for (auto wp = first_word(li); *wp; ++wp) {
         BNG_VERIFY(!wp->is_dead, "culled() should not be called on unpacked WordDB.");
         // check for use of unavailable letters
         if ((wp->letters | all_letters) != all_letters) {
-          cull_word(*wp);
+          cull_word(*wp, stats, culled_words);
           continue;
         }
         for (auto sp = str(*wp), se = str(*wp) + wp->length - 1; sp < se; ++sp) {
@@ -166,7 +161,7 @@ namespace bng::word_db {
             auto overlap = s.letters & letter_pair;
             // hits same side with 2 sequential letters.
             if (bool(overlap & (overlap - 1))) {
-              cull_word(*wp);
+              cull_word(*wp, stats, culled_words);
               goto continue_outer;
             }
           }
@@ -176,22 +171,7 @@ namespace bng::word_db {
       }
     }
 
-    auto cloned = clone_packed();
-
-    // undo culling
-    live_stats = cached_stats;
-    words_by_letter = cached_words_by_letter;
-
-    for (uint32_t li = 0; li < 26; ++li) {
-      if (words_by_letter[li] == WordIdx::kInvalid) {
-        continue;
-      }
-      for (auto wp = first_word_rw(li); *wp; ++wp) {
-        wp->is_dead = false;
-      }
-    }
-
-    return cloned;
+    return clone_packed(stats, culled_words);
   }
 
   SolutionSet WordDB::solve(const SideSet& sides) const {
@@ -419,18 +399,22 @@ namespace bng::word_db {
     BNG_VERIFY(first_letter_idx(*(wp - 2)) == 25, "");
   }
 
-  void WordDB::cull_word(Word& word) {
+  void WordDB::cull_word(const Word& word, TextStats& stats, std::vector<bool>& culled) const {
     auto li = first_letter_idx(word);
-    BNG_VERIFY(live_stats.size_bytes[li] >= word.length, "");
-    BNG_VERIFY(live_stats.word_counts[li], "");
-    live_stats.size_bytes[li] -= uint32_t(word.length);
-    --live_stats.word_counts[li];
-    word.is_dead = true;
+    BNG_VERIFY(stats.size_bytes[li] >= word.length, "");
+    BNG_VERIFY(stats.word_counts[li], "");
+    stats.size_bytes[li] -= uint32_t(word.length);
+    --stats.word_counts[li];
+    culled[uint32_t(word_i(word))] = true;
   }
 
   WordDB WordDB::clone_packed() const {
-    const uint32_t live_size = live_stats.total_size_bytes();
-    const uint32_t live_count = live_stats.total_count(); (void)live_count;
+    return clone_packed(live_stats, {});
+  }
+
+  WordDB WordDB::clone_packed(const TextStats& stats, const std::vector<bool>& culled) const {
+    const uint32_t live_size = stats.total_size_bytes();
+    const uint32_t live_count = stats.total_count(); (void)live_count;
     BNG_VERIFY(
       *this &&
       live_size <= text_buf.capacity() &&
@@ -439,7 +423,7 @@ namespace bng::word_db {
     WordDB out;
 
     out.text_buf = TextBuf(live_size);
-    out.mem_stats = out.live_stats = live_stats;
+    out.mem_stats = out.live_stats = stats;
     out.words_buf = new Word[out.words_count()];
     out.clear_words_by_letter();
 
@@ -447,7 +431,7 @@ namespace bng::word_db {
     uint32_t live_row_count = 0; (void)live_row_count;
 
     for (uint32_t li = 0; li < 26; ++li) {
-      if (!live_stats.word_counts[li]) {
+      if (!stats.word_counts[li]) {
         continue;
       }
 
@@ -455,7 +439,7 @@ namespace bng::word_db {
       const auto wpo_row_start = wpo;
 
       for (auto wp = first_word(li); *wp; wp++) {
-        if (!wp->is_dead) {
+        if (!wp->is_dead && (culled.empty() || !culled[uint32_t(word_i(*wp))])) {
           *wpo++ = out.text_buf.append(text_buf, *wp);
         }
       }
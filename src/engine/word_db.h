@@ -206,6 +206,8 @@ namespace bng::word_db {
 
     void save(const std::filesystem::path& path);
 
+    // a packed copy holding only the words that fit the puzzle. reads this db without
+    // changing it, so any number of threads can cull one shared db concurrently.
     WordDB culled(const SideSet& sides) const;
 
     SolutionSet solve(const SideSet& sides) const;
@@ -265,11 +267,12 @@ namespace bng::word_db {
 
     void collate_words();
 
-    WordDB culled_impl(const SideSet& sides);
-
     WordDB clone_packed() const;
 
-    void cull_word(Word& word);
+    // copies the live words not flagged in culled, stats are the counts left after culling
+    WordDB clone_packed(const TextStats& stats, const std::vector<bool>& culled) const;
+
+    void cull_word(const Word& word, TextStats& stats, std::vector<bool>& culled) const;
 
     static uint32_t header_size_bytes() {
       return offsetof(WordDB, text_buf);
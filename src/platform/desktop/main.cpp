@@ -20,8 +20,8 @@ int main(int argc, const char *argv[]) {
     setupData.wordsPath = wordsPath.string();
 
     auto err = solver->setup(setupData);
-    if (!err.empty()) {
-        BNG_PRINT("%s\n", err.c_str());
+    if (err != EngineError::ok) {
+        BNG_PRINT("ERROR: %s\n", error_name(err));
         return 1;
     }
 
@@ -30,11 +30,12 @@ int main(int argc, const char *argv[]) {
         side = side_args[&side - &puzzleData.sides[0]];
     }
 
-    auto solutions = solver->solve(puzzleData);
-    if (strstr(solutions.c_str(), "ERROR")) {
-        BNG_PRINT("%s\n", solutions.c_str());
+    auto solved = solver->solve(puzzleData);
+    if (!solved) {
+        BNG_PRINT("ERROR: %s\n", error_name(solved.error()));
         return 1;
     }
+    const std::string& solutions = solved.value();
     const char* p = solutions.c_str();
     const char* end = p + solutions.size();
     BNG_PRINT("puzzle: %s %s %s %s\n",
@@ -0,0 +1,617 @@
+#pragma once
+
+// runtime of the extension module generated by PythonExtensionGenerator. CPython requires
+// Python.h ahead of the standard headers.
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <structmember.h>
+
+#include <algorithm>
+#include <array>
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+#include <initializer_list>
+#include <limits>
+#include <memory>
+#include <mutex>
+#include <new>
+#include <optional>
+#include <span>
+#include <string>
+#include <string_view>
+#include <type_traits>
+#include <utility>
+#include <vector>
+#include "api/api_util.h"
+
+namespace bng::py {
+  // releases the GIL for the scope - no Python API calls until it ends
+  class ReleaseGil {
+  public:
+    ReleaseGil() : state_(PyEval_SaveThread()) {}
+    ReleaseGil(const ReleaseGil&) = delete;
+    ReleaseGil& operator=(const ReleaseGil&) = delete;
+
+    ~ReleaseGil() {
+      PyEval_RestoreThread(state_);
+    }
+
+  private:
+    PyThreadState* state_;
+  };
+
+  // runs call with the GIL released, the result is handed back once the GIL is held again
+  template <class Call>
+  auto without_gil(Call&& call) {
+    ReleaseGil released;
+    return call();
+  }
+
+  // Python <-> C++ values. from_py returns false with a Python exception set, to_py returns a
+  // new reference or nullptr with the exception set. the generated module specializes it for
+  // the api's structs.
+  template <class T, class Enable = void>
+  struct Convert;
+
+  template <class T>
+  bool from_py(PyObject* o, T& out) {
+    return Convert<T>::from_py(o, out);
+  }
+
+  template <class T>
+  PyObject* to_py(const T& value) {
+    return Convert<T>::to_py(value);
+  }
+
+  template <>
+  struct Convert<bool> {
+    static bool from_py(PyObject* o, bool& out) {
+      const int truth = PyObject_IsTrue(o);
+      out = truth > 0;
+      return truth >= 0;
+    }
+
+    static PyObject* to_py(bool value) {
+      return PyBool_FromLong(value);
+    }
+  };
+
+  template <class T>
+  struct Convert<T, std::enable_if_t<std::is_integral_v<T> && !std::is_same_v<T, bool>>> {
+    static bool from_py(PyObject* o, T& out) {
+      using Wide = std::conditional_t<std::is_signed_v<T>, long long, unsigned long long>;
+      Wide value = 0;
+      if constexpr (std::is_signed_v<T>) {
+        value = PyLong_AsLongLong(o);
+      } else {
+        value = PyLong_AsUnsignedLongLong(o);
+      }
+      if (value == Wide(-1) && PyErr_Occurred()) {
+        return false;
+      }
+      if (value < Wide(std::numeric_limits<T>::min()) ||
+          value > Wide(std::numeric_limits<T>::max())) {
+        PyErr_SetString(PyExc_OverflowError, "integer out of range");
+        return false;
+      }
+      out = T(value);
+      return true;
+    }
+
+    static PyObject* to_py(T value) {
+      if constexpr (std::is_signed_v<T>) {
+        return PyLong_FromLongLong(value);
+      } else {
+        return PyLong_FromUnsignedLongLong(value);
+      }
+    }
+  };
+
+  template <class T>
+  struct Convert<T, std::enable_if_t<std::is_floating_point_v<T>>> {
+    static bool from_py(PyObject* o, T& out) {
+      const double value = PyFloat_AsDouble(o);
+      if (value == -1.0 && PyErr_Occurred()) {
+        return false;
+      }
+      out = T(value);
+      return true;
+    }
+
+    static PyObject* to_py(T value) {
+      return PyFloat_FromDouble(double(value));
+    }
+  };
+
+  // the module's IntEnum of an api enum, set by add_int_enum
+  template <class T>
+  struct IntEnum {
+    static inline PyObject* type = nullptr;
+  };
+
+  // enums are taken as their values and returned as the module's IntEnum members
+  template <class T>
+  struct Convert<T, std::enable_if_t<std::is_enum_v<T>>> {
+    using Value = std::underlying_type_t<T>;
+
+    static bool from_py(PyObject* o, T& out) {
+      Value value{};
+      if (!Convert<Value>::from_py(o, value)) {
+        return false;
+      }
+      out = T(value);
+      return true;
+    }
+
+    // a value the enum doesn't list stays a plain int
+    static PyObject* to_py(T value) {
+      PyObject* number = Convert<Value>::to_py(Value(value));
+      if (number == nullptr || IntEnum<T>::type == nullptr) {
+        return number;
+      }
+      PyObject* member = PyObject_CallOneArg(IntEnum<T>::type, number);
+      if (member == nullptr && PyErr_ExceptionMatches(PyExc_ValueError)) {
+        PyErr_Clear();
+        return number;
+      }
+      Py_DECREF(number);
+      return member;
+    }
+  };
+
+  // a view of a str's UTF-8, cached in the str object - valid while the object lives
+  template <>
+  struct Convert<std::string_view> {
+    static bool from_py(PyObject* o, std::string_view& out) {
+      Py_ssize_t size = 0;
+      if (PyBytes_Check(o)) {
+        out = std::string_view(PyBytes_AS_STRING(o), size_t(PyBytes_GET_SIZE(o)));
+        return true;
+      }
+      const char* chars = PyUnicode_AsUTF8AndSize(o, &size);
+      if (chars == nullptr) {
+        return false;
+      }
+      out = std::string_view(chars, size_t(size));
+      return true;
+    }
+
+    static PyObject* to_py(std::string_view value) {
+      return PyUnicode_FromStringAndSize(value.data(), Py_ssize_t(value.size()));
+    }
+  };
+
+  template <>
+  struct Convert<std::string> {
+    static bool from_py(PyObject* o, std::string& out) {
+      std::string_view view;
+      if (!Convert<std::string_view>::from_py(o, view)) {
+        return false;
+      }
+      out.assign(view);
+      return true;
+    }
+
+    static PyObject* to_py(const std::string& value) {
+      return Convert<std::string_view>::to_py(value);
+    }
+  };
+
+  template <class T>
+  struct Convert<std::vector<T>> {
+    static bool from_py(PyObject* o, std::vector<T>& out) {
+      PyObject* items = PySequence_Fast(o, "expected a sequence");
+      if (items == nullptr) {
+        return false;
+      }
+      const auto count = size_t(PySequence_Fast_GET_SIZE(items));
+      out.resize(count);
+      for (size_t i = 0; i < count; ++i) {
+        if (!Convert<T>::from_py(PySequence_Fast_GET_ITEM(items, i), out[i])) {
+          Py_DECREF(items);
+          return false;
+        }
+      }
+      Py_DECREF(items);
+      return true;
+    }
+
+    static PyObject* to_py(const std::vector<T>& value) {
+      PyObject* list = PyList_New(Py_ssize_t(value.size()));
+      for (size_t i = 0; list != nullptr && i < value.size(); ++i) {
+        PyObject* item = Convert<T>::to_py(value[i]);
+        if (item == nullptr) {
+          Py_CLEAR(list);
+        } else {
+          PyList_SET_ITEM(list, Py_ssize_t(i), item);
+        }
+      }
+      return list;
+    }
+  };
+
+  template <class T, size_t N>
+  struct Convert<std::array<T, N>> {
+    static bool from_py(PyObject* o, std::array<T, N>& out) {
+      PyObject* items = PySequence_Fast(o, "expected a sequence");
+      if (items == nullptr) {
+        return false;
+      }
+      bool ok = size_t(PySequence_Fast_GET_SIZE(items)) == N;
+      if (!ok) {
+        PyErr_Format(PyExc_ValueError, "expected %zu items", N);
+      }
+      for (size_t i = 0; ok && i < N; ++i) {
+        ok = Convert<T>::from_py(PySequence_Fast_GET_ITEM(items, i), out[i]);
+      }
+      Py_DECREF(items);
+      return ok;
+    }
+
+    static PyObject* to_py(const std::array<T, N>& value) {
+      PyObject* tuple = PyTuple_New(Py_ssize_t(N));
+      for (size_t i = 0; tuple != nullptr && i < N; ++i) {
+        PyObject* item = Convert<T>::to_py(value[i]);
+        if (item == nullptr) {
+          Py_CLEAR(tuple);
+        } else {
+          PyTuple_SET_ITEM(tuple, Py_ssize_t(i), item);
+        }
+      }
+      return tuple;
+    }
+  };
+
+  // bytes of a converted argument, counted like the C shims count theirs - the characters of
+  // strings, the items of lists and the size of anything else
+  template <class T>
+  uint64_t arg_bytes(const T&) {
+    return sizeof(T);
+  }
+
+  inline uint64_t arg_bytes(std::string_view value) {
+    return value.size();
+  }
+
+  inline uint64_t arg_bytes(const std::string& value) {
+    return value.size();
+  }
+
+  template <class T>
+  uint64_t arg_bytes(const std::vector<T>& value) {
+    if constexpr (std::is_same_v<T, std::string> || std::is_same_v<T, std::string_view>) {
+      uint64_t bytes = 0;
+      for (const auto& item : value) {
+        bytes += item.size();
+      }
+      return bytes;
+    } else {
+      return sizeof(T) * value.size();
+    }
+  }
+
+  // a converted call argument. views in it borrow from the Python object, which the caller
+  // holds for the duration of the call.
+  template <class T>
+  class Arg {
+  public:
+    bool load(PyObject* o) {
+      return Convert<T>::from_py(o, value_);
+    }
+
+    T& get() {
+      return value_;
+    }
+
+    uint64_t bytes() const {
+      return arg_bytes(value_);
+    }
+
+  private:
+    T value_{};
+  };
+
+  // bytes, bytearray, memoryview and anything else exporting a buffer - passed without a copy
+  template <>
+  class Arg<std::span<const uint8_t>> {
+  public:
+    Arg() = default;
+    Arg(const Arg&) = delete;
+    Arg& operator=(const Arg&) = delete;
+
+    // the GIL is held again by the time the argument goes out of scope
+    ~Arg() {
+      if (view_.obj != nullptr) {
+        PyBuffer_Release(&view_);
+      }
+    }
+
+    bool load(PyObject* o) {
+      return PyObject_GetBuffer(o, &view_, PyBUF_SIMPLE) == 0;
+    }
+
+    std::span<const uint8_t> get() const {
+      return {static_cast<const uint8_t*>(view_.buf), size_t(view_.len)};
+    }
+
+    uint64_t bytes() const {
+      return uint64_t(view_.len);
+    }
+
+  private:
+    Py_buffer view_{};
+  };
+
+  // string lists are packed into one buffer and an offset table, views of the strs' UTF-8
+  template <>
+  class Arg<bng::api::StringViews> {
+  public:
+    bool load(PyObject* o) {
+      std::vector<std::string_view> views;
+      if (!Convert<std::vector<std::string_view>>::from_py(o, views)) {
+        return false;
+      }
+      packed_.emplace(views);
+      // the UTF-8 and the offsets, like a packed list passed to the C shims
+      bytes_ = sizeof(uint32_t) * (views.size() + 1);
+      for (const auto& view : views) {
+        bytes_ += view.size();
+      }
+      return true;
+    }
+
+    bng::api::StringViews get() const {
+      return packed_->views();
+    }
+
+    uint64_t bytes() const {
+      return bytes_;
+    }
+
+  private:
+    std::optional<bng::api::PackedStrings> packed_;
+    uint64_t bytes_ = 0;
+  };
+
+  // the Python object of an api struct. the members are attributes holding any Python value,
+  // converted when the struct is passed. no instance dict - like a __slots__ class.
+  template <size_t N>
+  struct Record {
+    PyObject_HEAD
+    PyObject* members[N > 0 ? N : 1];
+
+    static Record* cast(PyObject* o) {
+      return reinterpret_cast<Record*>(o);
+    }
+
+    static constexpr Py_ssize_t offset(size_t i) {
+      return Py_ssize_t(offsetof(Record, members) + i * sizeof(PyObject*));
+    }
+
+    // a new record owning the given member references - nullptr if any is missing
+    static PyObject* make(PyTypeObject* type, std::array<PyObject*, N> values) {
+      PyObject* o = nullptr;
+      if (std::find(values.begin(), values.end(), nullptr) == values.end()) {
+        o = type->tp_alloc(type, 0);
+      }
+      if (o == nullptr) {
+        for (PyObject* value : values) {
+          Py_XDECREF(value);
+        }
+        return nullptr;
+      }
+      std::copy(values.begin(), values.end(), cast(o)->members);
+      return o;
+    }
+
+    static int init(PyObject* o, const std::array<PyObject*, N>& values) {
+      for (size_t i = 0; i < N; ++i) {
+        Py_INCREF(values[i]);
+        Py_XDECREF(std::exchange(cast(o)->members[i], values[i]));
+      }
+      return 0;
+    }
+
+    // members left at None keep the C++ default
+    template <class T>
+    bool load(size_t i, T& out) const {
+      PyObject* value = members[i];
+      return value == nullptr || value == Py_None || Convert<T>::from_py(value, out);
+    }
+
+    static int traverse(PyObject* o, visitproc visit, void* arg) {
+      Py_VISIT(Py_TYPE(o));
+      for (size_t i = 0; i < N; ++i) {
+        Py_VISIT(cast(o)->members[i]);
+      }
+      return 0;
+    }
+
+    static int clear(PyObject* o) {
+      for (size_t i = 0; i < N; ++i) {
+        Py_CLEAR(cast(o)->members[i]);
+      }
+      return 0;
+    }
+
+    static void dealloc(PyObject* o) {
+      PyTypeObject* o_type = Py_TYPE(o);
+      PyObject_GC_UnTrack(o);
+      clear(o);
+      o_type->tp_free(o);
+      Py_DECREF(o_type);
+    }
+  };
+
+  // METH_FASTCALL functions go into a PyMethodDef as PyCFunction
+  inline PyCFunction fastcall(PyObject* (*function)(PyObject*, PyObject* const*, Py_ssize_t)) {
+    return reinterpret_cast<PyCFunction>(reinterpret_cast<void (*)()>(function));
+  }
+
+  inline bool check_arg_count(const char* name, Py_ssize_t nargs, Py_ssize_t expected) {
+    if (nargs == expected) {
+      return true;
+    }
+    PyErr_Format(
+        PyExc_TypeError, "%s() takes %zd arguments (%zd given)", name, expected, nargs);
+    return false;
+  }
+
+  // adds the type made from spec to the module under the spec's unqualified name
+  inline bool add_type(PyObject* module, PyType_Spec& spec, PyTypeObject*& type) {
+    type = reinterpret_cast<PyTypeObject*>(PyType_FromSpec(&spec));
+    if (type == nullptr) {
+      return false;
+    }
+    const char* dot = strrchr(spec.name, '.');
+    return PyModule_AddObjectRef(
+               module, dot ? dot + 1 : spec.name, reinterpret_cast<PyObject*>(type)) == 0;
+  }
+
+  // adds a RuntimeError subclass named like module.Name to the module
+  inline bool add_exception(PyObject* module, const char* name, PyObject*& exception) {
+    exception = PyErr_NewException(name, PyExc_RuntimeError, nullptr);
+    return exception && PyModule_AddObjectRef(module, strrchr(name, '.') + 1, exception) == 0;
+  }
+
+  // sets an attribute of the module or one of its types, taking the value reference
+  inline bool add_value(PyObject* owner, const char* name, PyObject* value) {
+    const bool ok = value && PyObject_SetAttrString(owner, name, value) == 0;
+    Py_XDECREF(value);
+    return ok;
+  }
+
+  // adds an enum.IntEnum with the given members to the module, returned for values of T
+  template <class T>
+  bool add_int_enum(
+      PyObject* module,
+      const char* name,
+      std::initializer_list<std::pair<const char*, long long>> members) {
+    PyObject* items = PyList_New(0);
+    for (const auto& [member, value] : members) {
+      PyObject* item = items ? Py_BuildValue("(sL)", member, value) : nullptr;
+      if (item == nullptr || PyList_Append(items, item) < 0) {
+        Py_XDECREF(item);
+        Py_XDECREF(items);
+        return false;
+      }
+      Py_DECREF(item);
+    }
+    PyObject* enum_module = items ? PyImport_ImportModule("enum") : nullptr;
+    PyObject* enum_type =
+        enum_module ? PyObject_CallMethod(enum_module, "IntEnum", "sO", name, items) : nullptr;
+    const bool ok = enum_type && PyModule_AddObjectRef(module, name, enum_type) == 0;
+    if (ok) {
+      Py_XDECREF(IntEnum<T>::type);
+      IntEnum<T>::type = enum_type;
+    } else {
+      Py_XDECREF(enum_type);
+    }
+    Py_XDECREF(enum_module);
+    Py_XDECREF(items);
+    return ok;
+  }
+
+  // the Python object of an api class instance. the shared_ptr keeps the instance alive for
+  // the streams opened on it.
+  template <class T>
+  struct Instance {
+    PyObject_HEAD
+    std::shared_ptr<T> self;
+    // serializes the reentrant calls on this instance
+    std::mutex lock;
+
+    static inline PyTypeObject* type = nullptr;
+    // serializes the calls that aren't reentrant across every instance
+    static inline std::mutex class_lock;
+
+    static Instance* cast(PyObject* o) {
+      return reinterpret_cast<Instance*>(o);
+    }
+
+    static PyObject* wrap(std::shared_ptr<T> self) {
+      if (!self) {
+        Py_RETURN_NONE;
+      }
+      auto* instance = cast(type->tp_alloc(type, 0));
+      if (instance != nullptr) {
+        new (&instance->self) std::shared_ptr<T>(std::move(self));
+        new (&instance->lock) std::mutex();
+      }
+      return reinterpret_cast<PyObject*>(instance);
+    }
+
+    static void dealloc(PyObject* o) {
+      PyTypeObject* o_type = Py_TYPE(o);
+      cast(o)->lock.~mutex();
+      cast(o)->self.~shared_ptr();
+      o_type->tp_free(o);
+      Py_DECREF(o_type);
+    }
+  };
+
+  // iterator over an is_stream result. items are pulled with the GIL released, one puller at a
+  // time.
+  template <class T>
+  struct StreamIterator {
+    PyObject_HEAD
+    std::unique_ptr<bng::api::Stream<T>> stream;
+    std::mutex lock;
+
+    static inline PyTypeObject* type = nullptr;
+
+    static StreamIterator* cast(PyObject* o) {
+      return reinterpret_cast<StreamIterator*>(o);
+    }
+
+    static PyObject* wrap(std::unique_ptr<bng::api::Stream<T>> stream) {
+      if (!stream) {
+        PyErr_SetString(PyExc_RuntimeError, "no stream returned");
+        return nullptr;
+      }
+      auto* iterator = cast(type->tp_alloc(type, 0));
+      if (iterator != nullptr) {
+        new (&iterator->stream) std::unique_ptr<bng::api::Stream<T>>(std::move(stream));
+        new (&iterator->lock) std::mutex();
+      }
+      return reinterpret_cast<PyObject*>(iterator);
+    }
+
+    static PyObject* next(PyObject* o) {
+      auto* iterator = cast(o);
+      T item{};
+      const bool has_item = without_gil([&] {
+        std::lock_guard lock(iterator->lock);
+        return iterator->stream->next(item);
+      });
+      // nullptr without an exception set ends the iteration
+      return has_item ? Convert<T>::to_py(item) : nullptr;
+    }
+
+    static void dealloc(PyObject* o) {
+      PyTypeObject* o_type = Py_TYPE(o);
+      cast(o)->lock.~mutex();
+      cast(o)->stream.~unique_ptr();
+      o_type->tp_free(o);
+      Py_DECREF(o_type);
+    }
+
+    static bool add_type(PyObject* module, const char* name) {
+      static PyType_Slot slots[] = {
+          {Py_tp_iter, reinterpret_cast<void*>(PyObject_SelfIter)},
+          {Py_tp_iternext, reinterpret_cast<void*>(next)},
+          {Py_tp_dealloc, reinterpret_cast<void*>(dealloc)},
+          {0, nullptr},
+      };
+      static PyType_Spec spec = {
+          name,
+          sizeof(StreamIterator),
+          0,
+          Py_TPFLAGS_DEFAULT | Py_TPFLAGS_DISALLOW_INSTANTIATION,
+          slots,
+      };
+      return bng::py::add_type(module, spec, type);
+    }
+  };
+}
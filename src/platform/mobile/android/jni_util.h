@@ -1,9 +1,58 @@
 #pragma once
 
+#include <cstdint>
+#include <cstring>
+#include <memory>
 #include <string>
+#include <string_view>
 #include <vector>
 #include <jni.h>
 
+// UTF-8 chars of a jstring. Short strings are copied into a stack buffer with
+// GetStringUTFRegion - no JNI heap copy and nothing to release; longer ones fall back to
+// GetStringUTFChars. view() and c_str() are valid for the holder's lifetime.
+class JStringUTF {
+public:
+    static constexpr jsize kStackSize = 64;
+
+    JStringUTF(JNIEnv* _env, jstring _jStr) : env(_env), jStr(_jStr) {
+        if (!jStr) {
+            return;
+        }
+        size = env->GetStringUTFLength(jStr);
+        if (size < kStackSize) {
+            env->GetStringUTFRegion(jStr, 0, env->GetStringLength(jStr), stack);
+            stack[size] = 0;
+            chars = stack;
+        } else {
+            heap = env->GetStringUTFChars(jStr, nullptr);
+            chars = heap;
+        }
+    }
+
+    ~JStringUTF() {
+        if (heap) {
+            env->ReleaseStringUTFChars(jStr, heap);
+        }
+    }
+
+    JStringUTF(const JStringUTF&) = delete;
+    JStringUTF& operator=(const JStringUTF&) = delete;
+
+    std::string_view view() const { return {chars, size_t(size)}; }
+    const char* c_str() const { return chars; }
+    // short strings land in std::string's inline buffer without a heap allocation
+    std::string str() const { return std::string(view()); }
+
+private:
+    JNIEnv* env;
+    jstring jStr;
+    jsize size = 0;
+    const char* heap = nullptr;
+    const char* chars = "";
+    char stack[kStackSize];
+};
+
 struct JVE {
     explicit JVE(JavaVM* _jvm) : env(nullptr), jvm(_jvm) {
         jvm->AttachCurrentThread(&env, nullptr);
@@ -111,10 +160,7 @@ struct JVE {
     }
 
     std::string toString(jstring jStr) {
-        const char* bytes = env->GetStringUTFChars(jStr, nullptr);
-        std::string strout(bytes);
-        env->ReleaseStringUTFChars(jStr, bytes);
-        return strout;
+        return JStringUTF(env, jStr).str();
     }
 
     std::vector<double> toVector(jdoubleArray& arrayJO) {
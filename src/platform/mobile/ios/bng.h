@@ -1,4 +1,4 @@
 // umbrella header for framework module.
 // not used in C++ project.
 #pragma once
-#import "bng_c_api.h"
+#import "bng_api_swift.h"
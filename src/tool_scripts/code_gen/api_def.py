@@ -1,5 +1,5 @@
 from enum import StrEnum
-from typing import Optional, Set, List, Dict
+from typing import Optional, Set, List, Dict, Tuple
 import json
 from pathlib import Path
 
@@ -47,6 +47,19 @@ class RefType(StrEnum):
     unique = "unique"
 
 
+class StructLayout(StrEnum):
+    declared = "declared"
+    # members ordered by alignment, largest first, to leave the least padding
+    sorted = "sorted"
+    # no padding at all - C++ can't bind references to misaligned members
+    packed = "packed"
+    # the C++ struct starts on its own cache line, the binding structs keep natural alignment
+    cache_aligned = "cache_aligned"
+
+
+CACHE_LINE_SIZE = 64
+
+
 class Base:
     def __init__(self, **kwargs):
         dct_keys = set(kwargs.keys())
@@ -136,6 +149,23 @@ class BaseType(Named):
     def is_string(self) -> bool:
         return False
 
+    @property
+    def is_string_view(self) -> bool:
+        return False
+
+    @property
+    def is_bytes(self) -> bool:
+        return False
+
+    @property
+    def is_borrowed(self) -> bool:
+        return self.is_string_view or self.is_bytes
+
+    @property
+    def byte_size(self) -> Optional[int]:
+        """the same on every platform, None when it isn't"""
+        return None
+
     @property
     def type_obj(self) -> "BaseType":
         return self
@@ -165,6 +195,14 @@ class PrimitiveType(BaseType):
     def is_string(self) -> bool:
         return self.name == "string"
 
+    @property
+    def is_string_view(self) -> bool:
+        return self.name == "string_view"
+
+    @property
+    def is_bytes(self) -> bool:
+        return self.name == "bytes"
+
     @property
     def is_bool(self) -> bool:
         return self.name == "bool"
@@ -173,6 +211,14 @@ class PrimitiveType(BaseType):
     def is_primitive(self) -> bool:
         return True
 
+    @property
+    def byte_size(self) -> Optional[int]:
+        if self.is_bool:
+            return 1
+        if self.is_number and self.name != "intptr":
+            return int("".join(c for c in self.name if c.isdigit())) // 8
+        return None
+
 
 class TypedNamed(Named):
     def __init__(self, **kwargs):
@@ -250,6 +296,18 @@ class TypedNamed(Named):
     def is_string(self) -> bool:
         return self.resolved_type_obj.is_string
 
+    @property
+    def is_string_view(self) -> bool:
+        return self.resolved_type_obj.is_string_view
+
+    @property
+    def is_bytes(self) -> bool:
+        return self.resolved_type_obj.is_bytes
+
+    @property
+    def is_borrowed(self) -> bool:
+        return self.resolved_type_obj.is_borrowed
+
     @property
     def is_bool(self) -> bool:
         return self.resolved_type_obj.is_bool
@@ -312,6 +370,10 @@ class EnumDef(BaseType):
     def is_int(self) -> bool:
         return True
 
+    @property
+    def byte_size(self) -> Optional[int]:
+        return self.resolved_base_type_obj.byte_size
+
 
 class AliasDef(BaseType):
     def __init__(self, **kwargs):
@@ -364,14 +426,123 @@ class MemberDef(TypedNamed):
         super()._validate()
         if self.resolved_type_obj.is_void:
             raise ValueError(f"{self} can't have a void type")
+        if self.is_borrowed:
+            raise ValueError(f"{self} - borrowed types can only be used as parameters")
+
+    @property
+    def is_blittable(self) -> bool:
+        """a fixed size number or enum, or a fixed array of them, held by value"""
+        if self.is_static or self.is_const or self.is_list or self.ref_type is not None:
+            return False
+        type_obj = self.type_obj
+        if isinstance(type_obj, AliasDef) and (
+            type_obj.is_list or type_obj.is_array or type_obj.ref_type is not None
+        ):
+            return False
+        type_obj = self.resolved_type_obj
+        if isinstance(type_obj, EnumDef):
+            # C enums are int sized
+            return type_obj.byte_size == 4
+        return type_obj.is_number and type_obj.byte_size is not None
+
+    def c_size_align(self, pointer_size: int) -> Tuple[int, int]:
+        """size and alignment of the member in the C binding struct"""
+        if self.is_list:
+            # items pointer and uint32_t count
+            return pointer_size + 4, pointer_size
+        type_obj = self.resolved_type_obj
+        if isinstance(type_obj, StructDef):
+            _, size, align = type_obj.c_layout(pointer_size)
+        elif isinstance(type_obj, EnumDef):
+            # C enums are int sized
+            size = align = 4
+        elif type_obj.byte_size is not None and self.ref_type is None:
+            size = align = type_obj.byte_size
+        else:
+            # strings, refs and intptr
+            size = align = pointer_size
+        return size * (self.array_count or 1), align
 
 
 class StructDef(BaseType):
     def __init__(self, **kwargs):
         self.members = []
+        self.layout = StructLayout.declared
         super().__init__(**kwargs)
         self.name = ensure_camel(self.name, capitalized=True)
         self.members = [MemberDef(**m) for m in self.members]
+        self.layout = StructLayout(self.layout)
+        self._validate_layout()
+
+    def _is_attr_optional(self, attr_name: str) -> bool:
+        return attr_name in ["layout"] or super()._is_attr_optional(attr_name)
+
+    def _validate_layout(self):
+        if self.layout == StructLayout.packed and not self.is_blittable:
+            # strings, lists and refs are pointers - misaligned ones can't be used in place
+            raise ValueError(f"{self} - only blittable structs can be packed")
+
+    @property
+    def is_blittable(self) -> bool:
+        """
+        C and C++ lay the struct out the same - bindings copy it whole instead of member by
+        member
+        """
+        if self.layout == StructLayout.cache_aligned:
+            # malloc'd binding buffers aren't cache line aligned
+            return False
+        return bool(self.members) and all(m.is_blittable for m in self.members)
+
+    @property
+    def layout_members(self) -> List[MemberDef]:
+        """members in the order the C and C++ structs declare them"""
+        if self.layout != StructLayout.sorted:
+            return self.members
+        # stable, so equally aligned members stay in declared order. 64 bit pointers order
+        # pointers with doubles, wasm32's 4 byte ones can leave a padding gap after them
+        return sorted(self.members, key=lambda m: -m.c_size_align(8)[1])
+
+    def c_layout(self, pointer_size: int) -> Tuple[List[int], int, int]:
+        """offsets of the layout_members, size and alignment of the C binding struct"""
+        return self._c_layout(self.layout_members, pointer_size)
+
+    def _c_layout(self, members: List[MemberDef], pointer_size: int) -> Tuple[List[int], int, int]:
+        offsets = []
+        size = 0
+        align = 1
+        for member_def in members:
+            member_size, member_align = member_def.c_size_align(pointer_size)
+            if self.layout == StructLayout.packed:
+                member_align = 1
+            size += -size % member_align
+            offsets.append(size)
+            size += member_size
+            align = max(align, member_align)
+        return offsets, size + -size % align, align
+
+    def blittable_layout(self) -> Tuple[List[int], int]:
+        """
+        offsets of the layout_members and size of a blittable struct - C, C++ and wasm32 lay it
+        out the same. bindings relying on the numbers static_assert them.
+        """
+        if not self.is_blittable:
+            raise ValueError(f"{self} is not blittable")
+        offsets, size, _ = self.c_layout(pointer_size=8)
+        return offsets, size
+
+    def layout_report(self, pointer_size: int) -> List[str]:
+        """offsets, size and padding of the C binding struct, one line per member"""
+        offsets, size, align = self.c_layout(pointer_size)
+        padding = size - sum(m.c_size_align(pointer_size)[0] for m in self.members)
+        summary = f"{self.name} ({self.layout}): {size} bytes, align {align}, {padding} padding"
+        if self.layout == StructLayout.sorted:
+            declared_size = self._c_layout(self.members, pointer_size)[1]
+            summary += f", {declared_size} bytes declared"
+        lines = [summary]
+        for member_def, offset in zip(self.layout_members, offsets):
+            member_size, _ = member_def.c_size_align(pointer_size)
+            lines.append(f"  {offset:>4} {member_size:>4}  {member_def.name}")
+        return lines
 
 
 class ParameterDef(TypedNamed):
@@ -386,12 +557,23 @@ class ParameterDef(TypedNamed):
         super()._validate()
         if self.is_array:
             raise ValueError(f"{self} - can't pass arrays as parameters")
+        if self.is_borrowed and self.ref_type is not None:
+            raise ValueError(f"{self} - borrowed types are passed by value, not as refs")
+        if self.is_list and self.is_bytes:
+            raise ValueError(f"{self} - bytes can't be passed as lists")
+
+    @property
+    def is_packed_string_list(self) -> bool:
+        """a string_view list - crosses as one UTF-8 buffer and an offset table"""
+        return self.is_list and self.is_string_view
 
 
 class FunctionDef(TypedNamed):
     def __init__(self, **kwargs):
         self.parameters = []
         self.is_factory = False
+        self.is_async = False
+        self.error_enum: Optional[str] = None
         super().__init__(**kwargs)
         self.name = ensure_snake(self.name)
         self.parameters = [ParameterDef(**p) for p in self.parameters]
@@ -399,14 +581,29 @@ class FunctionDef(TypedNamed):
             self.is_const = False
             if self.ref_type is None:
                 self.ref_type = RefType.raw
+        if self.is_async:
+            # the platform wrappers don't bind free functions, so only C++ would get a variant
+            raise ValueError(f"{self} - functions can't be async, make it a static method")
+        _validate_error_enum(self)
 
     def _is_attr_optional(self, attr_name: str) -> bool:
-        return attr_name in ["parameters", "is_factory"] or super()._is_attr_optional(attr_name)
+        return attr_name in [
+            "parameters",
+            "is_factory",
+            "is_async",
+            "error_enum",
+        ] or super()._is_attr_optional(attr_name)
 
     def _validate(self):
         super()._validate()
         if self.is_factory and self.ref_type == RefType.non_optional:
             raise ValueError(f"{self} is a factory - ref_type must be 'raw', 'shared', or 'unique'")
+        if self.is_borrowed:
+            raise ValueError(f"{self} - borrowed types can't be returned")
+
+    @property
+    def error_enum_obj(self) -> Optional["EnumDef"]:
+        return get_type(self.error_enum) if self.error_enum is not None else None
 
 
 class MethodDef(TypedNamed):
@@ -415,6 +612,15 @@ class MethodDef(TypedNamed):
         self.is_static = False
         self.is_const_method = False
         self.is_factory = False
+        self.is_long_running = False
+        self.is_async = False
+        self.is_batchable = False
+        self.is_stream = False
+        self.error_enum: Optional[str] = None
+        # concurrent calls on the same instance are fine
+        self.is_thread_safe = False
+        # concurrent calls on different instances are fine - no state shared between instances
+        self.is_reentrant = False
         super().__init__(**kwargs)
         self.name = ensure_snake(self.name)
         self.parameters = [ParameterDef(**p) for p in self.parameters]
@@ -422,6 +628,13 @@ class MethodDef(TypedNamed):
             self.is_const = False
             if self.ref_type is None:
                 self.ref_type = RefType.raw
+        if self.is_thread_safe:
+            self.is_reentrant = True
+        self._batch_source: Optional[MethodDef] = None
+        _validate_async(self)
+        _validate_error_enum(self)
+        self._validate_batchable()
+        self._validate_stream()
 
     def _is_attr_optional(self, attr_name: str) -> bool:
         return attr_name in [
@@ -429,14 +642,134 @@ class MethodDef(TypedNamed):
             "is_static",
             "is_const_method",
             "is_factory",
+            "is_long_running",
+            "is_async",
+            "is_batchable",
+            "is_stream",
+            "error_enum",
+            "is_thread_safe",
+            "is_reentrant",
         ] or super()._is_attr_optional(attr_name)
 
     def _validate(self):
         super()._validate()
         if self.is_static and self.is_const_method:
             raise ValueError(f"{self} can't be both static and const method")
+        if self.is_long_running and (self.is_static or self.is_factory):
+            raise ValueError(f"{self} - only instance methods can be long running")
         if self.is_factory and self.ref_type == RefType.non_optional:
             raise ValueError(f"{self} is a factory - ref_type must be 'raw', 'shared', or 'unique'")
+        if self.is_borrowed:
+            raise ValueError(f"{self} - borrowed types can't be returned")
+
+    @property
+    def async_name(self) -> str:
+        return f"{self.name}_async"
+
+    @property
+    def error_enum_obj(self) -> Optional["EnumDef"]:
+        return get_type(self.error_enum) if self.error_enum is not None else None
+
+    def _validate_batchable(self):
+        if not self.is_batchable:
+            return
+        if self.is_static or self.is_factory:
+            raise ValueError(f"{self} - only instance methods can be batchable")
+        if len(self.parameters) != 1:
+            raise ValueError(f"{self} - batchable methods take exactly one parameter")
+        param_def = self.parameters[0]
+        if param_def.is_list or param_def.is_borrowed:
+            raise ValueError(f"{self} - batchable parameter must be a single owned value")
+        if self.is_list or self.is_array or self.ref_type is not None:
+            raise ValueError(f"{self} - batchable methods must return a single value")
+
+    def _validate_stream(self):
+        if not self.is_stream:
+            return
+        if self.is_static or self.is_factory:
+            raise ValueError(f"{self} - only instance methods can stream")
+        if self.is_list or self.is_array or self.ref_type is not None or self.is_void:
+            raise ValueError(f"{self} - stream items must be single values")
+        if self.is_async or self.is_batchable or self.is_long_running:
+            # items are pulled one at a time on the caller's side
+            raise ValueError(f"{self} - streams can't be async, batchable or long running")
+
+    @property
+    def lock_scope(self) -> Optional[str]:
+        """
+        what the platform wrappers serialize calls over - None for direct calls, "instance" for a
+        per-instance lock, "class" for one lock shared by every instance of the class
+        """
+        if self.is_thread_safe:
+            return None
+        if self.is_reentrant:
+            # static calls have no instance state to protect
+            return None if self.is_static or self.is_factory else "instance"
+        return "class"
+
+    @property
+    def stream_name(self) -> str:
+        """type name stem for the generated stream/cursor types, prefixed by the class name"""
+        name = ensure_camel(self.name, capitalized=True)
+        return name if name.endswith("Stream") else f"{name}Stream"
+
+    @property
+    def batch_name(self) -> str:
+        return f"{self.name}_batch"
+
+    @property
+    def batch_source(self) -> Optional["MethodDef"]:
+        """the batchable method a generated batch method loops over, None for declared methods"""
+        return self._batch_source
+
+    def make_batch_method(self) -> "MethodDef":
+        param_def = self.parameters[0]
+        batch_def = MethodDef(
+            name=self.batch_name,
+            type=self.type,
+            is_list=not self.is_void,
+            is_const_method=self.is_const_method,
+            is_long_running=self.is_long_running,
+            is_async=self.is_async,
+            error_enum=self.error_enum,
+            is_thread_safe=self.is_thread_safe,
+            is_reentrant=self.is_reentrant,
+            parameters=[
+                dict(
+                    name=f"{param_def.name}_batch",
+                    type=param_def.type,
+                    is_list=True,
+                    is_const=True,
+                )
+            ],
+        )
+        batch_def._batch_source = self
+        return batch_def
+
+
+def _validate_async(callable_def):
+    if not callable_def.is_async:
+        return
+    if callable_def.is_factory:
+        raise ValueError(f"{callable_def} - factories can't be async")
+    if any(p.is_borrowed for p in callable_def.parameters):
+        # the call completes after the caller's borrowed buffer may be gone
+        raise ValueError(f"{callable_def} - async calls can't take borrowed parameters")
+
+
+def _validate_error_enum(callable_def):
+    if callable_def.error_enum is None:
+        return
+    enum_def = callable_def.error_enum_obj
+    if not isinstance(enum_def, EnumDef):
+        raise ValueError(f"{callable_def} - error_enum {callable_def.error_enum} is not an enum")
+    if not any(int(str(m.value), 0) == 0 for m in enum_def.members):
+        # zero initialized results read as success in every binding
+        raise ValueError(f"{callable_def} - error_enum {enum_def.name} has no 0 (success) value")
+    if callable_def.is_factory:
+        raise ValueError(f"{callable_def} - factories can't have an error_enum")
+    if callable_def.ref_type is not None:
+        raise ValueError(f"{callable_def} - results with an error_enum are returned by value")
 
 
 class ClassDef(BaseType):
@@ -444,21 +777,94 @@ class ClassDef(BaseType):
         self.constants = []
         self.members = []
         self.methods = []
+        # final implementation class bound at compile time, and the header that defines it
+        self.impl_type: Optional[str] = None
+        self.impl_h: Optional[str] = None
+        # workers sharing one set up instance's state, see pool_class
+        self.is_pooled = False
         super().__init__(**kwargs)
         self.name = ensure_camel(self.name, capitalized=True)
         self.constants = [ConstantDef(**c) for c in self.constants]
         self.members = [MemberDef(**m) for m in self.members]
         self.methods = [MethodDef(**m) for m in self.methods]
+        # batch forms follow their single call method and are bound like declared methods
+        batch_methods = [m.make_batch_method() for m in self.methods if m.is_batchable]
+        for batch_def in batch_methods:
+            if any(m.name == batch_def.name for m in self.methods):
+                raise ValueError(f"{batch_def} - name already declared by {self}")
+            self.methods.insert(self.methods.index(batch_def.batch_source) + 1, batch_def)
+        self._share_method: Optional[MethodDef] = None
+        self._pool_class: Optional[ClassDef] = None
+        self._pool_source: Optional[ClassDef] = None
+        if self.is_pooled:
+            self._make_pool()
 
     def _is_attr_optional(self, attr_name: str) -> bool:
-        return attr_name in ["constants", "methods", "members"] or super()._is_attr_optional(
-            attr_name
-        )
+        return attr_name in [
+            "constants",
+            "methods",
+            "members",
+            "impl_type",
+            "impl_h",
+            "is_pooled",
+        ] or super()._is_attr_optional(attr_name)
+
+    def _validate(self):
+        super()._validate()
+        if (self.impl_type is None) != (self.impl_h is None):
+            raise ValueError(f"{self} - impl_type and impl_h must be set together")
+        if self.impl_type is not None and not self.impl_type.isidentifier():
+            # forward declared in the api namespace
+            raise ValueError(f"{self} - impl_type must be a class name in the api namespace")
+
+    @property
+    def is_static_dispatch(self) -> bool:
+        """calls bind to impl_type at compile time instead of going through a vtable"""
+        return self.impl_type is not None
 
     @property
     def static_factory(self) -> Optional[MethodDef]:
         return next((m for m in self.methods if m.is_factory and m.resolved_type_obj is self), None)
 
+    def _make_pool(self):
+        factory = self.static_factory
+        if factory is None:
+            raise ValueError(f"{self} - pooled classes need a static factory")
+        pooled = [m for m in self.methods if m.is_long_running and not m.is_stream]
+        if not pooled:
+            raise ValueError(f"{self} - pooled classes need long running methods to dispatch")
+        if any(not m.is_reentrant for m in pooled):
+            # the workers run them concurrently
+            raise ValueError(f"{self} - pooled long running methods must be reentrant")
+        if any(m.name == "share" for m in self.methods):
+            raise ValueError(f"{self} - share is implied by is_pooled")
+        # implemented by the class - a new instance reading this one's state, which must be
+        # immutable once set up. not bound, the pool calls it.
+        self._share_method = MethodDef(
+            name="share", type=self.name, ref_type=factory.ref_type.name, is_const=True
+        )
+        self._pool_class = ClassDef(name=f"{self.name}Pool")
+        # the same method definitions - the pool forwards each call to a free worker
+        self._pool_class.methods = pooled
+        self._pool_class._pool_source = self
+
+    @property
+    def share_method(self) -> Optional[MethodDef]:
+        return self._share_method
+
+    @property
+    def pool_class(self) -> Optional["ClassDef"]:
+        """
+        generated <Name>Pool dispatching the long running methods to workers created with
+        share(). not in ApiDef.classes, the generators that support pools bind it explicitly.
+        """
+        return self._pool_class
+
+    @property
+    def pool_source(self) -> Optional["ClassDef"]:
+        """the pooled class, for a pool_class"""
+        return self._pool_source
+
 
 class ApiDef(Named):
     def __init__(self, **kwargs):
@@ -506,6 +912,13 @@ class ApiDef(Named):
         ):
             raise ValueError(f"{self} defines no api")
 
+    @property
+    def error_enums(self) -> List[EnumDef]:
+        """enums named as error_enum by any function or method, in declaration order"""
+        callables = list(self.functions) + [m for c in self.classes for m in c.methods]
+        used = {c.error_enum for c in callables if c.error_enum is not None}
+        return [e for e in self.enums if e.name in used]
+
     @property
     def types_used_in_list(self) -> Set[BaseType]:
         if self._types_used_in_list is None:
@@ -590,6 +1003,9 @@ def init_type_table():
         "float32",
         "float64",
         "string",
+        # borrowed, non-owning views - parameters only
+        "string_view",
+        "bytes",
     ]
     for base_type in base_types:
         PrimitiveType(name=base_type)
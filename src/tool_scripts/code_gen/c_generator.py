@@ -1,3 +1,4 @@
+import zlib
 from typing import Optional
 from api_def import (
     ApiDef,
@@ -14,7 +15,10 @@ from api_def import (
     PrimitiveType,
     RefType,
     StructDef,
+    StructLayout,
+    TypedNamed,
     get_type,
+    ensure_camel,
     ensure_snake,
 )
 from generator import Generator, GenCtx, BlockCtx
@@ -22,8 +26,50 @@ from cpp_generator import CppGenerator
 
 
 class CBindingGenerator(CppGenerator):
+    """
+    extern C wrapper over the C++ API. inputs are borrowed for the duration of the call. string
+    and list results are written into caller supplied buffers (out + out_capacity) and the
+    required size is returned, nothing is written unless the whole result fits - callers reuse
+    one buffer across calls and grow it on a miss. a retry repeats the call.
+
+    string list parameters are packed - the UTF-8 of every string back to back in {name} and
+    {name}_count + 1 offsets in {name}_offsets, string i spanning offsets[i]..offsets[i + 1].
+
+    the shims don't lock. calls of unmarked methods must not overlap at all, calls of reentrant
+    methods must not overlap on one instance, thread safe methods need no serialization.
+
+    is_pooled classes get a {class}_pool_create taking a set up instance, and the pool's shims
+    take the calls from any thread.
+
+    structs and struct lists are deep copied into one arena allocation holding the items and
+    everything they point to, released in bulk with {api}_release_result. so are the string and numeric lists of
+    batch methods - a buffer miss would repeat the whole batch. a batch fails as a whole with
+    its first failing item's error.
+
+    streams return a cursor - {method}_next advances it, {method}_item reads the current item
+    (repeatable, so a buffer miss doesn't lose it) and destroy_{cursor} closes it.
+
+    error_enum calls take a trailing out_error the status is written to - the other results
+    are only valid when it is the enum's zero value.
+
+    built with BNG_BINDING_STATS every shim counts its calls, time and argument bytes, and
+    {api}_get_binding_stats copies the counters out. without it the hooks compile to nothing.
+
+    {Api}ApiTable holds a pointer to every function of the header for callers loading the
+    library at runtime - {api}_get_api_table(version) is the one symbol they look up, see
+    CLoaderGenerator. the version is a hash of the table's entries, so a caller built against
+    another api gets NULL instead of a table laid out differently.
+
+    the shims are declared with {API}_C_SHIM - exported by default for callers linking the
+    library, hidden when built with {API}_API_TABLE_ONLY so the table getter is the library's
+    only export. the sources define {API}_C_BUILD first, so on MSVC they dllexport what the
+    callers including the header dllimport.
+    """
+
     generates_header = True
     generates_source = True
+    supports_shards = True
+    has_api_table = True
 
     def __init__(self, api: ApiDef, *, gen_version: str, api_h: str):
         super().__init__(api, gen_version=gen_version)
@@ -33,8 +79,17 @@ class CBindingGenerator(CppGenerator):
         if hdr_ctx is not None:
             ctx = hdr_ctx
             self._pragma("once", ctx=ctx)
-            self._include("stdlib.h", ctx=ctx)
+            # static_assert and offsetof for the struct layout checks
+            layout_headers = ["<assert.h>", "stddef.h"] if self.api.structs else []
+            self._include(sorted(["stdbool.h", "stdint.h", "stdlib.h"] + layout_headers), ctx=ctx)
+            if self._stats_entries():
+                # BngCallStats
+                block = self._push_ifdef_block(self.stats_symbol, ctx=ctx)
+                self._include(["api/api_util.h"], ctx=ctx)
+                ctx.pop_block(block)
             ctx.add_lines("")
+            if self.has_api_table:
+                self._gen_export_macros(ctx=ctx)
             ec_block = self._push_extern_c_block(ctx)
             for enum_def in self.api.enums:
                 self._gen_enum(enum_def, ctx=ctx)
@@ -42,17 +97,247 @@ class CBindingGenerator(CppGenerator):
                 self._gen_struct(struct_def, ctx=ctx)
             for class_def in self.api.classes:
                 self._gen_class_decls(class_def, ctx=ctx)
+                if class_def.is_pooled:
+                    self._gen_pool_decls(class_def, ctx=ctx)
+            for func_def in self.api.functions:
+                self._gen_buffer_comment(func_def, ctx=ctx)
+                ctx.add_lines(f"{self._shim_export(self._gen_shim_decl(func_def))};")
+            if self._has_arena_results():
+                release_decl = f"void {self.release_name}(const void* result)"
+                ctx.add_lines(f"{self._shim_export(release_decl)};")
+            if self._stats_entries():
+                block = self._push_ifdef_block(self.stats_symbol, ctx=ctx)
+                # not in the table, so it stays visible in table only builds
+                ctx.add_lines(f"{self._export(self._gen_stats_accessor_decl())};")
+                ctx.pop_block(block)
+            if self.has_api_table:
+                self._gen_api_table_decls(ctx=ctx)
             ctx.pop_block(ec_block)
 
         if src_ctx is not None:
             ctx = src_ctx
-            self._include([hdr_ctx.out_path.name, self.api_h], ctx=ctx)
+            if self.has_api_table:
+                # exports instead of importing the header's declarations
+                self._define(self.build_symbol, None, ctx=ctx)
+            self._include([hdr_ctx.out_path.name] + self._source_includes(), ctx=ctx)
             ctx.add_lines("")
+            self._gen_struct_converters(ctx=ctx)
+            self._gen_cursor_types(ctx=ctx)
+            self._gen_stats_table(ctx=ctx)
             ec_block = self._push_extern_c_block(ctx)
             for class_def in self.api.classes:
-                self._gen_class_impls(class_def, ctx=ctx)
+                if self._in_shard(class_def):
+                    self._gen_class_impls(class_def, ctx=ctx)
+                    if class_def.is_pooled:
+                        self._gen_pool_impls(class_def, ctx=ctx)
+            if self._in_shard():
+                for func_def in self.api.functions:
+                    self._gen_shim_impl(func_def, call=f"{self.api_ns}::{func_def.name}", ctx=ctx)
+            if self._in_shard() and self._has_arena_results():
+                block = ctx.push_block(
+                    f"void {self.release_name}(const void* result) {{",
+                    indent=True,
+                    post_pop_lines="}\n",
+                )
+                self._gen_stats_hook(self.release_name, [], ctx=ctx)
+                ctx.add_lines("free(const_cast<void*>(result));")
+                ctx.pop_block(block)
+            if self._in_shard():
+                self._gen_stats_accessor(ctx=ctx)
+            if self._in_shard() and self.has_api_table:
+                self._gen_api_table_getter(ctx=ctx)
             ctx.pop_block(ec_block)
 
+    @staticmethod
+    def result_kind(callable_def: TypedNamed) -> str:
+        type_obj = callable_def.resolved_type_obj
+        if callable_def.is_factory:
+            return "handle"
+        if isinstance(callable_def, MethodDef) and callable_def.is_stream:
+            return "stream"
+        # fixed arrays come back like lists - std::array iterates the same
+        if callable_def.is_list or callable_def.is_array:
+            if type_obj.is_string:
+                return "text_list"
+            if type_obj.is_primitive and type_obj.is_number_or_bool:
+                return "list"
+            if isinstance(type_obj, StructDef):
+                return "struct_list"
+        else:
+            if type_obj.is_void:
+                return "void"
+            if type_obj.is_string:
+                return "text"
+            if isinstance(type_obj, EnumDef):
+                return "enum"
+            if type_obj.is_primitive and type_obj.is_number_or_bool:
+                return "value"
+            if isinstance(type_obj, StructDef):
+                return "struct"
+        raise ValueError(f"{callable_def} - return type not supported by the C binding")
+
+    def shim_name(self, callable_def: TypedNamed, class_def: Optional[ClassDef] = None) -> str:
+        if class_def is None:
+            return f"{self.api.name}_{callable_def.name}"
+        return f"{ensure_snake(class_def.name)}_{callable_def.name}"
+
+    @staticmethod
+    def cursor_name(method_def: MethodDef, class_def: ClassDef) -> str:
+        return f"{class_def.name}{method_def.stream_name}Cursor"
+
+    @staticmethod
+    def stream_item(method_def: MethodDef) -> FunctionDef:
+        """single value callable standing in for the items of a stream"""
+        return FunctionDef(name=f"{method_def.name}_item", type=method_def.type)
+
+    def _source_includes(self) -> [str]:
+        blittable = ["bit", "cstddef"] if self._blittable_structs() else []
+        return (
+            [self.api_h, "api/api_util.h", "algorithm"]
+            + blittable
+            + ["cstring", "string", "vector"]
+        )
+
+    def _stats_entries(self) -> [str]:
+        # every function of the table - pool creation, destructors and cursors included
+        return [self._api_table_entry(decl)[0] for decl in self._api_table_decls()]
+
+    @property
+    def release_name(self) -> str:
+        return f"{self.api.name}_release_result"
+
+    @property
+    def api_table_type(self) -> str:
+        return f"{ensure_camel(self.api.name, capitalized=True)}ApiTable"
+
+    @property
+    def api_table_getter(self) -> str:
+        return f"{self.api.name}_get_api_table"
+
+    @property
+    def api_table_version_symbol(self) -> str:
+        return f"{self.api.name.upper()}_API_TABLE_VERSION"
+
+    @property
+    def export_symbol(self) -> str:
+        return f"{self.api.name.upper()}_C_EXPORT"
+
+    @property
+    def build_symbol(self) -> str:
+        return f"{self.api.name.upper()}_C_BUILD"
+
+    @property
+    def shim_export_symbol(self) -> str:
+        return f"{self.api.name.upper()}_C_SHIM"
+
+    @property
+    def table_only_symbol(self) -> str:
+        return f"{self.api.name.upper()}_API_TABLE_ONLY"
+
+    def _gen_export_macros(self, *, ctx: GenCtx):
+        export, shim = self.export_symbol, self.shim_export_symbol
+        ctx.add_lines(
+            [
+                f"// the binding's sources define {self.build_symbol} - callers import",
+                "#if !defined(_MSC_VER)",
+                f'  #define {export} __attribute__((visibility("default")))',
+                f"#elif defined({self.build_symbol})",
+                f"  #define {export} __declspec(dllexport)",
+                "#else",
+                f"  #define {export} __declspec(dllimport)",
+                "#endif",
+                "",
+                f"// built with {self.table_only_symbol} the library exports {self.api_table_getter}",
+                "// only and the shims are reached through its table, otherwise they're exported too",
+                f"#if !defined({self.table_only_symbol})",
+                f"  #define {shim} {export}",
+                "#elif defined(_MSC_VER)",
+                f"  #define {shim}",
+                "#else",
+                f'  #define {shim} __attribute__((visibility("hidden")))',
+                "#endif",
+                "",
+            ]
+        )
+
+    def _export(self, decl: str) -> str:
+        return f"{self.export_symbol} {decl}" if self.has_api_table else decl
+
+    def _shim_export(self, decl: str) -> str:
+        # added to the header only - the table entries are parsed from the bare declarations
+        return f"{self.shim_export_symbol} {decl}" if self.has_api_table else decl
+
+    def _api_table_decls(self) -> [str]:
+        """declarations of the functions the api table points to, in header order"""
+
+        def class_decls(class_def: ClassDef) -> [str]:
+            decls = []
+            for method_def in class_def.methods:
+                decls.append(self._gen_shim_decl(method_def, class_def))
+                if method_def.is_stream:
+                    decls += self._gen_cursor_decls(method_def, class_def)
+            return decls + [self._destructor_decl(class_def)]
+
+        decls = []
+        for class_def in self.api.classes:
+            decls += class_decls(class_def)
+            if class_def.is_pooled:
+                decls.append(self._gen_pool_create_decl(class_def))
+                decls += class_decls(class_def.pool_class)
+        decls += [self._gen_shim_decl(func_def) for func_def in self.api.functions]
+        if self._has_arena_results():
+            decls.append(f"void {self.release_name}(const void* result)")
+        return decls
+
+    def api_table_version(self) -> int:
+        # any change to an entry's name or signature changes the layout
+        return zlib.crc32("\n".join(self._api_table_decls()).encode("utf8"))
+
+    @staticmethod
+    def _api_table_entry(decl: str) -> (str, str):
+        """name and function pointer member of a declaration"""
+        head, params = decl.split("(", 1)
+        return_type, name = head.rsplit(" ", 1)
+        return name, f"{return_type} (*{name})({params};"
+
+    def _gen_api_table_decls(self, *, ctx: GenCtx):
+        # the stats accessor stays out - the table's layout doesn't depend on build options
+        entries = [self._api_table_entry(decl)[1] for decl in self._api_table_decls()]
+        ctx.add_lines(
+            [
+                "",
+                f"#define {self.api_table_version_symbol} 0x{self.api_table_version():08x}u",
+                "",
+                f"typedef struct {self.api_table_type} {{",
+                "  uint32_t version;",
+            ]
+            + [f"  {entry}" for entry in entries]
+            + [
+                f"}} {self.api_table_type};",
+                "",
+                f"// NULL unless version is {self.api_table_version_symbol} - the table is static",
+                f"{self.export_symbol} const {self.api_table_type}* "
+                f"{self.api_table_getter}(uint32_t version);",
+            ]
+        )
+
+    def _gen_api_table_getter(self, *, ctx: GenCtx):
+        names = [self._api_table_entry(decl)[0] for decl in self._api_table_decls()]
+        ctx.add_lines(
+            [
+                f"const {self.api_table_type}* {self.api_table_getter}(uint32_t version) {{",
+                f"  static constexpr {self.api_table_type} table = {{",
+                f"    {self.api_table_version_symbol},",
+            ]
+            + [f"    {name}," for name in names]
+            + [
+                "  };",
+                "  return version == table.version ? &table : nullptr;",
+                "}",
+                "",
+            ]
+        )
+
     def _gen_alias(self, alias_def: AliasDef, *, ctx: GenCtx):
         ref = "*" if alias_def.ref_type else ""
         ctx.add_lines(f"typedef {self._gen_typename(alias_def.type_obj)}{ref} {alias_def.name};")
@@ -60,10 +345,22 @@ class CBindingGenerator(CppGenerator):
     def _gen_param(self, param_def: ParameterDef) -> str:
         if param_def.is_array:
             raise ValueError("C does not support arrays as parameters.")
+        if isinstance(param_def.resolved_type_obj, ClassDef):
+            raise ValueError(f"{param_def} - class parameters not supported by the C binding")
         if param_def.is_list:
-            type_str = self._gen_typename(param_def.type_obj)
             count_type_str = self._gen_typename(get_type("uint32"))
-            return f"const {type_str}* {param_def.name}, {count_type_str} {param_def.name}_count"
+            name = param_def.name
+            if param_def.is_string or param_def.is_string_view:
+                return (
+                    f"const char* {name}, const {count_type_str}* {name}_offsets, "
+                    f"{count_type_str} {name}_count"
+                )
+            type_str = f"const {self._gen_typename(param_def.type_obj)}*"
+            return f"{type_str} {name}, {count_type_str} {name}_count"
+        if param_def.is_borrowed:
+            size_type_str = self._gen_typename(get_type("uint32"))
+            data_type_str = "char" if param_def.is_string_view else "uint8_t"
+            return f"const {data_type_str}* {param_def.name}, {size_type_str} {param_def.name}_size"
         if not param_def.is_primitive:
             const = "const "
             ref = "*"
@@ -101,37 +398,62 @@ class CBindingGenerator(CppGenerator):
     def _gen_struct(self, struct_def: StructDef, *, ctx: GenCtx, is_forward: bool = False):
         term = ";" if is_forward else " {"
         struct_decl = f"struct {struct_def.name}{term}"
+        is_packed = struct_def.layout == StructLayout.packed and not is_forward
+        if is_packed:
+            self._pragma("pack(push, 1)", ctx=ctx)
         struct_block = ctx.push_block(
             struct_decl, indent=True, post_pop_lines=("};" if not is_forward else None)
         )
         if not is_forward:
-            for member_def in struct_def.members:
+            for member_def in struct_def.layout_members:
                 self._gen_c_member(member_def, ctx=ctx)
         ctx.pop_block(struct_block)
+        if is_packed:
+            self._pragma("pack(pop)", ctx=ctx)
         ctx.add_lines(
             [
                 f"typedef struct {struct_def.name} {struct_def.name};",
                 "",
             ]
         )
+        if not is_forward:
+            self._gen_c_layout_check(struct_def, ctx=ctx)
+
+    def _gen_c_layout_check(self, struct_def: StructDef, *, ctx: GenCtx):
+        # the layout the size report shows - binding targets have 64 bit pointers
+        offsets, size, _ = struct_def.c_layout(pointer_size=8)
+        c_block = ctx.push_block("#if UINTPTR_MAX == UINT64_MAX", post_pop_lines="#endif")
+        self._gen_static_assert(
+            [f"sizeof({struct_def.name}) == {size}"]
+            + [
+                f"offsetof({struct_def.name}, {m.name}) == {offset}"
+                for m, offset in zip(struct_def.layout_members, offsets)
+            ],
+            f"{struct_def.name} layout differs from the api definition's",
+            ctx=ctx,
+        )
+        ctx.pop_block(c_block)
+        ctx.add_lines("")
 
     def _gen_c_member(self, member_def: MemberDef, *, ctx: GenCtx):
         if member_def.is_static:
             raise Exception(f"{member_def} is static - not supported in POD struct.")
-        const = "const " if member_def.is_const else ""
+        # strings are views - the binding copies them into the C++ struct
+        const = "const " if member_def.is_const or member_def.is_string else ""
         ref = "*" if member_def.ref_type else ""
         type_spec = f"{self._gen_typename(member_def.type_obj)}{ref}"
-        if member_def.is_array:
-            type_spec = f"{type_spec}[{member_def.array_count}]"
         if member_def.is_list:
             count_type_str = self._gen_typename(get_type("uint32"))
+            if member_def.is_string:
+                type_spec = "char* const"
             return ctx.add_lines(
                 [
                     f"{const}{type_spec}* {member_def.name};",
                     f"{count_type_str} {member_def.name}_count;",
                 ]
             )
-        return ctx.add_lines(f"{const}{type_spec} {member_def.name};")
+        array = f"[{member_def.array_count}]" if member_def.is_array else ""
+        return ctx.add_lines(f"{const}{type_spec} {member_def.name}{array};")
 
     def _gen_typename(self, type_obj: BaseType) -> str:
         if type_obj.is_primitive:
@@ -142,45 +464,787 @@ class CBindingGenerator(CppGenerator):
 
     def _gen_class_decls(self, class_def: ClassDef, *, ctx: GenCtx):
         self._gen_class_opaque_type(class_def, ctx=ctx)
+        for method_def in class_def.methods:
+            if method_def.is_stream:
+                cursor = self.cursor_name(method_def, class_def)
+                ctx.add_lines([f"struct {cursor};", f"typedef struct {cursor} {cursor};", ""])
         for method_def in class_def.methods:
             self._gen_class_method_decl(method_def, class_def=class_def, ctx=ctx)
         self._gen_destructor_decl(class_def, ctx=ctx)
         ctx.add_lines("")
 
     def _gen_destructor_decl(self, class_def: ClassDef, *, ctx: GenCtx):
+        ctx.add_lines(f"{self._shim_export(self._destructor_decl(class_def))};")
+
+    @staticmethod
+    def _destructor_decl(class_def: ClassDef) -> str:
         snake_name = ensure_snake(class_def.name)
-        ctx.add_lines(f"void destroy_{snake_name}({class_def.name}*);")
+        return f"void destroy_{snake_name}({class_def.name}* {snake_name})"
 
     def _gen_class_opaque_type(self, class_def: ClassDef, *, ctx: GenCtx):
         ctx.add_lines(
             [
                 f"struct {class_def.name};",
-                f"typedef struct {class_def.name} {class_def};",
+                f"typedef struct {class_def.name} {class_def.name};",
                 "",
             ]
         )
 
+    def _gen_pool_create_decl(self, class_def: ClassDef) -> str:
+        pool_name = class_def.pool_class.name
+        return (
+            f"{pool_name}* {ensure_snake(pool_name)}_create("
+            f"const {class_def.name}* source, uint32_t size)"
+        )
+
+    def _gen_pool_decls(self, class_def: ClassDef, *, ctx: GenCtx):
+        pool_def = class_def.pool_class
+        self._gen_class_opaque_type(pool_def, ctx=ctx)
+        ctx.add_lines(f"{self._shim_export(self._gen_pool_create_decl(class_def))};")
+        for method_def in pool_def.methods:
+            self._gen_class_method_decl(method_def, class_def=pool_def, ctx=ctx)
+        self._gen_destructor_decl(pool_def, ctx=ctx)
+        ctx.add_lines("")
+
     def _gen_class_method_decl(self, method_def: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
-        class_name_snake = ensure_snake(class_def.name)
-        method_name = f"{class_name_snake}_{method_def.name}"
-        if not method_def.is_factory:
-            const = "const " if method_def.is_const_method else ""
-            self_decl = f"{const}{class_def.name}* {class_name_snake}"
+        if method_def.is_thread_safe or class_def.pool_source is not None:
+            ctx.add_lines("// thread safe")
+        elif method_def.is_reentrant:
+            ctx.add_lines("// reentrant - calls on one instance must not overlap")
+        if method_def.batch_source is not None:
+            self._gen_batch_comment(method_def, ctx=ctx)
+        self._gen_buffer_comment(method_def, ctx=ctx)
+        ctx.add_lines(f"{self._shim_export(self._gen_shim_decl(method_def, class_def))};")
+        if method_def.is_stream:
+            cursor_decls = self._gen_cursor_decls(method_def, class_def)
+            next_decl, item_decl, destroy_decl = [self._shim_export(d) for d in cursor_decls]
+            ctx.add_lines(f"{next_decl};")
+            self._gen_buffer_comment(self.stream_item(method_def), ctx=ctx)
+            ctx.add_lines([f"{item_decl};", f"{destroy_decl};"])
+
+    def _gen_batch_comment(self, method_def: MethodDef, *, ctx: GenCtx):
+        ctx.add_lines(
+            "// one result per item - fails as a whole with the first failing item's error"
+        )
+        if self._is_arena_result(method_def):
+            ctx.add_lines(f"// the results are one allocation, free it with {self.release_name}")
+
+    def _gen_buffer_comment(self, callable_def: TypedNamed, *, ctx: GenCtx):
+        """the caller buffer contract of a shim writing its result to out"""
+        if self._is_arena_result(callable_def):
+            return
+        result_kind = self.result_kind(callable_def)
+        if result_kind == "text":
+            ctx.add_lines(
+                [
+                    "// returns the string's size without the NUL, and writes it and the NUL to out",
+                    "// only if size < out_capacity - nothing is written otherwise",
+                ]
+            )
+        elif result_kind == "text_list":
+            ctx.add_lines(
+                [
+                    "// returns the size of the strings back to back, each NUL terminated, and",
+                    "// writes them to out only if size <= out_capacity - nothing is written otherwise",
+                ]
+            )
+        elif result_kind == "list":
+            ctx.add_lines(
+                [
+                    "// returns the item count, and writes the items to out only if",
+                    "// count <= out_capacity - nothing is written otherwise",
+                ]
+            )
+
+    def _gen_cursor_decls(self, method_def: MethodDef, class_def: ClassDef) -> [str]:
+        """next, item and destroy declarations of a stream's cursor"""
+        cursor = self.cursor_name(method_def, class_def)
+        shim_name = self.shim_name(method_def, class_def)
+        return_type, result_params = self._gen_result_decl(self.stream_item(method_def))
+        item_params = ", ".join([f"const {cursor}* cursor"] + result_params)
+        return [
+            f"bool {shim_name}_next({cursor}* cursor)",
+            f"{return_type} {shim_name}_item({item_params})",
+            f"void destroy_{ensure_snake(cursor)}({cursor}* cursor)",
+        ]
+
+    def _gen_result_decl(
+        self, callable_def: TypedNamed, class_def: Optional[ClassDef] = None
+    ) -> (str, [str]):
+        size_tn = self._gen_typename(get_type("uint32"))
+        result_kind = self.result_kind(callable_def)
+        if result_kind == "handle":
+            return f"{callable_def.resolved_type_obj.name}*", []
+        if result_kind == "stream":
+            return f"{self.cursor_name(callable_def, class_def)}*", []
+        if self._is_arena_result(callable_def):
+            type_obj = callable_def.resolved_type_obj
+            elem_type = "char* const" if type_obj.is_string else self._c_element_type(type_obj)
+            count = [] if result_kind == "struct" else [f"{size_tn}* out_count"]
+            return f"const {elem_type.removeprefix('::')}*", count
+        if result_kind in ("text", "text_list"):
+            return size_tn, ["char* out", f"{size_tn} out_capacity"]
+        if result_kind == "list":
+            return size_tn, [
+                f"{self._gen_typename(callable_def.type_obj)}* out",
+                f"{size_tn} out_capacity",
+            ]
+        return self._gen_typename(callable_def.type_obj), []
+
+    def _gen_shim_decl(self, callable_def: TypedNamed, class_def: Optional[ClassDef] = None):
+        params = []
+        if class_def is not None and not (callable_def.is_static or callable_def.is_factory):
+            const = "const " if callable_def.is_const_method else ""
+            params.append(f"{const}{class_def.name}* {ensure_snake(class_def.name)}")
+        params.extend([self._gen_param(p) for p in callable_def.parameters])
+        return_type, result_params = self._gen_result_decl(callable_def, class_def)
+        params.extend(result_params)
+        if callable_def.error_enum is not None:
+            params.append(f"{callable_def.error_enum_obj.name}* out_error")
+        return f"{return_type} {self.shim_name(callable_def, class_def)}({', '.join(params) or 'void'})"
+
+    def _cpp_name(self, type_obj: BaseType) -> str:
+        return f"{self.api_ns}::{type_obj.name}"
+
+    def _class_ref_type(self, class_def: ClassDef) -> RefType:
+        # destroy_* releases whatever the factories handed out - they have to agree
+        ref_types = {
+            c.ref_type
+            for c in self._callables()
+            if c.is_factory and c.resolved_type_obj is class_def
+        }
+        if len(ref_types) > 1:
+            raise ValueError(f"{class_def} - factories mix ref types {sorted(ref_types)}")
+        return next(iter(ref_types), RefType.raw)
+
+    def _handle_type(self, class_def: ClassDef) -> str:
+        ref_type = self._class_ref_type(class_def)
+        if ref_type == RefType.raw:
+            return f"{self._cpp_name(class_def)}*"
+        return f"std::{ref_type}_ptr<{self._cpp_name(class_def)}>*"
+
+    def _gen_cpp_value(self, type_obj: BaseType, c_expr: str) -> str:
+        type_obj = type_obj.resolved_type_obj
+        if type_obj.is_string:
+            return f"({c_expr} ? std::string({c_expr}) : std::string())"
+        if isinstance(type_obj, StructDef) and type_obj.is_blittable:
+            return f"std::bit_cast<{self._cpp_name(type_obj)}>({c_expr})"
+        if isinstance(type_obj, StructDef):
+            return f"to_cpp({c_expr})"
+        if isinstance(type_obj, EnumDef):
+            return f"static_cast<{self._cpp_name(type_obj)}>({c_expr})"
+        return c_expr
+
+    def _structs_reached(self, typed_list: [TypedNamed]) -> [StructDef]:
+        # only structs crossing the boundary get converters - unused ones would trip
+        # -Wunused-function
+        reached = set()
+
+        def add(type_obj: BaseType):
+            if isinstance(type_obj, StructDef) and type_obj not in reached:
+                reached.add(type_obj)
+                for member_def in type_obj.members:
+                    add(member_def.resolved_type_obj)
+
+        for typed in typed_list:
+            add(typed.resolved_type_obj)
+        return [s for s in self.api.structs if s in reached]
+
+    def _structs_passed(self, callables: Optional[list] = None) -> [StructDef]:
+        callables = self._callables() if callables is None else callables
+        return self._structs_reached([p for c in callables for p in c.parameters])
+
+    def _structs_returned(self, callables: Optional[list] = None) -> [StructDef]:
+        callables = self._callables() if callables is None else callables
+        return self._structs_reached(
+            [c for c in callables if self.result_kind(c) in ("struct", "struct_list")]
+        )
+
+    def _is_arena_result(self, callable_def: TypedNamed) -> bool:
+        """results copied into one allocation the caller releases, instead of its buffer"""
+        result_kind = self.result_kind(callable_def)
+        if result_kind in ("struct", "struct_list"):
+            return True
+        # a batch answers many calls - a buffer miss must not repeat them
+        batch_source = getattr(callable_def, "batch_source", None)
+        return batch_source is not None and result_kind in ("text_list", "list")
+
+    def _has_arena_results(self, callables: Optional[list] = None) -> bool:
+        callables = self._callables() if callables is None else callables
+        return any(self._is_arena_result(c) for c in callables)
+
+    def _blittable_structs(self, callables: Optional[list] = None) -> [StructDef]:
+        crossing = self._structs_passed(callables) + self._structs_returned(callables)
+        return [s for s in self.api.structs if s in crossing and s.is_blittable]
+
+    def _gen_struct_converters(self, *, ctx: GenCtx):
+        # converters have internal linkage - each shard gets the ones its shims use
+        passed = self._structs_passed(self._shard_callables())
+        returned = self._structs_returned(self._shard_callables())
+        has_arena = self._has_arena_results(self._shard_callables())
+        if not passed and not has_arena:
+            return
+        ns_block = ctx.push_block("namespace {", indent=True, post_pop_lines="} // namespace\n")
+        for struct_def in self._blittable_structs(self._shard_callables()):
+            self._gen_layout_check(struct_def, ctx=ctx)
+        if has_arena:
+            self._gen_result_arena(ctx=ctx)
+        # blittable structs are bit_cast or copied whole instead
+        for struct_def in [s for s in returned if not s.is_blittable]:
+            self._gen_arena_size(struct_def, ctx=ctx)
+            self._gen_to_c(struct_def, ctx=ctx)
+        for struct_def in [s for s in passed if not s.is_blittable]:
+            cpp_name = self._cpp_name(struct_def)
+            fn_block = ctx.push_block(
+                f"{cpp_name} to_cpp(const ::{struct_def.name}& c) {{",
+                indent=True,
+                post_pop_lines="}\n",
+            )
+            ctx.add_lines(f"{cpp_name} cpp{{}};")
+            for member_def in struct_def.members:
+                name = member_def.name
+                if member_def.is_array:
+                    value = self._gen_cpp_value(member_def.type_obj, f"c.{name}[i]")
+                    ctx.add_lines(
+                        f"for (size_t i = 0; i < {member_def.array_count}; ++i) {{ cpp.{name}[i] = {value}; }}"
+                    )
+                elif member_def.is_list:
+                    value = self._gen_cpp_value(member_def.type_obj, f"c.{name}[i]")
+                    ctx.add_lines(
+                        [
+                            f"cpp.{name}.reserve(c.{name}_count);",
+                            f"for (uint32_t i = 0; i < c.{name}_count; ++i) {{ cpp.{name}.push_back({value}); }}",
+                        ]
+                    )
+                else:
+                    ctx.add_lines(
+                        f"cpp.{name} = {self._gen_cpp_value(member_def.type_obj, f'c.{name}')};"
+                    )
+            ctx.add_lines("return cpp;")
+            ctx.pop_block(fn_block)
+        ctx.pop_block(ns_block)
+
+    def _gen_layout_check(self, struct_def: StructDef, *, ctx: GenCtx):
+        c_name = f"::{struct_def.name}"
+        cpp_name = self._cpp_name(struct_def)
+        self._gen_static_assert(
+            [
+                f"sizeof({c_name}) == sizeof({cpp_name})",
+                f"alignof({c_name}) == alignof({cpp_name})",
+            ]
+            + [
+                f"offsetof({c_name}, {m.name}) == offsetof({cpp_name}, {m.name})"
+                for m in struct_def.members
+            ],
+            f"{struct_def.name} is copied whole - the C and C++ layouts must match",
+            ctx=ctx,
+        )
+        ctx.add_lines("")
+
+    def _gen_result_arena(self, *, ctx: GenCtx):
+        ctx.add_lines(
+            [
+                "struct ResultArena {",
+                "  char* next;",
+                "",
+                "  template <class T>",
+                "  T* alloc(size_t count) {",
+                "    next += (alignof(T) - reinterpret_cast<uintptr_t>(next) % alignof(T)) % alignof(T);",
+                "    auto* items = reinterpret_cast<T*>(next);",
+                "    next += sizeof(T) * count;",
+                "    return items;",
+                "  }",
+                "",
+                "  const char* copy(const std::string& s) {",
+                "    auto* chars = alloc<char>(s.size() + 1);",
+                "    memcpy(chars, s.data(), s.size());",
+                "    chars[s.size()] = '\\0';",
+                "    return chars;",
+                "  }",
+                "};",
+                "",
+            ]
+        )
+
+    def _c_element_type(self, type_obj: BaseType) -> str:
+        if type_obj.is_string:
+            return "const char*"
+        if isinstance(type_obj, (StructDef, EnumDef)):
+            return f"::{type_obj.name}"
+        return self._gen_typename(type_obj)
+
+    def _gen_arena_size(self, struct_def: StructDef, *, ctx: GenCtx):
+        # bytes a struct points to - alignof covers the worst case padding of each array
+        fn_block = ctx.push_block(
+            f"size_t arena_size(const {self._cpp_name(struct_def)}& v) {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        ctx.add_lines("size_t size = 0;")
+        for member_def in struct_def.members:
+            name = member_def.name
+            type_obj = member_def.resolved_type_obj
+            if type_obj.is_string:
+                elem_size = "item.size() + 1"
+            elif isinstance(type_obj, StructDef) and not type_obj.is_blittable:
+                elem_size = "arena_size(item)"
+            else:
+                elem_size = None
+            if member_def.is_list:
+                elem_type = self._c_element_type(type_obj)
+                ctx.add_lines(
+                    f"size += sizeof({elem_type}) * v.{name}.size() + alignof({elem_type});"
+                )
+            elif not member_def.is_array:
+                if elem_size is not None:
+                    ctx.add_lines(f"size += {elem_size.replace('item', f'v.{name}')};")
+                continue
+            if elem_size is not None:
+                ctx.add_lines(f"for (const auto& item : v.{name}) {{ size += {elem_size}; }}")
+        ctx.add_lines("return size;")
+        ctx.pop_block(fn_block)
+
+    def _gen_c_assign(self, type_obj: BaseType, cpp_expr: str, c_expr: str) -> str:
+        if isinstance(type_obj, StructDef) and type_obj.is_blittable:
+            return f"{c_expr} = std::bit_cast<::{type_obj.name}>({cpp_expr});"
+        if isinstance(type_obj, StructDef):
+            return f"to_c({cpp_expr}, {c_expr}, arena);"
+        if type_obj.is_string:
+            return f"{c_expr} = arena.copy({cpp_expr});"
+        if isinstance(type_obj, EnumDef):
+            return f"{c_expr} = static_cast<::{type_obj.name}>({cpp_expr});"
+        return f"{c_expr} = {cpp_expr};"
+
+    def _gen_to_c(self, struct_def: StructDef, *, ctx: GenCtx):
+        fn_block = ctx.push_block(
+            f"void to_c(const {self._cpp_name(struct_def)}& v, ::{struct_def.name}& c, "
+            "ResultArena& arena) {",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        for member_def in struct_def.members:
+            name = member_def.name
+            type_obj = member_def.resolved_type_obj
+            if member_def.is_array:
+                assign = self._gen_c_assign(type_obj, f"v.{name}[i]", f"c.{name}[i]")
+                ctx.add_lines(
+                    f"for (size_t i = 0; i < {member_def.array_count}; ++i) {{ {assign} }}"
+                )
+            elif member_def.is_list:
+                elem_type = self._c_element_type(type_obj)
+                assign = self._gen_c_assign(type_obj, f"v.{name}[i]", f"{name}[i]")
+                ctx.add_lines(
+                    [
+                        f"auto* {name} = arena.alloc<{elem_type}>(v.{name}.size());",
+                        f"for (size_t i = 0; i < v.{name}.size(); ++i) {{ {assign} }}",
+                        f"c.{name} = {name};",
+                        f"c.{name}_count = uint32_t(v.{name}.size());",
+                    ]
+                )
+            else:
+                ctx.add_lines(self._gen_c_assign(type_obj, f"v.{name}", f"c.{name}"))
+        ctx.pop_block(fn_block)
+
+    def _gen_shim_arg(self, param_def: ParameterDef, *, ctx: GenCtx) -> str:
+        name = param_def.name
+        type_obj = param_def.resolved_type_obj
+        if param_def.is_list:
+            if type_obj.is_string or type_obj.is_string_view:
+                views = f"bng::api::StringViews({name}, {name}_offsets, {name}_count)"
+                if type_obj.is_string_view:
+                    return views
+                ctx.add_lines(
+                    [
+                        f"{self._gen_container(param_def)} {name}_arg;",
+                        f"{name}_arg.reserve({name}_count);",
+                        f"for (auto s : {views}) {{ {name}_arg.emplace_back(s); }}",
+                    ]
+                )
+                return f"{name}_arg"
+            if type_obj.is_primitive and type_obj.is_number_or_bool:
+                return f"{self._gen_container(param_def)}({name}, {name} + {name}_count)"
+            if isinstance(type_obj, StructDef) and type_obj.is_blittable:
+                ctx.add_lines(
+                    [
+                        f"{self._gen_container(param_def)} {name}_arg({name}_count);",
+                        f"if ({name}_count) {{ memcpy({name}_arg.data(), {name}, sizeof(*{name}) * {name}_count); }}",
+                    ]
+                )
+                return f"{name}_arg"
+            ctx.add_lines(
+                [
+                    f"{self._gen_container(param_def)} {name}_arg;",
+                    f"{name}_arg.reserve({name}_count);",
+                    f"for (uint32_t i = 0; i < {name}_count; ++i) {{ "
+                    f"{name}_arg.push_back({self._gen_cpp_value(type_obj, f'{name}[i]')}); }}",
+                ]
+            )
+            return f"{name}_arg"
+        if param_def.is_string_view:
+            return f"std::string_view({name}, {name}_size)"
+        if param_def.is_bytes:
+            return f"std::span<const uint8_t>({name}, {name}_size)"
+        if isinstance(type_obj, StructDef):
+            return self._gen_cpp_value(type_obj, f"*{name}")
+        return self._gen_cpp_value(type_obj, name)
+
+    def _gen_arg_bytes(self, param_def: ParameterDef) -> str:
+        name = param_def.name
+        if param_def.is_list:
+            if param_def.is_string or param_def.is_string_view:
+                return self._gen_text_list_bytes(name)
+            return f"sizeof(*{name}) * {name}_count"
+        if param_def.is_borrowed:
+            return f"{name}_size"
+        if param_def.is_string:
+            return f"({name} ? strlen({name}) : 0)"
+        if isinstance(param_def.resolved_type_obj, StructDef):
+            return f"sizeof(*{name})"
+        return f"sizeof({name})"
+
+    def _gen_container(self, typed: TypedNamed) -> str:
+        if typed.is_array:
+            return f"std::array<{self._gen_cpp_typename(typed.type_obj)}, {typed.array_count}>"
+        return f"std::vector<{self._gen_cpp_typename(typed.type_obj)}>"
+
+    def _gen_cpp_typename(self, type_obj: BaseType) -> str:
+        type_obj = type_obj.resolved_type_obj
+        if isinstance(type_obj, (StructDef, EnumDef)):
+            return self._cpp_name(type_obj)
+        return CppGenerator._gen_typename(self, type_obj)
+
+    def _gen_shim_impl(
+        self,
+        callable_def: TypedNamed,
+        *,
+        call: str,
+        ctx: GenCtx,
+        class_def: Optional[ClassDef] = None,
+    ):
+        block = ctx.push_block(
+            f"{self._gen_shim_decl(callable_def, class_def)} {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        self._gen_stats_hook(
+            self.shim_name(callable_def, class_def),
+            [self._gen_arg_bytes(p) for p in callable_def.parameters],
+            ctx=ctx,
+        )
+        args = [self._gen_shim_arg(p, ctx=ctx) for p in callable_def.parameters]
+        invocation = f"{call}({', '.join(args)})"
+        result_kind = self.result_kind(callable_def)
+        if callable_def.error_enum is not None:
+            invocation = self._gen_error_check(
+                callable_def, invocation, class_def=class_def, ctx=ctx
+            )
+        if invocation is None:
+            # void call - already made by the error check
+            ctx.pop_block(block)
+            return
+        if result_kind == "handle":
+            class_name = callable_def.resolved_type_obj.name
+            if callable_def.ref_type == RefType.raw:
+                handle = invocation
+            else:
+                cpp_class = self._cpp_name(callable_def.resolved_type_obj)
+                handle = f"new std::{callable_def.ref_type}_ptr<{cpp_class}>({invocation})"
+            ctx.add_lines(f"return reinterpret_cast<::{class_name}*>({handle});")
+        elif result_kind == "enum":
+            ctx.add_lines(
+                f"return static_cast<::{callable_def.resolved_type_obj.name}>({invocation});"
+            )
+        elif result_kind == "void":
+            ctx.add_lines(f"{invocation};")
+        elif result_kind == "value":
+            ctx.add_lines(f"return {invocation};")
+        elif self._is_arena_result(callable_def):
+            self._gen_arena_result(callable_def, invocation, ctx=ctx)
+        elif result_kind == "stream":
+            ctx.add_lines(f"return new {self.cursor_name(callable_def, class_def)}({invocation});")
         else:
-            self_decl = ""
-        ref = "*" if method_def.ref_type else ""
-        type_spec = f"{self._gen_typename(method_def.type_obj)}{ref}"
+            self._gen_buffered_result(callable_def, invocation, result_kind=result_kind, ctx=ctx)
+        ctx.pop_block(block)
 
-        if method_def.is_array:
-            raise ValueError(f"returning array not supported in pure C")
-        if method_def.is_list:
-            raise ValueError(f"returning list not implemented for C")
+    def _gen_error_check(
+        self,
+        callable_def: TypedNamed,
+        invocation: str,
+        *,
+        class_def: Optional[ClassDef] = None,
+        ctx: GenCtx,
+    ) -> Optional[str]:
+        """
+        reports the call's status through out_error and returns early on failure. returns the
+        expression for the success value, None for void calls.
+        """
+        c_error = f"::{callable_def.error_enum_obj.name}"
+        if callable_def.is_void:
+            ctx.add_lines(f"*out_error = static_cast<{c_error}>({invocation});")
+            return None
+        # the result's sizes are zeroed as well - the caller gets no stale count with the NULL
+        _, result_params = self._gen_result_decl(callable_def, class_def)
+        out_sizes = [p.rsplit(" ", 1)[1] for p in result_params if "* out_" in p]
+        ctx.add_lines(
+            [
+                f"auto expected = {invocation};",
+                f"*out_error = static_cast<{c_error}>(expected.error());",
+                "if (!expected) {",
+            ]
+            + [f"  *{name} = 0;" for name in out_sizes]
+            + [
+                "  return {};",
+                "}",
+            ]
+        )
+        return "std::move(expected).value()"
 
-        decl = f"{type_spec} {method_name}"
-        params = ", ".join(
-            [self_decl] + [self._gen_param(param_def) for param_def in method_def.parameters]
+    def _gen_arena_result(self, callable_def: TypedNamed, invocation: str, *, ctx: GenCtx):
+        type_obj = callable_def.resolved_type_obj
+        c_type = self._c_element_type(type_obj)
+        is_struct = isinstance(type_obj, StructDef)
+        # copied whole - bit_cast compatible structs and numbers
+        blittable = type_obj.is_blittable if is_struct else not type_obj.is_string
+        if self.result_kind(callable_def) == "struct":
+            arena_size = "" if blittable else " + arena_size(result)"
+            ctx.add_lines(
+                [
+                    f"const auto& result = {invocation};",
+                    f"ResultArena arena{{static_cast<char*>(malloc(sizeof({c_type}){arena_size}))}};",
+                    "if (arena.next == nullptr) {",
+                    "  return nullptr;",
+                    "}",
+                    f"auto* item = arena.alloc<{c_type}>(1);",
+                    self._gen_c_assign(type_obj, "result", "*item"),
+                    "return item;",
+                ]
+            )
+            return
+        ctx.add_lines(
+            [
+                f"const auto& result = {invocation};",
+                f"size_t size = sizeof({c_type}) * result.size();",
+            ]
         )
-        ctx.add_lines(f"{decl}({params});")
+        if is_struct and not blittable:
+            ctx.add_lines("for (const auto& item : result) { size += arena_size(item); }")
+        elif type_obj.is_string:
+            ctx.add_lines("for (const auto& item : result) { size += item.size() + 1; }")
+        ctx.add_lines(
+            [
+                "ResultArena arena{static_cast<char*>(malloc(size))};",
+                "if (arena.next == nullptr) {",
+                "  *out_count = 0;",
+                "  return nullptr;",
+                "}",
+                f"auto* items = arena.alloc<{c_type}>(result.size());",
+            ]
+        )
+        if is_struct and blittable:
+            ctx.add_lines("memcpy(items, result.data(), size);")
+        elif blittable:
+            # std::vector<bool> has no data()
+            ctx.add_lines("std::copy(result.begin(), result.end(), items);")
+        else:
+            assign = self._gen_c_assign(type_obj, "result[i]", "items[i]")
+            ctx.add_lines(f"for (size_t i = 0; i < result.size(); ++i) {{ {assign} }}")
+        ctx.add_lines(["*out_count = uint32_t(result.size());", "return items;"])
+
+    def _gen_buffered_result(
+        self, callable_def: TypedNamed, invocation: str, *, result_kind: str, ctx: GenCtx
+    ):
+        _ = callable_def
+        ctx.add_lines(f"const auto& result = {invocation};")
+        if result_kind == "text":
+            # size excludes the terminator, like snprintf
+            ctx.add_lines(
+                [
+                    "const auto size = uint32_t(result.size());",
+                    "if (size < out_capacity) {",
+                    "  memcpy(out, result.data(), size);",
+                    "  out[size] = '\\0';",
+                    "}",
+                    "return size;",
+                ]
+            )
+        elif result_kind == "text_list":
+            # strings packed back to back, each null terminated
+            ctx.add_lines(
+                [
+                    "uint32_t size = 0;",
+                    "for (const auto& s : result) { size += uint32_t(s.size()) + 1; }",
+                    "if (size <= out_capacity) {",
+                    "  for (const auto& s : result) {",
+                    "    memcpy(out, s.data(), s.size());",
+                    "    out += s.size();",
+                    "    *out++ = '\\0';",
+                    "  }",
+                    "}",
+                    "return size;",
+                ]
+            )
+        else:
+            ctx.add_lines(
+                [
+                    "const auto count = uint32_t(result.size());",
+                    "if (count <= out_capacity) { std::copy(result.begin(), result.end(), out); }",
+                    "return count;",
+                ]
+            )
+
+    def _gen_cursor_types(self, *, ctx: GenCtx):
+        # completes the opaque C cursor types declared in the header
+        streams = [
+            (m, c) for c in self.api.classes if self._in_shard(c) for m in c.methods if m.is_stream
+        ]
+        for method_def, class_def in streams:
+            ctx.add_lines(
+                [
+                    f"struct {self.cursor_name(method_def, class_def)} : "
+                    f"bng::api::StreamCursor<{self._gen_cpp_typename(method_def.type_obj)}> {{",
+                    "  using StreamCursor::StreamCursor;",
+                    "};",
+                    "",
+                ]
+            )
+
+    def _gen_cursor_impls(self, method_def: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
+        next_decl, item_decl, destroy_decl = self._gen_cursor_decls(method_def, class_def)
+        shim_name = self.shim_name(method_def, class_def)
+        block = ctx.push_block(f"{next_decl} {{", indent=True, post_pop_lines="}\n")
+        self._gen_stats_hook(f"{shim_name}_next", [], ctx=ctx)
+        ctx.add_lines("return cursor->next();")
+        ctx.pop_block(block)
+        block = ctx.push_block(f"{item_decl} {{", indent=True, post_pop_lines="}\n")
+        self._gen_stats_hook(f"{shim_name}_item", [], ctx=ctx)
+        self._gen_stream_item_result(self.stream_item(method_def), ctx=ctx)
+        ctx.pop_block(block)
+        block = ctx.push_block(f"{destroy_decl} {{", indent=True, post_pop_lines="}\n")
+        self._gen_stats_hook(
+            f"destroy_{ensure_snake(self.cursor_name(method_def, class_def))}", [], ctx=ctx
+        )
+        ctx.add_lines("delete cursor;")
+        ctx.pop_block(block)
+
+    def _gen_stream_item_result(self, item_def: FunctionDef, *, ctx: GenCtx):
+        result_kind = self.result_kind(item_def)
+        if result_kind == "text":
+            self._gen_buffered_result(item_def, "cursor->item", result_kind=result_kind, ctx=ctx)
+        elif result_kind == "enum":
+            ctx.add_lines(f"return static_cast<::{item_def.resolved_type_obj.name}>(cursor->item);")
+        elif result_kind == "value":
+            ctx.add_lines("return cursor->item;")
+        else:
+            raise ValueError(f"{item_def} - stream item type not supported by the C binding")
+
+    def _gen_pool_impls(self, class_def: ClassDef, *, ctx: GenCtx):
+        # the source is only read while the workers are created - callers keep owning it
+        handle_type = self._handle_type(class_def)
+        source = f"reinterpret_cast<const {handle_type}>(source)"
+        source = f"**{source}" if handle_type.startswith("std::") else f"*{source}"
+        pool_def = class_def.pool_class
+        block = ctx.push_block(
+            f"{self._gen_pool_create_decl(class_def)} {{", indent=True, post_pop_lines="}\n"
+        )
+        # the handle is opaque here - only the size is counted
+        self._gen_stats_hook(f"{ensure_snake(pool_def.name)}_create", ["sizeof(size)"], ctx=ctx)
+        ctx.add_lines(
+            f"return reinterpret_cast<::{pool_def.name}*>("
+            f"new {self._cpp_name(pool_def)}({source}, size));"
+        )
+        ctx.pop_block(block)
+        self._gen_class_impls(pool_def, ctx=ctx)
 
     def _gen_class_impls(self, class_def: ClassDef, *, ctx: GenCtx):
-        pass
+        cpp_class = self._cpp_name(class_def)
+        handle_type = self._handle_type(class_def)
+        self_name = ensure_snake(class_def.name)
+        for method_def in class_def.methods:
+            if method_def.is_factory or method_def.is_static:
+                call = f"{cpp_class}::{method_def.name}"
+            else:
+                const = "const " if method_def.is_const_method else ""
+                handle = f"reinterpret_cast<{const}{handle_type}>({self_name})"
+                if handle_type.startswith("std::"):
+                    call = f"(*{handle})->{method_def.name}"
+                else:
+                    call = f"{handle}->{method_def.name}"
+            self._gen_shim_impl(method_def, call=call, class_def=class_def, ctx=ctx)
+            if method_def.is_stream:
+                self._gen_cursor_impls(method_def, class_def=class_def, ctx=ctx)
+        block = ctx.push_block(
+            f"{self._destructor_decl(class_def)} {{", indent=True, post_pop_lines="}\n"
+        )
+        self._gen_stats_hook(f"destroy_{self_name}", [], ctx=ctx)
+        ctx.add_lines(f"delete reinterpret_cast<{handle_type}>({self_name});")
+        ctx.pop_block(block)
+
+
+class CLoaderGenerator(CBindingGenerator):
+    """
+    header only loader for callers opening the C binding library at runtime instead of linking
+    it - {api}_load_api fills an {Api}ApiTable in one call, from dlopen / LoadLibrary and the
+    one {api}_get_api_table lookup. a loaded library stays loaded.
+    """
+
+    generates_header = True
+    generates_source = False
+    supports_shards = False
+
+    def __init__(self, api: ApiDef, *, gen_version: str, c_h: str):
+        super().__init__(api, gen_version=gen_version, api_h="")
+        self.c_h = c_h
+
+    @property
+    def loader_name(self) -> str:
+        return f"{self.api.name}_load_api"
+
+    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
+        ctx = hdr_ctx
+        self._pragma("once", ctx=ctx)
+        self._include([self.c_h], ctx=ctx)
+        ctx.add_lines("")
+        block = ctx.push_block("#if defined(_WIN32)", post_pop_lines="#endif")
+        self._include(["<windows.h>"], ctx=ctx)
+        ctx.add_lines("#else")
+        # glibc before 2.34 links dlopen from libdl
+        self._include(["<dlfcn.h>"], ctx=ctx)
+        ctx.pop_block(block)
+        ctx.add_lines("")
+
+        table = self.api_table_type
+        ctx.add_lines(
+            [
+                "// opens library_path and copies its table to out_table - false if the library can't",
+                "// be opened or was built from another api, it's closed again then",
+                f"static inline bool {self.loader_name}(const char* library_path, {table}* out_table) {{",
+                f"  typedef const {table}* (*GetApiTable)(uint32_t version);",
+                "  GetApiTable get_api_table = NULL;",
+                f"  const {table}* table = NULL;",
+                "#if defined(_WIN32)",
+                "  HMODULE library = LoadLibraryA(library_path);",
+                "  if (library != NULL) {",
+                f'    get_api_table = (GetApiTable)(void*)GetProcAddress(library, "{self.api_table_getter}");',
+                f"    table = get_api_table != NULL ? get_api_table({self.api_table_version_symbol}) : NULL;",
+                "    if (table == NULL) {",
+                "      FreeLibrary(library);",
+                "    }",
+                "  }",
+                "#else",
+                "  void* library = dlopen(library_path, RTLD_NOW | RTLD_LOCAL);",
+                "  if (library != NULL) {",
+                "    // POSIX guarantees a function's dlsym address converts to a function pointer",
+                f'    *(void**)(&get_api_table) = dlsym(library, "{self.api_table_getter}");',
+                f"    table = get_api_table != NULL ? get_api_table({self.api_table_version_symbol}) : NULL;",
+                "    if (table == NULL) {",
+                "      dlclose(library);",
+                "    }",
+                "  }",
+                "#endif",
+                "  if (table != NULL) {",
+                "    *out_table = *table;",
+                "  }",
+                "  return table != NULL;",
+                "}",
+            ]
+        )
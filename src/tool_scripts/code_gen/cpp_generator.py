@@ -1,5 +1,7 @@
+from pathlib import Path
 from typing import Optional
 from api_def import (
+    CACHE_LINE_SIZE,
     ApiDef,
     AliasDef,
     BaseType,
@@ -13,6 +15,7 @@ from api_def import (
     ParameterDef,
     RefType,
     StructDef,
+    StructLayout,
     TypedNamed,
 )
 from generator import Generator, GenCtx, BlockCtx
@@ -28,7 +31,9 @@ class CppGenerator(Generator):
     def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
         ctx = hdr_ctx
         self._pragma("once", ctx=ctx)
-        self._include(["array", "memory", "string", "vector", "api/api_util.h"], ctx=ctx)
+        self._include(self._std_headers(), ctx=ctx)
+        if self._uses_api_util:
+            self._include(["api/api_util.h"], ctx=ctx)
 
         ns_block = ctx.push_block(
             f"\nnamespace {self.api_ns} {{",
@@ -48,6 +53,8 @@ class CppGenerator(Generator):
 
         for enum_def in self.api.enums:
             self._gen_enum(enum_def, ctx=ctx)
+            if enum_def in self.api.error_enums:
+                self._gen_error_name(enum_def, ctx=ctx)
 
         for struct_def in self.api.structs:
             self._gen_struct(struct_def, ctx=ctx)
@@ -64,6 +71,89 @@ class CppGenerator(Generator):
         if ns_block:
             ctx.pop_block(ns_block)
 
+        if self._has_static_dispatch:
+            # last, so the implementations see the complete interface header when they
+            # include it first - consumers of this header get the complete final types
+            ctx.add_lines("")
+            self._include([c.impl_h for c in self.api.classes if c.is_static_dispatch], ctx=ctx)
+
+        pooled = [c for c in self.api.classes if c.is_pooled]
+        if pooled:
+            ns_block = ctx.push_block(
+                f"\nnamespace {self.api_ns} {{",
+                indent=True,
+                post_pop_lines=f"}} // namespace {self.api_ns}",
+            )
+            for class_def in pooled:
+                self._gen_pool(class_def, ctx=ctx)
+            ctx.pop_block(ns_block)
+
+    @property
+    def _has_static_dispatch(self) -> bool:
+        return any(class_def.is_static_dispatch for class_def in self.api.classes)
+
+    def _callables(self) -> [TypedNamed]:
+        return list(self.api.functions) + [m for c in self.api.classes for m in c.methods]
+
+    def _shard_callables(self) -> [TypedNamed]:
+        """the callables bound by the source being generated"""
+        functions = list(self.api.functions) if self._in_shard() else []
+        return functions + [m for c in self.api.classes if self._in_shard(c) for m in c.methods]
+
+    @property
+    def _uses_api_util(self) -> bool:
+        # streams, bng::api::Expected results, async variants posting to its executor, and string
+        # lists - bindings receive those packed and slice them with bng::api::StringViews
+        return any(c.is_pooled for c in self.api.classes) or any(
+            getattr(c, "is_stream", False)
+            or c.is_async
+            or c.error_enum is not None
+            or any(p.is_list and (p.is_string or p.is_string_view) for p in c.parameters)
+            for c in self._callables()
+        )
+
+    def _std_headers(self) -> [str]:
+        """exactly the standard headers the declarations need - every binding includes them"""
+        typed_defs = self.api.aliases + self.api.constants
+        typed_defs += [m for s in self.api.structs for m in s.members]
+        for class_def in self.api.classes:
+            typed_defs += class_def.constants + class_def.members + class_def.methods
+        typed_defs += self.api.functions
+        typed_defs += [p for c in self._callables() for p in c.parameters]
+
+        headers = set()
+        if self.api.enums:
+            headers.add("cstdint")
+        for typed_def in typed_defs:
+            type_obj = typed_def.resolved_type_obj
+            if type_obj.is_int or type_obj.is_bytes:
+                headers.add("cstdint")
+            if type_obj.name == "string":
+                headers.add("string")
+            elif type_obj.is_string_view:
+                headers.add("string_view")
+            elif type_obj.is_bytes:
+                headers.add("span")
+            if typed_def.is_array:
+                headers.add("array")
+            elif typed_def.is_list and not type_obj.is_string_view:
+                headers.add("vector")
+            if typed_def.ref_type in [RefType.shared, RefType.unique]:
+                headers.add("memory")
+        for callable_def in self._callables():
+            if callable_def.is_async:
+                headers.add("functional")
+                if callable_def.lock_scope is not None:
+                    headers.add("mutex")
+            if getattr(callable_def, "is_stream", False):
+                headers.add("memory")
+        if self._has_static_dispatch:
+            headers.add("type_traits")
+        if any(s.is_blittable for s in self.api.structs):
+            # offsetof for the layout checks
+            headers.add("cstddef")
+        return sorted(headers)
+
     def _comment(self, text: str) -> [str]:
         return [f"// {ln}" for ln in text.split("\n")]
 
@@ -87,6 +177,70 @@ class CppGenerator(Generator):
         ctx.add_lines("")
         return ec_block
 
+    # bindings built with BNG_BINDING_STATS time every entry point into a bng::api::CallStats
+    # table, the hooks expand to nothing otherwise
+    stats_symbol = "BNG_BINDING_STATS"
+
+    @property
+    def stats_prefix(self) -> str:
+        return self.api.name
+
+    @property
+    def stats_table(self) -> str:
+        return f"{self.stats_prefix}_call_stats"
+
+    @property
+    def stats_accessor(self) -> str:
+        return f"{self.stats_prefix}_get_binding_stats"
+
+    def _stats_entries(self) -> [str]:
+        """the timed entry points of the whole api in table order - every shard indexes alike"""
+        raise Exception(f"{self.name} does not time its entry points")
+
+    def _gen_stats_accessor_decl(self) -> str:
+        return f"uint32_t {self.stats_accessor}(BngCallStats* out, uint32_t out_capacity)"
+
+    def _gen_stats_table(self, *, ctx: GenCtx):
+        # inline - the shards of a binding share one table
+        if not self._stats_entries():
+            return
+        block = self._push_ifdef_block(self.stats_symbol, ctx=ctx)
+        ctx.add_lines(f"inline bng::api::CallStats {self.stats_table}[] = {{")
+        ctx.add_lines([f'  bng::api::CallStats("{name}"),' for name in self._stats_entries()])
+        ctx.add_lines("};")
+        ctx.pop_block(block)
+        ctx.add_lines("")
+
+    def _gen_stats_accessor(self, *, ctx: GenCtx, export: str = ""):
+        # the table goes to the caller's buffer whole or not at all, like the binding results
+        if not self._stats_entries():
+            return
+        block = self._push_ifdef_block(self.stats_symbol, ctx=ctx)
+        ctx.add_lines(
+            [
+                f"{export}{self._gen_stats_accessor_decl()} {{",
+                f"  const auto count = uint32_t(std::size({self.stats_table}));",
+                "  if (count <= out_capacity) {",
+                f"    for (uint32_t i = 0; i < count; ++i) {{ {self.stats_table}[i].copy_to(out[i]); }}",
+                "  }",
+                "  return count;",
+                "}",
+            ]
+        )
+        ctx.pop_block(block)
+        ctx.add_lines("")
+
+    def _gen_stats_hook(self, entry: str, arg_bytes: [str], *, ctx: GenCtx):
+        index = self._stats_entries().index(entry)
+        ctx.add_lines(
+            f"BNG_BINDING_CALL({self.stats_table}[{index}], {' + '.join(arg_bytes) or '0'});"
+        )
+
+    @staticmethod
+    def _gen_text_list_bytes(name: str) -> str:
+        """size of a packed string list - the UTF-8 and the offsets"""
+        return f"{name}_offsets[{name}_count] + sizeof(uint32_t) * ({name}_count + 1)"
+
     @staticmethod
     def _is_sys_header(hname: str) -> bool:
         return ("." not in hname) or hname.startswith("std")
@@ -97,6 +251,17 @@ class CppGenerator(Generator):
             return hname
         return f"<{hname}>" if CppGenerator._is_sys_header(hname) else f'"{hname}"'
 
+    def _source_includes(self) -> [str]:
+        """the headers a generated binding source starts with"""
+        raise Exception(f"{self.name} does not generate a binding source")
+
+    def generate_pch_ctx(self, pch: Path) -> GenCtx:
+        """a header for the build to precompile, with what every binding source includes"""
+        ctx = self._make_ctx(pch)
+        self._pragma("once", ctx=ctx)
+        self._include(self._source_includes(), ctx=ctx)
+        return ctx
+
     def _include(self, names, *, ctx: GenCtx):
         if isinstance(names, str):
             names = names.split("\n")
@@ -125,6 +290,10 @@ class CppGenerator(Generator):
                 return "double" if type_obj.name.endswith("64") else "float"
             if type_obj.name == "string":
                 return "std::string"
+            if type_obj.is_string_view:
+                return "std::string_view"
+            if type_obj.is_bytes:
+                return "std::span<const uint8_t>"
             raise ValueError(f"{type_obj} not handled.")
         return f"{type_obj.name}"
 
@@ -159,9 +328,7 @@ class CppGenerator(Generator):
         ctx.add_lines(f"{eval_def.name} = {eval_def.value}{sep}")
 
     def _gen_enum(self, enum_def: EnumDef, *, ctx: GenCtx, is_forward: bool = False):
-        base_type = ""
-        if not enum_def.type_obj.is_void:
-            base_type = f" : {self._gen_typename(enum_def.type_obj)}"
+        base_type = f" : {self._gen_typename(enum_def.resolved_base_type_obj)}"
         term = ";" if is_forward else " {"
         enum_block = ctx.push_block(
             f"enum class {enum_def.name}{base_type}{term}",
@@ -175,6 +342,28 @@ class CppGenerator(Generator):
                 )
         ctx.pop_block(enum_block)
 
+    def _gen_error_name(self, enum_def: EnumDef, *, ctx: GenCtx):
+        # bindings turn errors into exception messages without a lookup table per language
+        block = ctx.push_block(
+            f"constexpr const char* error_name({enum_def.name} error) {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        switch_block = ctx.push_block("switch (error) {", indent=True, post_pop_lines="}")
+        for eval_def in enum_def.members:
+            ctx.add_lines(f'case {enum_def.name}::{eval_def.name}: return "{eval_def.name}";')
+        ctx.pop_block(switch_block)
+        ctx.add_lines('return "unknown";')
+        ctx.pop_block(block)
+
+    def _gen_error_result(self, callable_def: TypedNamed, type_spec: str) -> str:
+        error_enum = callable_def.error_enum_obj
+        if error_enum is None:
+            return type_spec
+        if callable_def.is_void:
+            return error_enum.name
+        return f"bng::api::Expected<{type_spec}, {error_enum.name}>"
+
     def _gen_member(self, member_def: MemberDef, *, ctx: GenCtx, is_for_class: bool = True):
         if member_def.is_static and not is_for_class:
             raise Exception(f"{member_def} is static - not supported in POD struct.")
@@ -202,17 +391,52 @@ class CppGenerator(Generator):
         return ctx.add_lines(f"{const}{type_spec} {member_def.name};")
 
     def _gen_struct(self, struct_def: StructDef, *, ctx: GenCtx, is_forward: bool = False):
-        term = ";" if is_forward else " {"
-        struct_decl = f"struct {struct_def.name}{term}"
+        if is_forward:
+            ctx.add_lines(f"struct {struct_def.name};")
+            return
+        is_packed = struct_def.layout == StructLayout.packed
+        if is_packed:
+            self._pragma("pack(push, 1)", ctx=ctx)
+        align = ""
+        if struct_def.layout == StructLayout.cache_aligned:
+            align = f"alignas({CACHE_LINE_SIZE}) "
         struct_block = ctx.push_block(
-            struct_decl, indent=True, post_pop_lines=("};\n" if not is_forward else None)
+            f"struct {align}{struct_def.name} {{", indent=True, post_pop_lines="};"
         )
-        if not is_forward:
-            for member_def in struct_def.members:
-                self._gen_member(member_def, ctx=ctx)
+        for member_def in struct_def.layout_members:
+            self._gen_member(member_def, ctx=ctx)
         ctx.pop_block(struct_block)
+        if is_packed:
+            self._pragma("pack(pop)", ctx=ctx)
+        if struct_def.is_blittable:
+            offsets, size = struct_def.blittable_layout()
+            self._gen_static_assert(
+                [f"sizeof({struct_def.name}) == {size}"]
+                + [
+                    f"offsetof({struct_def.name}, {m.name}) == {offset}"
+                    for m, offset in zip(struct_def.layout_members, offsets)
+                ],
+                f"bindings copy {struct_def.name} whole at these offsets",
+                ctx=ctx,
+            )
+        ctx.add_lines("")
+
+    def _gen_static_assert(self, checks: [str], message: str, *, ctx: GenCtx):
+        ctx.add_lines(
+            ["static_assert("]
+            + [f"  {check} &&" for check in checks[:-1]]
+            + [f"  {checks[-1]},", f'  "{message}");']
+        )
 
     def _gen_param(self, param_def: ParameterDef) -> str:
+        return f"{self._gen_param_type(param_def)} {param_def.name}"
+
+    def _gen_param_type(self, param_def: ParameterDef) -> str:
+        if param_def.is_packed_string_list:
+            return "bng::api::StringViews"
+        if param_def.is_borrowed:
+            # views are trivially copyable - always pass by value
+            return self._gen_typename(param_def.type_obj)
         const = "const " if param_def.is_const else ""
         if (
             param_def.ref_type is None
@@ -236,7 +460,7 @@ class CppGenerator(Generator):
             and param_def.ref_type != RefType.non_optional
         ):
             type_spec = f"{type_spec}&"
-        return f"{const}{type_spec} {param_def.name}"
+        return f"{const}{type_spec}"
 
     def _gen_method(
         self,
@@ -252,6 +476,26 @@ class CppGenerator(Generator):
             raise Exception(f"{method_def}: method body generation not supported.")
         # TODO: "<API_NAME>_API" with conditional macro aliasing it to export for impl and import for consumers
         decorator = "static " if method_def.is_static else "virtual " if is_abstract else ""
+        type_spec = self._gen_method_type(method_def)
+
+        decl = f"{decorator}{type_spec} {method_def.name}"
+        params = ", ".join([self._gen_param(param_def) for param_def in method_def.parameters])
+        decorator = " const" if method_def.is_const else ""
+        if method_def.batch_source is not None:
+            self._gen_batch_default(method_def, decl=f"{decl}({params}){decorator}", ctx=ctx)
+        else:
+            abstract = " = 0" if is_abstract and not method_def.is_static else ""
+            ctx.add_lines(f"{decl}({params}){decorator}{abstract};")
+        if method_def.is_async:
+            self._gen_async_variant(
+                method_def,
+                type_spec=type_spec,
+                decorator="static " if method_def.is_static else "virtual " if is_abstract else "",
+                capture="=" if method_def.is_static else "=, this",
+                ctx=ctx,
+            )
+
+    def _gen_method_type(self, method_def: MethodDef) -> str:
         if (
             method_def.ref_type is None
             or method_def.ref_type == RefType.raw
@@ -270,12 +514,60 @@ class CppGenerator(Generator):
         ) and method_def.ref_type == RefType.non_optional:
             const = "const " if method_def.is_const else ""
             type_spec = f"{const}{type_spec}&"
-
-        decl = f"{decorator}{type_spec} {method_def.name}"
-        params = ", ".join([self._gen_param(param_def) for param_def in method_def.parameters])
-        decorator = " const" if method_def.is_const else ""
-        abstract = " = 0" if is_abstract and not method_def.is_static else ""
-        ctx.add_lines(f"{decl}({params}){decorator}{abstract};")
+        if method_def.is_stream:
+            type_spec = f"std::unique_ptr<bng::api::Stream<{type_spec}>>"
+        return self._gen_error_result(method_def, type_spec)
+
+    def _gen_batch_default(self, batch_def: MethodDef, *, decl: str, ctx: GenCtx, callee: str = ""):
+        # default loops over the single call form - engines override it to share setup
+        # or parallelize across the batch
+        items = batch_def.parameters[0].name
+        call = f"{callee}{batch_def.batch_source.name}(item)"
+        block = ctx.push_block(f"{decl} {{", indent=True, post_pop_lines="}")
+        error_enum = batch_def.error_enum_obj
+        if error_enum is not None:
+            # the batch fails with the first failing item
+            self._gen_batch_default_errors(batch_def, call=call, ctx=ctx)
+        elif batch_def.is_void:
+            ctx.add_lines(f"for (const auto& item : {items}) {{ {call}; }}")
+        else:
+            result_tn = f"std::vector<{self._gen_typename(batch_def.type_obj)}>"
+            ctx.add_lines(
+                [
+                    f"{result_tn} results;",
+                    f"results.reserve({items}.size());",
+                    f"for (const auto& item : {items}) {{ results.push_back({call}); }}",
+                    "return results;",
+                ]
+            )
+        ctx.pop_block(block)
+
+    def _gen_batch_default_errors(self, batch_def: MethodDef, *, call: str, ctx: GenCtx):
+        items = batch_def.parameters[0].name
+        error_tn = batch_def.error_enum_obj.name
+        if batch_def.is_void:
+            ctx.add_lines(
+                [
+                    f"for (const auto& item : {items}) {{",
+                    f"  if (auto error = {call}; error != {error_tn}{{}}) {{ return error; }}",
+                    "}",
+                    f"return {error_tn}{{}};",
+                ]
+            )
+        else:
+            result_tn = f"std::vector<{self._gen_typename(batch_def.type_obj)}>"
+            ctx.add_lines(
+                [
+                    f"{result_tn} results;",
+                    f"results.reserve({items}.size());",
+                    f"for (const auto& item : {items}) {{",
+                    f"  auto result = {call};",
+                    "  if (!result) { return bng::api::unexpected(result.error()); }",
+                    "  results.push_back(std::move(result).value());",
+                    "}",
+                    "return results;",
+                ]
+            )
 
     def _gen_class(
         self,
@@ -285,6 +577,9 @@ class CppGenerator(Generator):
         is_forward: bool = False,
         is_abstract: bool = False,
     ):
+        if class_def.is_static_dispatch and not is_forward:
+            self._gen_static_class(class_def, ctx=ctx)
+            return
         term = ";" if is_forward else " {"
         class_decl = f"class {class_def.name}{term}"
         class_block = ctx.push_block(class_decl, post_pop_lines="};\n" if not is_forward else None)
@@ -292,6 +587,7 @@ class CppGenerator(Generator):
         if not is_forward:
             protected_block = ctx.push_block("protected:", indent=True, post_pop_lines="")
             ctx.add_lines(f"{class_def.name}() = default;")
+            self._gen_async_lock(class_def, ctx=ctx)
             ctx.pop_block(protected_block)
 
             public_block = ctx.push_block("public:", indent=True)
@@ -302,7 +598,8 @@ class CppGenerator(Generator):
                 ctx.add_lines("")
 
             ctx.add_lines(f"virtual ~{class_def.name}() = default;")
-            for method_def in class_def.methods:
+            for method_def in self._interface_methods(class_def):
+                self._gen_concurrency_note(method_def, ctx=ctx)
                 self._gen_method(
                     method_def,
                     class_def=class_def,
@@ -317,6 +614,210 @@ class CppGenerator(Generator):
 
         ctx.pop_block(class_block)
 
+    def _gen_static_class(self, class_def: ClassDef, *, ctx: GenCtx):
+        # CRTP base of the final implementation named by impl_type. the interface name aliases
+        # the implementation, so bindings call it directly and the calls can inline.
+        base = f"{class_def.name}Base"
+        self._gen_static_class_fwd(class_def, ctx=ctx)
+        ctx.add_lines(["", "template <typename Impl>"])
+        class_block = ctx.push_block(f"class {base} {{", post_pop_lines="};\n")
+        has_public = (
+            class_def.constants
+            or class_def.members
+            or any(m.batch_source is not None or m.is_async for m in class_def.methods)
+        )
+
+        protected_block = ctx.push_block(
+            "protected:", indent=True, post_pop_lines="" if has_public else None
+        )
+        ctx.add_lines(f"{base}() = default;")
+        # instances are only destroyed as Impl - no virtual destructor. Impl is complete here,
+        # so this is where it's checked against the declared interface.
+        dtor_block = ctx.push_block(f"~{base}() {{", indent=True, post_pop_lines="}")
+        for method_def in self._interface_methods(class_def):
+            if method_def.batch_source is None:
+                self._gen_concurrency_note(method_def, ctx=ctx)
+                self._gen_static_check(method_def, ctx=ctx)
+        ctx.pop_block(dtor_block)
+        self._gen_async_lock(class_def, ctx=ctx)
+        ctx.pop_block(protected_block)
+        if not has_public:
+            ctx.pop_block(class_block)
+            return
+
+        public_block = ctx.push_block("public:", indent=True)
+        if class_def.constants:
+            for const_def in class_def.constants:
+                self._gen_const(const_def, ctx=ctx)
+            ctx.add_lines("")
+
+        for method_def in class_def.methods:
+            const = "const " if method_def.is_const else ""
+            callee = "Impl::" if method_def.is_static else f"static_cast<{const}Impl*>(this)->"
+            type_spec = self._gen_method_type(method_def)
+            if method_def.batch_source is not None:
+                params = ", ".join([self._gen_param(p) for p in method_def.parameters])
+                decorator = " const" if method_def.is_const else ""
+                decl = f"{type_spec} {method_def.name}({params}){decorator}"
+                self._gen_batch_default(method_def, decl=decl, ctx=ctx, callee=callee)
+            if method_def.is_async:
+                self._gen_async_variant(
+                    method_def,
+                    type_spec=type_spec,
+                    decorator="static " if method_def.is_static else "",
+                    capture="=" if method_def.is_static else "=, this",
+                    ctx=ctx,
+                    callee=callee,
+                )
+
+        for member_def in class_def.members:
+            self._gen_member(member_def, ctx=ctx)
+        ctx.pop_block(public_block)
+        ctx.pop_block(class_block)
+
+    @staticmethod
+    def _interface_methods(class_def: ClassDef) -> [MethodDef]:
+        """the methods the implementation provides - the declared ones and share() for pools"""
+        share = [class_def.share_method] if class_def.share_method is not None else []
+        return class_def.methods + share
+
+    def _gen_concurrency_note(self, method_def: MethodDef, *, ctx: GenCtx):
+        # the platform wrappers skip their locks on the implementation's word
+        if method_def.is_thread_safe:
+            ctx.add_lines("// thread safe - must allow concurrent calls on one instance")
+        elif method_def.is_reentrant:
+            ctx.add_lines("// reentrant - must allow concurrent calls on different instances")
+
+    def _gen_pool(self, class_def: ClassDef, *, ctx: GenCtx):
+        # a template so the calls compile where Impl is complete - implementations include this
+        # header before they are declared
+        pool_def = class_def.pool_class
+        base = f"Basic{pool_def.name}"
+        ctx.add_lines(
+            [
+                f"// {class_def.name} workers for calls from any number of threads. the workers are",
+                "// created with share() from a set up instance and read its state, each call checks",
+                "// out a free worker and waits while all are busy. batches are split over the",
+                "// workers and run in parallel.",
+                "template <typename Impl>",
+            ]
+        )
+        class_block = ctx.push_block(f"class {base} {{", post_pop_lines="};")
+        public_block = ctx.push_block("public:", indent=True)
+        ctx.add_lines(
+            [
+                "// size 0 makes one worker per hardware thread",
+                f"{base}(const Impl& source, uint32_t size)",
+                "    : pool_(size, [&source]() { return source.share(); }) {}",
+                "",
+                "uint32_t size() const {",
+                "  return pool_.size();",
+                "}",
+            ]
+        )
+        for method_def in pool_def.methods:
+            params = ", ".join([self._gen_param(p) for p in method_def.parameters])
+            args = ", ".join([p.name for p in method_def.parameters])
+            decl = f"{self._gen_method_type(method_def)} {method_def.name}({params})"
+            ctx.add_lines("")
+            if method_def.batch_source is not None:
+                self._gen_pool_batch(method_def, decl=decl, ctx=ctx)
+                continue
+            ctx.add_lines(
+                [
+                    f"{decl} {{",
+                    f"  return pool_.checkout()->{method_def.name}({args});",
+                    "}",
+                ]
+            )
+        ctx.pop_block(public_block)
+        private_block = ctx.push_block("\nprivate:", indent=True)
+        ctx.add_lines("bng::api::InstancePool<Impl> pool_;")
+        ctx.pop_block(private_block)
+        ctx.pop_block(class_block)
+        self._gen_pool_fwd(class_def, ctx=ctx)
+        ctx.add_lines("")
+
+    def _gen_pool_batch(self, batch_def: MethodDef, *, decl: str, ctx: GenCtx):
+        # split over the workers instead of running the whole batch on one - each item is a
+        # single call, and the batch fails with the lowest failing item like the serial form
+        items = batch_def.parameters[0].name
+        call = f"worker.{batch_def.batch_source.name}({items}[i])"
+        error_enum = batch_def.error_enum_obj
+        block = ctx.push_block(f"{decl} {{", indent=True, post_pop_lines="}")
+        if error_enum is not None:
+            ctx.add_lines(f"std::vector<{error_enum.name}> errors({items}.size());")
+        if not batch_def.is_void:
+            result_tn = f"std::vector<{self._gen_typename(batch_def.type_obj)}>"
+            ctx.add_lines(f"{result_tn} results({items}.size());")
+        failed = "const auto failed = " if error_enum is not None else ""
+        ctx.add_lines(f"{failed}pool_.run_sliced({items}.size(), [&](Impl& worker, size_t i) {{")
+        if error_enum is None:
+            ctx.add_lines(f"  {call};" if batch_def.is_void else f"  results[i] = {call};")
+        elif batch_def.is_void:
+            ctx.add_lines(
+                [
+                    f"  errors[i] = {call};",
+                    f"  return errors[i] == {error_enum.name}{{}};",
+                ]
+            )
+        else:
+            ctx.add_lines(
+                [
+                    f"  auto result = {call};",
+                    "  if (!result) {",
+                    "    errors[i] = result.error();",
+                    "    return false;",
+                    "  }",
+                    "  results[i] = std::move(result).value();",
+                ]
+            )
+        if error_enum is None or not batch_def.is_void:
+            ctx.add_lines("  return true;")
+        ctx.add_lines("});")
+        if error_enum is None:
+            if not batch_def.is_void:
+                ctx.add_lines("return results;")
+        elif batch_def.is_void:
+            ctx.add_lines(
+                f"return failed < {items}.size() ? errors[failed] : {error_enum.name}{{}};"
+            )
+        else:
+            ctx.add_lines(
+                [
+                    f"if (failed < {items}.size()) {{",
+                    "  return bng::api::unexpected(errors[failed]);",
+                    "}",
+                    "return results;",
+                ]
+            )
+        ctx.pop_block(block)
+
+    def _gen_pool_fwd(self, class_def: ClassDef, *, ctx: GenCtx):
+        pool_name = class_def.pool_class.name
+        ctx.add_lines(f"using {pool_name} = Basic{pool_name}<{class_def.name}>;")
+
+    def _gen_static_class_fwd(self, class_def: ClassDef, *, ctx: GenCtx):
+        ctx.add_lines(
+            [
+                f"class {class_def.impl_type};",
+                f"using {class_def.name} = {class_def.impl_type};",
+            ]
+        )
+
+    def _gen_static_check(self, method_def: MethodDef, *, ctx: GenCtx):
+        params = ", ".join([self._gen_param_type(p) for p in method_def.parameters])
+        type_spec = self._gen_method_type(method_def)
+        if method_def.is_static:
+            signature = f"{type_spec} (*)({params})"
+        else:
+            const = " const" if method_def.is_const else ""
+            signature = f"{type_spec} (Impl::*)({params}){const}"
+        ctx.add_lines(
+            f"static_assert(std::is_same_v<decltype(&Impl::{method_def.name}), {signature}>, "
+            f'"{method_def.name}() differs from the interface");'
+        )
+
     def _gen_function(self, func_def: FunctionDef, *, ctx: GenCtx, is_forward: bool = False):
         if not is_forward:
             raise Exception(f"{func_def}: function body generation not supported.")
@@ -336,7 +837,125 @@ class CppGenerator(Generator):
         if (func_def.is_array or func_def.is_list) and func_def.ref_type == RefType.non_optional:
             const = "const " if func_def.is_const else ""
             type_spec = f"{const}{type_spec}&"
+        type_spec = self._gen_error_result(func_def, type_spec)
 
         decl = f"{type_spec} {func_def.name}"
         params = ", ".join([self._gen_param(param_def) for param_def in func_def.parameters])
         ctx.add_lines(f"{decl}({params});")
+
+    @staticmethod
+    def _has_async_lock(class_def: ClassDef) -> bool:
+        return any(m.is_async and m.lock_scope is not None for m in class_def.methods)
+
+    def _gen_async_lock(self, class_def: ClassDef, *, ctx: GenCtx):
+        if not self._has_async_lock(class_def):
+            return
+        ctx.add_lines(
+            [
+                "",
+                "// serializes the default *_async calls of the methods that aren't thread safe,",
+                "// across the class - the interface holds no per instance state to lock",
+                "static std::mutex& async_call_lock() {",
+                "  static std::mutex lock;",
+                "  return lock;",
+                "}",
+            ]
+        )
+
+    def _gen_async_variant(
+        self,
+        method_def: MethodDef,
+        *,
+        type_spec: str,
+        decorator: str,
+        capture: str,
+        ctx: GenCtx,
+        callee: str = "",
+    ):
+        # runs on the shared bounded executor instead of a thread per call. arguments are
+        # captured by value, the instance only by pointer. mutable so the copies bind to the
+        # sync method's non-const reference params.
+        has_result = not method_def.is_void or method_def.error_enum is not None
+        result_type = type_spec if has_result else ""
+        callback = f"std::function<void({result_type})> on_complete"
+        params = ", ".join(
+            [self._gen_param(param_def) for param_def in method_def.parameters] + [callback]
+        )
+        args = ", ".join([param_def.name for param_def in method_def.parameters])
+        call = f"{callee}{method_def.name}({args})"
+        lifetime = (
+            "" if method_def.is_static else " the instance must stay alive until on_complete runs."
+        )
+        ctx.add_lines(
+            [
+                f"// runs {method_def.name}() on bng::api::AsyncExecutor::shared() and on_complete "
+                "after it,",
+                f"// on that thread.{lifetime}",
+            ]
+        )
+        block = ctx.push_block(
+            f"{decorator}void {method_def.async_name}({params}) {{",
+            indent=True,
+            post_pop_lines="}",
+        )
+        post = f"bng::api::AsyncExecutor::shared().post([{capture}]() mutable {{"
+        if method_def.lock_scope is None:
+            body = f"on_complete({call});" if has_result else f"{call}; on_complete();"
+            ctx.add_lines(f"{post} {body} }});")
+        elif has_result:
+            ctx.add_lines(
+                [
+                    post,
+                    "  auto result = [&]() {",
+                    "    std::lock_guard lock(async_call_lock());",
+                    f"    return {call};",
+                    "  }();",
+                    "  on_complete(std::move(result));",
+                    "});",
+                ]
+            )
+        else:
+            ctx.add_lines(
+                [
+                    post,
+                    "  {",
+                    "    std::lock_guard lock(async_call_lock());",
+                    f"    {call};",
+                    "  }",
+                    "  on_complete();",
+                    "});",
+                ]
+            )
+        ctx.pop_block(block)
+
+
+class CppFwdGenerator(CppGenerator):
+    """
+    forward declarations of the interface types, for headers that only pass them around
+    by pointer or reference and shouldn't pay for the full interface header
+    """
+
+    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
+        ctx = hdr_ctx
+        self._pragma("once", ctx=ctx)
+        if self.api.enums:
+            self._include(["cstdint"], ctx=ctx)
+
+        ns_block = ctx.push_block(
+            f"\nnamespace {self.api_ns} {{",
+            indent=True,
+            post_pop_lines=f"}} // namespace {self.api_ns}",
+        )
+        for enum_def in self.api.enums:
+            self._gen_enum(enum_def, ctx=ctx, is_forward=True)
+        for struct_def in self.api.structs:
+            self._gen_struct(struct_def, ctx=ctx, is_forward=True)
+        for class_def in self.api.classes:
+            if class_def.is_static_dispatch:
+                self._gen_static_class_fwd(class_def, ctx=ctx)
+            else:
+                self._gen_class(class_def, ctx=ctx, is_forward=True)
+            if class_def.is_pooled:
+                ctx.add_lines(f"template <typename Impl> class Basic{class_def.pool_class.name};")
+                self._gen_pool_fwd(class_def, ctx=ctx)
+        ctx.pop_block(ns_block)
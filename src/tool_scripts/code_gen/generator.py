@@ -2,7 +2,7 @@ import os
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Any, Tuple
-from api_def import ApiDef
+from api_def import ApiDef, ClassDef, ensure_snake
 
 
 class BlockCtx:
@@ -31,6 +31,8 @@ class GenCtx:
         self._block_ctx_stack: [BlockCtx] = []
         self._lines = []
         self.out_path = out_path
+        # leading generated-by comment, it changes on every run
+        self.banner_line_count = 0
 
     @property
     def indentation(self) -> str:
@@ -118,10 +120,14 @@ class GenCtx:
 class Generator:
     generates_header = False
     generates_source = False
+    # the source can be split into a translation unit per class plus one for the rest
+    supports_shards = False
 
     def __init__(self, api: ApiDef, *, gen_version: str):
         self.api = api
         self.gen_version = gen_version
+        self._sharding = False
+        self._shard: Optional[ClassDef] = None
 
     @property
     def name(self):
@@ -152,21 +158,87 @@ class Generator:
         if self.generates_source and not src:
             raise Exception(f"{self.name} generates a source file but src path was not specified")
 
-        def make_ctx(out_path: Optional[Path]) -> Optional[GenCtx]:
-            ctx = GenCtx(out_path) if out_path else None
-            if ctx:
-                self._add_comment(
-                    f"\n{ctx.out_path.name} v{self.api.version} generated by {self.gen_version} {datetime.now()}\n",
-                    ctx=ctx,
-                )
-            return ctx
-
-        hdr_ctx, src_ctx = make_ctx(hdr), make_ctx(src)
+        hdr_ctx, src_ctx = self._make_ctx(hdr), self._make_ctx(src)
         self._generate(hdr_ctx=hdr_ctx, src_ctx=src_ctx)
         return hdr_ctx, src_ctx
 
-    def generate_files(self, *, hdr: Optional[Path] = None, src: Optional[Path] = None):
+    def _make_ctx(self, out_path: Optional[Path]) -> Optional[GenCtx]:
+        ctx = GenCtx(out_path) if out_path else None
+        if ctx:
+            self._add_comment(
+                f"\n{ctx.out_path.name} v{self.api.version} generated by {self.gen_version} {datetime.now()}\n",
+                ctx=ctx,
+            )
+            ctx.banner_line_count = ctx.line_count
+        return ctx
+
+    def generate_pch_ctx(self, pch: Path) -> GenCtx:
+        raise Exception(f"{self.name} does not generate a precompiled header")
+
+    def generate_files(
+        self,
+        *,
+        hdr: Optional[Path] = None,
+        src: Optional[Path] = None,
+        shard: bool = False,
+        pch: Optional[Path] = None,
+    ):
+        if pch:
+            # rewriting an unchanged pch would rebuild it along with every source using it
+            self._write(self.generate_pch_ctx(pch), only_if_changed=True)
+        if shard:
+            self._generate_shards(hdr=hdr, src=src)
+            return
         for ctx in self.generate_ctx(hdr=hdr, src=src):
             if ctx:
-                os.makedirs(ctx.out_path.parent.as_posix(), exist_ok=True)
-                ctx.out_path.write_text(ctx.get_gen_text(), encoding="utf-8", newline="\n")
+                self._write(ctx)
+
+    @staticmethod
+    def _write(ctx: GenCtx, *, only_if_changed: bool = False):
+        text = ctx.get_gen_text()
+        if only_if_changed and ctx.out_path.exists():
+            # untouched files keep their timestamps, so the build skips recompiling them
+            old_lines = ctx.out_path.read_text(encoding="utf-8").split("\n")
+            if old_lines[ctx.banner_line_count :] == text.split("\n")[ctx.banner_line_count :]:
+                return
+        os.makedirs(ctx.out_path.parent.as_posix(), exist_ok=True)
+        ctx.out_path.write_text(text, encoding="utf-8", newline="\n")
+
+    @staticmethod
+    def shard_manifest(src: Path) -> Path:
+        """lists the generated shards, one path per line"""
+        return src.with_name(f"{src.stem}_shards.txt")
+
+    def shard_path(self, src: Path, class_def: Optional[ClassDef]) -> Path:
+        if class_def is None:
+            return src
+        return src.with_stem(f"{src.stem}_{ensure_snake(class_def.name)}")
+
+    def _in_shard(self, class_def: Optional[ClassDef] = None) -> bool:
+        """
+        whether the source for class_def, or for everything outside of classes when None,
+        goes to the translation unit being generated
+        """
+        return not self._sharding or self._shard is class_def
+
+    def _generate_shards(self, *, hdr: Optional[Path], src: Path):
+        if not self.supports_shards:
+            raise Exception(f"{self.name} does not support sharded sources")
+        shard_paths = []
+        self._sharding = True
+        try:
+            for class_def in [None] + self.api.classes:
+                self._shard = class_def
+                shard_path = self.shard_path(src, class_def)
+                hdr_ctx, src_ctx = self.generate_ctx(hdr=hdr, src=shard_path)
+                # the header doesn't depend on the shard
+                if hdr_ctx and class_def is None:
+                    self._write(hdr_ctx, only_if_changed=True)
+                self._write(src_ctx, only_if_changed=True)
+                shard_paths.append(shard_path)
+        finally:
+            self._sharding = False
+            self._shard = None
+        self.shard_manifest(src).write_text(
+            "".join(f"{p.resolve().as_posix()}\n" for p in shard_paths), encoding="utf-8"
+        )
@@ -17,16 +17,34 @@ from api_def import (
 )
 from generator import Generator, GenCtx, BlockCtx
 from cpp_generator import CppGenerator
+from c_generator import CBindingGenerator
+
+
+def lock_scope(method_def: MethodDef, class_def: ClassDef) -> Optional[str]:
+    # pools check out a worker per call - their calls are never locked
+    return method_def.lock_scope if class_def.pool_source is None else None
+
+
+def native_name(method_def: MethodDef, class_def: ClassDef) -> str:
+    """name of the external fun - class locked calls go through a wrapper"""
+    if method_def.is_stream:
+        return f"{method_def.name}_open"
+    if lock_scope(method_def, class_def) == "class":
+        return f"{method_def.name}_unlocked"
+    return method_def.name
 
 
 class JniBindingGenerator(CppGenerator):
     generates_header = False
     generates_source = True
+    supports_shards = True
 
     def __init__(self, api: ApiDef, *, gen_version: str, api_h: str, api_pkg: str):
         super().__init__(api, gen_version=gen_version)
         self.api_h = api_h
         self.api_pkg = api_pkg
+        # instances cross as the C binding's handles
+        self._c_binding = CBindingGenerator(api, gen_version=gen_version, api_h=api_h)
 
     def _gen_jni_typename(self, type_obj: BaseType) -> str:
         type_obj = type_obj.resolved_type_obj
@@ -39,28 +57,109 @@ class JniBindingGenerator(CppGenerator):
                 return "void"
             if type_obj.is_string:
                 return "jstring"
+            if type_obj.is_borrowed:
+                # direct java.nio.ByteBuffer - native address is read without a copy
+                return "jobject"
         return ""
 
+    def _gen_jni_typed_typename(self, typed: TypedNamed) -> str:
+        if typed.is_list:
+            # kotlin List<T> crosses as a java.util.List reference
+            return "jobject"
+        return self._gen_jni_typename(typed.type_obj)
+
     def _gen_jni_param(self, param_def: ParameterDef):
-        return f"{self._gen_jni_typename(param_def.type_obj)} {param_def.name}"
+        return f"{self._gen_jni_typed_typename(param_def)} {param_def.name}"
 
     def _gen_jni_method(self, method_def: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
-        tn = self._gen_jni_typename(method_def.type_obj)
+        # streams open a native cursor the kotlin stream class pulls from
+        tn = "jlong" if method_def.is_stream else self._gen_jni_typed_typename(method_def)
+        name = native_name(method_def, class_def)
         params = ["JNIEnv *env", "jobject thiz"]
         params.extend([self._gen_jni_param(p) for p in method_def.parameters])
         params = ", ".join(params)
         block = ctx.push_block(
-            f"{tn} BNG_JNI_METHOD({class_def.name}_{method_def.name})({params}) {{",
+            f"{tn} BNG_JNI_METHOD({class_def.name}_{name})({params}) {{",
             post_pop_lines="}",
             indent=True,
         )
+        # buffers are checked before the hook - a rejected call isn't counted
+        for param_def in method_def.parameters:
+            if param_def.is_borrowed:
+                self._gen_jni_borrowed_param(param_def, is_void=tn == "void", ctx=ctx)
+        self._gen_stats_hook(
+            f"{class_def.name}_{name}",
+            [self._gen_jni_arg_bytes(p) for p in method_def.parameters],
+            ctx=ctx,
+        )
+        for param_def in method_def.parameters:
+            if param_def.is_string and not param_def.is_list and not param_def.is_borrowed:
+                self._gen_jni_string_param(param_def, ctx=ctx)
         ctx.pop_block(block)
 
+    @staticmethod
+    def _gen_jni_arg_bytes(param_def: ParameterDef) -> str:
+        # list contents would take a JNI call per item to size - only their reference counts
+        name = param_def.name
+        if param_def.is_borrowed:
+            return f"{name}_size"
+        if param_def.is_string and not param_def.is_list:
+            return f"env->GetStringUTFLength({name})"
+        return f"sizeof({name})"
+
+    def _gen_jni_borrowed_param(self, param_def: ParameterDef, *, is_void: bool, ctx: GenCtx):
+        # a heap ByteBuffer has no address (NULL) and no capacity (-1) - only direct ones cross
+        name = param_def.name
+        data_type = "char" if param_def.is_string_view else "uint8_t"
+        ctx.add_lines(
+            [
+                f"auto {name}_data = (const {data_type}*)env->GetDirectBufferAddress({name});",
+                f"auto {name}_capacity = env->GetDirectBufferCapacity({name});",
+                f"if ({name}_data == nullptr || {name}_capacity < 0) {{",
+                '  env->ThrowNew(env->FindClass("java/lang/IllegalArgumentException"), '
+                f'"{name} must be a direct ByteBuffer");',
+                f"  return{'' if is_void else ' {}'};",
+                "}",
+                f"auto {name}_size = size_t({name}_capacity);",
+                f"{self._gen_typename(param_def.type_obj)} {name}_view({name}_data, {name}_size);",
+            ]
+        )
+
+    def _gen_jni_string_param(self, param_def: ParameterDef, *, ctx: GenCtx):
+        # short strings are read into a stack buffer and land in std::string's inline storage
+        name = param_def.name
+        ctx.add_lines(
+            [
+                f"JStringUTF {name}_utf(env, {name});",
+                f"{self._gen_typename(param_def.type_obj)} {name}_str = {name}_utf.str();",
+            ]
+        )
+
+    def _source_includes(self) -> [str]:
+        return [self.api_h, "api/api_util.h", "jni_util.h"]
+
+    @property
+    def stats_prefix(self) -> str:
+        # apart from the C binding's - both can end up in one library
+        return f"{self.api.name}_jni"
+
+    def _stats_entries(self) -> [str]:
+        names = []
+        for class_def in self.api.classes:
+            for binding_def in [class_def] + (
+                [class_def.pool_class] if class_def.is_pooled else []
+            ):
+                names += [
+                    f"{binding_def.name}_{native_name(m, binding_def)}" for m in binding_def.methods
+                ]
+            if class_def.is_pooled:
+                pool_name = class_def.pool_class.name
+                names += [f"{pool_name}_createNative", f"{pool_name}_destroy"]
+        return names
+
     def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
         ctx = src_ctx
-        self._include(
-            [self.api_h, "platform/mobile/mobile.h", "jni_util.h", "core/core.h"], ctx=ctx
-        )
+        self._include(self._source_includes(), ctx=ctx)
         ctx.add_lines(
             [
                 "",
@@ -69,14 +168,107 @@ class JniBindingGenerator(CppGenerator):
             ]
         )
 
+        self._gen_error_helpers(ctx=ctx)
+        ctx.add_lines("")
+        self._gen_stats_table(ctx=ctx)
         ec_block = self._push_extern_c_block(ctx)
         for class_def in self.api.classes:
-            self._gen_class_binding(class_def, ctx=ctx)
+            if self._in_shard(class_def):
+                self._gen_class_binding(class_def, ctx=ctx)
+                if class_def.is_pooled:
+                    self._gen_class_binding(class_def.pool_class, ctx=ctx)
+        if self._in_shard():
+            self._gen_stats_accessor(ctx=ctx, export="JNIEXPORT ")
         ctx.pop_block(ec_block)
 
+    def _gen_error_helpers(self, *, ctx: GenCtx):
+        if not self.api.error_enums:
+            return
+        ctx.add_lines("")
+        ns_block = ctx.push_block("namespace {", indent=True, post_pop_lines="} // namespace")
+        for enum_def in self.api.error_enums:
+            exception = f"{self.api_pkg.replace('.', '/')}/{enum_def.name}Exception"
+            ctx.add_lines(
+                [
+                    f"// raises {enum_def.name}Exception - the binding returns right after",
+                    f"[[maybe_unused]] void throw_error(JNIEnv *env, {self.api_ns}::{enum_def.name} error) {{",
+                    f'  env->ThrowNew(env->FindClass("{exception}"), error_name(error));',
+                    "}",
+                ]
+            )
+        ctx.pop_block(ns_block)
+
     def _gen_class_binding(self, class_def: ClassDef, ctx: GenCtx):
         for method_def in class_def.methods:
             self._gen_jni_method(method_def, class_def=class_def, ctx=ctx)
+            if method_def.is_stream:
+                self._gen_jni_stream(method_def, class_def=class_def, ctx=ctx)
+        if class_def.pool_source is not None:
+            self._gen_jni_pool_lifetime(class_def, ctx=ctx)
+
+    def _gen_jni_pool_lifetime(self, pool_def: ClassDef, *, ctx: GenCtx):
+        # the source is only read while the workers are created - the caller keeps owning it
+        handle_type = self._c_binding._handle_type(pool_def.pool_source)
+        source = f"reinterpret_cast<const {handle_type}>(source)"
+        source = f"**{source}" if handle_type.startswith("std::") else f"*{source}"
+        pool_type = f"{self.api_ns}::{pool_def.name}"
+        block = ctx.push_block(
+            f"jlong BNG_JNI_METHOD({pool_def.name}_createNative)"
+            "(JNIEnv *env, jclass clazz, jlong source, jint size) {",
+            post_pop_lines="}",
+            indent=True,
+        )
+        self._gen_stats_hook(
+            f"{pool_def.name}_createNative", ["sizeof(source)", "sizeof(size)"], ctx=ctx
+        )
+        ctx.add_lines(
+            [
+                "if (source == 0) {",
+                '  env->ThrowNew(env->FindClass("java/lang/IllegalArgumentException"), '
+                '"source has no native instance");',
+                "  return 0;",
+                "}",
+                f"return jlong(new {pool_type}({source}, uint32_t(size)));",
+            ]
+        )
+        ctx.pop_block(block)
+        block = ctx.push_block(
+            f"void BNG_JNI_METHOD({pool_def.name}_destroy)"
+            "(JNIEnv *env, jobject thiz, jlong handle) {",
+            post_pop_lines="}",
+            indent=True,
+        )
+        self._gen_stats_hook(f"{pool_def.name}_destroy", [], ctx=ctx)
+        ctx.add_lines(f"delete reinterpret_cast<{pool_type}*>(handle);")
+        ctx.pop_block(block)
+
+    def _gen_jni_stream(self, method_def: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
+        item_type = method_def.resolved_type_obj
+        if not (item_type.is_string or (item_type.is_primitive and item_type.is_number)):
+            raise ValueError(f"{method_def} - stream item type not supported by the JNI binding")
+        stream = f"{class_def.name}{method_def.stream_name}"
+        cursor = (
+            f"reinterpret_cast<bng::api::StreamCursor<{self._gen_typename(item_type)}>*>(cursor)"
+        )
+        item = (
+            f"env->NewStringUTF({cursor}->item.c_str())"
+            if item_type.is_string
+            else f"{cursor}->item"
+        )
+        params = "JNIEnv *env, jobject thiz, jlong cursor"
+        ctx.add_lines(
+            [
+                f"jboolean BNG_JNI_METHOD({stream}_next)({params}) {{",
+                f"  return {cursor}->next();",
+                "}",
+                f"{self._gen_jni_typename(item_type)} BNG_JNI_METHOD({stream}_item)({params}) {{",
+                f"  return {item};",
+                "}",
+                f"void BNG_JNI_METHOD({stream}_destroy)({params}) {{",
+                f"  delete {cursor};",
+                "}",
+            ]
+        )
 
 
 class KtGenerator(Generator):
@@ -91,6 +283,16 @@ class KtGenerator(Generator):
     def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
         ctx = src_ctx
         # ctx.add_lines("import com.google.android.foo")
+        has_async = any(m.is_async for c in self.api.classes for m in c.methods)
+        if has_async:
+            ctx.add_lines(
+                [
+                    "import java.util.concurrent.Executors",
+                    "import kotlinx.coroutines.asCoroutineDispatcher",
+                    "import kotlinx.coroutines.withContext",
+                    "",
+                ]
+            )
 
         # if self.api.aliases:
         #     for alias_def in self.api.aliases:
@@ -108,8 +310,31 @@ class KtGenerator(Generator):
         for struct_def in self.api.structs:
             self._gen_struct(struct_def, ctx=ctx)
 
+        if has_async:
+            ctx.add_lines(
+                [
+                    "// blocking native calls behind suspend wrappers run here, off the caller's thread",
+                    "private val nativeDispatcher = Executors.newFixedThreadPool(",
+                    "  Runtime.getRuntime().availableProcessors()",
+                    ").asCoroutineDispatcher()",
+                    "",
+                ]
+            )
+
+        for enum_def in self.api.error_enums:
+            # thrown by error_enum methods, the message is the failing enum value's name
+            ctx.add_lines(
+                [f"class {enum_def.name}Exception(message: String) : RuntimeException(message)", ""]
+            )
+
         for class_def in self.api.classes:
             self._gen_class(class_def, ctx=ctx)
+            for method_def in class_def.methods:
+                if method_def.is_stream:
+                    self._gen_stream(method_def, class_def=class_def, ctx=ctx)
+            if class_def.is_pooled:
+                # thread safe - every call goes to a free worker
+                self._gen_class(class_def.pool_class, ctx=ctx)
 
         # for function_def in self.api.functions:
         #     self._gen_function(function_def, ctx=ctx)
@@ -134,15 +359,132 @@ class KtGenerator(Generator):
         ctx.add_lines(["@JvmField", f"var {member_def.name}: {self._gen_type(member_def)}"])
 
     def _gen_class(self, class_def: ClassDef, *, ctx: GenCtx):
-        c_block = ctx.push_block(f"class {class_def.name} {{", post_pop_lines="}", indent=True)
+        source_def = class_def.pool_source
+        head = f"class {class_def.name}"
+        if source_def is not None:
+            head += " private constructor(private var handle: Long) : AutoCloseable"
+        c_block = ctx.push_block(f"{head} {{", post_pop_lines="}", indent=True)
+        if any(lock_scope(m, class_def) == "class" for m in class_def.methods):
+            ctx.add_lines(
+                [
+                    "companion object {",
+                    "  // serializes the calls that aren't reentrant across every instance",
+                    "  private val classLock = Any()",
+                    "}",
+                ]
+            )
+        if class_def.is_pooled:
+            ctx.add_lines(
+                [
+                    "// the native instance - pools created from this one share its set up state",
+                    "@JvmField internal var handle: Long = 0L",
+                ]
+            )
+        if source_def is not None:
+            self._gen_pool_lifetime(class_def, ctx=ctx)
         for method_def in class_def.methods:
             self._gen_method(method_def, class_def=class_def, ctx=ctx)
         ctx.pop_block(c_block)
 
+    def _gen_pool_lifetime(self, pool_def: ClassDef, *, ctx: GenCtx):
+        source_name = pool_def.pool_source.name
+        ctx.add_lines(
+            [
+                "companion object {",
+                "  // workers share the set up source's state, size 0 is one per hardware thread",
+                "  @JvmStatic",
+                f"  fun create(source: {source_name}, size: Int = 0): {pool_def.name} =",
+                f"    {pool_def.name}(createNative(source.handle, size))",
+                "",
+                "  @JvmStatic",
+                "  private external fun createNative(source: Long, size: Int): Long",
+                "}",
+                "",
+                "// stops the workers - the source stays usable",
+                "override fun close() {",
+                "  if (handle != 0L) {",
+                "    destroy(handle)",
+                "    handle = 0L",
+                "  }",
+                "}",
+                "",
+                "private external fun destroy(handle: Long)",
+            ]
+        )
+
     def _gen_method(self, method_def: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
-        _ = class_def
         params = ", ".join([self._gen_param(p) for p in method_def.parameters])
-        ctx.add_lines(f"external fun {method_def.name}({params}): {self._gen_type(method_def)}")
+        args = ", ".join([p.name for p in method_def.parameters])
+        scope = lock_scope(method_def, class_def)
+        if method_def.is_thread_safe or class_def.pool_source is not None:
+            ctx.add_lines("/** @ThreadSafe - may be called concurrently, also on one instance */")
+        elif scope == "instance":
+            ctx.add_lines("/** reentrant - calls on one instance are serialized */")
+        elif scope == "class":
+            ctx.add_lines("/** not reentrant - calls on every instance are serialized */")
+        if method_def.error_enum is not None:
+            ctx.add_lines(f"@Throws({method_def.error_enum_obj.name}Exception::class)")
+        if scope == "instance":
+            ctx.add_lines("@Synchronized")
+        native = native_name(method_def, class_def)
+        if method_def.is_stream or scope == "class":
+            result = self._gen_type(method_def)
+            call = f"{native}({args})"
+            native_result = result
+            if method_def.is_stream:
+                result = f"{class_def.name}{method_def.stream_name}"
+                call = f"{result}({call})"
+                native_result = "Long"
+            if scope == "class":
+                call = f"synchronized(classLock) {{ {call} }}"
+            ctx.add_lines(
+                [
+                    f"fun {method_def.name}({params}): {result} = {call}",
+                    f"private external fun {native}({params}): {native_result}",
+                ]
+            )
+        else:
+            ctx.add_lines(f"external fun {method_def.name}({params}): {self._gen_type(method_def)}")
+        if method_def.is_async and not method_def.is_stream:
+            ctx.add_lines(
+                f"suspend fun {method_def.async_name}({params}): {self._gen_type(method_def)} = "
+                f"withContext(nativeDispatcher) {{ {method_def.name}({args}) }}"
+            )
+
+    def _gen_stream(self, method_def: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
+        stream = f"{class_def.name}{method_def.stream_name}"
+        item = self._gen_base_type(method_def.type_obj)
+        s_block = ctx.push_block(
+            f"class {stream} internal constructor(private var cursor: Long) : "
+            f"Sequence<{item}>, AutoCloseable {{",
+            post_pop_lines="}",
+            indent=True,
+        )
+        ctx.add_lines(
+            [
+                "// single pass - items are pulled from the native cursor as the sequence is consumed",
+                f"override fun iterator(): Iterator<{item}> = kotlin.sequences.iterator {{",
+                "  try {",
+                "    while (cursor != 0L && next(cursor)) yield(item(cursor))",
+                "  } finally {",
+                "    close()",
+                "  }",
+                "}",
+                "",
+                "// releases the native cursor - needed when iteration stops early",
+                "override fun close() {",
+                "  if (cursor != 0L) {",
+                "    destroy(cursor)",
+                "    cursor = 0L",
+                "  }",
+                "}",
+                "",
+                "private external fun next(cursor: Long): Boolean",
+                f"private external fun item(cursor: Long): {item}",
+                "private external fun destroy(cursor: Long)",
+            ]
+        )
+        ctx.pop_block(s_block)
 
     def _gen_param(self, param_def: ParameterDef) -> str:
         return f"{param_def.name}: {self._gen_type(param_def)}"
@@ -160,6 +502,8 @@ class KtGenerator(Generator):
             return "Unit"
         if type_obj.is_string:
             return "String"
+        if type_obj.is_borrowed:
+            return "java.nio.ByteBuffer"
         if type_obj.is_int or type_obj.is_float:
             return type_obj.name
         return type_obj.name
@@ -0,0 +1,539 @@
+from typing import Optional
+from api_def import (
+    ApiDef,
+    BaseType,
+    ClassDef,
+    MethodDef,
+    ParameterDef,
+    RefType,
+    StructDef,
+    TypedNamed,
+    ensure_camel,
+)
+from generator import GenCtx
+from cpp_generator import CppGenerator
+
+
+class PythonExtensionGenerator(CppGenerator):
+    """
+    CPython extension module over the C++ API, built against the full (not limited) C API.
+    callables are METH_FASTCALL functions taking positional arguments - CPython calls them
+    through vectorcall without building an args tuple.
+
+    structs are types holding their members as attributes without an instance dict, converted
+    when passed. str arguments are read from the UTF-8 the str caches, bytes arguments take
+    any buffer protocol object without a copy. enums are IntEnums, error_enum calls raise
+    {enum}Exception with the error's name.
+
+    the GIL is released for every call into the API, so Python threads run calls in parallel.
+    the calls are locked like in the platform wrappers - thread safe methods aren't, reentrant
+    ones on their instance, the rest across the class. is_pooled classes take a set up
+    instance and a size, and their calls check out a worker each.
+
+    streams are iterators pulling the items with the GIL released.
+    """
+
+    generates_header = False
+    generates_source = True
+
+    def __init__(self, api: ApiDef, *, gen_version: str, api_h: str, module_name: str = ""):
+        super().__init__(api, gen_version=gen_version)
+        self.api_h = api_h
+        self.module_name = module_name or api.name
+
+    def _source_includes(self) -> [str]:
+        # py_util.h brings Python.h, which has to come first
+        return ["py_util.h", self.api_h]
+
+    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
+        ctx = src_ctx
+        self._include(self._source_includes(), ctx=ctx)
+        ctx.add_lines("")
+        self._gen_stats_table(ctx=ctx)
+
+        ns_block = ctx.push_block("namespace {", indent=True, post_pop_lines="} // namespace\n")
+        for enum_def in self.api.error_enums:
+            self._gen_error_helper(enum_def.name, ctx=ctx)
+        for struct_def in self.api.structs:
+            self._gen_struct_type(struct_def, ctx=ctx)
+        ctx.pop_block(ns_block)
+
+        # struct conversions come first - the calls convert their arguments with them
+        if self.api.structs:
+            ns_block = ctx.push_block(
+                "namespace bng::py {", indent=True, post_pop_lines="} // namespace bng::py\n"
+            )
+            for struct_def in self.api.structs:
+                self._gen_struct_convert(struct_def, ctx=ctx)
+            ctx.pop_block(ns_block)
+
+        ns_block = ctx.push_block("namespace {", indent=True, post_pop_lines="} // namespace\n")
+        for class_def in self.api.classes:
+            self._gen_class_type(class_def, ctx=ctx)
+            if class_def.is_pooled:
+                self._gen_class_type(class_def.pool_class, ctx=ctx)
+        self._gen_module_def(ctx=ctx)
+        ctx.pop_block(ns_block)
+
+        ctx.add_lines(
+            [
+                f"PyMODINIT_FUNC PyInit_{self.module_name}() {{",
+                "  PyObject* module = PyModule_Create(&module_def);",
+                "  if (module != nullptr && !add_module_members(module)) {",
+                "    Py_CLEAR(module);",
+                "  }",
+                "  return module;",
+                "}",
+            ]
+        )
+
+    @property
+    def stats_prefix(self) -> str:
+        return f"{self.api.name}_py"
+
+    def _stats_entries(self) -> [str]:
+        names = [func_def.name for func_def in self.api.functions]
+        for class_def in self._bound_classes():
+            names += [f"{class_def.name}.{m.name}" for m in class_def.methods]
+        return names
+
+    def _bound_classes(self) -> [ClassDef]:
+        classes = []
+        for class_def in self.api.classes:
+            classes += [class_def] + ([class_def.pool_class] if class_def.is_pooled else [])
+        return classes
+
+    def _gen_typename(self, type_obj: BaseType) -> str:
+        # the module's code is outside the api namespace
+        if type_obj.is_primitive:
+            return super()._gen_typename(type_obj)
+        return f"{self.api_ns}::{type_obj.name}"
+
+    @staticmethod
+    def _lock_scope(method_def: MethodDef, class_def: ClassDef) -> Optional[str]:
+        # pools check out a worker per call - their calls are never locked
+        return method_def.lock_scope if class_def.pool_source is None else None
+
+    def _instance_type(self, class_def: ClassDef) -> str:
+        return f"bng::py::Instance<{self._gen_typename(class_def)}>"
+
+    def _stream_type(self, method_def: MethodDef) -> str:
+        return f"bng::py::StreamIterator<{self._gen_typename(method_def.resolved_type_obj)}>"
+
+    def _gen_error_helper(self, enum_name: str, *, ctx: GenCtx):
+        ctx.add_lines(
+            [
+                f"PyObject* {enum_name}Exception = nullptr;",
+                "",
+                f"PyObject* raise_error({self.api_ns}::{enum_name} error) {{",
+                f"  PyErr_SetString({enum_name}Exception, error_name(error));",
+                "  return nullptr;",
+                "}",
+                "",
+            ]
+        )
+
+    def _gen_struct_type(self, struct_def: StructDef, *, ctx: GenCtx):
+        name = struct_def.name
+        record = f"bng::py::Record<{len(struct_def.members)}>"
+        names = [m.name for m in struct_def.members]
+        keywords = ", ".join([f'"{n}"' for n in names] + ["nullptr"])
+        ctx.add_lines(
+            [
+                f"PyTypeObject* {name}_type = nullptr;",
+                "",
+                f"int {name}_init(PyObject* self, PyObject* args, PyObject* kwargs) {{",
+                f"  static const char* keywords[] = {{{keywords}}};",
+                f"  std::array<PyObject*, {len(names)}> values;",
+                "  values.fill(Py_None);",
+                "  if (!PyArg_ParseTupleAndKeywords(",
+                f'          args, kwargs, "|{"O" * len(names)}:{name}", const_cast<char**>(keywords),',
+                f"          {', '.join(f'&values[{i}]' for i in range(len(names)))})) {{",
+                "    return -1;",
+                "  }",
+                f"  return {record}::init(self, values);",
+                "}",
+                "",
+                f"PyMemberDef {name}_members[] = {{",
+            ]
+        )
+        ctx.add_lines(
+            [
+                f'  {{"{n}", T_OBJECT_EX, {record}::offset({i}), 0, nullptr}},'
+                for i, n in enumerate(names)
+            ]
+            + [
+                "  {nullptr, 0, 0, 0, nullptr},",
+                "};",
+                "",
+                f"PyType_Slot {name}_slots[] = {{",
+                f"  {{Py_tp_init, reinterpret_cast<void*>({name}_init)}},",
+                f"  {{Py_tp_traverse, reinterpret_cast<void*>({record}::traverse)}},",
+                f"  {{Py_tp_clear, reinterpret_cast<void*>({record}::clear)}},",
+                f"  {{Py_tp_dealloc, reinterpret_cast<void*>({record}::dealloc)}},",
+                f"  {{Py_tp_members, {name}_members}},",
+                "  {0, nullptr},",
+                "};",
+                "",
+                f"PyType_Spec {name}_spec = {{",
+                f'  "{self.module_name}.{name}",',
+                f"  sizeof({record}),",
+                "  0,",
+                "  Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC,",
+                f"  {name}_slots,",
+                "};",
+                "",
+            ]
+        )
+
+    def _gen_struct_convert(self, struct_def: StructDef, *, ctx: GenCtx):
+        name = struct_def.name
+        cpp_name = self._gen_typename(struct_def)
+        record = f"Record<{len(struct_def.members)}>"
+        loads = " &&\n         ".join(
+            [f"record->load({i}, out.{m.name})" for i, m in enumerate(struct_def.members)]
+        )
+        values = ", ".join([f"bng::py::to_py(value.{m.name})" for m in struct_def.members])
+        ctx.add_lines(
+            [
+                "template <>",
+                f"struct Convert<{cpp_name}> {{",
+                f"  static bool from_py(PyObject* o, {cpp_name}& out) {{",
+                f"    if (!PyObject_TypeCheck(o, {name}_type)) {{",
+                f'      PyErr_Format(PyExc_TypeError, "expected {name}, got %s", Py_TYPE(o)->tp_name);',
+                "      return false;",
+                "    }",
+                f"    const auto* record = {record}::cast(o);",
+                f"    return {loads or 'record != nullptr'};",
+                "  }",
+                "",
+                f"  static PyObject* to_py(const {cpp_name}& value) {{",
+                f"    return {record}::make({name}_type, {{{values}}});",
+                "  }",
+                "};",
+                "",
+            ]
+        )
+
+    def _gen_arg_type(self, param_def: ParameterDef) -> str:
+        if isinstance(param_def.resolved_type_obj, ClassDef):
+            raise ValueError(f"{param_def} - class parameters not supported by the Python binding")
+        if param_def.ref_type in [RefType.shared, RefType.unique, RefType.raw]:
+            raise ValueError(
+                f"{param_def} - pointer parameters not supported by the Python binding"
+            )
+        type_spec = self._gen_param_type(param_def)
+        return type_spec.removeprefix("const ").removesuffix("&")
+
+    def _gen_callable(
+        self,
+        callable_def: TypedNamed,
+        *,
+        fn_name: str,
+        ctx: GenCtx,
+        class_def: Optional[ClassDef] = None,
+    ):
+        is_static = class_def is None or callable_def.is_static or callable_def.is_factory
+        params = callable_def.parameters
+        signature = ", ".join(
+            ["PyObject*" if is_static else "PyObject* self"]
+            + (["PyObject* const* args"] if params else ["PyObject* const*"])
+            + ["Py_ssize_t nargs"]
+        )
+        block = ctx.push_block(
+            f"PyObject* {fn_name}({signature}) {{", indent=True, post_pop_lines="}\n"
+        )
+        entry = callable_def.name if class_def is None else f"{class_def.name}.{callable_def.name}"
+        ctx.add_lines(
+            [
+                f'if (!bng::py::check_arg_count("{callable_def.name}", nargs, {len(params)})) {{',
+                "  return nullptr;",
+                "}",
+            ]
+        )
+        if params:
+            ctx.add_lines(
+                [f"bng::py::Arg<{self._gen_arg_type(p)}> {p.name}_arg;" for p in params]
+                + [
+                    "if ("
+                    + " || ".join([f"!{p.name}_arg.load(args[{i}])" for i, p in enumerate(params)])
+                    + ") {",
+                    "  return nullptr;",
+                    "}",
+                ]
+            )
+        # timed once the arguments are converted - their sizes are known then
+        self._gen_stats_hook(entry, [f"{p.name}_arg.bytes()" for p in params], ctx=ctx)
+        args = ", ".join([f"{p.name}_arg.get()" for p in params])
+        if class_def is None:
+            call = f"{self.api_ns}::{callable_def.name}({args})"
+        elif is_static:
+            call = f"{self._gen_typename(class_def)}::{callable_def.name}({args})"
+        else:
+            ctx.add_lines(f"auto* instance = {self._instance_type(class_def)}::cast(self);")
+            call = f"instance->self->{callable_def.name}({args})"
+
+        lock_scope = None if class_def is None else self._lock_scope(callable_def, class_def)
+        if lock_scope is None:
+            body = [f"return {call};"]
+        elif lock_scope == "instance" and not is_static:
+            body = ["std::lock_guard lock(instance->lock);", f"return {call};"]
+        else:
+            body = [
+                f"std::lock_guard lock({self._instance_type(class_def)}::class_lock);",
+                f"return {call};",
+            ]
+        self._gen_result(callable_def, body, class_def=class_def, ctx=ctx)
+        ctx.pop_block(block)
+
+    def _gen_result(
+        self,
+        callable_def: TypedNamed,
+        body: [str],
+        *,
+        class_def: Optional[ClassDef],
+        ctx: GenCtx,
+    ):
+        """makes the call with the GIL released and returns its converted result"""
+        is_void = callable_def.is_void and not callable_def.is_factory
+        error_enum = callable_def.error_enum_obj
+        if is_void and error_enum is None:
+            result = ""
+        elif is_void:
+            result = "const auto error = "
+        else:
+            result = "auto result = "
+        if len(body) == 1:
+            ctx.add_lines(f"{result}bng::py::without_gil([&] {{ {body[0]} }});")
+        else:
+            ctx.add_lines(f"{result}bng::py::without_gil([&] {{")
+            ctx.add_lines([f"  {line}" for line in body])
+            ctx.add_lines("});")
+
+        value = "std::move(result)"
+        if is_void:
+            if error_enum is not None:
+                ctx.add_lines(
+                    [
+                        f"if (error != {self._gen_typename(error_enum)}{{}}) {{",
+                        "  return raise_error(error);",
+                        "}",
+                    ]
+                )
+            ctx.add_lines("Py_RETURN_NONE;")
+            return
+        if error_enum is not None:
+            ctx.add_lines(["if (!result) {", "  return raise_error(result.error());", "}"])
+            value = "std::move(result).value()"
+        if callable_def.is_factory:
+            created = callable_def.resolved_type_obj
+            ctx.add_lines(
+                f"return {self._instance_type(created)}::wrap("
+                f"std::shared_ptr<{self._gen_typename(created)}>({value}));"
+            )
+        elif isinstance(callable_def, MethodDef) and callable_def.is_stream:
+            ctx.add_lines(f"return {self._stream_type(callable_def)}::wrap({value});")
+        else:
+            ctx.add_lines(f"return bng::py::to_py({value});")
+
+    def _gen_pool_new(self, pool_def: ClassDef, *, ctx: GenCtx):
+        # the source is only read while the workers are created - locked like a share() call
+        source_def = pool_def.pool_source
+        source_type = self._instance_type(source_def)
+        lock_scope = self._lock_scope(source_def.share_method, source_def)
+        body = [f"return std::make_shared<{self._gen_typename(pool_def)}>(*source->self, size);"]
+        if lock_scope == "instance":
+            body.insert(0, "std::lock_guard lock(source->lock);")
+        elif lock_scope == "class":
+            body.insert(0, f"std::lock_guard lock({source_type}::class_lock);")
+        ctx.add_lines(
+            [
+                f"PyObject* {pool_def.name}_new(PyTypeObject*, PyObject* args, PyObject* kwargs) {{",
+                '  static const char* keywords[] = {"source", "size", nullptr};',
+                "  PyObject* source_object = nullptr;",
+                "  unsigned int size = 0;",
+                "  if (!PyArg_ParseTupleAndKeywords(",
+                f'          args, kwargs, "O!|I:{pool_def.name}", const_cast<char**>(keywords),',
+                f"          {source_type}::type, &source_object, &size)) {{",
+                "    return nullptr;",
+                "  }",
+                f"  auto* source = {source_type}::cast(source_object);",
+                "  auto pool = bng::py::without_gil([&] {",
+            ]
+        )
+        ctx.add_lines([f"    {line}" for line in body])
+        ctx.add_lines(
+            [
+                "  });",
+                f"  return {self._instance_type(pool_def)}::wrap(std::move(pool));",
+                "}",
+                "",
+            ]
+        )
+
+    @staticmethod
+    def _gen_text_signature(callable_def: TypedNamed, is_static: bool) -> str:
+        params = ([] if is_static else ["$self"]) + [p.name for p in callable_def.parameters]
+        params += ["/"] if callable_def.parameters or not is_static else []
+        return f"{callable_def.name}({', '.join(params)})\\n--\\n\\n"
+
+    def _gen_method_entry(self, callable_def: TypedNamed, fn_name: str, *, flags: str) -> str:
+        is_static = "METH_STATIC" in flags or not isinstance(callable_def, MethodDef)
+        doc = self._gen_text_signature(callable_def, is_static)
+        return f'{{"{callable_def.name}", bng::py::fastcall({fn_name}), {flags}, "{doc}"}},'
+
+    def _gen_class_type(self, class_def: ClassDef, *, ctx: GenCtx):
+        name = class_def.name
+        entries = []
+        for method_def in class_def.methods:
+            fn_name = f"{name}_{method_def.name}"
+            self._gen_callable(method_def, fn_name=fn_name, class_def=class_def, ctx=ctx)
+            is_static = method_def.is_static or method_def.is_factory
+            flags = "METH_FASTCALL | METH_STATIC" if is_static else "METH_FASTCALL"
+            entries.append(self._gen_method_entry(method_def, fn_name, flags=flags))
+        if class_def.pool_source is not None:
+            self._gen_pool_new(class_def, ctx=ctx)
+
+        instance_type = self._instance_type(class_def)
+        ctx.add_lines(
+            [f"PyMethodDef {name}_methods[] = {{"]
+            + [f"  {entry}" for entry in entries]
+            + ["  {nullptr, nullptr, 0, nullptr},", "};", ""]
+        )
+        slots = [
+            f"{{Py_tp_dealloc, reinterpret_cast<void*>({instance_type}::dealloc)}},",
+            f"{{Py_tp_methods, {name}_methods}},",
+        ]
+        flags = "Py_TPFLAGS_DEFAULT"
+        if class_def.pool_source is not None:
+            slots.insert(0, f"{{Py_tp_new, reinterpret_cast<void*>({name}_new)}},")
+        else:
+            # instances come from the factories
+            flags += " | Py_TPFLAGS_DISALLOW_INSTANTIATION"
+        ctx.add_lines(f"PyType_Slot {name}_slots[] = {{")
+        ctx.add_lines([f"  {slot}" for slot in slots] + ["  {0, nullptr},", "};", ""])
+        ctx.add_lines(
+            [
+                f"PyType_Spec {name}_spec = {{",
+                f'  "{self.module_name}.{name}",',
+                f"  sizeof({instance_type}),",
+                "  0,",
+                f"  {flags},",
+                f"  {name}_slots,",
+                "};",
+                "",
+            ]
+        )
+
+    def _gen_module_def(self, *, ctx: GenCtx):
+        for func_def in self.api.functions:
+            self._gen_callable(func_def, fn_name=func_def.name, ctx=ctx)
+        if self._stats_entries():
+            self._gen_stats_function(ctx=ctx)
+
+        ctx.add_lines(
+            ["PyMethodDef module_methods[] = {"]
+            + [
+                f"  {self._gen_method_entry(f, f.name, flags='METH_FASTCALL')}"
+                for f in self.api.functions
+            ]
+        )
+        if self._stats_entries():
+            ctx.add_lines(
+                [
+                    f"#if defined({self.stats_symbol})",
+                    '  {"get_binding_stats", get_binding_stats, METH_NOARGS, nullptr},',
+                    "#endif",
+                ]
+            )
+        ctx.add_lines(
+            [
+                "  {nullptr, nullptr, 0, nullptr},",
+                "};",
+                "",
+                "PyModuleDef module_def = {",
+                "  PyModuleDef_HEAD_INIT,",
+                f'  "{self.module_name}",',
+                "  nullptr,",
+                "  -1,",
+                "  module_methods,",
+                "  nullptr,",
+                "  nullptr,",
+                "  nullptr,",
+                "  nullptr,",
+                "};",
+                "",
+            ]
+        )
+        self._gen_add_module_members(ctx=ctx)
+
+    def _gen_stats_function(self, *, ctx: GenCtx):
+        block = self._push_ifdef_block(self.stats_symbol, ctx=ctx)
+        ctx.add_lines(
+            [
+                "PyObject* get_binding_stats(PyObject*, PyObject*) {",
+                "  PyObject* list = PyList_New(0);",
+                f"  for (size_t i = 0; list != nullptr && i < std::size({self.stats_table}); ++i) {{",
+                "    BngCallStats stats{};",
+                f"    {self.stats_table}[i].copy_to(stats);",
+                "    PyObject* item = Py_BuildValue(",
+                '        "{s:s,s:K,s:K,s:K,s:K}", "name", stats.name, "calls", stats.calls,',
+                '        "total_ns", stats.total_ns, "max_ns", stats.max_ns, "arg_bytes", stats.arg_bytes);',
+                "    if (item == nullptr || PyList_Append(list, item) < 0) {",
+                "      Py_CLEAR(list);",
+                "    }",
+                "    Py_XDECREF(item);",
+                "  }",
+                "  return list;",
+                "}",
+            ]
+        )
+        ctx.pop_block(block)
+        ctx.add_lines("")
+
+    def _gen_add_module_members(self, *, ctx: GenCtx):
+        adds = [
+            f'bng::py::add_value(module, "__version__", PyUnicode_FromString("{self.api.version}"))'
+        ]
+        for const_def in self.api.constants:
+            adds.append(
+                f'bng::py::add_value(module, "{const_def.name}", '
+                f"bng::py::to_py({self.api_ns}::{const_def.name}))"
+            )
+        for enum_def in self.api.enums:
+            members = ", ".join([f'{{"{m.name}", {m.value}}}' for m in enum_def.members])
+            adds.append(
+                f"bng::py::add_int_enum<{self._gen_typename(enum_def)}>"
+                f'(module, "{enum_def.name}", {{{members}}})'
+            )
+        for enum_def in self.api.error_enums:
+            adds.append(
+                f'bng::py::add_exception(module, "{self.module_name}.{enum_def.name}Exception", '
+                f"{enum_def.name}Exception)"
+            )
+        for struct_def in self.api.structs:
+            adds.append(
+                f"bng::py::add_type(module, {struct_def.name}_spec, {struct_def.name}_type)"
+            )
+        for class_def in self._bound_classes():
+            instance_type = self._instance_type(class_def)
+            adds.append(f"bng::py::add_type(module, {class_def.name}_spec, {instance_type}::type)")
+            for const_def in class_def.constants:
+                adds.append(
+                    f"bng::py::add_value(reinterpret_cast<PyObject*>({instance_type}::type), "
+                    f'"{const_def.name}", '
+                    f"bng::py::to_py({self._gen_typename(class_def)}::{const_def.name}))"
+                )
+        streams = {}
+        for class_def in self.api.classes:
+            for method_def in [m for m in class_def.methods if m.is_stream]:
+                type_name = ensure_camel(method_def.resolved_type_obj.name, capitalized=True)
+                streams.setdefault(self._stream_type(method_def), f"{type_name}Stream")
+        for stream_type, type_name in streams.items():
+            adds.append(f'{stream_type}::add_type(module, "{self.module_name}.{type_name}")')
+        adds[-1] += ";"
+        ctx.add_lines(
+            ["bool add_module_members(PyObject* module) {", f"  return {adds[0]}"]
+            + [f"      && {add}" for add in adds[1:]]
+            + ["}"]
+        )
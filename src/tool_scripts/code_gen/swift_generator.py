@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Optional, Callable
 from api_def import (
     ApiDef,
     AliasDef,
@@ -12,45 +12,780 @@ from api_def import (
     MethodDef,
     ParameterDef,
     PrimitiveType,
+    RefType,
     StructDef,
+    TypedNamed,
+    ensure_camel,
+    ensure_snake,
     get_type,
 )
 from generator import Generator, GenCtx, BlockCtx
 from c_generator import CBindingGenerator
+from cpp_generator import CppGenerator
 
 
 class SwiftBindingGenerator(CBindingGenerator):
+    """
+    C shims called by the SwiftGenerator wrapper. inputs are views borrowed from swift for the
+    duration of the call (withCString / withUnsafeBufferPointer), results live in thread_local
+    storage reused across calls - valid until the next call into the same shim on that thread.
+    """
+
     generates_header = True
     generates_source = True
+    # linked into the app - nothing loads it at runtime
+    has_api_table = False
 
     def __init__(self, api: ApiDef, *, gen_version: str, api_h: str):
         super().__init__(api, gen_version=gen_version, api_h=api_h)
 
-    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
-        super()._generate(src_ctx=src_ctx, hdr_ctx=hdr_ctx)
-        # ctx = hdr_ctx
-        # self._pragma("once", ctx=ctx)
-        # ec_block = self._push_extern_c_block(ctx)
-        # # TODO: swift binding protos
-        # ctx.pop_block(ec_block)
-        #
-        # ctx = src_ctx
-        # self._include(["stdlib.h", hdr_ctx.out_path.name, self.api_h], ctx=ctx)
-        # ctx.add_lines("")
-        # ec_block = self._push_extern_c_block(ctx)
-        # # TODO: swift binding impls
-        # ctx.pop_block(ec_block)
+    def _is_arena_result(self, callable_def: TypedNamed) -> bool:
+        # batch results are thread_local like any other - nothing runs twice
+        return self.result_kind(callable_def) in ("struct", "struct_list")
+
+    def _gen_result_decl(
+        self, callable_def: TypedNamed, class_def: Optional[ClassDef] = None
+    ) -> (str, [str]):
+        size_tn = self._gen_typename(get_type("uint32"))
+        result_kind = self.result_kind(callable_def)
+        if result_kind == "text":
+            return "const char*", [f"{size_tn}* out_size"]
+        if result_kind == "text_list":
+            return "const char* const*", [f"{size_tn}* out_count"]
+        if result_kind == "list":
+            return f"const {self._gen_typename(callable_def.type_obj)}*", [f"{size_tn}* out_count"]
+        return super()._gen_result_decl(callable_def, class_def)
+
+    def _gen_buffer_comment(self, callable_def: TypedNamed, *, ctx: GenCtx):
+        # no caller buffers - results are thread_local
+        pass
+
+    def _gen_stream_item_result(self, item_def: FunctionDef, *, ctx: GenCtx):
+        if self.result_kind(item_def) != "text":
+            return super()._gen_stream_item_result(item_def, ctx=ctx)
+        # the cursor keeps the current item alive until the next pull - no copy needed
+        ctx.add_lines(
+            ["*out_size = uint32_t(cursor->item.size());", "return cursor->item.c_str();"]
+        )
+
+    def _gen_buffered_result(
+        self, callable_def: TypedNamed, invocation: str, *, result_kind: str, ctx: GenCtx
+    ):
+        if result_kind == "text":
+            ctx.add_lines(
+                [
+                    f"thread_local std::string result;",
+                    f"result = {invocation};",
+                    "*out_size = uint32_t(result.size());",
+                    "return result.c_str();",
+                ]
+            )
+        elif result_kind == "text_list":
+            ctx.add_lines(
+                [
+                    f"thread_local {self._gen_container(callable_def)} result;",
+                    "thread_local std::vector<const char*> result_ptrs;",
+                    f"result = {invocation};",
+                    "result_ptrs.clear();",
+                    "for (const auto& s : result) { result_ptrs.push_back(s.c_str()); }",
+                    "*out_count = uint32_t(result.size());",
+                    "return result_ptrs.data();",
+                ]
+            )
+        else:
+            ctx.add_lines(
+                [
+                    f"thread_local {self._gen_container(callable_def)} result;",
+                    f"result = {invocation};",
+                    "*out_count = uint32_t(result.size());",
+                    "return result.data();",
+                ]
+            )
 
 
 class SwiftGenerator(Generator):
+    """
+    swift wrapper over the SwiftBindingGenerator shims. arguments cross as views of the swift
+    values - strings through withCString, numeric lists through withUnsafeBufferPointer and
+    fixed arrays as C tuples built on the stack. string lists and struct lists are packed into
+    one buffer per call. struct list results stay in the shim's arena behind a collection
+    converting items on access, single struct results are converted and released right away.
+    streams are AsyncSequences pulling one item per next().
+    """
+
     generates_header = False
     generates_source = True
 
-    def __init__(self, api: ApiDef, *, gen_version: str, api_h: str):
+    def __init__(self, api: ApiDef, *, gen_version: str, api_h: str, c_module: str = "bng_bridge"):
         super().__init__(api, gen_version=gen_version)
         self.api_h = api_h
+        self.c_module = c_module
+        self._binding = SwiftBindingGenerator(api, gen_version=gen_version, api_h=api_h)
 
     _comment = CBindingGenerator._comment
 
     def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
-        src_ctx.add_lines("import Foundation")
+        ctx = src_ctx
+        ctx.add_lines(["import Foundation", f"import {self.c_module}", ""])
+        self._gen_helpers(ctx=ctx)
+        for alias_def in self.api.aliases:
+            self._gen_alias(alias_def, ctx=ctx)
+        for enum_def in self.api.enums:
+            self._gen_enum(enum_def, ctx=ctx)
+            if enum_def in self.api.error_enums:
+                # error_enum calls throw their failures as the enum itself
+                ctx.add_lines([f"extension {enum_def.name}: Error {{}}", ""])
+        for struct_def in self.api.structs:
+            self._gen_struct(struct_def, ctx=ctx)
+        for struct_def in self._structs_used_in_list_params():
+            self._gen_struct_list_marshalling(struct_def, ctx=ctx)
+        for struct_def in self._binding._structs_returned():
+            self._gen_struct_from_c(struct_def, ctx=ctx)
+        for struct_def in self._structs_used_in_list_results():
+            self._gen_arena_list(struct_def, ctx=ctx)
+        for class_def in self.api.classes:
+            for method_def in class_def.methods:
+                if method_def.is_stream:
+                    self._gen_stream(method_def, class_def=class_def, ctx=ctx)
+            self._gen_class(class_def, ctx=ctx)
+            if class_def.is_pooled:
+                self._gen_class(class_def.pool_class, ctx=ctx)
+        for func_def in self.api.functions:
+            self._gen_callable(func_def, class_def=None, ctx=ctx)
+            ctx.add_lines("")
+        for class_def in self.api.classes:
+            self._gen_async_extension(class_def, ctx=ctx)
+            if class_def.is_pooled:
+                self._gen_async_extension(class_def.pool_class, ctx=ctx)
+
+    _swift_primitives = {
+        "void": "Void",
+        "bool": "Bool",
+        "int8": "Int8",
+        "uint8": "UInt8",
+        "int16": "Int16",
+        "uint16": "UInt16",
+        "int32": "Int32",
+        "uint32": "UInt32",
+        "int64": "Int64",
+        "uint64": "UInt64",
+        "intptr": "Int",
+        "float32": "Float",
+        "float64": "Double",
+        "string": "String",
+        "string_view": "String",
+        "bytes": "Data",
+    }
+
+    def _gen_swift_base_type(self, type_obj: BaseType) -> str:
+        if type_obj.is_primitive:
+            return self._swift_primitives[type_obj.name]
+        return type_obj.name
+
+    def _gen_swift_type(self, typed: TypedNamed) -> str:
+        base_type = self._gen_swift_base_type(typed.type_obj)
+        if typed.is_list or typed.is_array:
+            return f"[{base_type}]"
+        return base_type
+
+    def _gen_swift_result_type(
+        self, callable_def: TypedNamed, class_def: Optional[ClassDef] = None
+    ) -> str:
+        result_kind = SwiftBindingGenerator.result_kind(callable_def)
+        if result_kind == "struct_list":
+            return f"{callable_def.resolved_type_obj.name}List"
+        if result_kind == "stream":
+            return self._stream_name(callable_def, class_def)
+        return self._gen_swift_type(callable_def)
+
+    @staticmethod
+    def _stream_name(method_def: MethodDef, class_def: ClassDef) -> str:
+        return f"{class_def.name}{method_def.stream_name}"
+
+    def _gen_swift_params(self, callable_def: TypedNamed) -> str:
+        return ", ".join(
+            [f"{ensure_camel(p.name)}: {self._gen_swift_type(p)}" for p in callable_def.parameters]
+        )
+
+    def _gen_helpers(self, *, ctx: GenCtx):
+        ctx.add_lines(
+            [
+                "fileprivate func takeString(_ ptr: UnsafePointer<CChar>?, _ size: UInt32) -> String {",
+                '  guard let ptr else { return "" }',
+                "  return ptr.withMemoryRebound(to: UInt8.self, capacity: Int(size)) {",
+                "    String(decoding: UnsafeBufferPointer(start: $0, count: Int(size)), as: UTF8.self)",
+                "  }",
+                "}",
+                "",
+                "// all strings packed into one buffer - a single allocation instead of one per string",
+                "fileprivate func withCStrings<R>(",
+                "  _ strings: [String], _ body: (UnsafeBufferPointer<UnsafePointer<CChar>?>) throws -> R",
+                ") rethrows -> R {",
+                "  var buffer = [CChar]()",
+                "  buffer.reserveCapacity(strings.reduce(0) { $0 + $1.utf8.count + 1 })",
+                "  var offsets = [Int]()",
+                "  offsets.reserveCapacity(strings.count)",
+                "  for s in strings {",
+                "    offsets.append(buffer.count)",
+                "    for byte in s.utf8 { buffer.append(CChar(bitPattern: byte)) }",
+                "    buffer.append(0)",
+                "  }",
+                "  return try buffer.withUnsafeBufferPointer { chars in",
+                "    let ptrs = offsets.map { Optional(chars.baseAddress! + $0) }",
+                "    return try ptrs.withUnsafeBufferPointer(body)",
+                "  }",
+                "}",
+                "",
+                "// string list parameters - the UTF-8 of all strings back to back and the offsets",
+                "// they start at, with the end as the last one",
+                "fileprivate func withPackedStrings<R>(",
+                "  _ strings: [String], _ body: (UnsafeBufferPointer<CChar>, UnsafeBufferPointer<UInt32>) throws -> R",
+                ") rethrows -> R {",
+                "  var chars = [CChar]()",
+                "  chars.reserveCapacity(strings.reduce(0) { $0 + $1.utf8.count })",
+                "  var offsets = [UInt32]()",
+                "  offsets.reserveCapacity(strings.count + 1)",
+                "  offsets.append(0)",
+                "  for s in strings {",
+                "    for byte in s.utf8 { chars.append(CChar(bitPattern: byte)) }",
+                "    offsets.append(UInt32(chars.count))",
+                "  }",
+                "  return try chars.withUnsafeBufferPointer { chars in",
+                "    try offsets.withUnsafeBufferPointer { offsets in try body(chars, offsets) }",
+                "  }",
+                "}",
+                "",
+            ]
+        )
+
+    def _gen_alias(self, alias_def: AliasDef, *, ctx: GenCtx):
+        if alias_def.ref_type is not None or alias_def.is_list or alias_def.is_array:
+            return
+        ctx.add_lines(
+            [
+                f"public typealias {alias_def.name} = {self._gen_swift_base_type(alias_def.base_type_obj)}",
+                "",
+            ]
+        )
+
+    def _enum_raw_type(self, enum_def: EnumDef) -> str:
+        base_type_obj = enum_def.resolved_base_type_obj
+        return "Int32" if base_type_obj.is_void else self._gen_swift_base_type(base_type_obj)
+
+    def _gen_enum(self, enum_def: EnumDef, *, ctx: GenCtx):
+        e_block = ctx.push_block(
+            f"public enum {enum_def.name}: {self._enum_raw_type(enum_def)} {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        for enum_value in enum_def.members:
+            ctx.add_lines(f"case {ensure_camel(enum_value.name)} = {enum_value.value}")
+        ctx.pop_block(e_block)
+
+    def _gen_struct(self, struct_def: StructDef, *, ctx: GenCtx):
+        s_block = ctx.push_block(
+            f"public struct {struct_def.name} {{", indent=True, post_pop_lines="}\n"
+        )
+        members = [(ensure_camel(m.name), self._gen_swift_type(m)) for m in struct_def.members]
+        ctx.add_lines([f"public var {name}: {tn}" for name, tn in members])
+        ctx.add_lines(
+            [
+                "",
+                f"public init({', '.join([f'{name}: {tn}' for name, tn in members])}) {{",
+                *[f"  self.{name} = {name}" for name, _ in members],
+                "}",
+            ]
+        )
+        ctx.pop_block(s_block)
+
+    def _c_type(self, type_obj: BaseType) -> str:
+        return f"{self.c_module}.{type_obj.name}"
+
+    def _gen_c_value(
+        self, typed: TypedNamed, expr: str, *, c_string: Callable[[str], str], is_element=False
+    ) -> str:
+        """
+        swift expression for the C value of typed. c_string maps a swift String expression
+        to an expression for its borrowed C pointer.
+        """
+        type_obj = typed.resolved_type_obj
+        if typed.is_array and not is_element:
+            elements = [
+                self._gen_c_value(typed, f"{expr}[{i}]", c_string=c_string, is_element=True)
+                for i in range(typed.array_count)
+            ]
+            # fixed arrays import as C tuples - built in place, no array allocation
+            return f"({', '.join(elements)})"
+        if typed.is_list and not is_element:
+            raise ValueError(f"{typed} - list members of swift struct parameters not supported")
+        if type_obj.is_string:
+            return c_string(expr)
+        if isinstance(type_obj, StructDef):
+            fields = []
+            # the imported memberwise init takes the C declaration order
+            for member_def in type_obj.layout_members:
+                value = self._gen_c_value(
+                    member_def, f"{expr}.{ensure_camel(member_def.name)}", c_string=c_string
+                )
+                fields.append(f"{member_def.name}: {value}")
+            return f"{self._c_type(type_obj)}({', '.join(fields)})"
+        if isinstance(type_obj, EnumDef):
+            return f"{self._c_type(type_obj)}(rawValue: numericCast({expr}.rawValue))"
+        if type_obj.is_primitive and type_obj.is_number_or_bool:
+            return expr
+        raise ValueError(f"{typed} - not supported by the swift binding")
+
+    def _structs_used_in_list_params(self) -> [StructDef]:
+        callables = list(self.api.functions) + [m for c in self.api.classes for m in c.methods]
+        used = []
+        for callable_def in callables:
+            for param_def in callable_def.parameters:
+                type_obj = param_def.resolved_type_obj
+                if param_def.is_list and isinstance(type_obj, StructDef) and type_obj not in used:
+                    used.append(type_obj)
+        return used
+
+    def _gen_struct_list_marshalling(self, struct_def: StructDef, *, ctx: GenCtx):
+        # string leaves of every item go into one packed buffer, then each C struct is built
+        # pointing into it - one allocation for the whole list
+        string_exprs = []
+
+        def next_string(expr: str) -> str:
+            string_exprs.append(expr)
+            return "next()"
+
+        value = self._gen_c_value(
+            TypedNamed(name="item", type=struct_def.name), "item", c_string=next_string
+        )
+        c_type = self._c_type(struct_def)
+        if not string_exprs:
+            # nothing to keep alive - blittable items go to the shim in one copy
+            ctx.add_lines(
+                [
+                    "fileprivate func withCArray<R>(",
+                    f"  _ items: [{struct_def.name}], _ body: (UnsafeBufferPointer<{c_type}>) throws -> R",
+                    ") rethrows -> R {",
+                    f"  return try items.map {{ item in {value} }}.withUnsafeBufferPointer(body)",
+                    "}",
+                    "",
+                ]
+            )
+            return
+        ctx.add_lines(
+            [
+                "fileprivate func withCArray<R>(",
+                f"  _ items: [{struct_def.name}], _ body: (UnsafeBufferPointer<{c_type}>) throws -> R",
+                ") rethrows -> R {",
+                "  var strings = [String]()",
+                f"  strings.reserveCapacity(items.count * {len(string_exprs)})",
+                f"  for item in items {{ strings.append(contentsOf: [{', '.join(string_exprs)}]) }}",
+                "  return try withCStrings(strings) { ptrs in",
+                "    var index = 0",
+                "    func next() -> UnsafePointer<CChar>? {",
+                "      defer { index += 1 }",
+                "      return ptrs[index]",
+                "    }",
+                f"    let values = items.map {{ item in {value} }}",
+                "    return try values.withUnsafeBufferPointer(body)",
+                "  }",
+                "}",
+                "",
+            ]
+        )
+
+    def _structs_used_in_list_results(self) -> [StructDef]:
+        callables = list(self.api.functions) + [m for c in self.api.classes for m in c.methods]
+        used = []
+        for callable_def in callables:
+            type_obj = callable_def.resolved_type_obj
+            result_kind = SwiftBindingGenerator.result_kind(callable_def)
+            if result_kind == "struct_list" and type_obj not in used:
+                used.append(type_obj)
+        return used
+
+    def _c_element_type(self, type_obj: BaseType) -> str:
+        if type_obj.is_string:
+            return "UnsafePointer<CChar>?"
+        if isinstance(type_obj, (StructDef, EnumDef)):
+            return self._c_type(type_obj)
+        return self._gen_swift_base_type(type_obj)
+
+    def _gen_swift_value(self, typed: TypedNamed, c_expr: str, *, is_element=False) -> str:
+        type_obj = typed.resolved_type_obj
+        if (typed.is_array or typed.is_list) and not is_element:
+            if typed.is_array:
+                # C tuples are contiguous - viewed as a buffer of their element type
+                elements = (
+                    f"withUnsafeBytes(of: {c_expr}) {{ "
+                    f"Array($0.bindMemory(to: {self._c_element_type(type_obj)}.self)) }}"
+                )
+            else:
+                elements = f"UnsafeBufferPointer(start: {c_expr}, count: Int({c_expr}_count))"
+            element = self._gen_swift_value(typed, "$0", is_element=True)
+            if element != "$0":
+                return f"{elements}.map {{ {element} }}"
+            return elements if typed.is_array else f"Array({elements})"
+        if type_obj.is_string:
+            return f"String(cString: {c_expr}!)"
+        if isinstance(type_obj, StructDef):
+            return f"{type_obj.name}({c_expr})"
+        if isinstance(type_obj, EnumDef):
+            return f"{type_obj.name}(rawValue: numericCast({c_expr}.rawValue))!"
+        if type_obj.is_primitive and type_obj.is_number_or_bool:
+            return c_expr
+        raise ValueError(f"{typed} - not supported by the swift binding")
+
+    def _gen_struct_from_c(self, struct_def: StructDef, *, ctx: GenCtx):
+        args = [
+            f"{ensure_camel(m.name)}: {self._gen_swift_value(m, f'c.{m.name}')}"
+            for m in struct_def.members
+        ]
+        ctx.add_lines(
+            [
+                f"fileprivate extension {struct_def.name} {{",
+                f"  init(_ c: {self._c_type(struct_def)}) {{",
+                f"    self.init({', '.join(args)})",
+                "  }",
+                "}",
+                "",
+            ]
+        )
+
+    def _gen_arena_list(self, struct_def: StructDef, *, ctx: GenCtx):
+        c_type = self._c_type(struct_def)
+        ctx.add_lines(
+            [
+                f"public final class {struct_def.name}List: RandomAccessCollection {{",
+                f"  private let items: UnsafeBufferPointer<{c_type}>",
+                "",
+                f"  fileprivate init(_ base: UnsafePointer<{c_type}>?, _ count: UInt32) {{",
+                "    items = UnsafeBufferPointer(start: base, count: Int(count))",
+                "  }",
+                "",
+                "  deinit {",
+                f"    {self._binding.release_name}(items.baseAddress)",
+                "  }",
+                "",
+                "  public var startIndex: Int { items.startIndex }",
+                "  public var endIndex: Int { items.endIndex }",
+                "",
+                "  // converted on access - the C records stay in the arena",
+                f"  public subscript(position: Int) -> {struct_def.name} {{ "
+                f"{struct_def.name}(items[position]) }}",
+                "}",
+                "",
+            ]
+        )
+
+    @staticmethod
+    def _lock_scope(method_def: MethodDef, class_def: ClassDef) -> Optional[str]:
+        # pools check out a worker per call - their calls are never locked
+        return method_def.lock_scope if class_def.pool_source is None else None
+
+    def _gen_class(self, class_def: ClassDef, *, ctx: GenCtx):
+        source_def = class_def.pool_source
+        # sendable - calls are thread safe or serialized by the locks below
+        c_block = ctx.push_block(
+            f"public final class {class_def.name}: @unchecked Sendable {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        snake_name = ensure_snake(class_def.name)
+        lock_scopes = {self._lock_scope(m, class_def) for m in class_def.methods}
+        if "instance" in lock_scopes:
+            ctx.add_lines("// serializes the reentrant calls on this instance")
+            ctx.add_lines("private let lock = NSLock()")
+        if "class" in lock_scopes:
+            ctx.add_lines("// serializes the calls that aren't reentrant across every instance")
+            ctx.add_lines("private static let classLock = NSLock()")
+        if lock_scopes - {None}:
+            ctx.add_lines("")
+        ctx.add_lines(
+            [
+                "fileprivate let handle: OpaquePointer",
+                "",
+                "fileprivate init(handle: OpaquePointer) {",
+                "  self.handle = handle",
+                "}",
+            ]
+        )
+        if source_def is not None:
+            ctx.add_lines(
+                [
+                    "",
+                    "// workers share the set up source's state, size 0 is one per hardware thread",
+                    f"public convenience init(sharing source: {source_def.name}, size: UInt32 = 0) {{",
+                    f"  self.init(handle: {snake_name}_create(source.handle, size)!)",
+                    "}",
+                ]
+            )
+        ctx.add_lines(
+            [
+                "",
+                "deinit {",
+                f"  destroy_{snake_name}(handle)",
+                "}",
+            ]
+        )
+        for method_def in class_def.methods:
+            ctx.add_lines("")
+            self._gen_callable(method_def, class_def=class_def, ctx=ctx)
+        ctx.pop_block(c_block)
+
+    def _gen_callable(
+        self, callable_def: TypedNamed, *, class_def: Optional[ClassDef], ctx: GenCtx
+    ):
+        is_instance = class_def is not None and not (
+            callable_def.is_static or callable_def.is_factory
+        )
+        static = "static " if class_def is not None and not is_instance else ""
+        result_kind = SwiftBindingGenerator.result_kind(callable_def)
+        returns = (
+            ""
+            if result_kind == "void"
+            else f" -> {self._gen_swift_result_type(callable_def, class_def)}"
+        )
+        throws = " throws" if callable_def.error_enum is not None else ""
+        f_block = ctx.push_block(
+            f"public {static}func {ensure_camel(callable_def.name)}"
+            f"({self._gen_swift_params(callable_def)}){throws}{returns} {{",
+            indent=True,
+            post_pop_lines="}",
+        )
+        lock_scope = self._lock_scope(callable_def, class_def) if class_def is not None else None
+        if lock_scope is not None:
+            lock = "lock" if lock_scope == "instance" else f"{class_def.name}.classLock"
+            ctx.add_lines([f"{lock}.lock()", f"defer {{ {lock}.unlock() }}"])
+        args = ["handle"] if is_instance else []
+        opened = []
+        for param_def in callable_def.parameters:
+            args.extend(
+                self._gen_param_marshalling(param_def, opened=opened, ctx=ctx, throws=bool(throws))
+            )
+        self._gen_call(
+            callable_def,
+            call=self._binding.shim_name(callable_def, class_def),
+            args=args,
+            result_kind=result_kind,
+            ctx=ctx,
+            class_def=class_def,
+        )
+        for block in reversed(opened):
+            ctx.pop_block(block)
+        ctx.pop_block(f_block)
+
+    def _open_closure(
+        self, head: str, var: str, *, opened: [BlockCtx], ctx: GenCtx, throws: bool = False
+    ):
+        try_ = "try " if throws else ""
+        opened.append(
+            ctx.push_block(f"return {try_}{head} {{ {var} in", indent=True, post_pop_lines="}")
+        )
+
+    def _gen_param_marshalling(
+        self, param_def: ParameterDef, *, opened: [BlockCtx], ctx: GenCtx, throws: bool = False
+    ) -> [str]:
+        name = ensure_camel(param_def.name)
+        c_name = f"{param_def.name}_c"
+        type_obj = param_def.resolved_type_obj
+        if param_def.is_list:
+            if type_obj.is_string or type_obj.is_string_view:
+                chars, offsets = f"{param_def.name}_chars", f"{param_def.name}_offsets"
+                self._open_closure(
+                    f"withPackedStrings({name})",
+                    f"{chars}, {offsets}",
+                    opened=opened,
+                    ctx=ctx,
+                    throws=throws,
+                )
+                return [
+                    f"{chars}.baseAddress",
+                    f"{offsets}.baseAddress",
+                    f"UInt32({offsets}.count - 1)",
+                ]
+            if isinstance(type_obj, StructDef):
+                head = f"withCArray({name})"
+            elif type_obj.is_primitive and type_obj.is_number_or_bool:
+                head = f"{name}.withUnsafeBufferPointer"
+            else:
+                raise ValueError(f"{param_def} - list type not supported by the swift binding")
+            self._open_closure(head, c_name, opened=opened, ctx=ctx, throws=throws)
+            return [f"{c_name}.baseAddress", f"UInt32({c_name}.count)"]
+        if param_def.is_string_view:
+            self._open_closure(f"{name}.withCString", c_name, opened=opened, ctx=ctx, throws=throws)
+            return [c_name, f"UInt32({name}.utf8.count)"]
+        if param_def.is_bytes:
+            self._open_closure(
+                f"{name}.withUnsafeBytes", c_name, opened=opened, ctx=ctx, throws=throws
+            )
+            return [f"{c_name}.bindMemory(to: UInt8.self).baseAddress", f"UInt32({c_name}.count)"]
+
+        def with_c_string(expr: str) -> str:
+            var = (
+                expr.replace(".", "_").replace("[", "_").replace("]", "")
+                if expr != name
+                else c_name
+            )
+            self._open_closure(f"{expr}.withCString", var, opened=opened, ctx=ctx, throws=throws)
+            return var
+
+        value = self._gen_c_value(param_def, name, c_string=with_c_string)
+        if isinstance(type_obj, StructDef):
+            ctx.add_lines(f"var {c_name} = {value}")
+            return [f"&{c_name}"]
+        return [value]
+
+    def _gen_call(
+        self,
+        callable_def: TypedNamed,
+        *,
+        call: str,
+        args: [str],
+        result_kind: str,
+        ctx: GenCtx,
+        class_def: Optional[ClassDef] = None,
+    ):
+        # the conversion of the shim's result, {} stands for the raw result
+        lines = []
+        out_args = []
+        note = []
+        bind_result = True
+        after_call = []
+        if result_kind == "text":
+            lines = ["var size: UInt32 = 0"]
+            note = ["// copied out of the shim's reused result buffer"]
+            out_args = ["&size"]
+            convert = "takeString({}, size)"
+        elif result_kind in ["text_list", "list"]:
+            lines = ["var count: UInt32 = 0"]
+            out_args = ["&count"]
+            if result_kind == "text_list":
+                convert = "(0..<Int(count)).map {{ String(cString: {}![$0]!) }}"
+            else:
+                convert = "Array(UnsafeBufferPointer(start: {}, count: Int(count)))"
+        elif result_kind == "struct_list":
+            lines = ["var count: UInt32 = 0"]
+            out_args = ["&count"]
+            convert = f"{self._gen_swift_result_type(callable_def)}({{}}, count)"
+        elif result_kind == "struct":
+            # converted right away - the arena copy is released on the way out
+            after_call = [f"defer {{ {self._binding.release_name}(result) }}"]
+            convert = f"{callable_def.resolved_type_obj.name}({{}}!.pointee)"
+        else:
+            bind_result = False
+            if result_kind == "handle":
+                convert = f"{callable_def.resolved_type_obj.name}(handle: {{}}!)"
+            elif result_kind == "stream":
+                convert = (
+                    f"{self._stream_name(callable_def, class_def)}(cursor: {{}}!, owner: self)"
+                )
+            elif result_kind == "enum":
+                convert = (
+                    f"{callable_def.resolved_type_obj.name}(rawValue: numericCast({{}}.rawValue))!"
+                )
+            elif result_kind == "void":
+                convert = None
+            else:
+                convert = "{}"
+
+        error_enum = callable_def.error_enum_obj
+        if error_enum is not None:
+            lines.append(f"var error = {self._c_type(error_enum)}(rawValue: 0)")
+            out_args.append("&error")
+        invocation = f"{call}({', '.join(args + out_args)})"
+        lines += note
+        if convert is None:
+            lines.append(invocation)
+        elif bind_result or error_enum is not None:
+            lines.append(f"let result = {invocation}")
+            lines += after_call
+        else:
+            lines.append(f"return {convert.format(invocation)}")
+        if error_enum is not None:
+            lines.append(
+                "if error.rawValue != 0 { "
+                f"throw {error_enum.name}(rawValue: numericCast(error.rawValue))! }}"
+            )
+        if convert is not None and (bind_result or error_enum is not None):
+            lines.append(f"return {convert.format('result')}")
+        ctx.add_lines(lines)
+
+    def _gen_stream(self, method_def: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
+        name = self._stream_name(method_def, class_def)
+        shim_name = self._binding.shim_name(method_def, class_def)
+        cursor_snake = ensure_snake(self._binding.cursor_name(method_def, class_def))
+        item_def = SwiftBindingGenerator.stream_item(method_def)
+        element = self._gen_swift_type(item_def)
+        s_block = ctx.push_block(
+            f"public final class {name}: AsyncSequence, AsyncIteratorProtocol {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        ctx.add_lines(
+            [
+                f"public typealias Element = {element}",
+                "",
+                "private let cursor: OpaquePointer",
+                "// keeps the producing instance alive while items are pulled",
+                "private let owner: AnyObject",
+                "",
+                "fileprivate init(cursor: OpaquePointer, owner: AnyObject) {",
+                "  self.cursor = cursor",
+                "  self.owner = owner",
+                "}",
+                "",
+                "deinit {",
+                f"  destroy_{cursor_snake}(cursor)",
+                "}",
+                "",
+                f"public func makeAsyncIterator() -> {name} {{ self }}",
+                "",
+            ]
+        )
+        n_block = ctx.push_block(
+            f"public func next() async -> {element}? {{", indent=True, post_pop_lines="}"
+        )
+        ctx.add_lines(
+            [
+                "// other tasks (rendering the items so far) run between pulls",
+                "await Task.yield()",
+                f"guard {shim_name}_next(cursor) else {{ return nil }}",
+            ]
+        )
+        self._gen_call(
+            item_def,
+            call=f"{shim_name}_item",
+            args=["cursor"],
+            result_kind=SwiftBindingGenerator.result_kind(item_def),
+            ctx=ctx,
+        )
+        ctx.pop_block(n_block)
+        ctx.pop_block(s_block)
+
+    def _gen_async_extension(self, class_def: ClassDef, *, ctx: GenCtx):
+        async_methods = [m for m in class_def.methods if m.is_async]
+        if not async_methods:
+            return
+        ext_block = ctx.push_block(
+            f"\nextension {class_def.name} {{", indent=True, post_pop_lines="}"
+        )
+        for method_def in async_methods:
+            static = "static " if method_def.is_static else ""
+            target = class_def.name if method_def.is_static else "self"
+            returns = "" if method_def.is_void else f" -> {self._gen_swift_result_type(method_def)}"
+            throws = method_def.error_enum is not None
+            args = ", ".join(
+                [f"{ensure_camel(p.name)}: {ensure_camel(p.name)}" for p in method_def.parameters]
+            )
+            m_block = ctx.push_block(
+                f"public {static}func {ensure_camel(method_def.async_name)}"
+                f"({self._gen_swift_params(method_def)}) async{' throws' if throws else ''}{returns} {{",
+                indent=True,
+                post_pop_lines="}",
+            )
+            try_ = "try " if throws else ""
+            ctx.add_lines(
+                f"{try_}await Task.detached {{ {try_}{target}.{ensure_camel(method_def.name)}({args}) }}.value"
+            )
+            ctx.pop_block(m_block)
+        ctx.pop_block(ext_block)
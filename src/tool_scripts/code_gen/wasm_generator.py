@@ -14,7 +14,9 @@ from api_def import (
     PrimitiveType,
     RefType,
     StructDef,
+    TypedNamed,
     get_type,
+    ensure_snake,
 )
 from generator import Generator, GenCtx, BlockCtx
 from cpp_generator import CppGenerator
@@ -23,26 +25,43 @@ from cpp_generator import CppGenerator
 class WasmBindingGenerator(CppGenerator):
     generates_header = False
     generates_source = True
+    supports_shards = True
 
     def __init__(self, api: ApiDef, *, gen_version: str, api_h: str):
         super().__init__(api, gen_version=gen_version)
         self.api_h = api_h
 
     # https://emscripten.org/docs/porting/connecting_cpp_and_javascript/embind.html
+    def _source_includes(self) -> [str]:
+        api_util = ["api/api_util.h"] if self._uses_api_util else []
+        return [self.api_h] + api_util + ["<emscripten/bind.h>"]
+
     def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
         ctx = src_ctx
-        self._include([self.api_h, "core/core.h", "api/api_util.h", "<emscripten/bind.h>"], ctx=ctx)
+        self._include(self._source_includes(), ctx=ctx)
         ctx.add_lines([f"using namespace {self.api_ns};", ""])
+        if self._uses_typed_arrays():
+            self._gen_typed_array_helpers(ctx=ctx)
+        if self.api.error_enums:
+            self._gen_error_helpers(ctx=ctx)
+        # one registration block per shard - types shared by classes are registered once,
+        # with the functions
+        name = self.api.name
+        if self._shard is not None:
+            name = f"{name}_{ensure_snake(self._shard.name)}"
         bindings_block = ctx.push_block(
-            f"EMSCRIPTEN_BINDINGS({self.api.name}) {{",
+            f"EMSCRIPTEN_BINDINGS({name}) {{",
             post_pop_lines="} // EMSCRIPTEN_BINDINGS",
             indent=True,
         )
 
-        self._gen_struct_bindings(ctx=ctx)
+        if self._in_shard():
+            self._gen_struct_bindings(ctx=ctx)
         self._gen_class_bindings(ctx=ctx)
-        self._gen_function_bindings(ctx=ctx)
-        self._gen_collection_registration(ctx=ctx)
+        if self._in_shard():
+            self._gen_function_bindings(ctx=ctx)
+            self._gen_collection_registration(ctx=ctx)
+            self._gen_stream_registration(ctx=ctx)
 
         ctx.pop_block(bindings_block)
 
@@ -60,13 +79,24 @@ class WasmBindingGenerator(CppGenerator):
             indent=True,
         )
         for member in struct_def.members:
-            ctx.add_lines(f'.field("{member.name}", &{struct_def.name}::{member.name})')
+            if self._is_typed_array(member):
+                sn = struct_def.name
+                ctx.add_lines(
+                    [
+                        f'.field("{member.name}",',
+                        f"  +[](const {sn}& s) {{ return typed_copy(s.{member.name}); }},",
+                        f"  +[]({sn}& s, emscripten::val v) {{ assign_typed_array(s.{member.name}, v); }})",
+                    ]
+                )
+            else:
+                ctx.add_lines(f'.field("{member.name}", &{struct_def.name}::{member.name})')
         ctx.pop_block(sd_block)
 
     def _gen_class_bindings(self, *, ctx: GenCtx):
-        if self.api.classes:
+        classes = [c for c in self.api.classes if self._in_shard(c)]
+        if classes:
             self._add_comment("class bindings", ctx=ctx)
-            for class_def in self.api.classes:
+            for class_def in classes:
                 self._gen_class_binding(class_def, ctx=ctx)
 
     def _gen_class_binding(self, class_def: ClassDef, *, ctx: GenCtx):
@@ -116,14 +146,13 @@ class WasmBindingGenerator(CppGenerator):
                     f"binding static method {class_def.name}::{method.name} not supported."
                 )
             return
-        return_value_policy = (
-            ""
-            if (method.is_primitive and not method.is_string)
-            else ", emscripten::return_value_policy::take_ownership()"
-        )
-        ctx.add_lines(
-            f'.function("{method.name}", &{class_def.name}::{method.name}{return_value_policy})'
-        )
+        return_value_policy = self._gen_return_value_policy(method)
+        if self._needs_override(method):
+            self_param = f"{'const ' if method.is_const_method else ''}{class_def.name}& self"
+            target = self._gen_override(method, call=f"self.{method.name}", self_param=self_param)
+        else:
+            target = f"&{class_def.name}::{method.name}"
+        ctx.add_lines(f'.function("{method.name}", {target}{return_value_policy})')
 
     def _gen_function_bindings(self, *, ctx: GenCtx):
         if self.api.functions:
@@ -133,30 +162,1524 @@ class WasmBindingGenerator(CppGenerator):
 
     def _gen_func_binding(self, func_def: FunctionDef, *, ctx: GenCtx):
         fname = f"{self.api.name}_{func_def.name}"
-        return_value_policy = (
-            ""
-            if (func_def.is_primitive and not func_def.is_string)
-            else ", emscripten::return_value_policy::take_ownership()"
+        return_value_policy = self._gen_return_value_policy(func_def)
+        if self._needs_override(func_def):
+            target = self._gen_override(func_def, call=fname)
+        else:
+            target = f"&{fname}"
+        ctx.add_lines(f'emscripten::function("{fname}", {target}{return_value_policy});')
+
+    def _gen_return_value_policy(self, callable_def: TypedNamed) -> str:
+        if (
+            self._is_stream(callable_def)
+            or callable_def.error_enum is not None
+            or (callable_def.is_primitive and not callable_def.is_string)
+            or self._is_typed_array(callable_def)
+            or self._is_js_array(callable_def)
+        ):
+            return ""
+        return ", emscripten::return_value_policy::take_ownership()"
+
+    @staticmethod
+    def _is_typed_array_element(type_obj: BaseType) -> bool:
+        # numeric primitives with a matching JS TypedArray. 64 bit ints would need BigInt64Array.
+        type_obj = type_obj.resolved_type_obj
+        return (
+            type_obj.is_primitive
+            and type_obj.is_number
+            and not (type_obj.is_int and type_obj.name.endswith("64"))
+        )
+
+    @staticmethod
+    def _is_typed_array(typed: TypedNamed) -> bool:
+        return (typed.is_list or typed.is_array) and WasmBindingGenerator._is_typed_array_element(
+            typed.type_obj
+        )
+
+    @staticmethod
+    def _is_js_array(typed: TypedNamed, callable_def: Optional[TypedNamed] = None) -> bool:
+        # batch lists cross as plain JS arrays so they can be built, sliced and posted to
+        # workers without registered vector wrappers
+        callable_def = callable_def or typed
+        return (
+            isinstance(callable_def, MethodDef)
+            and callable_def.batch_source is not None
+            and typed.is_list
+            and not WasmBindingGenerator._is_typed_array(typed)
+        )
+
+    @staticmethod
+    def _is_stream(callable_def: TypedNamed) -> bool:
+        return isinstance(callable_def, MethodDef) and callable_def.is_stream
+
+    def _needs_override(self, callable_def: TypedNamed) -> bool:
+        return (
+            self._is_stream(callable_def)
+            or callable_def.error_enum is not None
+            or self._is_typed_array(callable_def)
+            or self._is_js_array(callable_def)
+            or any(
+                p.is_borrowed or self._is_typed_array(p) or self._is_js_array(p, callable_def)
+                for p in callable_def.parameters
+            )
+        )
+
+    def _gen_container_typename(self, typed: TypedNamed) -> str:
+        tn = self._gen_typename(typed.type_obj)
+        return f"std::array<{tn}, {typed.array_count}>" if typed.is_array else f"std::vector<{tn}>"
+
+    def _gen_override(
+        self, callable_def: TypedNamed, *, call: str, self_param: Optional[str] = None
+    ) -> str:
+        # embind marshals a JS string, Uint8Array or ArrayBuffer into std::string with a single
+        # copy into the wasm heap - the view handed to the implementation borrows that buffer.
+        # numeric lists cross as TypedArrays with one bulk copy in and a heap view out.
+        params = [self_param] if self_param else []
+        args = []
+        for param_def in callable_def.parameters:
+            if param_def.is_packed_string_list:
+                # a plain JS array of strings, packed once on the wasm side
+                params.append(f"const emscripten::val& {param_def.name}")
+                args.append(
+                    "bng::api::PackedStrings("
+                    f"emscripten::vecFromJSArray<std::string>({param_def.name})).views()"
+                )
+            elif param_def.is_borrowed:
+                params.append(f"const std::string& {param_def.name}")
+                if param_def.is_bytes:
+                    args.append(
+                        f"{self._gen_typename(param_def.type_obj)}"
+                        f"((const uint8_t*){param_def.name}.data(), {param_def.name}.size())"
+                    )
+                else:
+                    args.append(f"std::string_view({param_def.name})")
+            elif self._is_typed_array(param_def):
+                params.append(f"const emscripten::val& {param_def.name}")
+                args.append(
+                    f"from_typed_array<{self._gen_container_typename(param_def)}>({param_def.name})"
+                )
+            elif self._is_js_array(param_def, callable_def):
+                params.append(f"const emscripten::val& {param_def.name}")
+                args.append(
+                    f"emscripten::vecFromJSArray<{self._gen_typename(param_def.type_obj)}>"
+                    f"({param_def.name})"
+                )
+            else:
+                params.append(self._gen_param(param_def))
+                args.append(param_def.name)
+        invocation = f"{call}({', '.join(args)})"
+        error_check = ""
+        if callable_def.error_enum is not None:
+            # failures come back as Error objects rather than thrown - a JS throw would skip
+            # the destructors of the arguments embind owns
+            if callable_def.is_void:
+                body = (
+                    f"auto error = {invocation}; return error == {callable_def.error_enum_obj.name}{{}} "
+                    "? emscripten::val::undefined() : api_error(error);"
+                )
+                return f"emscripten::optional_override([]({', '.join(params)}) {{ {body} }})"
+            error_check = (
+                f"auto expected = {invocation}; "
+                "if (!expected) { return api_error(expected.error()); } "
+            )
+            invocation = "std::move(expected).value()"
+        if self._is_stream(callable_def):
+            # the JS side pulls items with next()/item() and must delete() the cursor
+            cursor = f"std::make_unique<{self._gen_cursor_typename(callable_def)}>({invocation})"
+            body = f"return emscripten::val({cursor});" if error_check else f"return {cursor};"
+        elif self._is_js_array(callable_def):
+            body = f"return emscripten::val::array({invocation});"
+        elif not self._is_typed_array(callable_def):
+            body = (
+                f"return emscripten::val({invocation});" if error_check else f"return {invocation};"
+            )
+        elif callable_def.ref_type == RefType.non_optional:
+            # view over storage owned by the callee
+            body = f"return typed_view({invocation});"
+        else:
+            # view over a per-binding result buffer, valid until the next call
+            body = (
+                f"static {self._gen_container_typename(callable_def)} result; "
+                f"result = {invocation}; return typed_view(result);"
+            )
+        return f"emscripten::optional_override([]({', '.join(params)}) {{ {error_check}{body} }})"
+
+    def _gen_error_helpers(self, *, ctx: GenCtx):
+        ns_block = ctx.push_block("namespace {", indent=True, post_pop_lines="} // namespace\n")
+        ctx.add_lines(
+            [
+                "// JS Error for a failed error_enum call, named after the enum value",
+                "template <typename E>",
+                "emscripten::val api_error(E error) {",
+                '  auto js_error = emscripten::val::global("Error").new_(emscripten::val(error_name(error)));',
+                '  js_error.set("code", static_cast<int>(error));',
+                "  return js_error;",
+                "}",
+            ]
         )
-        ctx.add_lines(f'emscripten::function("{fname}", &{fname}{return_value_policy});')
+        ctx.pop_block(ns_block)
+
+    def _uses_typed_arrays(self) -> bool:
+        return any(
+            self._is_typed_array_element(t)
+            for t in list(self.api.types_used_in_list) + list(self.api.type_array_counts.keys())
+        )
+
+    def _gen_typed_array_helpers(self, *, ctx: GenCtx):
+        self._add_comment(
+            "numeric list/array <-> TypedArray marshalling.\n"
+            "views alias the wasm heap - they are invalidated by memory growth and must be\n"
+            "copied (e.g. .slice()) if kept beyond the next call into the module.",
+            ctx=ctx,
+        )
+        ns_block = ctx.push_block("namespace {", indent=True, post_pop_lines="} // namespace\n")
+        ctx.add_lines(
+            [
+                "template <typename C>",
+                "emscripten::val typed_view(const C& c) {",
+                "  return emscripten::val(emscripten::typed_memory_view(c.size(), c.data()));",
+                "}",
+                "",
+                "template <typename C>",
+                "emscripten::val typed_copy(const C& c) {",
+                '  return typed_view(c).template call<emscripten::val>("slice");',
+                "}",
+                "",
+                "template <typename C>",
+                "void assign_typed_array(C& c, const emscripten::val& typed_array) {",
+                "  if constexpr (requires { c.resize(0); }) {",
+                '    c.resize(typed_array["length"].as<size_t>());',
+                "  }",
+                "  // single bulk copy into the wasm heap",
+                '  typed_view(c).template call<void>("set", typed_array);',
+                "}",
+                "",
+                "template <typename C>",
+                "C from_typed_array(const emscripten::val& typed_array) {",
+                "  C c{};",
+                "  assign_typed_array(c, typed_array);",
+                "  return c;",
+                "}",
+            ]
+        )
+        ctx.pop_block(ns_block)
 
     def _gen_collection_registration(self, *, ctx: GenCtx):
-        if self.api.types_used_in_list or self.api.type_array_counts:
-            if used_in_list := self.api.types_used_in_list:
-                ctx.add_lines("")
-                self._add_comment("register list usages", ctx=ctx)
-                for lt in used_in_list:
-                    ltn = self._gen_typename(lt)
-                    ctx.add_lines(f'emscripten::register_vector<{ltn}>("{ltn}Vector");')
-
-            if self.api.type_array_counts:
-                ctx.add_lines("")
-                self._add_comment("register array usages", ctx=ctx)
-                for at, counts in self.api.type_array_counts.items():
-                    atn = self._gen_typename(at)
-                    for count in counts:
-                        array_decl = f'emscripten::value_array<std::array<{atn}, {count}>>("array_{at.name}_{count}")'
-                        array_block = ctx.push_block(array_decl, post_pop_lines=";", indent=True)
-                        for i in range(count):
-                            ctx.add_lines(f".element(emscripten::index<{i}>())")
-                        ctx.pop_block(array_block)
+        # numeric element types cross as TypedArrays and need no embind registration
+        # string_view lists are packed from plain JS arrays - views can't be registered
+        used_in_list = [
+            lt
+            for lt in self.api.types_used_in_list
+            if not self._is_typed_array_element(lt) and not lt.is_string_view
+        ]
+        type_array_counts = {
+            at: counts
+            for at, counts in self.api.type_array_counts.items()
+            if not self._is_typed_array_element(at)
+        }
+        if used_in_list:
+            ctx.add_lines("")
+            self._add_comment("register list usages", ctx=ctx)
+            for lt in used_in_list:
+                ltn = self._gen_typename(lt)
+                ctx.add_lines(f'emscripten::register_vector<{ltn}>("{ltn}Vector");')
+
+        if type_array_counts:
+            ctx.add_lines("")
+            self._add_comment("register array usages", ctx=ctx)
+            for at, counts in type_array_counts.items():
+                atn = self._gen_typename(at)
+                for count in counts:
+                    array_decl = f'emscripten::value_array<std::array<{atn}, {count}>>("array_{at.name}_{count}")'
+                    array_block = ctx.push_block(array_decl, post_pop_lines=";", indent=True)
+                    for i in range(count):
+                        ctx.add_lines(f".element(emscripten::index<{i}>())")
+                    ctx.pop_block(array_block)
+
+    def _gen_cursor_typename(self, method_def: MethodDef) -> str:
+        return f"bng::api::StreamCursor<{self._gen_typename(method_def.type_obj)}>"
+
+    def _gen_stream_registration(self, *, ctx: GenCtx):
+        # one cursor class per stream item type
+        cursors = {}
+        for class_def in self.api.classes:
+            for method_def in class_def.methods:
+                if method_def.is_stream:
+                    cursors.setdefault(self._gen_cursor_typename(method_def), method_def.type_obj)
+        if cursors:
+            ctx.add_lines("")
+            self._add_comment("register stream cursors", ctx=ctx)
+        for ctn, type_obj in cursors.items():
+            cursor_block = ctx.push_block(
+                f'emscripten::class_<{ctn}>("{type_obj.name}StreamCursor")',
+                post_pop_lines=";",
+                indent=True,
+            )
+            ctx.add_lines(
+                [
+                    f'.function("next", &{ctn}::next)',
+                    f'.function("item", emscripten::optional_override([](const {ctn}& c) {{ return c.item; }}))',
+                ]
+            )
+            ctx.pop_block(cursor_block)
+
+
+class FlatLeaf:
+    """
+    a scalar, string or list value reached by flattening a parameter through struct members
+    and array elements. raw bindings pass each leaf as one or more plain C arguments.
+    """
+
+    def __init__(self, *, c_name: str, cpp_path: str, js_path: str, typed: TypedNamed):
+        self.c_name = c_name
+        self.cpp_path = cpp_path
+        self.js_path = js_path
+        self.typed = typed
+
+    @property
+    def type_obj(self) -> BaseType:
+        return self.typed.resolved_type_obj
+
+    @property
+    def is_list(self) -> bool:
+        return self.typed.is_list
+
+    @property
+    def is_text(self) -> bool:
+        return self.type_obj.is_string or self.type_obj.is_string_view
+
+    @property
+    def is_struct_list(self) -> bool:
+        # only blittable structs are flattened as lists - the JS glue writes their bytes
+        return self.is_list and isinstance(self.type_obj, StructDef)
+
+
+def flatten_typed(
+    typed: TypedNamed, *, c_name: str, cpp_path: str, js_path: str, is_element: bool = False
+) -> [FlatLeaf]:
+    type_obj = typed.resolved_type_obj
+    if typed.is_array and not is_element:
+        leaves = []
+        for i in range(typed.array_count):
+            leaves.extend(
+                flatten_typed(
+                    typed,
+                    c_name=f"{c_name}_{i}",
+                    cpp_path=f"{cpp_path}[{i}]",
+                    js_path=f"{js_path}[{i}]",
+                    is_element=True,
+                )
+            )
+        return leaves
+    if isinstance(type_obj, StructDef) and not typed.is_list:
+        leaves = []
+        for member_def in type_obj.members:
+            leaves.extend(
+                flatten_typed(
+                    member_def,
+                    c_name=f"{c_name}_{member_def.name}",
+                    cpp_path=f"{cpp_path}.{member_def.name}",
+                    js_path=f"{js_path}.{member_def.name}",
+                )
+            )
+        return leaves
+    if isinstance(type_obj, ClassDef):
+        raise ValueError(f"{typed} - passing class instances not supported by raw wasm binding")
+    if typed.is_list and not (
+        type_obj.is_number_or_bool
+        or type_obj.is_string
+        or type_obj.is_string_view
+        or (isinstance(type_obj, StructDef) and type_obj.is_blittable)
+    ):
+        raise ValueError(
+            f"{typed} - only numeric, string and blittable struct lists supported by raw wasm binding"
+        )
+    return [FlatLeaf(c_name=c_name, cpp_path=cpp_path, js_path=js_path, typed=typed)]
+
+
+def blittable_list_structs(api: ApiDef, callables: [TypedNamed]) -> [StructDef]:
+    """structs the raw JS glue writes into wasm memory for list parameters"""
+    used = [
+        p.resolved_type_obj
+        for c in callables
+        for p in c.parameters
+        if p.is_list and isinstance(p.resolved_type_obj, StructDef)
+    ]
+    return [s for s in api.structs if s in used and s.is_blittable]
+
+
+class WasmRawBindingGenerator(CppGenerator):
+    """
+    alternative to the embind binding - plain EMSCRIPTEN_KEEPALIVE C functions taking flattened
+    arguments. no embind runtime or registration work at instantiation. the JS facing classes
+    come from WasmRawJsGenerator.
+    """
+
+    generates_header = False
+    generates_source = True
+    supports_shards = True
+
+    def __init__(self, api: ApiDef, *, gen_version: str, api_h: str):
+        super().__init__(api, gen_version=gen_version)
+        self.api_h = api_h
+
+    def _source_includes(self) -> [str]:
+        layouts = ["cstddef"] if blittable_list_structs(self.api, self._callables()) else []
+        return [self.api_h, "api/api_util.h"] + layouts + ["<emscripten/emscripten.h>"]
+
+    def _stats_entries(self) -> [str]:
+        # the exports _gen_export makes - batches are looped by the JS glue
+        names = []
+        for class_def in self.api.classes:
+            names += [
+                self.export_name(m, class_def) for m in class_def.methods if m.batch_source is None
+            ]
+        return names + [self.export_name(func_def) for func_def in self.api.functions]
+
+    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
+        ctx = src_ctx
+        self._include(self._source_includes(), ctx=ctx)
+        ctx.add_lines([f"using namespace {self.api_ns};", ""])
+        for struct_def in blittable_list_structs(self.api, self._shard_callables()):
+            self._gen_layout_check(struct_def, ctx=ctx)
+        self._gen_stats_table(ctx=ctx)
+        ec_block = self._push_extern_c_block(ctx)
+        for class_def in self.api.classes:
+            if self._in_shard(class_def):
+                self._gen_class_exports(class_def, ctx=ctx)
+        if self._in_shard():
+            for func_def in self.api.functions:
+                self._gen_export(
+                    func_def, export_name=self.export_name(func_def), call=func_def.name, ctx=ctx
+                )
+            self._gen_stats_accessor(ctx=ctx, export="EMSCRIPTEN_KEEPALIVE ")
+        ctx.pop_block(ec_block)
+
+    @staticmethod
+    def export_prefix(api: ApiDef, class_def: Optional[ClassDef] = None) -> str:
+        if class_def is None:
+            return api.name
+        return f"{api.name}_{ensure_snake(class_def.name)}"
+
+    def export_name(self, callable_def: TypedNamed, class_def: Optional[ClassDef] = None) -> str:
+        return f"{self.export_prefix(self.api, class_def)}_{callable_def.name}"
+
+    @staticmethod
+    def _handle_type(class_def: ClassDef) -> str:
+        factory = class_def.static_factory
+        if factory is None or factory.ref_type == RefType.raw:
+            return f"{class_def.name}*"
+        return f"std::{factory.ref_type}_ptr<{class_def.name}>*"
+
+    @staticmethod
+    def _self_expr(class_def: ClassDef) -> str:
+        factory = class_def.static_factory
+        if factory is None or factory.ref_type == RefType.raw:
+            return "self->"
+        return "(*self)->"
+
+    def _gen_class_exports(self, class_def: ClassDef, *, ctx: GenCtx):
+        handle_type = self._handle_type(class_def)
+        prefix = self.export_prefix(self.api, class_def)
+        factory = class_def.static_factory
+        for method_def in class_def.methods:
+            if method_def.is_static and method_def is not factory:
+                raise Exception(
+                    f"binding static method {class_def.name}::{method_def.name} not supported."
+                )
+            if method_def is factory:
+                self._gen_factory_export(method_def, class_def=class_def, ctx=ctx)
+            elif method_def.batch_source is not None:
+                # list<struct> params don't flatten - the JS glue loops the single call export
+                continue
+            else:
+                self._gen_export(
+                    method_def,
+                    export_name=self.export_name(method_def, class_def),
+                    call=f"{self._self_expr(class_def)}{method_def.name}",
+                    self_param=f"{handle_type} self",
+                    ctx=ctx,
+                )
+                if method_def.is_stream:
+                    self._gen_cursor_exports(method_def, class_def=class_def, ctx=ctx)
+        block = ctx.push_block(
+            f"EMSCRIPTEN_KEEPALIVE void {prefix}_destroy({handle_type} self) {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        ctx.add_lines("delete self;")
+        ctx.pop_block(block)
+
+    def _gen_factory_export(self, factory: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
+        handle_type = self._handle_type(class_def)
+        if factory.ref_type == RefType.raw:
+            create = f"{class_def.name}::{factory.name}"
+        else:
+            create = f"new std::{factory.ref_type}_ptr<{class_def.name}>({class_def.name}::{factory.name}"
+        self._gen_export(
+            factory,
+            export_name=self.export_name(factory, class_def),
+            call=create,
+            return_type=handle_type,
+            close_call=")" if factory.ref_type != RefType.raw else "",
+            ctx=ctx,
+        )
+
+    def _gen_layout_check(self, struct_def: StructDef, *, ctx: GenCtx):
+        offsets, size = struct_def.blittable_layout()
+        self._gen_static_assert(
+            [f"sizeof({struct_def.name}) == {size}"]
+            + [
+                f"offsetof({struct_def.name}, {m.name}) == {offset}"
+                for m, offset in zip(struct_def.layout_members, offsets)
+            ],
+            f"the JS glue writes {struct_def.name} list items at these offsets",
+            ctx=ctx,
+        )
+        ctx.add_lines("")
+
+    def _gen_leaf_params(self, leaf: FlatLeaf) -> [str]:
+        name = leaf.c_name
+        size_tn = self._gen_typename(get_type("uint32"))
+        if leaf.is_list:
+            if leaf.is_text:
+                return [
+                    f"const char* {name}",
+                    f"const {size_tn}* {name}_offsets",
+                    f"{size_tn} {name}_count",
+                ]
+            return [
+                f"const {self._gen_flat_typename(leaf.type_obj)}* {name}",
+                f"{size_tn} {name}_count",
+            ]
+        if leaf.is_text:
+            return [f"const char* {name}", f"{size_tn} {name}_size"]
+        if leaf.type_obj.is_bytes:
+            return [f"const uint8_t* {name}", f"{size_tn} {name}_size"]
+        return [f"{self._gen_flat_typename(leaf.type_obj)} {name}"]
+
+    def _gen_leaf_bytes(self, leaf: FlatLeaf) -> str:
+        name = leaf.c_name
+        if leaf.is_list:
+            if leaf.is_text:
+                return self._gen_text_list_bytes(name)
+            return f"sizeof(*{name}) * {name}_count"
+        if leaf.is_text or leaf.type_obj.is_bytes:
+            return f"{name}_size"
+        return f"sizeof({name})"
+
+    def _gen_flat_typename(self, type_obj: BaseType) -> str:
+        if isinstance(type_obj, EnumDef):
+            return self._gen_typename(type_obj.resolved_base_type_obj)
+        return self._gen_typename(type_obj)
+
+    def _gen_leaf_value(self, leaf: FlatLeaf) -> str:
+        name = leaf.c_name
+        type_obj = leaf.type_obj
+        if leaf.is_list and leaf.is_text:
+            return f"bng::api::StringViews({name}, {name}_offsets, {name}_count)"
+        if leaf.is_list:
+            return f"{{{name}, {name} + {name}_count}}"
+        if type_obj.is_string:
+            return f"std::string({name}, {name}_size)"
+        if type_obj.is_string_view:
+            return f"std::string_view({name}, {name}_size)"
+        if type_obj.is_bytes:
+            return f"{self._gen_typename(type_obj)}({name}, {name}_size)"
+        if isinstance(type_obj, EnumDef):
+            return f"{type_obj.name}({name})"
+        return name
+
+    def _gen_leaf_assign(self, leaf: FlatLeaf, lvalue: str, *, ctx: GenCtx):
+        if leaf.is_list and leaf.is_text and leaf.type_obj.is_string:
+            name = leaf.c_name
+            ctx.add_lines(
+                [
+                    f"{lvalue}.reserve({name}_count);",
+                    f"for (auto s : {self._gen_leaf_value(leaf)}) {{ {lvalue}.emplace_back(s); }}",
+                ]
+            )
+        else:
+            ctx.add_lines(f"{lvalue} = {self._gen_leaf_value(leaf)};")
+
+    def _gen_export(
+        self,
+        callable_def: TypedNamed,
+        *,
+        export_name: str,
+        call: str,
+        ctx: GenCtx,
+        self_param: Optional[str] = None,
+        return_type: Optional[str] = None,
+        close_call: str = "",
+    ):
+        params = [self_param] if self_param else []
+        param_leaves = []
+        for param_def in callable_def.parameters:
+            leaves = flatten_typed(
+                param_def, c_name=param_def.name, cpp_path=param_def.name, js_path=param_def.name
+            )
+            param_leaves.append((param_def, leaves))
+            for leaf in leaves:
+                params.extend(self._gen_leaf_params(leaf))
+
+        size_tn = self._gen_typename(get_type("uint32"))
+        result_kind = self.result_kind(callable_def)
+        if return_type is None:
+            if result_kind == "text":
+                return_type = "const char*"
+                params.append(f"{size_tn}* out_size")
+            elif result_kind == "typed_list":
+                return_type = f"const {self._gen_typename(callable_def.type_obj)}*"
+                params.append(f"{size_tn}* out_count")
+            elif result_kind == "stream":
+                return_type = f"{self._gen_cursor_typename(callable_def)}*"
+            else:
+                return_type = self._gen_flat_typename(callable_def.resolved_type_obj)
+        error_enum = callable_def.error_enum_obj
+        if error_enum is not None:
+            params.append(f"{self._gen_flat_typename(error_enum)}* out_error")
+
+        block = ctx.push_block(
+            f"EMSCRIPTEN_KEEPALIVE {return_type} {export_name}({', '.join(params)}) {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        self._gen_stats_hook(
+            export_name,
+            [self._gen_leaf_bytes(leaf) for _, leaves in param_leaves for leaf in leaves],
+            ctx=ctx,
+        )
+        args = []
+        for param_def, leaves in param_leaves:
+            if len(leaves) == 1 and leaves[0].cpp_path == param_def.name:
+                leaf = leaves[0]
+                if leaf.is_list and leaf.type_obj.is_string:
+                    ctx.add_lines(f"std::vector<std::string> {param_def.name}_arg;")
+                    self._gen_leaf_assign(leaf, f"{param_def.name}_arg", ctx=ctx)
+                    args.append(f"{param_def.name}_arg")
+                elif leaf.is_list and not leaf.is_text:
+                    args.append(
+                        f"std::vector<{self._gen_typename(leaf.typed.type_obj)}>{self._gen_leaf_value(leaf)}"
+                    )
+                else:
+                    args.append(self._gen_leaf_value(leaf))
+            else:
+                ctx.add_lines(f"{self._gen_typename(param_def.type_obj)} {param_def.name}_arg{{}};")
+                for leaf in leaves:
+                    lvalue = f"{param_def.name}_arg{leaf.cpp_path[len(param_def.name):]}"
+                    self._gen_leaf_assign(leaf, lvalue, ctx=ctx)
+                args.append(f"{param_def.name}_arg")
+
+        invocation = f"{call}({', '.join(args)}){close_call}"
+        if error_enum is not None:
+            error_tn = self._gen_flat_typename(error_enum)
+            if callable_def.is_void:
+                ctx.add_lines(f"*out_error = {error_tn}({invocation});")
+                ctx.pop_block(block)
+                return
+            ctx.add_lines(
+                [
+                    f"auto expected = {invocation};",
+                    f"*out_error = {error_tn}(expected.error());",
+                    "if (!expected) {",
+                    "  return {};",
+                    "}",
+                ]
+            )
+            invocation = "std::move(expected).value()"
+        if result_kind == "text":
+            ctx.add_lines(
+                [
+                    "// result storage lives until the next call - the JS glue decodes it first",
+                    "static std::string result;",
+                    f"result = {invocation};",
+                    "*out_size = uint32_t(result.size());",
+                    "return result.c_str();",
+                ]
+            )
+        elif result_kind == "typed_list":
+            ctx.add_lines(
+                [
+                    f"static {self._gen_container_typename(callable_def)} result;",
+                    f"result = {invocation};",
+                    "*out_count = uint32_t(result.size());",
+                    "return result.data();",
+                ]
+            )
+        elif result_kind == "stream":
+            ctx.add_lines(f"return new {self._gen_cursor_typename(callable_def)}({invocation});")
+        elif callable_def.is_void:
+            ctx.add_lines(f"{invocation};")
+        elif isinstance(callable_def.resolved_type_obj, EnumDef):
+            ctx.add_lines(f"return {return_type}({invocation});")
+        else:
+            ctx.add_lines(f"return {invocation};")
+        ctx.pop_block(block)
+
+    def _gen_container_typename(self, typed: TypedNamed) -> str:
+        tn = self._gen_typename(typed.type_obj)
+        return f"std::array<{tn}, {typed.array_count}>" if typed.is_array else f"std::vector<{tn}>"
+
+    def _gen_cursor_typename(self, method_def: MethodDef) -> str:
+        return f"bng::api::StreamCursor<{self._gen_typename(method_def.type_obj)}>"
+
+    def _gen_cursor_exports(self, method_def: MethodDef, *, class_def: ClassDef, ctx: GenCtx):
+        export_name = self.export_name(method_def, class_def)
+        cursor_param = f"{self._gen_cursor_typename(method_def)}* cursor"
+        item_kind = self.result_kind(self.stream_item(method_def))
+        ctx.add_lines(
+            [
+                f"EMSCRIPTEN_KEEPALIVE bool {export_name}_next({cursor_param}) {{",
+                "  return cursor->next();",
+                "}",
+                "",
+            ]
+        )
+        if item_kind == "text":
+            size_tn = self._gen_typename(get_type("uint32"))
+            ctx.add_lines(
+                [
+                    f"EMSCRIPTEN_KEEPALIVE const char* {export_name}_item({cursor_param}, {size_tn}* out_size) {{",
+                    "  *out_size = uint32_t(cursor->item.size());",
+                    "  return cursor->item.c_str();",
+                    "}",
+                    "",
+                ]
+            )
+        elif item_kind in ("number", "bool"):
+            item_tn = self._gen_flat_typename(method_def.resolved_type_obj)
+            ctx.add_lines(
+                [
+                    f"EMSCRIPTEN_KEEPALIVE {item_tn} {export_name}_item({cursor_param}) {{",
+                    f"  return {item_tn}(cursor->item);",
+                    "}",
+                    "",
+                ]
+            )
+        else:
+            raise ValueError(f"{method_def} - stream item type not supported by raw wasm binding")
+        ctx.add_lines(
+            [
+                f"EMSCRIPTEN_KEEPALIVE void {export_name}_destroy({cursor_param}) {{",
+                "  delete cursor;",
+                "}",
+                "",
+            ]
+        )
+
+    @staticmethod
+    def stream_item(method_def: MethodDef) -> FunctionDef:
+        """single value callable standing in for the items of a stream"""
+        return FunctionDef(name=f"{method_def.name}_item", type=method_def.type)
+
+    @staticmethod
+    def result_kind(callable_def: TypedNamed) -> str:
+        type_obj = callable_def.resolved_type_obj
+        if isinstance(callable_def, MethodDef) and callable_def.is_factory:
+            return "handle"
+        if isinstance(callable_def, MethodDef) and callable_def.is_stream:
+            return "stream"
+        if callable_def.is_list or callable_def.is_array:
+            if type_obj.is_primitive and type_obj.is_number_or_bool:
+                return "typed_list"
+            raise ValueError(f"{callable_def} - only numeric list returns supported by raw wasm")
+        if type_obj.is_string:
+            return "text"
+        if type_obj.is_void:
+            return "void"
+        if type_obj.is_number_or_bool:
+            return "bool" if type_obj.is_bool else "number"
+        raise ValueError(f"{callable_def} - return type not supported by raw wasm binding")
+
+
+class WasmRawJsGenerator(Generator):
+    """
+    ES module wrapping the WasmRawBindingGenerator exports into the same classes embind exposes.
+    usage: const api = bindApi(await createBngWasmModule()); const engine = new api.EngineInterface()
+    the module must export _malloc, _free, HEAPU8 and HEAPU32.
+    """
+
+    generates_header = False
+    generates_source = True
+
+    _typed_array_ctors = {
+        "bool": "Uint8Array",
+        "int8": "Int8Array",
+        "uint8": "Uint8Array",
+        "int16": "Int16Array",
+        "uint16": "Uint16Array",
+        "int32": "Int32Array",
+        "uint32": "Uint32Array",
+        "int64": "BigInt64Array",
+        "uint64": "BigUint64Array",
+        "intptr": "Int32Array",
+        "float32": "Float32Array",
+        "float64": "Float64Array",
+    }
+
+    def __init__(self, api: ApiDef, *, gen_version: str):
+        super().__init__(api, gen_version=gen_version)
+
+    _comment = CppGenerator._comment
+
+    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
+        ctx = src_ctx
+        ctx.add_lines(
+            ["const encoder = new TextEncoder()", "const decoder = new TextDecoder()", ""]
+        )
+        if self.api.error_enums:
+            self._gen_error_helpers(ctx=ctx)
+        bind_block = ctx.push_block(
+            "export function bindApi(wasm) {", indent=True, post_pop_lines="}"
+        )
+        self._gen_marshalling_helpers(ctx=ctx)
+        callables = list(self.api.functions) + [m for c in self.api.classes for m in c.methods]
+        for struct_def in blittable_list_structs(self.api, callables):
+            self._gen_struct_list_writer(struct_def, ctx=ctx)
+        names = []
+        for class_def in self.api.classes:
+            self._gen_class(class_def, ctx=ctx)
+            names.append(class_def.name)
+        for func_def in self.api.functions:
+            self._gen_function(func_def, ctx=ctx)
+            names.append(self._function_name(func_def))
+        ctx.add_lines(f"return {{ {', '.join(names)} }}")
+        ctx.pop_block(bind_block)
+
+    @staticmethod
+    def _error_names(enum_def: EnumDef) -> str:
+        return f"{enum_def.name}Names"
+
+    def _gen_error_helpers(self, *, ctx: GenCtx):
+        for enum_def in self.api.error_enums:
+            names = ", ".join([f'{m.value}: "{m.name}"' for m in enum_def.members])
+            ctx.add_lines(f"const {self._error_names(enum_def)} = {{ {names} }}")
+        ctx.add_lines(
+            [
+                "",
+                "// failed error_enum calls return an Error, like the embind binding",
+                "function apiError(names, code) {",
+                "  const error = new Error(names[code] ?? `error ${code}`)",
+                "  error.code = code",
+                "  return error",
+                "}",
+                "",
+            ]
+        )
+
+    def _gen_marshalling_helpers(self, *, ctx: GenCtx):
+        ctx.add_lines(
+            [
+                "// scratch words for size and error out-params",
+                "const scratch = wasm._malloc(8)",
+                "",
+                "function putBytes(allocs, bytes) {",
+                "  bytes = bytes instanceof Uint8Array ? bytes : new Uint8Array(bytes)",
+                "  const ptr = wasm._malloc(bytes.length || 1)",
+                "  allocs.push(ptr)",
+                "  wasm.HEAPU8.set(bytes, ptr)",
+                "  return [ptr, bytes.length]",
+                "}",
+                "",
+                "function putString(allocs, str) {",
+                "  return putBytes(allocs, encoder.encode(str))",
+                "}",
+                "",
+                "function putTyped(allocs, values, TypedArray) {",
+                "  const typed = values instanceof TypedArray ? values : TypedArray.from(values)",
+                "  const ptr = wasm._malloc(typed.byteLength || 1)",
+                "  allocs.push(ptr)",
+                "  wasm.HEAPU8.set(new Uint8Array(typed.buffer, typed.byteOffset, typed.byteLength), ptr)",
+                "  return [ptr, typed.length]",
+                "}",
+                "",
+                "// string lists are encoded straight into one block, string i spanning",
+                "// offsets[i]..offsets[i + 1] - no per string allocation or intermediate copy",
+                "function putStrings(allocs, strs) {",
+                "  // UTF-8 takes at most 3 bytes per UTF-16 code unit",
+                "  const capacity = strs.reduce((size, s) => size + 3 * s.length, 0)",
+                "  const ptr = wasm._malloc(capacity || 1)",
+                "  allocs.push(ptr)",
+                "  const offsets = new Uint32Array(strs.length + 1)",
+                "  strs.forEach((s, i) => {",
+                "    const at = ptr + offsets[i]",
+                "    offsets[i + 1] = offsets[i] + encoder.encodeInto(s, wasm.HEAPU8.subarray(at, ptr + capacity)).written",
+                "  })",
+                "  return [ptr, putTyped(allocs, offsets, Uint32Array)[0], strs.length]",
+                "}",
+                "",
+                "function takeString(ptr) {",
+                "  return decoder.decode(wasm.HEAPU8.subarray(ptr, ptr + wasm.HEAPU32[scratch >> 2]))",
+                "}",
+                "",
+                "function freeAll(allocs) {",
+                "  allocs.forEach((ptr) => wasm._free(ptr))",
+                "}",
+                "",
+            ]
+        )
+
+    @staticmethod
+    def _struct_list_writer(struct_def: StructDef) -> str:
+        return f"put{struct_def.name}List"
+
+    def _gen_struct_list_writer(self, struct_def: StructDef, *, ctx: GenCtx):
+        offsets, size = struct_def.blittable_layout()
+        writes = []
+        for member_def, offset in zip(struct_def.layout_members, offsets):
+            type_obj = member_def.resolved_type_obj
+            ctor = self._typed_array_ctor(type_obj)
+            setter = f"set{ctor[: -len('Array')]}"
+            little_endian = ", true" if type_obj.byte_size > 1 else ""
+            value = f"item.{member_def.name}"
+            at = f"at + {offset}" if offset else "at"
+            if member_def.is_array:
+                value = f"{value}[j]"
+                at = f"{at} + {type_obj.byte_size} * j"
+            if ctor.startswith("Big"):
+                value = f"BigInt({value})"
+            write = f"view.{setter}({at}, {value}{little_endian})"
+            if member_def.is_array:
+                write = f"for (let j = 0; j < {member_def.array_count}; ++j) {write}"
+            writes.append(write)
+        ctx.add_lines(
+            [
+                f"// {struct_def.name} is blittable - items are written straight into wasm memory",
+                f"function {self._struct_list_writer(struct_def)}(allocs, items) {{",
+                f"  const ptr = wasm._malloc(items.length * {size} || 1)",
+                "  allocs.push(ptr)",
+                f"  const view = new DataView(wasm.HEAPU8.buffer, ptr, items.length * {size})",
+                "  items.forEach((item, i) => {",
+                f"    const at = i * {size}",
+            ]
+            + [f"    {write}" for write in writes]
+            + ["  })", "  return [ptr, items.length]", "}", ""]
+        )
+
+    def _gen_leaf_args(self, leaf: FlatLeaf) -> str:
+        type_obj = leaf.type_obj
+        if leaf.is_struct_list:
+            return f"...{self._struct_list_writer(type_obj)}(allocs, {leaf.js_path})"
+        if leaf.is_list:
+            if leaf.is_text:
+                return f"...putStrings(allocs, {leaf.js_path})"
+            return f"...putTyped(allocs, {leaf.js_path}, {self._typed_array_ctor(type_obj)})"
+        if leaf.is_text:
+            return f"...putString(allocs, {leaf.js_path})"
+        if type_obj.is_bytes:
+            return f"...putBytes(allocs, {leaf.js_path})"
+        return leaf.js_path
+
+    def _typed_array_ctor(self, type_obj: BaseType) -> str:
+        if isinstance(type_obj, EnumDef):
+            type_obj = type_obj.resolved_base_type_obj
+        return self._typed_array_ctors[type_obj.name]
+
+    def _gen_call_body(
+        self,
+        callable_def: TypedNamed,
+        *,
+        export_name: str,
+        self_arg: Optional[str],
+        ctx: GenCtx,
+        result_target: str = "return ",
+    ):
+        args = [self_arg] if self_arg else []
+        for param_def in callable_def.parameters:
+            for leaf in flatten_typed(
+                param_def, c_name=param_def.name, cpp_path=param_def.name, js_path=param_def.name
+            ):
+                args.append(self._gen_leaf_args(leaf))
+        result_kind = WasmRawBindingGenerator.result_kind(callable_def)
+        if result_kind in ["text", "typed_list"]:
+            args.append("scratch")
+        error_enum = callable_def.error_enum_obj
+        if error_enum is not None:
+            args.append("scratch + 4")
+        call = f"wasm._{export_name}({', '.join(args)})"
+        uses_allocs = any(a.startswith("...") for a in args)
+        if uses_allocs:
+            ctx.add_lines("const allocs = []")
+            try_block = ctx.push_block("try {", indent=True)
+        if error_enum is not None:
+            ctx.add_lines(
+                [
+                    call if result_kind == "void" else f"const result = {call}",
+                    # only HEAPU32 is exported - the enum is a signed int32
+                    "const error = wasm.HEAPU32[(scratch >> 2) + 1] | 0",
+                    f"if (error) return apiError({self._error_names(error_enum)}, error)",
+                ]
+            )
+            call = "result"
+        if error_enum is not None and result_kind == "void":
+            # void call - already made by the error check
+            pass
+        elif result_kind == "text":
+            ctx.add_lines(f"{result_target}takeString({call})")
+        elif result_kind == "typed_list":
+            ctor = self._typed_array_ctor(callable_def.resolved_type_obj)
+            ctx.add_lines(
+                [
+                    f"const ptr = {call}",
+                    "// view over the binding's result buffer - valid until the next call",
+                    f"{result_target}new {ctor}(wasm.HEAPU8.buffer, ptr, wasm.HEAPU32[scratch >> 2])",
+                ]
+            )
+        elif result_kind == "bool":
+            ctx.add_lines(f"{result_target}!!{call}")
+        elif result_kind == "void":
+            ctx.add_lines(call)
+        else:
+            ctx.add_lines(f"{result_target}{call}")
+        if uses_allocs:
+            ctx.pop_block(try_block)
+            finally_block = ctx.push_block("} finally {", indent=True, post_pop_lines="}")
+            ctx.add_lines("freeAll(allocs)")
+            ctx.pop_block(finally_block)
+
+    def _gen_class(self, class_def: ClassDef, *, ctx: GenCtx):
+        prefix = WasmRawBindingGenerator.export_prefix(self.api, class_def)
+        factory = class_def.static_factory
+        class_block = ctx.push_block(
+            f"class {class_def.name} {{", indent=True, post_pop_lines="}\n"
+        )
+        params = ", ".join([p.name for p in factory.parameters]) if factory else ""
+        ctor_block = ctx.push_block(f"constructor({params}) {{", indent=True, post_pop_lines="}\n")
+        if factory:
+            self._gen_call_body(
+                factory,
+                export_name=f"{prefix}_{factory.name}",
+                self_arg=None,
+                result_target="this._ptr = ",
+                ctx=ctx,
+            )
+        else:
+            ctx.add_lines("this._ptr = 0")
+        ctx.pop_block(ctor_block)
+
+        delete_block = ctx.push_block("delete() {", indent=True, post_pop_lines="}")
+        ctx.add_lines([f"wasm._{prefix}_destroy(this._ptr)", "this._ptr = 0"])
+        ctx.pop_block(delete_block)
+
+        for method_def in class_def.methods:
+            if method_def.is_static or method_def is factory:
+                continue
+            params = ", ".join([p.name for p in method_def.parameters])
+            m_block = ctx.push_block(
+                f"\n{method_def.name}({params}) {{", indent=True, post_pop_lines="}"
+            )
+            if method_def.batch_source is not None and method_def.error_enum is not None:
+                # the batch fails with the first failing item, like the C++ default
+                lines = [
+                    "const results = []",
+                    f"for (const item of {params}) {{",
+                    f"  const result = this.{method_def.batch_source.name}(item)",
+                    "  if (result instanceof Error) return result",
+                    "  results.push(result)",
+                    "}",
+                    "return results",
+                ]
+                if method_def.is_void:
+                    lines = [ln for ln in lines if "results" not in ln]
+                ctx.add_lines(lines)
+            elif method_def.batch_source is not None:
+                ctx.add_lines(
+                    f"return {params}.map((item) => this.{method_def.batch_source.name}(item))"
+                )
+            elif method_def.is_stream:
+                self._gen_stream_body(
+                    method_def, export_name=f"{prefix}_{method_def.name}", ctx=ctx
+                )
+            else:
+                self._gen_call_body(
+                    method_def,
+                    export_name=f"{prefix}_{method_def.name}",
+                    self_arg="this._ptr",
+                    ctx=ctx,
+                )
+            ctx.pop_block(m_block)
+        ctx.pop_block(class_block)
+
+    def _gen_stream_body(self, method_def: MethodDef, *, export_name: str, ctx: GenCtx):
+        # same next()/item()/delete() shape as the embind cursor classes
+        ctx.add_lines("let cursor = 0")
+        self._gen_call_body(
+            method_def,
+            export_name=export_name,
+            self_arg="this._ptr",
+            result_target="cursor = ",
+            ctx=ctx,
+        )
+        item_kind = WasmRawBindingGenerator.result_kind(
+            WasmRawBindingGenerator.stream_item(method_def)
+        )
+        if item_kind == "text":
+            item = f"takeString(wasm._{export_name}_item(cursor, scratch))"
+        elif item_kind == "bool":
+            item = f"!!wasm._{export_name}_item(cursor)"
+        else:
+            item = f"wasm._{export_name}_item(cursor)"
+        ctx.add_lines(
+            [
+                "return {",
+                f"  next: () => !!wasm._{export_name}_next(cursor),",
+                f"  item: () => {item},",
+                f"  delete: () => wasm._{export_name}_destroy(cursor),",
+                "}",
+            ]
+        )
+
+    def _function_name(self, func_def: FunctionDef) -> str:
+        # matches the embind binding's name so the two backends are interchangeable
+        return f"{self.api.name}_{func_def.name}"
+
+    def _gen_function(self, func_def: FunctionDef, *, ctx: GenCtx):
+        params = ", ".join([p.name for p in func_def.parameters])
+        f_block = ctx.push_block(
+            f"function {self._function_name(func_def)}({params}) {{",
+            indent=True,
+            post_pop_lines="}\n",
+        )
+        self._gen_call_body(
+            func_def,
+            export_name=f"{WasmRawBindingGenerator.export_prefix(self.api)}_{func_def.name}",
+            self_arg=None,
+            ctx=ctx,
+        )
+        ctx.pop_block(f_block)
+
+
+class WasmLoaderGenerator(Generator):
+    """
+    ES module loader for the wasm build. the .wasm download starts on preload() (or import),
+    compilation streams via WebAssembly.instantiateStreaming and instantiation is deferred
+    until the first wrapper class is created.
+    """
+
+    generates_header = False
+    generates_source = True
+
+    def __init__(
+        self,
+        api: ApiDef,
+        *,
+        gen_version: str,
+        factory_module: str,
+        wasm_url: str,
+        raw_js_module: Optional[str] = None,
+        setup_method: str = "setup",
+    ):
+        super().__init__(api, gen_version=gen_version)
+        self.factory_module = factory_module
+        self.wasm_url = wasm_url
+        self.raw_js_module = raw_js_module
+        self.setup_method = setup_method
+
+    # stream items pulled between yields to the event loop
+    stream_chunk = 256
+
+    _comment = CppGenerator._comment
+
+    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
+        ctx = src_ctx
+        ctx.add_lines(f'import createWasmModule from "{self.factory_module}"')
+        if self.raw_js_module:
+            ctx.add_lines(f'import {{ bindApi }} from "{self.raw_js_module}"')
+        ctx.add_lines("")
+        for enum_def in self.api.enums:
+            self._gen_enum_typedef(enum_def, ctx=ctx)
+        for struct_def in self.api.structs:
+            self._gen_struct_typedef(struct_def, ctx=ctx)
+        self._gen_instantiation(ctx=ctx)
+        for class_def in self.api.classes:
+            self._gen_class_wrapper(class_def, ctx=ctx)
+
+    def _gen_jsdoc_type(self, typed: TypedNamed) -> str:
+        type_obj = typed.resolved_type_obj
+        if type_obj.is_bytes:
+            base = "Uint8Array"
+        elif type_obj.is_string or type_obj.is_string_view:
+            base = "string"
+        elif type_obj.is_bool:
+            base = "boolean"
+        elif type_obj.is_void:
+            base = "void"
+        elif type_obj.is_number:
+            base = "number"
+        else:
+            base = type_obj.name
+        if typed.is_list or typed.is_array:
+            if WasmBindingGenerator._is_typed_array(typed):
+                return WasmRawJsGenerator._typed_array_ctors[type_obj.name]
+            return f"Array<{base}>"
+        return base
+
+    def _gen_enum_typedef(self, enum_def: EnumDef, *, ctx: GenCtx):
+        values = " | ".join([f"{m.value}" for m in enum_def.members]) or "number"
+        ctx.add_lines([f"/** @typedef {{{values}}} {enum_def.name} */", ""])
+
+    def _gen_struct_typedef(self, struct_def: StructDef, *, ctx: GenCtx):
+        lines = ["/**", f" * @typedef {{Object}} {struct_def.name}"]
+        for member_def in struct_def.members:
+            lines.append(f" * @property {{{self._gen_jsdoc_type(member_def)}}} {member_def.name}")
+        lines.extend([" */", ""])
+        ctx.add_lines(lines)
+
+    def _gen_instantiation(self, *, ctx: GenCtx):
+        ctx.add_lines(
+            [
+                f'const wasmUrl = new URL("{self.wasm_url}", import.meta.url)',
+                "let wasmResponse = null",
+                "let apiPromise = null",
+                "",
+                "// starts the .wasm download without compiling or instantiating it.",
+                "export function preload() {",
+                "  wasmResponse ??= fetch(wasmUrl)",
+                "  return wasmResponse",
+                "}",
+                "",
+                "// compiles while bytes arrive and instantiates on first use only. a failed",
+                "// download or compile rejects every pending create(), the next one retries.",
+                "function loadApi() {",
+                "  apiPromise ??= new Promise((resolve, reject) => {",
+                "    createWasmModule({",
+                "      instantiateWasm(imports, onInstantiated) {",
+                "        WebAssembly.instantiateStreaming(preload(), imports).then(",
+                "          (result) => onInstantiated(result.instance, result.module),",
+                "          reject",
+                "        )",
+                "        return {}",
+                "      },",
+                f"    }}).then({'(module) => resolve(bindApi(module))' if self.raw_js_module else 'resolve'}, reject)",
+                "  }).catch((error) => {",
+                "    wasmResponse = null",
+                "    apiPromise = null",
+                "    throw error",
+                "  })",
+                "  return apiPromise",
+                "}",
+                "",
+            ]
+        )
+        if any(m.is_async or m.is_stream for c in self.api.classes for m in c.methods):
+            ctx.add_lines(
+                [
+                    "// lets pending input and rendering run before a blocking call starts.",
+                    "// use the worker pool for calls that must not block at all.",
+                    "function yieldToEventLoop() {",
+                    "  return globalThis.scheduler?.yield?.() ?? new Promise((resolve) => setTimeout(resolve))",
+                    "}",
+                    "",
+                ]
+            )
+
+    def _gen_class_wrapper(self, class_def: ClassDef, *, ctx: GenCtx):
+        factory = class_def.static_factory
+        c_block = ctx.push_block(
+            f"export class {class_def.name} {{", indent=True, post_pop_lines="}\n"
+        )
+        ctx.add_lines(
+            [
+                "constructor(impl) {",
+                "  this._impl = impl",
+                "}",
+                "",
+                f"/** @returns {{Promise<{class_def.name}>}} */",
+                "static async create() {",
+                "  const api = await loadApi()",
+                f"  return new {class_def.name}(new api.{class_def.name}())",
+                "}",
+                "",
+                "delete() {",
+                "  this._impl.delete()",
+                "  this._impl = null",
+                "}",
+            ]
+        )
+        for method_def in class_def.methods:
+            if method_def.is_static or method_def is factory:
+                continue
+            params = [p.name for p in method_def.parameters]
+            doc = ["", "/**"]
+            doc.extend(
+                [f" * @param {{{self._gen_jsdoc_type(p)}}} {p.name}" for p in method_def.parameters]
+            )
+            if method_def.is_stream:
+                doc.append(f" * @returns {{AsyncGenerator<{self._gen_jsdoc_type(method_def)}>}}")
+                if method_def.error_enum is not None:
+                    doc.append(
+                        f" * @throws {{Error}} named after the failing {method_def.error_enum}"
+                        " value, from the first pull"
+                    )
+                ctx.add_lines(doc + [" */"])
+                self._gen_stream_wrapper(method_def, ctx=ctx)
+                continue
+            doc.append(f" * @returns {{{self._gen_jsdoc_type(method_def)}}}")
+            error_enum = method_def.error_enum_obj
+            if error_enum is not None:
+                doc.append(f" * @throws {{Error}} named after the failing {error_enum.name} value")
+            doc.append(" */")
+            ctx.add_lines(doc)
+            call = f"this._impl.{method_def.name}({', '.join(params)})"
+            if error_enum is not None:
+                # both backends return failures as Error objects
+                body = [
+                    f"  const result = {call}",
+                    "  if (result instanceof Error) throw result",
+                    "  return result",
+                ]
+            else:
+                body = [f"  return {call}"]
+            ctx.add_lines([f"{method_def.name}({', '.join(params)}) {{", *body, "}"])
+            if method_def.is_async:
+                ctx.add_lines(
+                    [
+                        "",
+                        f"/** @returns {{Promise<{self._gen_jsdoc_type(method_def)}>}} */",
+                        f"async {method_def.async_name}({', '.join(params)}) {{",
+                        "  await yieldToEventLoop()",
+                        f"  return this.{method_def.name}({', '.join(params)})",
+                        "}",
+                    ]
+                )
+        ctx.pop_block(c_block)
+
+        setup = next((m for m in class_def.methods if m.name == self.setup_method), None)
+        if factory is not None and setup is not None:
+            params = [p.name for p in setup.parameters]
+            ctx.add_lines(
+                [
+                    "// call at page load without awaiting - download, instantiation and",
+                    f"// {setup.name}() overlap with rendering instead of the first user action.",
+                    "/** @returns {Promise<{instance: "
+                    f"{class_def.name}, result: {self._gen_jsdoc_type(setup)}}}>}} */",
+                    f"export function start{class_def.name}({', '.join(params)}) {{",
+                    "  preload()",
+                    f"  return {class_def.name}.create().then((instance) => ({{",
+                    "    instance,",
+                    f"    result: instance.{setup.name}({', '.join(params)}),",
+                    "  }))",
+                    "}",
+                    "",
+                ]
+            )
+
+    def _gen_stream_wrapper(self, method_def: MethodDef, *, ctx: GenCtx):
+        params = ", ".join([p.name for p in method_def.parameters])
+        ctx.add_lines(
+            [
+                f"async *{method_def.name}({params}) {{",
+                f"  const cursor = this._impl.{method_def.name}({params})",
+                *(
+                    ["  if (cursor instanceof Error) throw cursor"]
+                    if method_def.error_enum is not None
+                    else []
+                ),
+                "  try {",
+                "    for (let i = 1; cursor.next(); ++i) {",
+                "      yield cursor.item()",
+                "      // a consumer that never awaits anything else would starve rendering",
+                f"      if (i % {self.stream_chunk} === 0) await yieldToEventLoop()",
+                "    }",
+                "  } finally {",
+                "    cursor.delete()",
+                "  }",
+                "}",
+            ]
+        )
+
+
+def worker_hosted_classes(api: ApiDef) -> [ClassDef]:
+    return [
+        c for c in api.classes if c.static_factory and any(m.is_long_running for m in c.methods)
+    ]
+
+
+class WasmWorkerGenerator(Generator):
+    """
+    module worker script hosting one instance per class that has long running methods.
+    instances come from the WasmLoaderGenerator loader. arguments arrive by structured clone,
+    large string and typed array results are transferred instead of cloned.
+    """
+
+    generates_header = False
+    generates_source = True
+
+    def __init__(self, api: ApiDef, *, gen_version: str, loader_module: str):
+        super().__init__(api, gen_version=gen_version)
+        self.loader_module = loader_module
+
+    _comment = CppGenerator._comment
+
+    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
+        ctx = src_ctx
+        class_names = [c.name for c in worker_hosted_classes(self.api)]
+        ctx.add_lines(
+            [
+                f'import {{ {", ".join(class_names)} }} from "{self.loader_module}"',
+                "",
+                f"const classes = {{ {', '.join(class_names)} }}",
+                "const instances = {}",
+                "const encoder = new TextEncoder()",
+                "// strings longer than this cross as transferred UTF-8 instead of a clone",
+                "const TRANSFER_THRESHOLD = 64 * 1024",
+                "",
+                "function reply(id, result) {",
+                '  if (typeof result === "string" && result.length > TRANSFER_THRESHOLD) {',
+                "    const encoded = encoder.encode(result).buffer",
+                "    self.postMessage({ id, encoded }, [encoded])",
+                "  } else if (ArrayBuffer.isView(result)) {",
+                "    // detach from the wasm heap before handing the buffer over",
+                "    const copy = result.slice()",
+                "    self.postMessage({ id, result: copy }, [copy.buffer])",
+                "  } else {",
+                "    self.postMessage({ id, result })",
+                "  }",
+                "}",
+                "",
+                "self.onmessage = async ({ data }) => {",
+                "  const { id, className, op, method, args } = data",
+                "  try {",
+                '    if (op === "create") {',
+                "      instances[className] ??= await classes[className].create()",
+                "      reply(id)",
+                '    } else if (op === "delete") {',
+                "      instances[className]?.delete()",
+                "      delete instances[className]",
+                "      reply(id)",
+                "    } else {",
+                "      reply(id, instances[className][method](...args))",
+                "    }",
+                "  } catch (error) {",
+                "    // plain fields - an Error's code doesn't survive the structured clone",
+                '    const { name = "Error", message = String(error), code } = error ?? {}',
+                "    self.postMessage({ id, error: { name, message, code } })",
+                "  }",
+                "}",
+            ]
+        )
+
+
+class WasmWorkerProxyGenerator(Generator):
+    """
+    main thread proxy for WasmWorkerGenerator workers. each class with long running methods
+    gets a <Class>WorkerPool: long running methods go to the least busy worker, all other
+    methods are broadcast so every worker's instance stays in the same state (e.g. setup).
+    every method returns a promise.
+    """
+
+    generates_header = False
+    generates_source = True
+
+    def __init__(self, api: ApiDef, *, gen_version: str, worker_module: str):
+        super().__init__(api, gen_version=gen_version)
+        self.worker_module = worker_module
+
+    _comment = CppGenerator._comment
+
+    def _generate(self, *, src_ctx: Optional[GenCtx], hdr_ctx: Optional[GenCtx]):
+        ctx = src_ctx
+        ctx.add_lines(
+            [
+                f'const workerUrl = new URL("{self.worker_module}", import.meta.url)',
+                "const decoder = new TextDecoder()",
+                "",
+                "class WorkerConnection {",
+                "  constructor() {",
+                '    this.worker = new Worker(workerUrl, { type: "module" })',
+                "    this.pending = new Map()",
+                "    this.nextId = 0",
+                "    this.worker.onmessage = ({ data }) => {",
+                "      const { resolve, reject } = this.pending.get(data.id)",
+                "      this.pending.delete(data.id)",
+                "      if (data.error !== undefined) {",
+                "        // rebuilt like the binding threw it, error_enum failures keep their code",
+                "        const error = new Error(data.error.message)",
+                "        error.name = data.error.name",
+                "        if (data.error.code !== undefined) error.code = data.error.code",
+                "        reject(error)",
+                "      } else {",
+                "        resolve(data.encoded ? decoder.decode(data.encoded) : data.result)",
+                "      }",
+                "    }",
+                "  }",
+                "",
+                "  get busy() {",
+                "    return this.pending.size",
+                "  }",
+                "",
+                "  request(message) {",
+                "    return new Promise((resolve, reject) => {",
+                "      const id = this.nextId++",
+                "      this.pending.set(id, { resolve, reject })",
+                "      this.worker.postMessage({ id, ...message })",
+                "    })",
+                "  }",
+                "}",
+                "",
+            ]
+        )
+        for class_def in worker_hosted_classes(self.api):
+            self._gen_pool(class_def, ctx=ctx)
+
+    def _gen_pool(self, class_def: ClassDef, *, ctx: GenCtx):
+        pool_block = ctx.push_block(
+            f"export class {class_def.name}WorkerPool {{", indent=True, post_pop_lines="}\n"
+        )
+        cn = class_def.name
+        ctx.add_lines(
+            [
+                "constructor(connections) {",
+                "  this._connections = connections",
+                "}",
+                "",
+                f"/** @returns {{Promise<{cn}WorkerPool>}} */",
+                "static async create(size = navigator.hardwareConcurrency || 4) {",
+                "  const connections = Array.from({ length: size }, () => new WorkerConnection())",
+                f'  await Promise.all(connections.map((c) => c.request({{ className: "{cn}", op: "create" }})))',
+                f"  return new {cn}WorkerPool(connections)",
+                "}",
+                "",
+                "terminate() {",
+                "  this._connections.forEach((c) => c.worker.terminate())",
+                "  this._connections = []",
+                "}",
+                "",
+                "_leastBusy() {",
+                "  return this._connections.reduce((a, b) => (b.busy < a.busy ? b : a))",
+                "}",
+            ]
+        )
+        for method_def in class_def.methods:
+            # stream cursors can't cross to the main thread - use the loader class directly
+            if method_def.is_static or method_def.is_factory or method_def.is_stream:
+                continue
+            params = ", ".join([p.name for p in method_def.parameters])
+            message = f'{{ className: "{cn}", op: "call", method: "{method_def.name}", args: [{params}] }}'
+            ctx.add_lines(["", f"{method_def.name}({params}) {{"])
+            if method_def.is_long_running and method_def.batch_source is not None:
+                # one slice per worker, results rejoined in input order
+                chunk = f"{params}.slice(i * size, (i + 1) * size)"
+                chunk_message = message.replace(f"args: [{params}]", f"args: [{chunk}]")
+                joined = "undefined" if method_def.is_void else "results.flat()"
+                ctx.add_lines(
+                    [
+                        f"  const size = Math.ceil({params}.length / this._connections.length)",
+                        "  return Promise.all(",
+                        f"    this._connections.map((c, i) => c.request({chunk_message}))",
+                        f"  ).then((results) => {joined})",
+                    ]
+                )
+            elif method_def.is_long_running:
+                ctx.add_lines(f"  return this._leastBusy().request({message})")
+            else:
+                ctx.add_lines(
+                    [
+                        "  return Promise.all(",
+                        f"    this._connections.map((c) => c.request({message}))",
+                        "  ).then((results) => results[0])",
+                    ]
+                )
+            ctx.add_lines("}")
+        ctx.pop_block(pool_block)
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 from pathlib import Path
+from typing import Optional
 import sys
 import cyclopts
 
@@ -12,19 +13,29 @@ sys.path.append(CODE_GEN_DIR.as_posix())
 from api_def import ApiDef
 
 # noinspection PyUnresolvedReferences
-from cpp_generator import CppGenerator
+from cpp_generator import CppFwdGenerator, CppGenerator
 
 # noinspection PyUnresolvedReferences
-from c_generator import CBindingGenerator
+from c_generator import CBindingGenerator, CLoaderGenerator
 
 # noinspection PyUnresolvedReferences
 from kotlin_generator import JniBindingGenerator, KtGenerator
 
+# noinspection PyUnresolvedReferences
+from python_generator import PythonExtensionGenerator
+
 # noinspection PyUnresolvedReferences
 from swift_generator import SwiftBindingGenerator, SwiftGenerator
 
 # noinspection PyUnresolvedReferences
-from wasm_generator import WasmBindingGenerator
+from wasm_generator import (
+    WasmBindingGenerator,
+    WasmLoaderGenerator,
+    WasmRawBindingGenerator,
+    WasmRawJsGenerator,
+    WasmWorkerGenerator,
+    WasmWorkerProxyGenerator,
+)
 
 tool_name = Path(__file__).with_suffix("").name
 tool_version = "0.5.0"
@@ -34,7 +45,7 @@ app = cyclopts.App(version=tool_version, name=tool_name)
 
 
 @app.command
-def generate_cpp_interface(*, api_def: Path, out_h: Path):
+def generate_cpp_interface(*, api_def: Path, out_h: Path, out_fwd_h: Optional[Path] = None):
     """
     generates C++ interface header for author to implement
 
@@ -44,12 +55,26 @@ def generate_cpp_interface(*, api_def: Path, out_h: Path):
         api definition json
     out_h
         output path for generated interface header
+    out_fwd_h
+        output path for generated forward declarations header
     """
-    CppGenerator(ApiDef.from_file(api_def), gen_version=gen_version).generate_files(hdr=out_h)
+    api = ApiDef.from_file(api_def)
+    CppGenerator(api, gen_version=gen_version).generate_files(hdr=out_h)
+    if out_fwd_h is not None:
+        CppFwdGenerator(api, gen_version=gen_version).generate_files(hdr=out_fwd_h)
 
 
 @app.command
-def generate_c_wrapper(*, api_def: Path, api_h: str, out_h: Path, out_cpp: Path):
+def generate_c_wrapper(
+    *,
+    api_def: Path,
+    api_h: str,
+    out_h: Path,
+    out_cpp: Path,
+    shard: bool = False,
+    out_pch_h: Optional[Path] = None,
+    out_loader_h: Optional[Path] = None,
+):
     """
     generates C wrapper API header with extern C implementation cpp file
 
@@ -63,14 +88,33 @@ def generate_c_wrapper(*, api_def: Path, api_h: str, out_h: Path, out_cpp: Path)
         output path for generated wrapper header
     out_cpp
         output path for generated wrapper source
+    shard
+        one source per class plus one for the rest, listed in <out_cpp stem>_shards.txt
+    out_pch_h
+        output path for a header of the binding's includes for the build to precompile
+    out_loader_h
+        output path for a header filling the wrapper's function table from a library at runtime
     """
-    CBindingGenerator(
-        ApiDef.from_file(api_def), gen_version=gen_version, api_h=api_h
-    ).generate_files(hdr=out_h, src=out_cpp)
+    api = ApiDef.from_file(api_def)
+    CBindingGenerator(api, gen_version=gen_version, api_h=api_h).generate_files(
+        hdr=out_h, src=out_cpp, shard=shard, pch=out_pch_h
+    )
+    if out_loader_h is not None:
+        CLoaderGenerator(api, gen_version=gen_version, c_h=out_h.name).generate_files(
+            hdr=out_loader_h
+        )
 
 
 @app.command
-def generate_jni_binding(*, api_def: Path, api_h: str, api_pkg: str, out_cpp: Path):
+def generate_jni_binding(
+    *,
+    api_def: Path,
+    api_h: str,
+    api_pkg: str,
+    out_cpp: Path,
+    shard: bool = False,
+    out_pch_h: Optional[Path] = None,
+):
     """
     generates JNI binding code
 
@@ -84,10 +128,14 @@ def generate_jni_binding(*, api_def: Path, api_h: str, api_pkg: str, out_cpp: Pa
         name of kotlin package (e.g. com.company.library)
     out_cpp
         output path for generated JNI cpp sourcer
+    shard
+        one source per class plus one for the rest, listed in <out_cpp stem>_shards.txt
+    out_pch_h
+        output path for a header of the binding's includes for the build to precompile
     """
     JniBindingGenerator(
         ApiDef.from_file(api_def), gen_version=gen_version, api_h=api_h, api_pkg=api_pkg
-    ).generate_files(src=out_cpp)
+    ).generate_files(src=out_cpp, shard=shard, pch=out_pch_h)
 
 
 @app.command
@@ -106,7 +154,15 @@ def generate_kt_wrapper(*, api_def: Path, out_kt: Path):
 
 
 @app.command
-def generate_swift_binding(*, api_def: Path, api_h: str, out_h: Path, out_cpp: Path):
+def generate_swift_binding(
+    *,
+    api_def: Path,
+    api_h: str,
+    out_h: Path,
+    out_cpp: Path,
+    shard: bool = False,
+    out_pch_h: Optional[Path] = None,
+):
     """
     command line utility for capturing web client composition renders
 
@@ -120,14 +176,20 @@ def generate_swift_binding(*, api_def: Path, api_h: str, out_h: Path, out_cpp: P
         output path for generated binding header
     out_cpp
         output path for generated binding implementation
+    shard
+        one source per class plus one for the rest, listed in <out_cpp stem>_shards.txt
+    out_pch_h
+        output path for a header of the binding's includes for the build to precompile
     """
     SwiftBindingGenerator(
         ApiDef.from_file(api_def), gen_version=gen_version, api_h=api_h
-    ).generate_files(hdr=out_h, src=out_cpp)
+    ).generate_files(hdr=out_h, src=out_cpp, shard=shard, pch=out_pch_h)
 
 
 @app.command
-def generate_swift_wrapper(*, api_def: Path, swift_h: str, out_swift: Path):
+def generate_swift_wrapper(
+    *, api_def: Path, swift_h: str, out_swift: Path, c_module: str = "bng_bridge"
+):
     """
     command line utility for capturing web client composition renders
 
@@ -139,9 +201,11 @@ def generate_swift_wrapper(*, api_def: Path, swift_h: str, out_swift: Path):
        dependency import header from generate_swift_binding
     out_swift
         output path for generated swift wrapper
+    c_module
+        swift module exposing the generate_swift_binding header
     """
     SwiftGenerator(
-        ApiDef.from_file(api_def), gen_version=gen_version, api_h=swift_h
+        ApiDef.from_file(api_def), gen_version=gen_version, api_h=swift_h, c_module=c_module
     ).generate_files(src=out_swift)
 
 
@@ -151,6 +215,8 @@ def generate_wasm_binding(
     api_def: Path,
     api_h: str,
     out_cpp: Path,
+    shard: bool = False,
+    out_pch_h: Optional[Path] = None,
 ):
     """
     command line utility for capturing web client composition renders
@@ -163,11 +229,176 @@ def generate_wasm_binding(
         dependency interface header from generate_cpp_interface
     out_cpp
         output path for generated cpp wasm binding
+    shard
+        one source per class plus one for the rest, listed in <out_cpp stem>_shards.txt
+    out_pch_h
+        output path for a header of the binding's includes for the build to precompile
     """
     WasmBindingGenerator(
         ApiDef.from_file(api_def), gen_version=gen_version, api_h=api_h
+    ).generate_files(src=out_cpp, shard=shard, pch=out_pch_h)
+
+
+@app.command
+def generate_wasm_raw_binding(
+    *,
+    api_def: Path,
+    api_h: str,
+    out_cpp: Path,
+    shard: bool = False,
+    out_pch_h: Optional[Path] = None,
+):
+    """
+    generates extern C wasm exports with flattened arguments as a lighter alternative to embind
+
+    Parameters
+    ----------
+    api_def
+        api definition json
+    api_h
+        dependency interface header from generate_cpp_interface
+    out_cpp
+        output path for generated cpp wasm binding
+    shard
+        one source per class plus one for the rest, listed in <out_cpp stem>_shards.txt
+    out_pch_h
+        output path for a header of the binding's includes for the build to precompile
+    """
+    WasmRawBindingGenerator(
+        ApiDef.from_file(api_def), gen_version=gen_version, api_h=api_h
+    ).generate_files(src=out_cpp, shard=shard, pch=out_pch_h)
+
+
+@app.command
+def generate_wasm_raw_js_wrapper(*, api_def: Path, out_js: Path):
+    """
+    generates ES module wrapping the generate_wasm_raw_binding exports in JS classes
+
+    Parameters
+    ----------
+    api_def
+        api definition json
+    out_js
+        output path for generated javascript module
+    """
+    WasmRawJsGenerator(ApiDef.from_file(api_def), gen_version=gen_version).generate_files(
+        src=out_js
+    )
+
+
+@app.command
+def generate_wasm_loader(
+    *,
+    api_def: Path,
+    factory_module: str,
+    wasm_url: str,
+    out_js: Path,
+    raw_js_module: Optional[str] = None,
+):
+    """
+    generates ES module loader with streaming compilation and lazily instantiated wrapper classes
+
+    Parameters
+    ----------
+    api_def
+        api definition json
+    factory_module
+        emscripten output module exporting the module factory, relative to the loader
+    wasm_url
+        url of the .wasm file, relative to the loader
+    out_js
+        output path for generated javascript loader
+    raw_js_module
+        module from generate_wasm_raw_js_wrapper when building the raw binding
+    """
+    WasmLoaderGenerator(
+        ApiDef.from_file(api_def),
+        gen_version=gen_version,
+        factory_module=factory_module,
+        wasm_url=wasm_url,
+        raw_js_module=raw_js_module,
+    ).generate_files(src=out_js)
+
+
+@app.command
+def generate_wasm_worker(*, api_def: Path, loader_module: str, out_js: Path):
+    """
+    generates web worker script hosting instances of classes with long running methods
+
+    Parameters
+    ----------
+    api_def
+        api definition json
+    loader_module
+        module from generate_wasm_loader, relative to the worker
+    out_js
+        output path for generated worker script
+    """
+    WasmWorkerGenerator(
+        ApiDef.from_file(api_def), gen_version=gen_version, loader_module=loader_module
+    ).generate_files(src=out_js)
+
+
+@app.command
+def generate_wasm_worker_proxy(*, api_def: Path, worker_module: str, out_js: Path):
+    """
+    generates main thread worker pool proxies returning promises for worker hosted classes
+
+    Parameters
+    ----------
+    api_def
+        api definition json
+    worker_module
+        script from generate_wasm_worker, relative to the proxy module
+    out_js
+        output path for generated proxy module
+    """
+    WasmWorkerProxyGenerator(
+        ApiDef.from_file(api_def), gen_version=gen_version, worker_module=worker_module
+    ).generate_files(src=out_js)
+
+
+@app.command
+def generate_python_extension(
+    *, api_def: Path, api_h: str, out_cpp: Path, module_name: Optional[str] = None
+):
+    """
+    generates CPython extension module source, with the GIL released around every API call
+
+    Parameters
+    ----------
+    api_def
+        api definition json
+    api_h
+        dependency interface header from generate_cpp_interface
+    out_cpp
+        output path for generated cpp extension module
+    module_name
+        name the module is imported by, defaults to the api name
+    """
+    PythonExtensionGenerator(
+        ApiDef.from_file(api_def),
+        gen_version=gen_version,
+        api_h=api_h,
+        module_name=module_name or "",
     ).generate_files(src=out_cpp)
 
 
+@app.command
+def report_struct_layout(*, api_def: Path, pointer_size: int = 8):
+    """
+    prints each struct's size, alignment, padding and member offsets in the C binding
+
+    Parameters
+    ----------
+    api_def
+        api definition json
+    pointer_size
+        target pointer size in bytes - 4 for wasm32
+    """
+    for struct_def in ApiDef.from_file(api_def).structs:
+        print("\n".join(struct_def.layout_report(pointer_size)))
+
+
 if __name__ == "__main__":
     app()
@@ -161,6 +161,8 @@ def test_init_primitive_types():
     get_type("bool")
     get_type("string")
     get_type("float64")
+    get_type("string_view")
+    get_type("bytes")
     reset_type_table()
 
 
@@ -212,3 +214,294 @@ def test_assign_float_to_int():
         return
     # should have thrown for assigning 1.5 to int value
     assert False
+
+
+def test_borrowed_member():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            structs=[dict(name="TheStruct", members=[dict(name="blob", type="bytes")])],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for a borrowed type outliving the call as a member
+    assert False
+
+
+def test_borrowed_return():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            functions=[dict(name="the_func", type="string_view")],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for returning a borrowed type
+    assert False
+
+
+def test_async_factory():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            classes=[
+                dict(
+                    name="TheClass",
+                    methods=[
+                        dict(
+                            name="create",
+                            type="TheClass",
+                            is_factory=True,
+                            is_static=True,
+                            is_async=True,
+                        )
+                    ],
+                )
+            ],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for an async factory
+    assert False
+
+
+def test_async_function():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            functions=[dict(name="the_func", type="int32", is_async=True)],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown - the platform wrappers have no async form of free functions
+    assert False
+
+
+def test_batchable_method():
+    api = ApiDef(
+        name="test_api",
+        version="1.2.3",
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(
+                        name="solve",
+                        type="string",
+                        is_batchable=True,
+                        parameters=[dict(name="puzzle", type="string")],
+                    )
+                ],
+            )
+        ],
+    )
+    solve, solve_batch = api.classes[0].methods
+    assert solve_batch.name == "solve_batch"
+    assert solve_batch.batch_source is solve
+    assert solve_batch.is_list
+    assert solve_batch.parameters[0].name == "puzzle_batch"
+    assert solve_batch.parameters[0].is_list
+
+
+def test_batchable_static():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            classes=[
+                dict(
+                    name="TheClass",
+                    methods=[
+                        dict(
+                            name="solve",
+                            type="string",
+                            is_static=True,
+                            is_batchable=True,
+                            parameters=[dict(name="puzzle", type="string")],
+                        )
+                    ],
+                )
+            ],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for a static batchable method
+    assert False
+
+
+def test_stream_list():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            classes=[
+                dict(
+                    name="TheClass",
+                    methods=[
+                        dict(name="lines", type="string", is_list=True, is_stream=True),
+                    ],
+                )
+            ],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for a stream of lists
+    assert False
+
+
+def test_error_enum_without_ok():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            enums=[dict(name="TheError", members=[dict(name="failed", value=1)])],
+            classes=[
+                dict(
+                    name="TheClass",
+                    methods=[dict(name="setup", type="void", error_enum="TheError")],
+                )
+            ],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for an error enum without a zero success value
+    assert False
+
+
+def test_error_enum_factory():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            enums=[
+                dict(
+                    name="TheError",
+                    members=[dict(name="ok", value=0), dict(name="failed", value=1)],
+                )
+            ],
+            classes=[
+                dict(
+                    name="TheClass",
+                    methods=[
+                        dict(
+                            name="create",
+                            type="TheClass",
+                            is_factory=True,
+                            is_static=True,
+                            error_enum="TheError",
+                        )
+                    ],
+                )
+            ],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for a factory with an error enum
+    assert False
+
+
+def test_impl_type_without_header():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            classes=[dict(name="TheClass", impl_type="TheImpl")],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for an implementation type without its header
+    assert False
+
+
+def test_pooled_without_long_running():
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            classes=[
+                dict(
+                    name="TheClass",
+                    is_pooled=True,
+                    methods=[
+                        dict(name="create", type="TheClass", is_factory=True, is_static=True),
+                        dict(name="solve", type="string"),
+                    ],
+                )
+            ],
+        )
+    except ValueError as ve:
+        return
+    # should have thrown for a pool with nothing to dispatch
+    assert False
+
+
+def test_blittable_struct():
+    api = ApiDef(
+        name="test_api",
+        version="1.2.3",
+        enums=[dict(name="TheKind", members=[dict(name="plain", value=0)])],
+        structs=[
+            dict(
+                name="ThePoint",
+                members=[
+                    dict(name="flag", type="uint8"),
+                    dict(name="x", type="float64"),
+                    dict(name="kind", type="TheKind"),
+                    dict(name="codes", type="uint16", array_count=3),
+                ],
+            ),
+            dict(name="TheLabel", members=[dict(name="text", type="string")]),
+            dict(name="TheRow", members=[dict(name="values", type="int32", is_list=True)]),
+        ],
+    )
+    point, label, row = api.structs
+    assert point.is_blittable
+    assert not label.is_blittable
+    assert not row.is_blittable
+    # padded to each member's alignment, and the size to the largest
+    assert point.blittable_layout() == ([0, 8, 16, 20], 32)
+
+
+def test_struct_layout():
+    members = [
+        dict(name="flag", type="uint8"),
+        dict(name="x", type="float64"),
+        dict(name="count", type="int32"),
+        dict(name="label", type="string"),
+    ]
+    api = ApiDef(
+        name="test_api",
+        version="1.2.3",
+        structs=[
+            dict(name="TheDeclared", members=members),
+            dict(name="TheSorted", members=members, layout="sorted"),
+            dict(name="ThePacked", members=members[:2], layout="packed"),
+            dict(name="TheHot", members=members[1:3], layout="cache_aligned"),
+        ],
+    )
+    declared, sorted_, packed, hot = api.structs
+    assert declared.c_layout(pointer_size=8) == ([0, 8, 16, 24], 32, 8)
+    # largest alignment first, declared order among equals
+    assert [m.name for m in sorted_.layout_members] == ["x", "label", "count", "flag"]
+    assert sorted_.c_layout(pointer_size=8) == ([0, 8, 16, 20], 24, 8)
+    assert sorted_.layout_report(pointer_size=8)[0] == (
+        "TheSorted (sorted): 24 bytes, align 8, 3 padding, 32 bytes declared"
+    )
+    assert packed.blittable_layout() == ([0, 1], 9)
+    # the binding structs of cache aligned ones keep natural alignment
+    assert not hot.is_blittable
+    assert hot.c_layout(pointer_size=8) == ([0, 8], 16, 8)
+    try:
+        ApiDef(
+            name="test_api",
+            version="1.2.3",
+            structs=[dict(name="TheLoose", members=members, layout="packed")],
+        )
+    except ValueError:
+        return
+    # strings can't be packed
+    assert False
@@ -0,0 +1,547 @@
+import sys
+from pathlib import Path
+
+import pytest
+from _pytest.fixtures import fixture
+
+TESTS_DIR = Path(__file__).parent
+TOOLS_DIR = TESTS_DIR.parent
+CODE_GEN_DIR = TOOLS_DIR / "code_gen"
+OUT_DIR = TESTS_DIR / "test_output"
+
+sys.path.append(TOOLS_DIR.as_posix())
+sys.path.append(CODE_GEN_DIR.as_posix())
+
+# noinspection PyUnresolvedReferences
+from api_def import ApiDef
+
+# noinspection PyUnresolvedReferences
+from c_generator import CBindingGenerator, CLoaderGenerator
+
+#
+# fixtures
+#
+
+
+@fixture
+def api_with_results() -> dict:
+    return dict(
+        name="test_api",
+        version="1.2.3",
+        structs=[
+            dict(
+                name="ThePuzzle",
+                members=[dict(name="sides", type="string", array_count=2)],
+            )
+        ],
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(
+                        name="create",
+                        type="TheClass",
+                        ref_type="shared",
+                        is_factory=True,
+                        is_static=True,
+                    ),
+                    dict(
+                        type="string",
+                        name="solve",
+                        is_batchable=True,
+                        parameters=[dict(name="puzzle", type="ThePuzzle", is_const=True)],
+                    ),
+                    dict(type="int32", name="counts", is_list=True),
+                    dict(type="string", name="words", is_list=True),
+                ],
+            )
+        ],
+    )
+
+
+#
+# tests
+#
+
+
+def test_c_binding_generator_caller_buffers(api_with_results: dict):
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert "TheClass* the_class_create(void);" in hdr
+    assert (
+        "uint32_t the_class_solve(TheClass* the_class, const ThePuzzle* puzzle, "
+        "char* out, uint32_t out_capacity);"
+    ) in hdr
+    # batch results go through the arena - a buffer miss would solve the batch again
+    assert (
+        "// one result per item - fails as a whole with the first failing item's error\n"
+        "// the results are one allocation, free it with test_api_release_result\n"
+        "TEST_API_C_SHIM const char* const* the_class_solve_batch(TheClass* the_class, "
+        "const ThePuzzle* puzzle_batch, uint32_t puzzle_batch_count, uint32_t* out_count);"
+    ) in hdr
+    assert "void test_api_release_result(const void* result);" in hdr
+    assert (
+        "uint32_t the_class_counts(TheClass* the_class, int32_t* out, uint32_t out_capacity);"
+        in hdr
+    )
+    # the caller buffer contract is spelled out above each shim
+    assert (
+        "// returns the string's size without the NUL, and writes it and the NUL to out\n"
+        "// only if size < out_capacity - nothing is written otherwise\n"
+        "TEST_API_C_SHIM uint32_t the_class_solve(TheClass* the_class, "
+    ) in hdr
+    assert (
+        "// returns the item count, and writes the items to out only if\n"
+        "// count <= out_capacity - nothing is written otherwise\n"
+        "TEST_API_C_SHIM uint32_t the_class_counts("
+    ) in hdr
+    assert (
+        "// writes them to out only if size <= out_capacity - nothing is written otherwise\n"
+        "TEST_API_C_SHIM uint32_t the_class_words(TheClass* the_class, char* out, uint32_t out_capacity);"
+    ) in hdr
+    assert "void destroy_the_class(TheClass* the_class);" in hdr
+
+    src = src_ctx.get_gen_text()
+    assert (
+        "  return reinterpret_cast<::TheClass*>("
+        "new std::shared_ptr<test::api::TheClass>(test::api::TheClass::create()));"
+    ) in src
+    assert (
+        "  const auto& result = "
+        "(*reinterpret_cast<std::shared_ptr<test::api::TheClass>*>(the_class))->solve(to_cpp(*puzzle));"
+    ) in src
+    assert "  if (size < out_capacity) {" in src
+    assert "  if (size <= out_capacity) {" in src
+    assert "  if (count <= out_capacity) { std::copy(result.begin(), result.end(), out); }" in src
+    assert "  for (const auto& item : result) { size += item.size() + 1; }" in src
+    assert (
+        "  for (size_t i = 0; i < result.size(); ++i) { items[i] = arena.copy(result[i]); }" in src
+    )
+    assert "  delete reinterpret_cast<std::shared_ptr<test::api::TheClass>*>(the_class);" in src
+
+
+def test_c_binding_generator_mixed_factory_refs(api_with_results: dict):
+    api_with_results["functions"] = [
+        dict(name="make_the_class", type="TheClass", ref_type="unique", is_factory=True)
+    ]
+    generator = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    )
+    with pytest.raises(ValueError):
+        generator.generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+
+
+def test_c_binding_generator_arena_result(api_with_results: dict):
+    api_with_results["structs"].append(
+        dict(
+            name="TheRecord",
+            members=[
+                dict(name="words", type="string", is_list=True),
+                dict(name="puzzle", type="ThePuzzle"),
+            ],
+        )
+    )
+    api_with_results["classes"][0]["methods"].append(
+        dict(type="TheRecord", name="records", is_list=True)
+    )
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert "  const char* const* words;" in hdr
+    assert "const TheRecord* the_class_records(TheClass* the_class, uint32_t* out_count);" in hdr
+    assert "void test_api_release_result(const void* result);" in hdr
+
+    src = src_ctx.get_gen_text()
+    assert "  struct ResultArena {" in src
+    assert "    size += sizeof(const char*) * v.words.size() + alignof(const char*);" in src
+    assert "    size += arena_size(v.puzzle);" in src
+    assert "    to_c(v.puzzle, c.puzzle, arena);" in src
+    assert "    for (size_t i = 0; i < 2; ++i) { c.sides[i] = arena.copy(v.sides[i]); }" in src
+    assert "  auto* items = arena.alloc<::TheRecord>(result.size());" in src
+    assert "  free(const_cast<void*>(result));" in src
+
+
+def test_c_binding_generator_struct_and_array_results(api_with_results: dict):
+    api_with_results["classes"][0]["methods"] += [
+        dict(type="ThePuzzle", name="puzzle"),
+        dict(type="int32", name="corners", array_count=4),
+        dict(type="ThePuzzle", name="pair", array_count=2),
+    ]
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    # a single struct is one arena allocation too - no count
+    assert "const ThePuzzle* the_class_puzzle(TheClass* the_class);" in hdr
+    # fixed arrays come back like lists
+    assert (
+        "uint32_t the_class_corners(TheClass* the_class, int32_t* out, uint32_t out_capacity);"
+        in hdr
+    )
+    assert "const ThePuzzle* the_class_pair(TheClass* the_class, uint32_t* out_count);" in hdr
+
+    src = src_ctx.get_gen_text()
+    assert (
+        "  ResultArena arena{static_cast<char*>(malloc(sizeof(::ThePuzzle) + arena_size(result)))};\n"
+        "  if (arena.next == nullptr) {\n"
+        "    return nullptr;\n"
+        "  }\n"
+        "  auto* item = arena.alloc<::ThePuzzle>(1);\n"
+        "  to_c(result, *item, arena);\n"
+        "  return item;"
+    ) in src
+    assert "  void to_c(const test::api::ThePuzzle& v, ::ThePuzzle& c, ResultArena& arena) {" in src
+
+
+def test_c_binding_generator_stream_cursor(api_with_results: dict):
+    api_with_results["classes"][0]["methods"].append(
+        dict(type="string", name="lines", is_stream=True)
+    )
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert "typedef struct TheClassLinesStreamCursor TheClassLinesStreamCursor;" in hdr
+    assert "TheClassLinesStreamCursor* the_class_lines(TheClass* the_class);" in hdr
+    assert "bool the_class_lines_next(TheClassLinesStreamCursor* cursor);" in hdr
+    assert (
+        "uint32_t the_class_lines_item(const TheClassLinesStreamCursor* cursor, "
+        "char* out, uint32_t out_capacity);"
+    ) in hdr
+    assert "void destroy_the_class_lines_stream_cursor(TheClassLinesStreamCursor* cursor);" in hdr
+
+    src = src_ctx.get_gen_text()
+    assert "struct TheClassLinesStreamCursor : bng::api::StreamCursor<std::string> {" in src
+    assert (
+        "  return new TheClassLinesStreamCursor("
+        "(*reinterpret_cast<std::shared_ptr<test::api::TheClass>*>(the_class))->lines());"
+    ) in src
+
+
+def test_c_binding_generator_error_enum(api_with_results: dict):
+    api_with_results["enums"] = [
+        dict(name="TheError", members=[dict(name="ok", value=0), dict(name="failed", value=1)])
+    ]
+    api_with_results["classes"][0]["methods"][1]["error_enum"] = "TheError"
+    api_with_results["classes"][0]["methods"].append(
+        dict(name="reset", type="void", error_enum="TheError")
+    )
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert "void the_class_reset(TheClass* the_class, TheError* out_error);" in hdr
+    assert (
+        "uint32_t the_class_solve(TheClass* the_class, const ThePuzzle* puzzle, "
+        "char* out, uint32_t out_capacity, TheError* out_error);"
+    ) in hdr
+
+    src = src_ctx.get_gen_text()
+    assert "  *out_error = static_cast<::TheError>(expected.error());" in src
+    assert "  if (!expected) {\n    return {};\n  }" in src
+    # a failed batch leaves no stale count next to its NULL
+    assert "  if (!expected) {\n    *out_count = 0;\n    return {};\n  }" in src
+
+
+def test_c_binding_generator_stream_error_enum(api_with_results: dict):
+    api_with_results["enums"] = [
+        dict(name="TheError", members=[dict(name="ok", value=0), dict(name="failed", value=1)])
+    ]
+    api_with_results["classes"][0]["methods"].append(
+        dict(type="string", name="lines", is_stream=True, error_enum="TheError")
+    )
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    # reported when the stream opens - a failed open returns no cursor
+    hdr = hdr_ctx.get_gen_text()
+    assert (
+        "TheClassLinesStreamCursor* the_class_lines(TheClass* the_class, TheError* out_error);"
+    ) in hdr
+    src = src_ctx.get_gen_text()
+    assert "  return new TheClassLinesStreamCursor(std::move(expected).value());" in src
+
+
+def test_c_binding_generator_shards(api_with_results: dict):
+    api_with_results["functions"] = [dict(name="version", type="string")]
+    generator = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    )
+    out_dir = OUT_DIR / "c_shards"
+    generator.generate_files(hdr=out_dir / "c_api.h", src=out_dir / "c_api.cpp", shard=True)
+    manifest = (out_dir / "c_api_shards.txt").read_text().splitlines()
+    assert manifest == [
+        (out_dir / "c_api.cpp").resolve().as_posix(),
+        (out_dir / "c_api_the_class.cpp").resolve().as_posix(),
+    ]
+
+    common = (out_dir / "c_api.cpp").read_text()
+    assert "test_api_version(" in common
+    assert "the_class_solve(" not in common
+    shard = (out_dir / "c_api_the_class.cpp").read_text()
+    assert "the_class_solve(" in shard
+    assert "test_api_version(" not in shard
+    # structs passed by the class' methods get converters in its shard
+    assert "to_cpp(const ::ThePuzzle& c)" in shard
+
+    # regenerating an unchanged api keeps the shard files untouched
+    mtime = (out_dir / "c_api_the_class.cpp").stat().st_mtime_ns
+    generator.generate_files(hdr=out_dir / "c_api.h", src=out_dir / "c_api.cpp", shard=True)
+    assert (out_dir / "c_api_the_class.cpp").stat().st_mtime_ns == mtime
+
+
+def test_c_binding_generator_pch(api_with_results: dict):
+    generator = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    )
+    includes = (
+        '#include "test_api.h"\n'
+        '#include "api/api_util.h"\n'
+        "#include <algorithm>\n"
+        "#include <cstring>\n"
+        "#include <string>\n"
+        "#include <vector>\n"
+    )
+    pch = generator.generate_pch_ctx(Path("unused_c_api_pch.h")).get_gen_text()
+    assert "#pragma once\n" + includes in pch
+    # the precompiled header holds exactly what the binding source starts with
+    _, src_ctx = generator.generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    assert '#include "unused_c_api.h"\n' + includes in src_ctx.get_gen_text()
+
+
+def test_c_binding_generator_blittable(api_with_results: dict):
+    api_with_results["structs"].append(
+        dict(
+            name="TheVec",
+            members=[dict(name="x", type="float64"), dict(name="y", type="float64")],
+        )
+    )
+    api_with_results["classes"][0]["methods"] += [
+        dict(
+            type="float64",
+            name="length",
+            parameters=[dict(name="vec", type="TheVec", is_const=True)],
+        ),
+        dict(
+            type="float64",
+            name="total",
+            parameters=[dict(name="vecs", type="TheVec", is_const=True, is_list=True)],
+        ),
+        dict(type="TheVec", name="vecs", is_list=True),
+    ]
+    _, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    src = src_ctx.get_gen_text()
+    assert "#include <bit>\n" in src
+    assert "    sizeof(::TheVec) == sizeof(test::api::TheVec) &&" in src
+    assert "    offsetof(::TheVec, y) == offsetof(test::api::TheVec, y)," in src
+    assert '    "TheVec is copied whole - the C and C++ layouts must match");' in src
+    # no per-member converters for blittable structs
+    assert "to_cpp(const ::TheVec& c)" not in src
+    assert "->length(std::bit_cast<test::api::TheVec>(*vec));" in src
+    assert "  std::vector<test::api::TheVec> vecs_arg(vecs_count);" in src
+    assert "  if (vecs_count) { memcpy(vecs_arg.data(), vecs, sizeof(*vecs) * vecs_count); }" in src
+    assert "  size_t size = sizeof(::TheVec) * result.size();" in src
+    assert "  memcpy(items, result.data(), size);" in src
+
+
+def test_c_binding_generator_packed_strings(api_with_results: dict):
+    api_with_results["classes"][0]["methods"] += [
+        dict(
+            type="int32",
+            name="count",
+            parameters=[dict(name="words", type="string_view", is_list=True)],
+        ),
+        dict(
+            type="void",
+            name="load",
+            parameters=[dict(name="words", type="string", is_list=True, is_const=True)],
+        ),
+    ]
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_c_api.h"), src=Path("unused_c_api.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert (
+        "int32_t the_class_count(TheClass* the_class, "
+        "const char* words, const uint32_t* words_offsets, uint32_t words_count);"
+    ) in hdr
+    assert (
+        "void the_class_load(TheClass* the_class, "
+        "const char* words, const uint32_t* words_offsets, uint32_t words_count);"
+    ) in hdr
+
+    src = src_ctx.get_gen_text()
+    # views are sliced out of the caller's buffer, owned strings are copied once
+    assert "->count(bng::api::StringViews(words, words_offsets, words_count));" in src
+    assert (
+        "  for (auto s : bng::api::StringViews(words, words_offsets, words_count)) "
+        "{ words_arg.emplace_back(s); }"
+    ) in src
+
+
+def test_c_binding_generator_pool(api_with_results: dict):
+    the_class = api_with_results["classes"][0]
+    the_class["is_pooled"] = True
+    the_class["methods"][1]["is_long_running"] = True
+    the_class["methods"][1]["is_thread_safe"] = True
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused.h"), src=Path("unused.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert "TheClassPool* the_class_pool_create(const TheClass* source, uint32_t size);" in hdr
+    assert "// thread safe\n// returns the string's size" in hdr
+    assert "uint32_t the_class_pool_solve(TheClassPool* the_class_pool, " in hdr
+    assert "the_class_pool_solve_batch(TheClassPool* the_class_pool, " in hdr
+    assert "the_class_pool_counts" not in hdr
+    src = src_ctx.get_gen_text()
+    assert (
+        "  return reinterpret_cast<::TheClassPool*>(new test::api::TheClassPool("
+        "**reinterpret_cast<const std::shared_ptr<test::api::TheClass>*>(source), size));"
+    ) in src
+    assert "  delete reinterpret_cast<test::api::TheClassPool*>(the_class_pool);" in src
+
+
+def test_c_binding_generator_call_stats(api_with_results: dict):
+    api_with_results["classes"][0]["methods"].append(
+        dict(
+            type="int32",
+            name="count_words",
+            parameters=[
+                dict(name="words", type="string", is_list=True),
+                dict(name="label", type="string"),
+            ],
+        )
+    )
+    hdr_ctx, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused.h"), src=Path("unused.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert (
+        "#if defined(BNG_BINDING_STATS)\n"
+        "TEST_API_C_EXPORT uint32_t test_api_get_binding_stats(BngCallStats* out, uint32_t out_capacity);\n"
+        "#endif"
+    ) in hdr
+    src = src_ctx.get_gen_text()
+    # one table entry per shim, batches included
+    assert "inline bng::api::CallStats test_api_call_stats[] = {" in src
+    assert '  bng::api::CallStats("the_class_solve_batch"),' in src
+    assert "  BNG_BINDING_CALL(test_api_call_stats[1], sizeof(*puzzle));" in src
+    assert (
+        "  BNG_BINDING_CALL(test_api_call_stats[5], words_offsets[words_count] + "
+        "sizeof(uint32_t) * (words_count + 1) + (label ? strlen(label) : 0));"
+    ) in src
+    assert (
+        "    for (uint32_t i = 0; i < count; ++i) { test_api_call_stats[i].copy_to(out[i]); }"
+        in src
+    )
+
+
+def test_c_binding_generator_call_stats_lifecycle(api_with_results: dict):
+    the_class = api_with_results["classes"][0]
+    the_class["methods"].append(dict(type="string", name="lines", is_stream=True))
+    the_class["is_pooled"] = True
+    the_class["methods"][1]["is_long_running"] = True
+    the_class["methods"][1]["is_thread_safe"] = True
+    _, src_ctx = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused.h"), src=Path("unused.cpp"))
+    src = src_ctx.get_gen_text()
+    # cursors, destructors, pool creation and releases are timed like the calls
+    assert (
+        "bool the_class_lines_next(TheClassLinesStreamCursor* cursor) {\n"
+        "  BNG_BINDING_CALL(test_api_call_stats[6], 0);\n"
+        "  return cursor->next();"
+    ) in src
+    assert (
+        "  BNG_BINDING_CALL(test_api_call_stats[7], 0);\n  const auto& result = cursor->item;"
+        in src
+    )
+    assert "  BNG_BINDING_CALL(test_api_call_stats[8], 0);\n  delete cursor;" in src
+    assert '  bng::api::CallStats("destroy_the_class"),' in src
+    assert (
+        "TheClassPool* the_class_pool_create(const TheClass* source, uint32_t size) {\n"
+        "  BNG_BINDING_CALL(test_api_call_stats[10], sizeof(size));"
+    ) in src
+    assert (
+        "  BNG_BINDING_CALL(test_api_call_stats[13], 0);\n"
+        "  delete reinterpret_cast<test::api::TheClassPool*>(the_class_pool);"
+    ) in src
+    assert (
+        "void test_api_release_result(const void* result) {\n"
+        "  BNG_BINDING_CALL(test_api_call_stats[14], 0);"
+    ) in src
+
+
+def test_c_binding_generator_api_table(api_with_results: dict):
+    generator = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    )
+    hdr_ctx, src_ctx = generator.generate_ctx(hdr=Path("unused.h"), src=Path("unused.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert f"#define TEST_API_API_TABLE_VERSION 0x{generator.api_table_version():08x}u" in hdr
+    assert (
+        "typedef struct TestApiApiTable {\n"
+        "  uint32_t version;\n"
+        "  TheClass* (*the_class_create)(void);\n"
+    ) in hdr
+    assert "  void (*destroy_the_class)(TheClass* the_class);\n" in hdr
+    assert "  void (*test_api_release_result)(const void* result);\n} TestApiApiTable;" in hdr
+    assert (
+        "TEST_API_C_EXPORT const TestApiApiTable* test_api_get_api_table(uint32_t version);"
+    ) in hdr
+    # MSVC callers import what the binding's sources export
+    assert (
+        "#if !defined(_MSC_VER)\n"
+        '  #define TEST_API_C_EXPORT __attribute__((visibility("default")))\n'
+        "#elif defined(TEST_API_C_BUILD)\n"
+        "  #define TEST_API_C_EXPORT __declspec(dllexport)\n"
+        "#else\n"
+        "  #define TEST_API_C_EXPORT __declspec(dllimport)\n"
+        "#endif"
+    ) in hdr
+    # the shims are hidden in table only builds, the table getter stays exported
+    assert (
+        "#if !defined(TEST_API_API_TABLE_ONLY)\n"
+        "  #define TEST_API_C_SHIM TEST_API_C_EXPORT\n"
+        "#elif defined(_MSC_VER)\n"
+        "  #define TEST_API_C_SHIM\n"
+        "#else\n"
+        '  #define TEST_API_C_SHIM __attribute__((visibility("hidden")))\n'
+        "#endif"
+    ) in hdr
+    assert "TEST_API_C_SHIM TheClass* the_class_create(void);" in hdr
+    assert "TEST_API_C_SHIM void destroy_the_class(TheClass* the_class);" in hdr
+    # the table entries stay bare
+    assert "  TheClass* (*the_class_create)(void);\n" in hdr
+    src = src_ctx.get_gen_text()
+    assert '#define TEST_API_C_BUILD\n#include "unused.h"' in src
+    assert "  static constexpr TestApiApiTable table = {\n    TEST_API_API_TABLE_VERSION,\n" in src
+    assert "  return version == table.version ? &table : nullptr;" in src
+
+    # a changed signature is another table
+    api_with_results["classes"][0]["methods"][2]["type"] = "int64"
+    other = CBindingGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", api_h="test_api.h"
+    )
+    assert other.api_table_version() != generator.api_table_version()
+
+
+def test_c_loader_generator(api_with_results: dict):
+    hdr_ctx, _ = CLoaderGenerator(
+        ApiDef(**api_with_results), gen_version="test-0.0.0", c_h="test_c_api.h"
+    ).generate_ctx(hdr=Path("unused_loader.h"))
+    hdr = hdr_ctx.get_gen_text()
+    assert '#include "test_c_api.h"' in hdr
+    assert (
+        "static inline bool test_api_load_api(const char* library_path, "
+        "TestApiApiTable* out_table) {"
+    ) in hdr
+    assert '*(void**)(&get_api_table) = dlsym(library, "test_api_get_api_table");' in hdr
+    assert (
+        "table = get_api_table != NULL ? get_api_table(TEST_API_API_TABLE_VERSION) : NULL;" in hdr
+    )
@@ -14,7 +14,7 @@ sys.path.append(CODE_GEN_DIR.as_posix())
 from api_def import ApiDef
 
 # noinspection PyUnresolvedReferences
-from cpp_generator import CppGenerator
+from cpp_generator import CppFwdGenerator, CppGenerator
 
 #
 # fixtures
@@ -54,6 +54,29 @@ def api_with_list() -> dict:
     )
 
 
+@fixture
+def api_with_borrowed() -> dict:
+    return dict(
+        name="test_api",
+        version="1.2.3",
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(
+                        type="int32",
+                        name="load",
+                        parameters=[
+                            dict(name="label", type="string_view"),
+                            dict(name="blob", type="bytes", is_const=True),
+                        ],
+                    )
+                ],
+            )
+        ],
+    )
+
+
 #
 # tests
 #
@@ -77,3 +100,275 @@ def test_cpp_generator_list_member(api_with_list: dict):
     assert "the_list_count" not in lines
     assert "const std::vector<double>& the_row) = 0;" in lines
     assert "std::vector<std::string> the_list;" in lines
+
+
+def test_cpp_generator_borrowed_params(api_with_borrowed: dict):
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_borrowed), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    lines = hdr_ctx.get_gen_text()
+    assert "#include <span>" in lines
+    assert "#include <string_view>" in lines
+    assert (
+        "virtual int32_t load(std::string_view label, std::span<const uint8_t> blob) = 0;" in lines
+    )
+
+
+def test_cpp_generator_async_variant(api_with_list: dict):
+    api_with_list["classes"][0]["methods"][0]["is_async"] = True
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_list), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    lines = hdr_ctx.get_gen_text()
+    assert "#include <functional>" in lines
+    assert "#include <thread>" not in lines
+    assert "std::function<void(double)> on_complete" in lines
+    # bounded executor instead of a detached thread per call, serialized - not thread safe
+    assert (
+        "      bng::api::AsyncExecutor::shared().post([=, this]() mutable {\n"
+        "        auto result = [&]() {\n"
+        "          std::lock_guard lock(async_call_lock());\n"
+        "          return list_sum(label, the_row);\n"
+        "        }();\n"
+        "        on_complete(std::move(result));\n"
+        "      });"
+    ) in lines
+    assert "    static std::mutex& async_call_lock() {" in lines
+    assert "// on that thread. the instance must stay alive until on_complete runs." in lines
+
+    # thread safe methods run unlocked
+    api_with_list["classes"][0]["methods"][0]["is_thread_safe"] = True
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_list), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    lines = hdr_ctx.get_gen_text()
+    assert (
+        "bng::api::AsyncExecutor::shared().post([=, this]() mutable "
+        "{ on_complete(list_sum(label, the_row)); });"
+    ) in lines
+    assert "async_call_lock" not in lines
+
+
+def test_cpp_generator_async_non_const_params():
+    api = ApiDef(
+        name="test_api",
+        version="1.2.3",
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(
+                        type="int32",
+                        name="tag",
+                        is_async=True,
+                        parameters=[
+                            dict(name="s", type="string"),
+                            dict(name="l", type="int32", is_list=True),
+                        ],
+                    ),
+                    dict(
+                        type="int32",
+                        name="stat",
+                        is_async=True,
+                        is_static=True,
+                        parameters=[dict(name="s", type="string")],
+                    ),
+                ],
+            )
+        ],
+    )
+    hdr_ctx, _ = CppGenerator(api, gen_version="test-0.0.0").generate_ctx(hdr=Path("unused.h"))
+    lines = hdr_ctx.get_gen_text()
+    assert (
+        "void tag_async(std::string& s, std::vector<int32_t>& l, "
+        "std::function<void(int32_t)> on_complete) {"
+    ) in lines
+    # the captured copies are const unless the lambda is mutable
+    assert "bng::api::AsyncExecutor::shared().post([=, this]() mutable {" in lines
+    assert "bng::api::AsyncExecutor::shared().post([=]() mutable {" in lines
+    assert "bng::api::AsyncExecutor::shared().post([=]() {" not in lines
+
+
+def test_cpp_generator_batch_default(api_with_borrowed: dict):
+    api_with_borrowed["classes"] = [
+        dict(
+            name="TheClass",
+            methods=[
+                dict(
+                    name="solve",
+                    type="string",
+                    is_batchable=True,
+                    parameters=[dict(name="puzzle", type="string", is_const=True)],
+                )
+            ],
+        )
+    ]
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_borrowed), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    lines = hdr_ctx.get_gen_text()
+    assert "virtual std::string solve(const std::string& puzzle) = 0;" in lines
+    assert (
+        "virtual std::vector<std::string> solve_batch(const std::vector<std::string>& puzzle_batch) {"
+        in lines
+    )
+    assert "for (const auto& item : puzzle_batch) { results.push_back(solve(item)); }" in lines
+
+
+def test_cpp_generator_error_enum(api_with_borrowed: dict):
+    api_with_borrowed["enums"] = [
+        dict(name="TheError", members=[dict(name="ok", value=0), dict(name="failed", value=1)])
+    ]
+    api_with_borrowed["classes"][0]["methods"] = [
+        dict(name="setup", type="void", error_enum="TheError"),
+        dict(
+            name="solve",
+            type="string",
+            is_batchable=True,
+            error_enum="TheError",
+            parameters=[dict(name="puzzle", type="string", is_const=True)],
+        ),
+    ]
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_borrowed), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    lines = hdr_ctx.get_gen_text()
+    assert "enum class TheError : int32_t {" in lines
+    assert "constexpr const char* error_name(TheError error) {" in lines
+    assert "virtual TheError setup() = 0;" in lines
+    assert (
+        "virtual bng::api::Expected<std::string, TheError> solve(const std::string& puzzle) = 0;"
+        in lines
+    )
+    # batches stop at the first failed item
+    assert "if (!result) { return bng::api::unexpected(result.error()); }" in lines
+
+
+def test_cpp_generator_static_dispatch(api_with_borrowed: dict):
+    the_class = api_with_borrowed["classes"][0]
+    the_class["impl_type"] = "TheImpl"
+    the_class["impl_h"] = "impl/the_impl.h"
+    the_class["methods"].append(
+        dict(
+            name="solve",
+            type="string",
+            is_batchable=True,
+            parameters=[dict(name="puzzle", type="string", is_const=True)],
+        )
+    )
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_borrowed), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    lines = hdr_ctx.get_gen_text()
+    assert "virtual" not in lines
+    assert "using TheClass = TheImpl;" in lines
+    assert "class TheClassBase {" in lines
+    assert (
+        "static_assert(std::is_same_v<decltype(&Impl::load), "
+        "int32_t (Impl::*)(std::string_view, std::span<const uint8_t>)>, "
+        '"load() differs from the interface");'
+    ) in lines
+    assert "results.push_back(static_cast<Impl*>(this)->solve(item));" in lines
+    assert lines.rstrip().endswith('#include "impl/the_impl.h"')
+
+
+def test_cpp_generator_pool(api_with_list: dict):
+    the_class = api_with_list["classes"][0]
+    the_class["is_pooled"] = True
+    the_class["methods"][0]["is_long_running"] = True
+    the_class["methods"][0]["is_reentrant"] = True
+    the_class["methods"].append(
+        dict(name="create", type="TheClass", ref_type="unique", is_factory=True, is_static=True)
+    )
+    api = ApiDef(**api_with_list)
+    assert [m.name for m in api.classes[0].pool_class.methods] == ["list_sum"]
+    hdr_ctx, _ = CppGenerator(api, gen_version="test-0.0.0").generate_ctx(hdr=Path("unused.h"))
+    lines = hdr_ctx.get_gen_text()
+    assert '#include "api/api_util.h"' in lines
+    assert "virtual std::unique_ptr<TheClass> share() const = 0;" in lines
+    assert (
+        "    // reentrant - must allow concurrent calls on different instances\n"
+        "    virtual double list_sum("
+    ) in lines
+    assert "class BasicTheClassPool {" in lines
+    assert "    : pool_(size, [&source]() { return source.share(); }) {}" in lines
+    assert "return pool_.checkout()->list_sum(label, the_row);" in lines
+    assert "using TheClassPool = BasicTheClassPool<TheClass>;" in lines
+
+
+def test_cpp_generator_pool_batch(api_with_list: dict):
+    the_class = api_with_list["classes"][0]
+    the_class["is_pooled"] = True
+    the_class["methods"] = [
+        dict(
+            name="count",
+            type="int32",
+            is_long_running=True,
+            is_reentrant=True,
+            is_batchable=True,
+            parameters=[dict(name="label", type="string", is_const=True)],
+        ),
+        dict(name="create", type="TheClass", ref_type="unique", is_factory=True, is_static=True),
+    ]
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_list), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    lines = hdr_ctx.get_gen_text()
+    # split over the workers, not run on one checked out worker
+    assert (
+        "    std::vector<int32_t> count_batch(const std::vector<std::string>& label_batch) {\n"
+        "      std::vector<int32_t> results(label_batch.size());\n"
+        "      pool_.run_sliced(label_batch.size(), [&](Impl& worker, size_t i) {\n"
+        "        results[i] = worker.count(label_batch[i]);\n"
+        "        return true;\n"
+        "      });\n"
+        "      return results;\n"
+        "    }"
+    ) in lines
+    assert "pool_.checkout()->count_batch(" not in lines
+
+
+def test_cpp_generator_minimal_includes(api_with_list: dict):
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_list), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    includes = [ln for ln in hdr_ctx.lines if ln.startswith("#include")]
+    assert includes == ["#include <string>", "#include <vector>"]
+
+
+def test_cpp_generator_struct_layout(api_with_list: dict):
+    api_with_list["structs"] = [
+        dict(
+            name="TheSorted",
+            layout="sorted",
+            members=[dict(name="flag", type="uint8"), dict(name="x", type="float64")],
+        ),
+        dict(name="TheHot", layout="cache_aligned", members=[dict(name="n", type="int32")]),
+    ]
+    hdr_ctx, _ = CppGenerator(ApiDef(**api_with_list), gen_version="test-0.0.0").generate_ctx(
+        hdr=Path("unused.h")
+    )
+    lines = hdr_ctx.get_gen_text()
+    assert "#include <cstddef>" in lines
+    assert "  struct TheSorted {\n    double x;\n    uint8_t flag;\n  };" in lines
+    assert "    sizeof(TheSorted) == 16 &&" in lines
+    assert "    offsetof(TheSorted, flag) == 8," in lines
+    assert "  struct alignas(64) TheHot {" in lines
+    assert "sizeof(TheHot)" not in lines
+
+
+def test_cpp_fwd_generator(api_with_borrowed: dict):
+    api_with_borrowed["enums"] = [dict(name="TheKind", members=[dict(name="a", value=0)])]
+    api_with_borrowed["structs"] = [dict(name="TheData", members=[dict(name="x", type="int32")])]
+    api_with_borrowed["classes"].append(
+        dict(name="TheEngine", impl_type="TheEngineImpl", impl_h="impl/the_engine.h")
+    )
+    hdr_ctx, _ = CppFwdGenerator(
+        ApiDef(**api_with_borrowed), gen_version="test-0.0.0"
+    ).generate_ctx(hdr=Path("unused_fwd.h"))
+    lines = hdr_ctx.lines
+    assert "#include <cstdint>" in lines
+    assert "  enum class TheKind : int32_t;" in lines
+    assert "  struct TheData;" in lines
+    assert "  class TheClass;" in lines
+    assert "  using TheEngine = TheEngineImpl;" in lines
@@ -17,9 +17,15 @@ from gen_api_sources import (
     generate_c_wrapper,
     generate_jni_binding,
     generate_kt_wrapper,
+    generate_python_extension,
     generate_swift_binding,
     generate_swift_wrapper,
     generate_wasm_binding,
+    generate_wasm_loader,
+    generate_wasm_raw_binding,
+    generate_wasm_raw_js_wrapper,
+    generate_wasm_worker,
+    generate_wasm_worker_proxy,
 )
 
 #
@@ -43,6 +49,7 @@ def test_integrated_api0():
         api_h=api_h.name,
         out_h=OUT_DIR / f"c_wrapper_{idx}.h",
         out_cpp=OUT_DIR / f"c_wrapper_{idx}.cpp",
+        out_loader_h=OUT_DIR / f"c_wrapper_loader_{idx}.h",
     )
     generate_jni_binding(
         api_def=api_def,
@@ -63,6 +70,30 @@ def test_integrated_api0():
     generate_wasm_binding(
         api_def=api_def, api_h=api_h.name, out_cpp=OUT_DIR / f"wasm_binding_{idx}.cpp"
     )
+    generate_wasm_raw_binding(
+        api_def=api_def, api_h=api_h.name, out_cpp=OUT_DIR / f"wasm_raw_binding_{idx}.cpp"
+    )
+    generate_wasm_raw_js_wrapper(api_def=api_def, out_js=OUT_DIR / f"wasm_raw_wrapper_{idx}.js")
+    generate_wasm_loader(
+        api_def=api_def,
+        factory_module="./bng.js",
+        wasm_url="bng.wasm",
+        out_js=OUT_DIR / f"wasm_loader_{idx}.js",
+        raw_js_module=f"./wasm_raw_wrapper_{idx}.js",
+    )
+    generate_wasm_worker(
+        api_def=api_def,
+        loader_module=f"./wasm_loader_{idx}.js",
+        out_js=OUT_DIR / f"wasm_worker_{idx}.js",
+    )
+    generate_wasm_worker_proxy(
+        api_def=api_def,
+        worker_module=f"./wasm_worker_{idx}.js",
+        out_js=OUT_DIR / f"wasm_worker_proxy_{idx}.js",
+    )
+    generate_python_extension(
+        api_def=api_def, api_h=api_h.name, out_cpp=OUT_DIR / f"python_extension_{idx}.cpp"
+    )
 
 
 def test_integrated_api1():
@@ -77,6 +108,7 @@ def test_integrated_api1():
         api_h=api_h.name,
         out_h=OUT_DIR / f"c_wrapper_{idx}.h",
         out_cpp=OUT_DIR / f"c_wrapper_{idx}.cpp",
+        out_loader_h=OUT_DIR / f"c_wrapper_loader_{idx}.h",
     )
     generate_jni_binding(
         api_def=api_def,
@@ -97,3 +129,27 @@ def test_integrated_api1():
     generate_wasm_binding(
         api_def=api_def, api_h=api_h.name, out_cpp=OUT_DIR / f"wasm_binding_{idx}.cpp"
     )
+    generate_wasm_raw_binding(
+        api_def=api_def, api_h=api_h.name, out_cpp=OUT_DIR / f"wasm_raw_binding_{idx}.cpp"
+    )
+    generate_wasm_raw_js_wrapper(api_def=api_def, out_js=OUT_DIR / f"wasm_raw_wrapper_{idx}.js")
+    generate_wasm_loader(
+        api_def=api_def,
+        factory_module="./bng.js",
+        wasm_url="bng.wasm",
+        out_js=OUT_DIR / f"wasm_loader_{idx}.js",
+        raw_js_module=f"./wasm_raw_wrapper_{idx}.js",
+    )
+    generate_wasm_worker(
+        api_def=api_def,
+        loader_module=f"./wasm_loader_{idx}.js",
+        out_js=OUT_DIR / f"wasm_worker_{idx}.js",
+    )
+    generate_wasm_worker_proxy(
+        api_def=api_def,
+        worker_module=f"./wasm_worker_{idx}.js",
+        out_js=OUT_DIR / f"wasm_worker_proxy_{idx}.js",
+    )
+    generate_python_extension(
+        api_def=api_def, api_h=api_h.name, out_cpp=OUT_DIR / f"python_extension_{idx}.cpp"
+    )
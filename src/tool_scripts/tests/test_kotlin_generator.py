@@ -78,6 +78,48 @@ def test_jni_binding_generator_list_member(api_with_list: dict):
         api_pkg="com.test.test_api",
     ).generate_ctx(src=Path("unused_bindings.cpp"))
     lines = src_ctx.get_gen_text()
+    assert "JNIEnv *env, jobject thiz, jstring label, jobject the_row) {" in lines
+    assert "  JStringUTF label_utf(env, label);" in lines
+    assert "  std::string label_str = label_utf.str();" in lines
+
+
+def test_jni_binding_generator_borrowed():
+    api = ApiDef(
+        name="test_api",
+        version="1.2.3",
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(
+                        type="int32",
+                        name="load",
+                        parameters=[
+                            dict(name="label", type="string_view"),
+                            dict(name="blob", type="bytes", is_const=True),
+                        ],
+                    )
+                ],
+            )
+        ],
+    )
+    _, src_ctx = JniBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="test_api.h", api_pkg="com.test.test_api"
+    ).generate_ctx(src=Path("unused_bindings.cpp"))
+    lines = src_ctx.get_gen_text()
+    # a non-direct buffer is rejected before its address or capacity is used
+    assert (
+        "  auto blob_data = (const uint8_t*)env->GetDirectBufferAddress(blob);\n"
+        "  auto blob_capacity = env->GetDirectBufferCapacity(blob);\n"
+        "  if (blob_data == nullptr || blob_capacity < 0) {\n"
+        '    env->ThrowNew(env->FindClass("java/lang/IllegalArgumentException"), '
+        '"blob must be a direct ByteBuffer");\n'
+        "    return {};\n"
+        "  }\n"
+        "  auto blob_size = size_t(blob_capacity);"
+    ) in lines
+    assert "  std::string_view label_view(label_data, label_size);" in lines
+    assert "label_utf" not in lines
 
 
 def test_kt_generator_minimal(api_minimal_valid: dict):
@@ -94,3 +136,127 @@ def test_kt_generator_list_member(api_with_list: dict):
     )
     assert src_ctx.line_count > 1
     lines = src_ctx.get_gen_text()
+
+
+def test_kt_generator_async(api_with_list: dict):
+    api_with_list["classes"][0]["methods"][0]["is_async"] = True
+    _, src_ctx = KtGenerator(ApiDef(**api_with_list), gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused_wrapper.kt")
+    )
+    lines = src_ctx.get_gen_text()
+    assert "import kotlinx.coroutines.withContext" in lines
+    assert "suspend fun list_sum_async(" in lines
+
+
+def test_kt_generator_stream(api_with_list: dict):
+    api_with_list["classes"][0]["methods"].append(dict(name="lines", type="string", is_stream=True))
+    api = ApiDef(**api_with_list)
+    _, src_ctx = KtGenerator(api, gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused_wrapper.kt")
+    )
+    lines = src_ctx.get_gen_text()
+    assert (
+        "fun lines(): TheClassLinesStream = "
+        "synchronized(classLock) { TheClassLinesStream(lines_open()) }"
+    ) in lines
+    assert (
+        "class TheClassLinesStream internal constructor(private var cursor: Long) : "
+        "Sequence<String>, AutoCloseable {"
+    ) in lines
+
+    _, src_ctx = JniBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="test_api.h", api_pkg="com.test.test_api"
+    ).generate_ctx(src=Path("unused_bindings.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert "jboolean BNG_JNI_METHOD(TheClassLinesStream_next)(" in lines
+    assert "  delete reinterpret_cast<bng::api::StreamCursor<std::string>*>(cursor);" in lines
+
+
+def test_kt_generator_error_enum(api_with_list: dict):
+    api_with_list["enums"] = [
+        dict(name="TheError", members=[dict(name="ok", value=0), dict(name="failed", value=1)])
+    ]
+    api_with_list["classes"][0]["methods"][0]["error_enum"] = "TheError"
+    api = ApiDef(**api_with_list)
+    _, src_ctx = KtGenerator(api, gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused_wrapper.kt")
+    )
+    lines = src_ctx.get_gen_text()
+    assert "class TheErrorException(message: String) : RuntimeException(message)" in lines
+    assert "@Throws(TheErrorException::class)" in lines
+
+    _, src_ctx = JniBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="test_api.h", api_pkg="com.test.test_api"
+    ).generate_ctx(src=Path("unused_bindings.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert 'env->FindClass("com/test/test_api/TheErrorException"), error_name(error));' in lines
+
+
+def test_kt_generator_lock_scopes(api_with_list: dict):
+    methods = api_with_list["classes"][0]["methods"]
+    methods[0]["is_reentrant"] = True
+    methods.append(dict(name="count", type="int32", is_thread_safe=True))
+    methods.append(dict(name="reset", type="void", parameters=[dict(name="n", type="int32")]))
+    api = ApiDef(**api_with_list)
+    _, src_ctx = KtGenerator(api, gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused_wrapper.kt")
+    )
+    lines = src_ctx.get_gen_text()
+    assert "  @Synchronized\n  external fun list_sum(" in lines
+    assert "  /** @ThreadSafe - may be called concurrently, also on one instance */" in lines
+    assert "  external fun count(): int32" in lines
+    assert "  private val classLock = Any()" in lines
+    assert "  fun reset(n: int32): Unit = synchronized(classLock) { reset_unlocked(n) }" in lines
+    assert "  private external fun reset_unlocked(n: int32): Unit" in lines
+
+    _, src_ctx = JniBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="test_api.h", api_pkg="com.test.test_api"
+    ).generate_ctx(src=Path("unused_bindings.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert (
+        "void BNG_JNI_METHOD(TheClass_reset_unlocked)(JNIEnv *env, jobject thiz, jint n) {" in lines
+    )
+
+
+def test_kt_generator_pool(api_with_list: dict):
+    the_class = api_with_list["classes"][0]
+    the_class["is_pooled"] = True
+    the_class["methods"][0]["is_long_running"] = True
+    the_class["methods"][0]["is_thread_safe"] = True
+    the_class["methods"].append(
+        dict(name="create", type="TheClass", ref_type="raw", is_factory=True, is_static=True)
+    )
+    _, src_ctx = KtGenerator(ApiDef(**api_with_list), gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused_wrapper.kt")
+    )
+    lines = src_ctx.get_gen_text()
+    assert "  @JvmField internal var handle: Long = 0L" in lines
+    # the pool is only built from a set up source, like Swift's Pool(sharing:size:)
+    assert (
+        "class TheClassPool private constructor(private var handle: Long) : AutoCloseable {"
+        in lines
+    )
+    assert (
+        "    fun create(source: TheClass, size: Int = 0): TheClassPool =\n"
+        "      TheClassPool(createNative(source.handle, size))"
+    ) in lines
+    assert "    private external fun createNative(source: Long, size: Int): Long" in lines
+    assert "  private external fun destroy(handle: Long)" in lines
+
+    _, src_ctx = JniBindingGenerator(
+        ApiDef(**api_with_list),
+        gen_version="test-0.0.0",
+        api_h="test_api.h",
+        api_pkg="com.test.test_api",
+    ).generate_ctx(src=Path("unused_bindings.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert (
+        "jlong BNG_JNI_METHOD(TheClassPool_createNative)"
+        "(JNIEnv *env, jclass clazz, jlong source, jint size) {"
+    ) in lines
+    assert (
+        "  return jlong(new test::api::TheClassPool("
+        "*reinterpret_cast<const test::api::TheClass*>(source), uint32_t(size)));"
+    ) in lines
+    assert "  delete reinterpret_cast<test::api::TheClassPool*>(handle);" in lines
+    assert '  bng::api::CallStats("TheClassPool_createNative"),' in lines
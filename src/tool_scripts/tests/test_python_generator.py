@@ -0,0 +1,163 @@
+import sys
+from pathlib import Path
+
+import pytest
+from _pytest.fixtures import fixture
+
+TESTS_DIR = Path(__file__).parent
+TOOLS_DIR = TESTS_DIR.parent
+CODE_GEN_DIR = TOOLS_DIR / "code_gen"
+OUT_DIR = TESTS_DIR / "test_output"
+
+sys.path.append(TOOLS_DIR.as_posix())
+sys.path.append(CODE_GEN_DIR.as_posix())
+
+# noinspection PyUnresolvedReferences
+from api_def import ApiDef
+
+# noinspection PyUnresolvedReferences
+from python_generator import PythonExtensionGenerator
+
+#
+# fixtures
+#
+
+
+@fixture
+def api_with_methods() -> dict:
+    return dict(
+        name="test_api",
+        version="1.2.3",
+        enums=[
+            dict(name="TheError", members=[dict(name="ok", value=0), dict(name="bad", value=1)])
+        ],
+        structs=[
+            dict(
+                name="ThePuzzle",
+                members=[dict(name="sides", type="string", array_count=2)],
+            )
+        ],
+        functions=[
+            dict(
+                name="checksum",
+                type="uint32",
+                parameters=[dict(name="data", type="bytes")],
+            )
+        ],
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(
+                        name="create",
+                        type="TheClass",
+                        ref_type="shared",
+                        is_factory=True,
+                        is_static=True,
+                    ),
+                    dict(
+                        type="string",
+                        name="solve",
+                        error_enum="TheError",
+                        parameters=[dict(name="puzzle", type="ThePuzzle", is_const=True)],
+                    ),
+                    dict(type="int32", name="lines", is_stream=True, is_reentrant=True),
+                ],
+            )
+        ],
+    )
+
+
+def _generate(api: dict, **kwargs) -> str:
+    _, src_ctx = PythonExtensionGenerator(
+        ApiDef(**api), gen_version="test-0.0.0", api_h="test_api.h", **kwargs
+    ).generate_ctx(src=Path("unused_py.cpp"))
+    return src_ctx.get_gen_text()
+
+
+#
+# tests
+#
+
+
+def test_python_generator_fastcall(api_with_methods: dict):
+    src = _generate(api_with_methods)
+    assert '#include "py_util.h"\n#include "test_api.h"' in src
+    assert (
+        "PyObject* checksum(PyObject*, PyObject* const* args, Py_ssize_t nargs) {\n"
+        '    if (!bng::py::check_arg_count("checksum", nargs, 1)) {'
+    ) in src
+    # buffer protocol view, no copy
+    assert "bng::py::Arg<std::span<const uint8_t>> data_arg;" in src
+    # timed once converted, counting the argument's bytes
+    assert "    BNG_BINDING_CALL(test_api_py_call_stats[0], data_arg.bytes());" in src
+    assert (
+        "auto result = bng::py::without_gil([&] { return test::api::checksum(data_arg.get()); });"
+    ) in src
+    assert (
+        '{"checksum", bng::py::fastcall(checksum), METH_FASTCALL, "checksum(data, /)\\n--\\n\\n"},'
+    ) in src
+    assert "PyMODINIT_FUNC PyInit_test_api() {" in src
+
+
+def test_python_generator_methods(api_with_methods: dict):
+    src = _generate(api_with_methods, module_name="the_module")
+    assert (
+        "return bng::py::Instance<test::api::TheClass>::wrap("
+        "std::shared_ptr<test::api::TheClass>(std::move(result)));"
+    ) in src
+    # not reentrant - serialized across the class, with the GIL released
+    assert (
+        "    auto result = bng::py::without_gil([&] {\n"
+        "      std::lock_guard lock(bng::py::Instance<test::api::TheClass>::class_lock);\n"
+        "      return instance->self->solve(puzzle_arg.get());\n"
+        "    });\n"
+        "    if (!result) {\n"
+        "      return raise_error(result.error());\n"
+        "    }"
+    ) in src
+    assert "std::lock_guard lock(instance->lock);" in src
+    assert "return bng::py::StreamIterator<int32_t>::wrap(std::move(result));" in src
+    assert '"create", bng::py::fastcall(TheClass_create), METH_FASTCALL | METH_STATIC' in src
+    assert "Py_TPFLAGS_DEFAULT | Py_TPFLAGS_DISALLOW_INSTANTIATION," in src
+    assert (
+        'bng::py::add_exception(module, "the_module.TheErrorException", TheErrorException)'
+    ) in src
+    assert 'bng::py::StreamIterator<int32_t>::add_type(module, "the_module.Int32Stream");' in src
+    # enum results come back as the registered IntEnum's members
+    assert (
+        'bng::py::add_int_enum<test::api::TheError>(module, "TheError", {{"ok", 0}, {"bad", 1}})'
+    ) in src
+
+
+def test_python_generator_struct(api_with_methods: dict):
+    src = _generate(api_with_methods)
+    assert '  {"sides", T_OBJECT_EX, bng::py::Record<1>::offset(0), 0, nullptr},' in src
+    assert "Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC," in src
+    assert "struct Convert<test::api::ThePuzzle> {" in src
+    assert "return record->load(0, out.sides);" in src
+    assert "return Record<1>::make(ThePuzzle_type, {bng::py::to_py(value.sides)});" in src
+
+
+def test_python_generator_pool(api_with_methods: dict):
+    the_class = api_with_methods["classes"][0]
+    the_class["is_pooled"] = True
+    the_class["methods"][1]["is_long_running"] = True
+    the_class["methods"][1]["is_reentrant"] = True
+    src = _generate(api_with_methods)
+    assert "PyObject* TheClassPool_new(PyTypeObject*, PyObject* args, PyObject* kwargs) {" in src
+    assert (
+        "      std::lock_guard lock(bng::py::Instance<test::api::TheClass>::class_lock);\n"
+        "      return std::make_shared<test::api::TheClassPool>(*source->self, size);"
+    ) in src
+    # workers are checked out per call - never locked
+    assert (
+        "auto result = bng::py::without_gil([&] { return instance->self->solve(puzzle_arg.get()); });"
+    ) in src
+    assert '{"get_binding_stats", get_binding_stats, METH_NOARGS, nullptr},' in src
+
+
+def test_python_generator_class_param(api_with_methods: dict):
+    api_with_methods["functions"][0]["parameters"] = [dict(name="other", type="TheClass")]
+    with pytest.raises(ValueError):
+        _generate(api_with_methods)
@@ -54,6 +54,34 @@ def api_with_list() -> dict:
     )
 
 
+@fixture
+def api_with_struct() -> dict:
+    return dict(
+        name="test_api",
+        version="1.2.3",
+        structs=[
+            dict(
+                name="ThePuzzle",
+                members=[dict(name="sides", type="string", array_count=2)],
+            )
+        ],
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(name="create", type="TheClass", is_factory=True, is_static=True),
+                    dict(
+                        type="string",
+                        name="solve",
+                        is_batchable=True,
+                        parameters=[dict(name="puzzle", type="ThePuzzle", is_const=True)],
+                    ),
+                ],
+            )
+        ],
+    )
+
+
 #
 # tests
 #
@@ -93,3 +121,123 @@ def test_swift_generator_list_member(api_with_list: dict):
     ).generate_ctx(src=Path("unused.swift"))
     assert src_ctx.line_count > 1
     lines = src_ctx.get_gen_text()
+
+
+def test_swift_generator_async(api_with_list: dict):
+    api_with_list["classes"][0]["methods"][0]["is_async"] = True
+    _, src_ctx = SwiftGenerator(
+        ApiDef(**api_with_list), gen_version="test-0.0.0", api_h="unused.h"
+    ).generate_ctx(src=Path("unused.swift"))
+    lines = src_ctx.get_gen_text()
+    assert "extension TheClass {" in lines
+    assert "public func listSumAsync(label: String, theRow: [Double]) async -> Double {" in lines
+
+
+def test_swift_binding_generator_shims(api_with_struct: dict):
+    hdr_ctx, src_ctx = SwiftBindingGenerator(
+        ApiDef(**api_with_struct), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_umbrella.h"), src=Path("unused_bindings.cpp"))
+    hdr = hdr_ctx.get_gen_text()
+    assert "  const char* sides[2];" in hdr
+    assert "TheClass* the_class_create(void);" in hdr
+    assert (
+        "const char* the_class_solve(TheClass* the_class, const ThePuzzle* puzzle, "
+        "uint32_t* out_size);"
+    ) in hdr
+    src = src_ctx.get_gen_text()
+    assert "  test::api::ThePuzzle to_cpp(const ::ThePuzzle& c) {" in src
+    assert "  thread_local std::string result;" in src
+    assert (
+        "  result = reinterpret_cast<test::api::TheClass*>(the_class)->solve(to_cpp(*puzzle));"
+        in src
+    )
+    assert "  delete reinterpret_cast<test::api::TheClass*>(the_class);" in src
+
+
+def test_swift_generator_wrappers(api_with_struct: dict):
+    _, src_ctx = SwiftGenerator(
+        ApiDef(**api_with_struct), gen_version="test-0.0.0", api_h="unused.h"
+    ).generate_ctx(src=Path("unused.swift"))
+    lines = src_ctx.lines
+    assert "public final class TheClass: @unchecked Sendable {" in lines
+    assert "  public func solve(puzzle: ThePuzzle) -> String {" in lines
+    # nothing is marked reentrant - every call shares the class lock
+    assert "  private static let classLock = NSLock()" in lines
+    assert "    defer { TheClass.classLock.unlock() }" in lines
+    # fixed array elements are borrowed in place and cross as a C tuple
+    assert "    return puzzle.sides[0].withCString { puzzle_sides_0 in" in lines
+    assert (
+        "        var puzzle_c = bng_bridge.ThePuzzle(sides: (puzzle_sides_0, puzzle_sides_1))"
+    ) in lines
+    assert "    return withCArray(puzzleBatch) { puzzle_batch_c in" in lines
+
+
+def test_swift_generator_arena_list(api_with_struct: dict):
+    api_with_struct["classes"][0]["methods"].append(
+        dict(type="ThePuzzle", name="puzzles", is_list=True)
+    )
+    _, src_ctx = SwiftGenerator(
+        ApiDef(**api_with_struct), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.swift"))
+    src = src_ctx.get_gen_text()
+    assert "  init(_ c: bng_bridge.ThePuzzle) {" in src
+    assert "bindMemory(to: UnsafePointer<CChar>?.self)) }.map { String(cString: $0!) }" in src
+    assert "public final class ThePuzzleList: RandomAccessCollection {" in src
+    assert "    test_api_release_result(items.baseAddress)" in src
+    assert "  public func puzzles() -> ThePuzzleList {" in src
+    assert "    return ThePuzzleList(result, count)" in src
+
+
+def test_swift_generator_struct_result(api_with_struct: dict):
+    api_with_struct["classes"][0]["methods"].append(dict(type="ThePuzzle", name="puzzle"))
+    hdr_ctx, _ = SwiftBindingGenerator(
+        ApiDef(**api_with_struct), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_umbrella.h"), src=Path("unused_bindings.cpp"))
+    assert "const ThePuzzle* the_class_puzzle(TheClass* the_class);" in hdr_ctx.get_gen_text()
+    _, src_ctx = SwiftGenerator(
+        ApiDef(**api_with_struct), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.swift"))
+    src = src_ctx.get_gen_text()
+    assert "  init(_ c: bng_bridge.ThePuzzle) {" in src
+    assert (
+        "    let result = the_class_puzzle(handle)\n"
+        "    defer { test_api_release_result(result) }\n"
+        "    return ThePuzzle(result!.pointee)"
+    ) in src
+
+
+def test_swift_generator_stream(api_with_struct: dict):
+    api_with_struct["classes"][0]["methods"].append(
+        dict(type="string", name="lines", is_stream=True)
+    )
+    _, src_ctx = SwiftGenerator(
+        ApiDef(**api_with_struct), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.swift"))
+    src = src_ctx.get_gen_text()
+    assert "public final class TheClassLinesStream: AsyncSequence, AsyncIteratorProtocol {" in src
+    assert "    destroy_the_class_lines_stream_cursor(cursor)" in src
+    assert "    guard the_class_lines_next(cursor) else { return nil }" in src
+    assert "  public func lines() -> TheClassLinesStream {" in src
+
+
+def test_swift_generator_error_enum(api_with_struct: dict):
+    api_with_struct["enums"] = [
+        dict(name="TheError", members=[dict(name="ok", value=0), dict(name="failed", value=1)])
+    ]
+    api_with_struct["classes"][0]["methods"][1]["error_enum"] = "TheError"
+    _, src_ctx = SwiftGenerator(
+        ApiDef(**api_with_struct), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.swift"))
+    src = src_ctx.get_gen_text()
+    assert "extension TheError: Error {}" in src
+    assert "  public func solve(puzzle: ThePuzzle) throws -> String {" in src
+    assert (
+        "if error.rawValue != 0 { throw TheError(rawValue: numericCast(error.rawValue))! }" in src
+    )
+    _, src_ctx = SwiftBindingGenerator(
+        ApiDef(**api_with_struct), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(hdr=Path("unused_umbrella.h"), src=Path("unused_bindings.cpp"))
+    # the NULL of a failed call comes with zero sizes, not the previous call's
+    src = src_ctx.get_gen_text()
+    assert "  if (!expected) {\n    *out_size = 0;\n    return {};\n  }" in src
+    assert "  if (!expected) {\n    *out_count = 0;\n    return {};\n  }" in src
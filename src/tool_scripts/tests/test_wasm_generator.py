@@ -14,7 +14,14 @@ sys.path.append(CODE_GEN_DIR.as_posix())
 from api_def import ApiDef
 
 # noinspection PyUnresolvedReferences
-from wasm_generator import WasmBindingGenerator
+from wasm_generator import (
+    WasmBindingGenerator,
+    WasmLoaderGenerator,
+    WasmRawBindingGenerator,
+    WasmRawJsGenerator,
+    WasmWorkerGenerator,
+    WasmWorkerProxyGenerator,
+)
 
 
 #
@@ -44,6 +51,57 @@ def api_with_list() -> dict:
     )
 
 
+@fixture
+def api_with_borrowed() -> dict:
+    return dict(
+        name="test_api",
+        version="1.2.3",
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(
+                        type="int32",
+                        name="load",
+                        parameters=[
+                            dict(name="count", type="int32"),
+                            dict(name="blob", type="bytes"),
+                        ],
+                    )
+                ],
+            )
+        ],
+    )
+
+
+@fixture
+def api_with_setup() -> dict:
+    return dict(
+        name="test_api",
+        version="1.2.3",
+        structs=[dict(name="TheSetupData", members=[dict(name="words", type="string")])],
+        classes=[
+            dict(
+                name="TheClass",
+                methods=[
+                    dict(name="create", type="TheClass", is_factory=True, is_static=True),
+                    dict(
+                        name="setup",
+                        type="string",
+                        parameters=[dict(name="setup_data", type="TheSetupData")],
+                    ),
+                    dict(
+                        name="solve",
+                        type="string",
+                        is_long_running=True,
+                        parameters=[dict(name="puzzle", type="string")],
+                    ),
+                ],
+            )
+        ],
+    )
+
+
 #
 # tests
 #
@@ -55,3 +113,405 @@ def test_wasm_binding_gen(api_with_list: dict):
     ).generate_ctx(src=Path("unused.cpp"))
     lines = src_ctx.get_gen_text()
     assert 'class_<TheClass>("TheClass")' in lines
+    # only what the binding uses - no streams or error results here
+    assert '#include "test_api.h"\n#include <emscripten/bind.h>' in lines
+
+
+def test_wasm_binding_gen_borrowed(api_with_borrowed: dict):
+    _, src_ctx = WasmBindingGenerator(
+        ApiDef(**api_with_borrowed), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert (
+        "emscripten::optional_override([](TheClass& self, int32_t count, const std::string& blob)"
+        in lines
+    )
+    assert (
+        "self.load(count, std::span<const uint8_t>((const uint8_t*)blob.data(), blob.size()))"
+        in lines
+    )
+
+
+def test_wasm_binding_gen_typed_arrays(api_with_list: dict):
+    _, src_ctx = WasmBindingGenerator(
+        ApiDef(**api_with_list), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert "emscripten::val typed_view(const C& c) {" in lines
+    assert "const emscripten::val& the_row" in lines
+    assert "from_typed_array<std::vector<double>>(the_row)" in lines
+    assert "register_vector<double>" not in lines
+    assert 'register_vector<std::string>("std::stringVector")' in lines
+
+
+def test_wasm_raw_binding_gen(api_with_list: dict):
+    _, src_ctx = WasmRawBindingGenerator(
+        ApiDef(**api_with_list), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert "emscripten::" not in lines
+    assert (
+        "EMSCRIPTEN_KEEPALIVE double test_api_the_class_list_sum(TheClass* self, "
+        "const char* label, uint32_t label_size, const double* the_row, uint32_t the_row_count) {"
+    ) in lines
+    assert (
+        "self->list_sum(std::string(label, label_size), std::vector<double>{the_row, the_row + the_row_count})"
+        in lines
+    )
+    assert "EMSCRIPTEN_KEEPALIVE void test_api_the_class_destroy(TheClass* self) {" in lines
+
+
+def test_wasm_raw_js_gen(api_with_list: dict):
+    _, src_ctx = WasmRawJsGenerator(ApiDef(**api_with_list), gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused.js")
+    )
+    lines = src_ctx.get_gen_text()
+    assert "export function bindApi(wasm) {" in lines
+    assert "class TheClass {" in lines
+    assert (
+        "return wasm._test_api_the_class_list_sum(this._ptr, ...putString(allocs, label), "
+        "...putTyped(allocs, the_row, Float64Array))"
+    ) in lines
+    assert "return { TheClass }" in lines
+
+
+def test_wasm_raw_gen_blittable_list(api_with_list: dict):
+    api_with_list["structs"] = [
+        dict(
+            name="ThePoint",
+            members=[
+                dict(name="flag", type="uint8"),
+                dict(name="x", type="float64"),
+                dict(name="codes", type="uint16", array_count=3),
+            ],
+        )
+    ]
+    api_with_list["classes"][0]["methods"].append(
+        dict(
+            type="float64",
+            name="points_sum",
+            parameters=[dict(name="points", type="ThePoint", is_const=True, is_list=True)],
+        )
+    )
+    api = ApiDef(**api_with_list)
+    _, src_ctx = WasmRawBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert "  sizeof(ThePoint) == 24 &&" in lines
+    assert "  offsetof(ThePoint, codes) == 16," in lines
+    assert "const ThePoint* points, uint32_t points_count) {" in lines
+    assert "std::vector<ThePoint>{points, points + points_count}" in lines
+
+    _, js_ctx = WasmRawJsGenerator(api, gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused.js")
+    )
+    js = js_ctx.get_gen_text()
+    assert "  function putThePointList(allocs, items) {" in js
+    assert "      view.setUint8(at, item.flag)" in js
+    assert "      view.setFloat64(at + 8, item.x, true)" in js
+    assert (
+        "      for (let j = 0; j < 3; ++j) view.setUint16(at + 16 + 2 * j, item.codes[j], true)"
+        in js
+    )
+    assert "...putThePointList(allocs, points))" in js
+
+
+def test_wasm_gen_packed_strings(api_with_list: dict):
+    api_with_list["classes"][0]["methods"].append(
+        dict(
+            type="int32",
+            name="count",
+            parameters=[dict(name="words", type="string_view", is_list=True)],
+        )
+    )
+    api = ApiDef(**api_with_list)
+    _, src_ctx = WasmRawBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    lines = src_ctx.get_gen_text()
+    assert (
+        "const char* words, const uint32_t* words_offsets, uint32_t words_count) {\n"
+        "  BNG_BINDING_CALL(test_api_call_stats[1], "
+        "words_offsets[words_count] + sizeof(uint32_t) * (words_count + 1));\n"
+        "  return self->count(bng::api::StringViews(words, words_offsets, words_count));"
+    ) in lines
+
+    _, js_ctx = WasmRawJsGenerator(api, gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused.js")
+    )
+    js = js_ctx.get_gen_text()
+    assert "  function putStrings(allocs, strs) {" in js
+    assert "encoder.encodeInto(s, wasm.HEAPU8.subarray(at, ptr + capacity)).written" in js
+    assert "...putStrings(allocs, words))" in js
+
+    _, embind_ctx = WasmBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    embind = embind_ctx.get_gen_text()
+    assert (
+        "self.count(bng::api::PackedStrings("
+        "emscripten::vecFromJSArray<std::string>(words)).views());"
+    ) in embind
+    assert "std::string_view>" not in embind
+
+
+def test_wasm_loader_gen(api_with_setup: dict):
+    _, src_ctx = WasmLoaderGenerator(
+        ApiDef(**api_with_setup),
+        gen_version="test-0.0.0",
+        factory_module="./bng.js",
+        wasm_url="bng.wasm",
+    ).generate_ctx(src=Path("unused.js"))
+    lines = src_ctx.lines
+    text = src_ctx.get_gen_text()
+    assert 'import createWasmModule from "./bng.js"' in lines
+    assert "bindApi" not in text
+    # download starts on preload, instantiation waits for the first create()
+    assert "  wasmResponse ??= fetch(wasmUrl)" in lines
+    assert "        WebAssembly.instantiateStreaming(preload(), imports).then(" in lines
+    # a failed download rejects create() and is retried by the next one
+    assert "          reject" in lines
+    assert "    }).then(resolve, reject)" in lines
+    assert "    wasmResponse = null" in lines
+    assert "    const api = await loadApi()" in lines
+    assert " * @property {string} words" in lines
+    assert "  setup(setup_data) {" in lines
+    assert "  create(" not in text
+    assert "export function startTheClass(setup_data) {" in lines
+    assert "function yieldToEventLoop() {" not in lines
+
+
+def test_wasm_loader_gen_async(api_with_setup: dict):
+    api_with_setup["classes"][0]["methods"][-1]["is_async"] = True
+    _, src_ctx = WasmLoaderGenerator(
+        ApiDef(**api_with_setup),
+        gen_version="test-0.0.0",
+        factory_module="./bng.js",
+        wasm_url="bng.wasm",
+    ).generate_ctx(src=Path("unused.js"))
+    lines = src_ctx.lines
+    assert "function yieldToEventLoop() {" in lines
+    assert "    await yieldToEventLoop()" in lines
+
+
+def test_wasm_loader_gen_raw(api_with_setup: dict):
+    _, src_ctx = WasmLoaderGenerator(
+        ApiDef(**api_with_setup),
+        gen_version="test-0.0.0",
+        factory_module="./bng.js",
+        wasm_url="bng.wasm",
+        raw_js_module="./test_api.js",
+    ).generate_ctx(src=Path("unused.js"))
+    lines = src_ctx.lines
+    assert 'import { bindApi } from "./test_api.js"' in lines
+    assert "    }).then((module) => resolve(bindApi(module)), reject)" in lines
+
+
+def test_wasm_worker_gen(api_with_setup: dict):
+    _, src_ctx = WasmWorkerGenerator(
+        ApiDef(**api_with_setup), gen_version="test-0.0.0", loader_module="./test_api_loader.js"
+    ).generate_ctx(src=Path("unused.js"))
+    lines = src_ctx.lines
+    assert 'import { TheClass } from "./test_api_loader.js"' in lines
+    assert "    self.postMessage({ id, encoded }, [encoded])" in lines
+    assert "      reply(id, instances[className][method](...args))" in lines
+    assert "    self.postMessage({ id, error: { name, message, code } })" in lines
+
+
+def test_wasm_worker_proxy_gen(api_with_setup: dict, api_with_list: dict):
+    _, src_ctx = WasmWorkerProxyGenerator(
+        ApiDef(**api_with_setup), gen_version="test-0.0.0", worker_module="./test_api_worker.js"
+    ).generate_ctx(src=Path("unused.js"))
+    text = src_ctx.get_gen_text()
+    assert "export class TheClassWorkerPool {" in text
+    assert "        error.name = data.error.name\n" in text
+    # long running methods go to one worker, state changes go to all of them
+    assert (
+        '  return this._leastBusy().request({ className: "TheClass", op: "call", '
+        'method: "solve", args: [puzzle] })'
+    ) in text
+    assert (
+        '    this._connections.map((c) => c.request({ className: "TheClass", op: "call", '
+        'method: "setup", args: [setup_data] }))'
+    ) in text
+
+    # no long running methods - no pool
+    _, src_ctx = WasmWorkerProxyGenerator(
+        ApiDef(**api_with_list), gen_version="test-0.0.0", worker_module="./test_api_worker.js"
+    ).generate_ctx(src=Path("unused.js"))
+    assert "WorkerPool" not in src_ctx.get_gen_text()
+
+
+def test_wasm_batch_gen(api_with_setup: dict):
+    api_with_setup["classes"][0]["methods"][-1]["is_batchable"] = True
+    _, src_ctx = WasmBindingGenerator(
+        ApiDef(**api_with_setup), gen_version="test-0.0.0", api_h="unused.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    text = src_ctx.get_gen_text()
+    assert "emscripten::vecFromJSArray<std::string>(puzzle_batch)" in text
+    assert "return emscripten::val::array(self.solve_batch(" in text
+
+    _, src_ctx = WasmWorkerProxyGenerator(
+        ApiDef(**api_with_setup), gen_version="test-0.0.0", worker_module="./test_api_worker.js"
+    ).generate_ctx(src=Path("unused.js"))
+    text = src_ctx.get_gen_text()
+    # batches are split across the pool instead of queued on one worker
+    assert "args: [puzzle_batch.slice(i * size, (i + 1) * size)] }))" in text
+    assert "  ).then((results) => results.flat())" in text
+
+
+def test_wasm_stream_gen(api_with_setup: dict):
+    api_with_setup["classes"][0]["methods"].append(
+        dict(
+            name="solve_lines",
+            type="string",
+            is_stream=True,
+            parameters=[dict(name="puzzle", type="string", is_const=True)],
+        )
+    )
+    api = ApiDef(**api_with_setup)
+    _, src_ctx = WasmBindingGenerator(api, gen_version="test-0.0.0", api_h="unused.h").generate_ctx(
+        src=Path("unused.cpp")
+    )
+    text = src_ctx.get_gen_text()
+    assert (
+        "return std::make_unique<bng::api::StreamCursor<std::string>>(self.solve_lines(puzzle));"
+    ) in text
+    assert 'emscripten::class_<bng::api::StreamCursor<std::string>>("stringStreamCursor")' in text
+
+    _, src_ctx = WasmRawBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="unused.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    text = src_ctx.get_gen_text()
+    assert (
+        "EMSCRIPTEN_KEEPALIVE bool test_api_the_class_solve_lines_next("
+        "bng::api::StreamCursor<std::string>* cursor) {"
+    ) in text
+    assert "  return cursor->item.c_str();" in text
+
+    _, src_ctx = WasmRawJsGenerator(api, gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused.js")
+    )
+    text = src_ctx.get_gen_text()
+    assert (
+        "item: () => takeString(wasm._test_api_the_class_solve_lines_item(cursor, scratch)),"
+        in text
+    )
+
+    _, src_ctx = WasmLoaderGenerator(
+        api, gen_version="test-0.0.0", factory_module="./bng.js", wasm_url="bng.wasm"
+    ).generate_ctx(src=Path("unused.js"))
+    lines = src_ctx.lines
+    assert "   * @returns {AsyncGenerator<string>}" in lines
+    assert "  async *solve_lines(puzzle) {" in lines
+    assert "        if (i % 256 === 0) await yieldToEventLoop()" in lines
+    assert "      cursor.delete()" in lines
+
+    # cursors stay on the thread that created them
+    _, src_ctx = WasmWorkerProxyGenerator(
+        api, gen_version="test-0.0.0", worker_module="./test_api_worker.js"
+    ).generate_ctx(src=Path("unused.js"))
+    assert "solve_lines" not in src_ctx.get_gen_text()
+
+
+def test_wasm_stream_error_gen(api_with_setup: dict):
+    api_with_setup["enums"] = [
+        dict(name="TheError", members=[dict(name="ok", value=0), dict(name="failed", value=1)])
+    ]
+    api_with_setup["classes"][0]["methods"].append(
+        dict(
+            name="solve_lines",
+            type="string",
+            is_stream=True,
+            error_enum="TheError",
+            parameters=[dict(name="puzzle", type="string", is_const=True)],
+        )
+    )
+    api = ApiDef(**api_with_setup)
+    _, src_ctx = WasmBindingGenerator(api, gen_version="test-0.0.0", api_h="unused.h").generate_ctx(
+        src=Path("unused.cpp")
+    )
+    text = src_ctx.get_gen_text()
+    # the error comes back when the stream opens, the cursor crosses as a val like other results
+    assert (
+        "auto expected = self.solve_lines(puzzle); if (!expected) { return api_error(expected.error()); } "
+        "return emscripten::val(std::make_unique<bng::api::StreamCursor<std::string>>"
+        "(std::move(expected).value()));"
+    ) in text
+
+    _, src_ctx = WasmRawJsGenerator(api, gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused.js")
+    )
+    text = src_ctx.get_gen_text()
+    assert "if (error) return apiError(TheErrorNames, error)\n        cursor = result" in text
+
+    _, src_ctx = WasmLoaderGenerator(
+        api, gen_version="test-0.0.0", factory_module="./bng.js", wasm_url="bng.wasm"
+    ).generate_ctx(src=Path("unused.js"))
+    lines = src_ctx.lines
+    assert (
+        "   * @throws {Error} named after the failing TheError value, from the first pull" in lines
+    )
+    assert "    if (cursor instanceof Error) throw cursor" in lines
+
+
+def test_wasm_error_enum_gen(api_with_setup: dict):
+    api_with_setup["enums"] = [
+        dict(name="TheError", members=[dict(name="ok", value=0), dict(name="failed", value=1)])
+    ]
+    setup, solve = api_with_setup["classes"][0]["methods"][1:]
+    setup["type"] = "void"
+    setup["error_enum"] = "TheError"
+    solve["error_enum"] = "TheError"
+    api = ApiDef(**api_with_setup)
+    _, src_ctx = WasmBindingGenerator(api, gen_version="test-0.0.0", api_h="unused.h").generate_ctx(
+        src=Path("unused.cpp")
+    )
+    text = src_ctx.get_gen_text()
+    assert "emscripten::val api_error(E error) {" in text
+    assert "if (!expected) { return api_error(expected.error()); }" in text
+
+    _, src_ctx = WasmRawBindingGenerator(
+        api, gen_version="test-0.0.0", api_h="unused.h"
+    ).generate_ctx(src=Path("unused.cpp"))
+    text = src_ctx.get_gen_text()
+    assert "uint32_t* out_size, int32_t* out_error) {" in text
+    assert "  *out_error = int32_t(self->setup(setup_data_arg));" in text
+
+    _, src_ctx = WasmRawJsGenerator(api, gen_version="test-0.0.0").generate_ctx(
+        src=Path("unused.js")
+    )
+    text = src_ctx.get_gen_text()
+    assert 'const TheErrorNames = { 0: "ok", 1: "failed" }' in text
+    # the raw build exports HEAPU32, not HEAP32
+    assert "const error = wasm.HEAPU32[(scratch >> 2) + 1] | 0" in text
+    assert "if (error) return apiError(TheErrorNames, error)" in text
+
+    _, src_ctx = WasmLoaderGenerator(
+        api, gen_version="test-0.0.0", factory_module="./bng.js", wasm_url="bng.wasm"
+    ).generate_ctx(src=Path("unused.js"))
+    lines = src_ctx.lines
+    assert "   * @throws {Error} named after the failing TheError value" in lines
+    assert "    if (result instanceof Error) throw result" in lines
+
+
+def test_wasm_binding_gen_shards(api_with_setup: dict):
+    out_dir = OUT_DIR / "wasm_shards"
+    WasmBindingGenerator(
+        ApiDef(**api_with_setup), gen_version="test-0.0.0", api_h="test_api.h"
+    ).generate_files(src=out_dir / "wasm_binding.cpp", shard=True)
+    assert (out_dir / "wasm_binding_shards.txt").read_text().splitlines() == [
+        (out_dir / "wasm_binding.cpp").resolve().as_posix(),
+        (out_dir / "wasm_binding_the_class.cpp").resolve().as_posix(),
+    ]
+
+    common = (out_dir / "wasm_binding.cpp").read_text()
+    assert "EMSCRIPTEN_BINDINGS(test_api) {" in common
+    assert 'value_object<TheSetupData>("TheSetupData")' in common
+    assert 'class_<TheClass>("TheClass")' not in common
+    # each translation unit needs its own uniquely named bindings block
+    shard = (out_dir / "wasm_binding_the_class.cpp").read_text()
+    assert "EMSCRIPTEN_BINDINGS(test_api_the_class) {" in shard
+    assert 'class_<TheClass>("TheClass")' in shard
+    assert "value_object<TheSetupData>" not in shard
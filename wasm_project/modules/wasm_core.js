@@ -15,12 +15,12 @@ function wasm_core_init(word_list, on_ready) {
     wasm_module = inst
     engine_handle = new wasm_module.EngineInterface()
     let setup_data = {wordsPath: "", cachePath: "", wordsData: word_list}
-    let err_msg = engine_handle.setup(setup_data)
-    if (!err_msg) {
+    let error = engine_handle.setup(setup_data)
+    if (!(error instanceof Error)) {
       on_ready()
     }
     else {
-      assert(false, err_msg)
+      assert(false, error.message)
     }
   })
 }
@@ -33,7 +33,8 @@ function wasm_core_solve(box) {
       box.slice(8, 11),
       box.slice(12, 15)
     ]}
-  return engine_handle.solve(puzzle)
+  let solutions = engine_handle.solve(puzzle)
+  return solutions instanceof Error ? `ERROR: ${solutions.message}` : solutions
 }
 
 const WasmCore = { init: wasm_core_init, solve: wasm_core_solve }